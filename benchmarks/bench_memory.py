@@ -0,0 +1,101 @@
+"""
+Benchmark peak memory and throughput of exporting DataCite records.
+
+Each record count is exported in a fresh subprocess from the synthetic DataCite
+stand-in in tests/datacite_stub.py, so that the maximum resident set size of one run
+does not carry over to the next.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory 1000 10000 100000 --page-size 1000
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from datacite_websnap.cli import datacite_bulk_export
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID
+
+DEFAULT_RECORDS = [1_000, 10_000, 100_000]
+
+
+def run(records: int, page_size: int) -> dict:
+    """Export records from the DataCite stand-in without writing files."""
+    exported = 0
+
+    def write_local_file(content_bytes, filename, directory_path, file_logs, **kwargs):
+        nonlocal exported
+        exported += 1
+
+    with (
+        DataCiteStub(records) as stub,
+        tempfile.TemporaryDirectory() as directory_path,
+        patch("datacite_websnap.sinks.write_local_file", new=write_local_file),
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+    ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            destination="local",
+            directory_path=directory_path,
+            api_url=stub.url,
+            page_size=page_size,
+        )
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "records": exported,
+        "seconds": round(seconds, 3),
+        "records_per_second": round(exported / seconds),
+        "peak_traced_mb": round(peak / 1024**2, 2),
+        "max_rss_mb": round(
+            max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024, 2
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("records", nargs="*", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.records[0], args.page_size)))
+        return
+
+    print(
+        f"{'records':>10} {'seconds':>9} {'records/s':>10} "
+        f"{'peak traced MB':>15} {'max RSS MB':>11}"
+    )
+    for records in args.records:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", str(records)]
+            + ["--page-size", str(args.page_size), "--child"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{result['records']:>10} {result['seconds']:>9} "
+            f"{result['records_per_second']:>10} "
+            f"{result['peak_traced_mb']:>15} {result['max_rss_mb']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
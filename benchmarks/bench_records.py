@@ -0,0 +1,110 @@
+"""
+Benchmark the per-record overhead of extracting and preparing DataCite records.
+
+Synthetic DataCite API pages with the records of tests/datacite_stub.py are built in
+memory, so that only the record handling is measured: extracting the records of a
+page and preparing each record with the export pipeline (_prepare_record), whose MD5
+hash is then read by the plan or snapshot and by the manifest. "dict" extracts the
+records with the former {doi: xml} dictionaries that were validated and unpacked for
+each record, "record" extracts DataCiteRecord objects directly. Both representations
+run the same pipeline after the extraction.
+
+Run from the repository root:
+    python -m benchmarks.bench_records
+    python -m benchmarks.bench_records --records 100000 --repeat 5
+"""
+
+import argparse
+import base64
+import time
+
+from datacite_websnap.api import _prepare_record
+from datacite_websnap.datacite_handler import extract_doi_xml
+from datacite_websnap.manifest import ManifestWriter
+from datacite_websnap.record import DataCiteRecord
+from tests.datacite_stub import stub_doi, stub_updated, stub_xml
+
+
+def build_pages(records: int, page_size: int) -> list[dict]:
+    """Return DataCite API list DOIs page responses with synthetic records."""
+    xml = {
+        index % 100: base64.b64encode(stub_xml(index)).decode() for index in range(100)
+    }
+    return [
+        {
+            "data": [
+                {
+                    "attributes": {
+                        "doi": stub_doi(index),
+                        "xml": xml[index % 100],
+                        "updated": stub_updated(index),
+                    }
+                }
+                for index in range(start, min(start + page_size, records))
+            ]
+        }
+        for start in range(0, records, page_size)
+    ]
+
+
+def run_dict(pages: list[dict]) -> None:
+    """Extract records as validated and unpacked dictionaries, then prepare them."""
+    manifest = ManifestWriter()
+    for page in pages:
+        doi_xml = []
+        for obj in page.get("data", []):
+            attributes = obj.get("attributes", {})
+            if (xml := attributes.get("xml")) and (doi := attributes.get("doi")):
+                doi_xml.append({doi: xml, "updated": attributes.get("updated")})
+        for doi_xml_dict in doi_xml:
+            # Former validate_single_string_key_value()
+            updated = doi_xml_dict.pop("updated")
+            if len(doi_xml_dict) == 1:
+                key, value = next(iter(doi_xml_dict.items()))
+                assert isinstance(key, str) and isinstance(value, str)
+            doi, xml = next(iter(doi_xml_dict.items()))
+            _prepare(DataCiteRecord(doi, xml, updated), manifest)
+    manifest.finish()
+
+
+def run_record(pages: list[dict]) -> None:
+    """Extract records as DataCiteRecord objects, then prepare them."""
+    manifest = ManifestWriter()
+    for page in pages:
+        for record in extract_doi_xml(page):
+            _prepare(record, manifest)
+    manifest.finish()
+
+
+def _prepare(record: DataCiteRecord, manifest: ManifestWriter) -> None:
+    """Prepare a record like the export and hash it for the plan and the manifest."""
+    prepared = _prepare_record((record, None))
+    _ = prepared.md5
+    manifest.add(
+        prepared.doi, prepared.filename, prepared.body, prepared.md5, record.updated
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = build_pages(args.records, args.page_size)
+
+    print(f"{'representation':>15} {'seconds':>9} {'µs/record':>10}")
+    for name, run in (("dict", run_dict), ("record", run_record)):
+        seconds = min(_timed(run, pages) for _ in range(args.repeat))
+        print(f"{name:>15} {seconds:>9.3f} {seconds / args.records * 1e6:>10.2f}")
+
+
+def _timed(run, pages: list[dict]) -> float:
+    start = time.perf_counter()
+    run(pages)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark the sustained S3 PUT rate of the "flat" and "hash" key layouts.
+
+Records are exported from the synthetic DataCite stand-in in tests/datacite_stub.py
+to the S3 stand-in in tests/s3_stub.py, which throttles PUT requests per key
+partition with "503 SlowDown" like S3 does. With the "flat" layout all keys share
+one partition, with the "hash" layout keys are spread across hash-derived prefixes.
+With --adaptive each layout is also exported with adaptive (AIMD) concurrency, which
+backs off from "503 SlowDown" instead of using all workers.
+
+Run from the repository root:
+    python -m benchmarks.bench_s3_put
+    python -m benchmarks.bench_s3_put --records 5000 --workers 32 --partition-rate 200
+    python -m benchmarks.bench_s3_put --adaptive
+"""
+
+import argparse
+import os
+import time
+from unittest.mock import patch
+
+from datacite_websnap.cli import datacite_bulk_export
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+KEY_PREFIX = "bench"
+
+
+def run(
+    layout: str,
+    records: int,
+    workers: int,
+    partition_rate: float,
+    adaptive: bool = False,
+) -> dict:
+    """Export records to the throttling S3 stand-in with a key layout."""
+    os.environ.update(AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench")
+
+    # Partitions are the key prefix and the first two characters after it
+    partition_length = len(KEY_PREFIX) + 3
+
+    with (
+        DataCiteStub(records) as datacite,
+        S3Stub(partition_rate, partition_length, keep_objects=False) as s3,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.api.CustomWarning") as mock_warning,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.key_index.CustomEcho"),
+        patch("datacite_websnap.preflight.CustomEcho"),
+    ):
+        os.environ["ENDPOINT_URL"] = s3.url
+        start = time.perf_counter()
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            bucket=STUB_BUCKET,
+            key_prefix=KEY_PREFIX,
+            api_url=datacite.url,
+            page_size=1000,
+            workers=workers,
+            layout=layout,
+            circuit_breaker_threshold=0,
+            retry_attempts=0,
+            adaptive_concurrency=adaptive,
+        )
+        seconds = time.perf_counter() - start
+
+    return {
+        "layout": f"{layout}{' (AIMD)' if adaptive else ''}",
+        "seconds": round(seconds, 2),
+        "puts_per_second": round(records / seconds),
+        "slow_down": s3.throttled,
+        "failed": mock_warning.call_count,
+        "partitions": len(s3.partitions()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--partition-rate", type=float, default=200)
+    parser.add_argument("--adaptive", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        f"{args.records} records, {args.workers} workers, "
+        f"{args.partition_rate:g} PUT/s per partition"
+    )
+    print(
+        f"{'layout':>13} {'seconds':>8} {'PUT/s':>7} {'SlowDown':>9} "
+        f"{'failed':>7} {'partitions':>11}"
+    )
+    modes = [(layout, False) for layout in ("flat", "hash")]
+    if args.adaptive:
+        modes += [(layout, True) for layout in ("flat", "hash")]
+    for layout, adaptive in modes:
+        result = run(layout, args.records, args.workers, args.partition_rate, adaptive)
+        print(
+            f"{result['layout']:>13} {result['seconds']:>8} "
+            f"{result['puts_per_second']:>7} {result['slow_down']:>9} "
+            f"{result['failed']:>7} {result['partitions']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1054 @@
+"""
+Programmatic API that bulk exports DataCite XML metadata records to a sink.
+
+The 'export' command of the CLI is a thin wrapper around the Exporter. Applications
+that export records repeatedly (for example scheduled workers) can use an Exporter
+directly, so that the DataCite API session and the sink clients are reused across
+exports and errors are raised as ExportError instead of click exceptions.
+
+Example usage:
+    from datacite_websnap.api import ExportOptions, ExportQuery, Exporter
+    from datacite_websnap.exporter import create_s3_client
+    from datacite_websnap.sinks import S3Sink
+
+    sink = S3Sink(create_s3_client(conf_s3), "opendataswiss")
+    with Exporter() as exporter:
+        result = exporter.export(
+            ExportQuery(client_id="ethz.wsl"),
+            sink,
+            ExportOptions(key_prefix="ethz.wsl", workers=8),
+        )
+    print(result.stats.summary())
+"""
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Literal, Sequence
+
+import click
+import requests
+
+from .circuit_breaker import CircuitBreaker
+from .concurrency import AdaptiveConcurrency
+from .compression import Compression, compress_bytes, validate_compression
+from .config import (
+    ADAPTIVE_CONCURRENCY_MAX,
+    CIRCUIT_BREAKER_COOLDOWN,
+    CIRCUIT_BREAKER_THRESHOLD,
+    COMPRESSION_WORKERS,
+    DATACITE_API_URL,
+    DATACITE_PAGE_SIZE,
+    DOI_LOOKUP_BATCH_SIZE,
+    DOI_LOOKUP_WORKERS,
+    EXPORT_WORKERS,
+    RETRY_ATTEMPTS,
+    XML_VALIDATION_BATCH_SIZE,
+    XML_VALIDATION_WORKERS,
+)
+from .datacite_handler import (
+    format_updated_since_filters,
+    get_datacite_client,
+    get_datacite_dois_xml_by_id,
+    get_datacite_list_dois_xml,
+    get_recorded_list_dois_xml,
+)
+from .exporter import Layout, format_xml_file_name
+from .failed_records import FailedRecord, retry_failed_records
+from .key_index import write_key_index
+from .logger import (
+    CustomClickException,
+    CustomEcho,
+    CustomTransportException,
+    CustomWarning,
+)
+from .manifest import ManifestWriter, write_manifest
+from .pipeline import PreparedRecord, prefetch_map
+from .preflight import PreflightCheck, run_preflight
+from .ratelimit import RateLimits, ThrottledSession
+from .record import DataCiteRecord
+from .plan import ExportPlan, build_export_plans
+from .sinks import Sink
+from .snapshot import (
+    load_snapshot_base,
+    format_snapshot_prefix,
+    prune_snapshots,
+    validate_snapshot,
+    write_latest_snapshot,
+)
+from .state import StateStore
+from .stats import ExportStats
+from .tracing import span
+from .xml_validator import validate_xml_records
+
+
+class ExportError(Exception):
+    """
+    Error raised by Exporter.export() if an export cannot be completed.
+
+    Attributes:
+        message: Error message.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass(frozen=True)
+class ExportQuery:
+    """
+    Records to export.
+
+    Exactly one source is used: recorded pages (replay_pages), specific DOIs (dois),
+    or the records of a repository account and/or DOI prefixes.
+
+    Attributes:
+        client_id: DataCite repository account ID, for example "ethz.wsl"
+        doi_prefix: DataCite DOI prefixes, for example ("10.16904",)
+        dois: Specific DOIs to export, for example ("10.16904/envidat.31",)
+        filters: Additional DataCite search query params, for example returned by
+                 format_datacite_filters().
+        record_pages: Optional path of a directory the page responses are recorded
+                      in.
+        replay_pages: Optional path of a directory with recorded page responses that
+                      are exported instead of querying DataCite.
+        updated_since: Optional ISO 8601 UTC timestamp, only records of the
+                       repository account and/or DOI prefixes updated at or after it
+                       are exported (incremental export). The manifest merges the
+                       entries of an existing manifest and 0 records are not an
+                       error.
+    """
+
+    client_id: str | None = None
+    doi_prefix: tuple[str, ...] = ()
+    dois: tuple[str, ...] = ()
+    filters: dict[str, str] = field(default_factory=dict)
+    record_pages: str | None = None
+    replay_pages: str | None = None
+    updated_since: str | None = None
+
+
+@dataclass(frozen=True)
+class ExportOptions:
+    """
+    Options of an export, defaults match the defaults of the CLI.
+
+    Attributes:
+        key_prefix: Optional key prefix of the exported objects.
+        layout: Layout of record keys, "flat", "hash" or "doi-suffix".
+        compress: Optional compression format of exported records, "gzip" or "zstd".
+        workers: Number of records written concurrently, the maximum if
+                 adaptive_concurrency is set.
+        validate_xml: Optional XML validation, "well-formed" or "schema".
+        xml_schema: Path of the local XSD file used if validate_xml is "schema".
+        validation_workers: Number of XML validation processes.
+        early_exit: If True the export stops at the first record that fails.
+        retry_attempts: Number of retry passes for records that failed to export.
+        circuit_breaker_threshold: Consecutive transport errors that pause the
+                                   export, 0 disables the circuit breaker.
+        circuit_breaker_cooldown: Seconds to wait before probing the destination.
+        page_size: Number of records per DataCite API page.
+        lookup_workers: Number of concurrent requests for specific DOIs.
+        plan: If True records are compared with the destination and nothing is
+              written, the plan is returned with the result.
+        manifest: If True a manifest of the exported records is written.
+        snapshot: Optional date of a snapshot, for example "2025-01-02". Records
+                  are written under the dated prefix, records that did not change
+                  since the latest snapshot are copied from it.
+        snapshot_retention: Number of snapshots to keep, older snapshots are
+                            deleted. 0 keeps all snapshots.
+        preflight: If True the DataCite query and the destinations are checked
+                   concurrently before the harvest, see preflight.py.
+        adaptive_concurrency: If True the number of records written concurrently
+                              to each destination adapts to its latency and
+                              errors (AIMD), up to workers (or
+                              ADAPTIVE_CONCURRENCY_MAX if workers is 1), see
+                              concurrency.py.
+        state_db: Optional path of a SQLite database the key, hash, DataCite
+                  "updated" timestamp, export time and error of each record are
+                  recorded in, see state.py. Not used by plans.
+    """
+
+    key_prefix: str | None = None
+    layout: Layout = "flat"
+    compress: Compression | None = None
+    workers: int = EXPORT_WORKERS
+    validate_xml: Literal["well-formed", "schema"] | None = None
+    xml_schema: str | None = None
+    validation_workers: int = XML_VALIDATION_WORKERS
+    early_exit: bool = False
+    retry_attempts: int = RETRY_ATTEMPTS
+    circuit_breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD
+    circuit_breaker_cooldown: int = CIRCUIT_BREAKER_COOLDOWN
+    page_size: int = DATACITE_PAGE_SIZE
+    lookup_workers: int = DOI_LOOKUP_WORKERS
+    plan: bool = False
+    manifest: bool = False
+    snapshot: str | None = None
+    snapshot_retention: int = 0
+    preflight: bool = True
+    adaptive_concurrency: bool = False
+    state_db: str | None = None
+
+
+@dataclass(frozen=True)
+class Destination:
+    """
+    Sink with its own export policy, used to export the records of one harvest to
+    several destinations.
+
+    Attributes:
+        sink: Sink the records are written to.
+        name: Name of the destination shown in messages, defaults to the sink name.
+        workers: Number of records written concurrently to this destination,
+                 defaults to ExportOptions.workers.
+        early_exit: If True this destination stops at the first record that fails,
+                    defaults to ExportOptions.early_exit.
+    """
+
+    sink: Sink
+    name: str | None = None
+    workers: int | None = None
+    early_exit: bool | None = None
+
+    @property
+    def label(self) -> str:
+        """Name of the destination shown in messages."""
+        return self.name or self.sink.name
+
+
+@dataclass
+class DestinationResult:
+    """
+    Result of an export to one destination.
+
+    Attributes:
+        name: Name of the destination.
+        stats: Counts and sizes of the records processed for the destination.
+        failed_records: Records that still failed after retrying.
+        plan: Plan of the export if it was planned instead of exported.
+        error: Error message if the export to the destination was aborted, for
+               example by its early-exit policy.
+    """
+
+    name: str
+    stats: ExportStats
+    failed_records: list[FailedRecord] = field(default_factory=list)
+    plan: ExportPlan | None = None
+    error: str | None = None
+
+
+@dataclass
+class ExportResult:
+    """
+    Result of an export, with one DestinationResult per destination in the order
+    of the destinations.
+    """
+
+    destinations: list[DestinationResult]
+
+    @property
+    def stats(self) -> ExportStats:
+        """Stats of the first (or only) destination."""
+        return self.destinations[0].stats
+
+    @property
+    def plan(self) -> ExportPlan | None:
+        """Plan of the first (or only) destination."""
+        return self.destinations[0].plan
+
+    @property
+    def failed_records(self) -> list[FailedRecord]:
+        """Records that failed for at least one destination, once per DOI."""
+        failed = {}
+        for result in self.destinations:
+            for record in result.failed_records:
+                failed.setdefault(record.doi, record)
+        return list(failed.values())
+
+    @property
+    def errors(self) -> dict[str, str]:
+        """Error messages of the destinations that were aborted, by name."""
+        return {
+            result.name: result.error for result in self.destinations if result.error
+        }
+
+
+class Exporter:
+    """
+    Export DataCite XML records to sinks.
+
+    The DataCite API requests of all exports share one requests.Session, so that
+    connections are reused. An Exporter can be used as a context manager that
+    closes the session.
+    """
+
+    def __init__(
+        self,
+        api_url: str = DATACITE_API_URL,
+        file_logs: bool = False,
+        rate_limits: RateLimits | None = None,
+    ):
+        """
+        Args:
+            api_url: The DataCite base URL to call the API with.
+            file_logs: If True enables logging info messages and errors to a file log.
+            rate_limits: Optional rate limits of the exports, the fetch limit
+                         applies to the DataCite API requests and the observed rates
+                         are echoed with the progress of each page. The upload and
+                         PUT limits must also be passed to the S3 sinks.
+        """
+        self.api_url = api_url
+        self.file_logs = file_logs
+        self.rate_limits = rate_limits or RateLimits()
+        self.session = (
+            ThrottledSession(self.rate_limits.fetch)
+            if self.rate_limits.fetch
+            else requests.Session()
+        )
+
+    def __enter__(self) -> "Exporter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the DataCite API session."""
+        self.session.close()
+
+    def export(
+        self,
+        query: ExportQuery,
+        sink: Sink | Destination | Sequence[Sink | Destination],
+        options: ExportOptions | None = None,
+    ) -> ExportResult:
+        """
+        Export the records matching the query to one or several destinations and
+        return the result.
+
+        Each record is retrieved, decoded and compressed once and then written to
+        all destinations concurrently, each destination with its own workers,
+        error counts and early-exit policy. Records that fail are retried and
+        returned with the result. A destination with early exit stops at its
+        first failing record while the other destinations continue, ExportError is
+        raised if all destinations stopped or the export cannot be completed.
+
+        Args:
+            query: Records to export.
+            sink: Sink, Destination or sequence of them the records are written to.
+            options: Options of the export, defaults to ExportOptions().
+        """
+        if isinstance(sink, (Sink, Destination)):
+            sink = [sink]
+        destinations = [
+            item if isinstance(item, Destination) else Destination(item)
+            for item in sink
+        ]
+        if not destinations:
+            raise ExportError("At least one export destination is required")
+        options = options or ExportOptions()
+
+        state = None
+        try:
+            if options.state_db and not options.plan:
+                state = StateStore(options.state_db, file_logs=self.file_logs)
+                state.start_run()
+            result = self._export(query, destinations, options, state)
+            if state:
+                state.finish_run(
+                    sum(dest.stats.exported for dest in result.destinations),
+                    sum(dest.stats.failed for dest in result.destinations),
+                )
+            return result
+        except click.ClickException as err:
+            if state:
+                state.finish_run(0, 0, error=err.message)
+            raise ExportError(err.message) from err
+        except Exception as err:
+            # Unexpected errors (for example of custom sinks) also fail the run
+            message = f"Unexpected error: {err}"
+            if state:
+                state.finish_run(0, 0, error=message)
+            raise ExportError(message) from err
+        finally:
+            if state:
+                state.close()
+
+    def _export(
+        self,
+        query: ExportQuery,
+        destinations: list[Destination],
+        options: ExportOptions,
+        state: StateStore | None = None,
+    ) -> ExportResult:
+        file_logs = self.file_logs
+        validate_compression(options.compress, file_logs)
+
+        # Incremental exports query the DataCite API for updated records
+        if query.updated_since and (query.dois or query.replay_pages):
+            raise CustomClickException(
+                "Incremental exports cannot be combined with specific DOIs or "
+                "recorded pages",
+                file_logs,
+            )
+
+        # Snapshots are complete copies of the records, a subset of DOIs or a plan
+        # cannot produce one
+        key_prefix = options.key_prefix
+        if options.snapshot:
+            validate_snapshot(options.snapshot, file_logs)
+            if query.dois or query.updated_since or options.plan:
+                raise CustomClickException(
+                    "Snapshots cannot be combined with specific DOIs, incremental "
+                    "exports or a plan",
+                    file_logs,
+                )
+            key_prefix = format_snapshot_prefix(key_prefix, options.snapshot)
+
+        exports = [
+            _DestinationExport(
+                destination,
+                options,
+                key_prefix=key_prefix,
+                merge=bool(query.dois or query.updated_since),
+                labelled=len(destinations) > 1,
+                state=state,
+                file_logs=file_logs,
+            )
+            for destination in destinations
+        ]
+
+        # Rate limits are echoed after each retrieved page
+        def on_page(page: dict) -> None:
+            CustomEcho(f"Rate limits: {self.rate_limits.summary()}", file_logs)
+
+        # Validate client_id (raise error if client_id does not return successful
+        # response when used to return a client from the DataCite API), retrieve
+        # the first page of records and check that the destinations can be written
+        # to. Lookups of specific DOIs retrieve all records at once and start after
+        # the checks.
+        lookup_failures: list[tuple[str, str]] = []
+        records = partial(
+            self._records,
+            query,
+            options,
+            on_page if self.rate_limits else None,
+            on_failed=lambda doi, error: lookup_failures.append((doi, error)),
+        )
+        checks = []
+        if query.client_id:
+            checks.append(
+                PreflightCheck(
+                    "DataCite client",
+                    partial(
+                        get_datacite_client,
+                        self.api_url,
+                        query.client_id,
+                        file_logs,
+                        session=self.session,
+                    ),
+                )
+            )
+        if not query.dois:
+            checks.append(PreflightCheck("DataCite records", records))
+        for export in exports:
+            checks.append(
+                PreflightCheck(
+                    f"{export.result.name} destination",
+                    partial(export.start, options.preflight),
+                )
+            )
+
+        if options.preflight:
+            results = run_preflight(checks, file_logs=file_logs)
+        else:
+            results = {check.name: check.run() for check in checks}
+        xml_list = (
+            results["DataCite records"] if "DataCite records" in results else records()
+        )
+        for export in exports:
+            export.stats.total = len(xml_list) + len(lookup_failures)
+
+        # Validate XML records in worker processes ahead of the export, records are
+        # paired with their validation error message (None if valid or not validated)
+        if options.validate_xml:
+            records = validate_xml_records(
+                xml_list,
+                mode=options.validate_xml,
+                schema_path=options.xml_schema,
+                workers=options.validation_workers,
+                batch_size=XML_VALIDATION_BATCH_SIZE,
+                file_logs=file_logs,
+            )
+        else:
+            records = ((record, None) for record in xml_list)
+
+        # Decode and compress records in worker threads ahead of the export so that
+        # compression does not block uploads, records are prepared once for all
+        # destinations
+        prepare_record = partial(
+            _prepare_record,
+            key_prefix=key_prefix,
+            compression=options.compress,
+            layout=options.layout,
+            file_logs=file_logs,
+        )
+        prepared_records = prefetch_map(
+            prepare_record,
+            records,
+            workers=COMPRESSION_WORKERS if options.compress else 0,
+        )
+
+        # Compare records with one listing of each destination instead of exporting
+        if options.plan:
+            plans = build_export_plans(
+                prepared_records,
+                [
+                    (
+                        export.sink.list(options.key_prefix),
+                        export.sink.stored_key("", options.compress),
+                    )
+                    for export in exports
+                ],
+                include_deletions=not (query.dois or query.updated_since),
+                file_logs=file_logs,
+            )
+            for export, export_plan in zip(exports, plans):
+                export.result.plan = export_plan
+            return ExportResult([export.result for export in exports])
+
+        # Write each record to all destinations, a slow destination holds back the
+        # harvest once its queue of pending records is full so that memory stays
+        # bounded
+        try:
+            # Specific DOIs that could not be retrieved fail like any other record,
+            # so that they are written to the dead-letter file
+            for doi, error in lookup_failures:
+                failed = PreparedRecord(
+                    doi, stage="lookup", error=CustomClickException(error, file_logs)
+                )
+                for export in exports:
+                    export.submit(failed)
+                _raise_if_all_aborted(exports)
+            for prepared in prepared_records:
+                for export in exports:
+                    export.submit(prepared)
+                _raise_if_all_aborted(exports)
+            for export in exports:
+                export.drain()
+            _raise_if_all_aborted(exports)
+        finally:
+            for export in exports:
+                export.shutdown()
+
+        # Retry records that failed, then write the DOI index and manifest
+        for export in exports:
+            if not export.aborted:
+                export.finish(prepare_record, options.retry_attempts)
+
+        return ExportResult([export.result for export in exports])
+
+    def _records(
+        self, query: ExportQuery, options: ExportOptions, on_page, on_failed=None
+    ):
+        """
+        Return an iterable of DataCiteRecord objects with DOIs and Base64 encoded XML
+        strings that correspond to the records of the query. Pages are streamed so that
+        memory use does not grow with the number of records. Specific DOIs that
+        cannot be retrieved are passed to on_failed with the error message.
+        """
+        if query.replay_pages:
+            return get_recorded_list_dois_xml(
+                query.replay_pages, self.file_logs, stream=True, on_page=on_page
+            )
+        if query.dois:
+            return get_datacite_dois_xml_by_id(
+                self.api_url,
+                query.dois,
+                batch_size=min(options.page_size, DOI_LOOKUP_BATCH_SIZE),
+                workers=options.lookup_workers,
+                file_logs=self.file_logs,
+                filters=query.filters,
+                on_page=on_page,
+                session=self.session,
+                on_failed=on_failed,
+            )
+        filters = query.filters
+        if query.updated_since:
+            filters = format_updated_since_filters(filters, query.updated_since)
+        return get_datacite_list_dois_xml(
+            self.api_url,
+            query.client_id,
+            query.doi_prefix,
+            options.page_size,
+            self.file_logs,
+            query.record_pages,
+            filters,
+            stream=True,
+            on_page=on_page,
+            session=self.session,
+            allow_empty=bool(query.updated_since),
+        )
+
+
+def _prepare_record(
+    item: tuple[DataCiteRecord, str | None],
+    key_prefix: str | None = None,
+    compression: Compression | None = None,
+    layout: Layout = "flat",
+    file_logs: bool = False,
+) -> PreparedRecord:
+    """
+    Decode and optionally compress a record paired with its XML validation error
+    message. Errors are returned with the prepared record instead of being
+    raised so that records can be prepared in worker threads.
+    """
+    record, xml_error = item
+    prepared = PreparedRecord(record.doi, record)
+    try:
+        prepared.filename = format_xml_file_name(prepared.doi, key_prefix, layout)
+
+        prepared.stage = "decode"
+        with span("decode_base64_xml", "record", doi=prepared.doi) as trace:
+            xml_decoded = record.decode(file_logs)
+            trace.set(bytes=len(xml_decoded))
+        prepared.size = len(xml_decoded)
+
+        if xml_error:
+            prepared.stage = "xml"
+            raise CustomClickException(
+                f"Invalid XML for DOI '{prepared.doi}': {xml_error}", file_logs
+            )
+
+        prepared.stage = "export"
+        if compression:
+            prepared.body = compress_bytes(xml_decoded, compression, file_logs)
+        else:
+            prepared.body = xml_decoded
+
+    except CustomClickException as err:
+        prepared.error = err
+
+    return prepared
+
+
+class _DestinationUnreachable(CustomTransportException):
+    """Record that was not written because the circuit breaker opened."""
+
+
+def _raise_if_all_aborted(exports: list["_DestinationExport"]) -> None:
+    """Raise the error of the export if all of its destinations were aborted."""
+    if not all(export.aborted for export in exports):
+        return
+    if len(exports) == 1:
+        raise exports[0].error
+    raise CustomClickException("; ".join(export.result.error for export in exports))
+
+
+def _write_record(
+    prepared: PreparedRecord, sink: Sink, compression: Compression | None = None
+) -> CustomClickException | None:
+    """
+    Write a prepared record that did not fail yet to a sink and return the error if
+    the write fails. Errors are returned instead of being raised so that records
+    can be written in worker threads. Unexpected errors of custom sinks fail the
+    record like other export errors.
+    """
+    if prepared.error:
+        return prepared.error
+    try:
+        sink.write_record(
+            prepared.doi, prepared.body, prepared.filename, compression=compression
+        )
+    except CustomClickException as err:
+        return err
+    except Exception as err:
+        return CustomClickException(
+            f"Failed to export key {prepared.filename} to {sink.name} "
+            f"destination: {err}"
+        )
+    return None
+
+
+class _DestinationExport:
+    """
+    Export of the prepared records to one destination: writes records in a pool of
+    worker threads and collects the results in the order of the records.
+    """
+
+    def __init__(
+        self,
+        destination: Destination,
+        options: ExportOptions,
+        key_prefix: str | None = None,
+        merge: bool = False,
+        labelled: bool = False,
+        state: StateStore | None = None,
+        file_logs: bool = False,
+    ):
+        """
+        Args:
+            destination: Destination of the export.
+            options: Options of the export.
+            key_prefix: Key prefix of the records, the DOI index and the manifest,
+                        includes the snapshot date of snapshot exports.
+            merge: If True the manifest merges entries of an existing manifest.
+            labelled: If True warnings are prefixed with the destination name.
+            state: Optional state database the exported and failed records are
+                   recorded in.
+            file_logs: If True enables logging info messages and errors to a file log.
+        """
+        self.sink = destination.sink
+        self.options = options
+        self.key_prefix = key_prefix
+        self.labelled = labelled
+        self.state = state
+        self.file_logs = file_logs
+        self.workers = destination.workers or options.workers
+        self.early_exit = (
+            options.early_exit
+            if destination.early_exit is None
+            else destination.early_exit
+        )
+        self.result = DestinationResult(
+            destination.label, ExportStats(compression=options.compress)
+        )
+        self.stats = self.result.stats
+        self.error: CustomClickException | None = None
+
+        # Adapt the number of writes in flight to the destination, the worker
+        # threads are the upper bound
+        self.concurrency = None
+        if options.adaptive_concurrency:
+            if self.workers == 1:
+                self.workers = ADAPTIVE_CONCURRENCY_MAX
+            self.concurrency = AdaptiveConcurrency(self.workers)
+            self.stats.concurrency_timeline = self.concurrency.timeline
+
+        # Pause export and probe destination after consecutive transport errors
+        self.breaker = None
+        if options.circuit_breaker_threshold and not self.early_exit:
+            self.breaker = CircuitBreaker(
+                probe=self.sink.probe,
+                threshold=options.circuit_breaker_threshold,
+                cooldown=options.circuit_breaker_cooldown,
+                file_logs=file_logs,
+            )
+
+        # Keys of records nested in shard directories (written to the index) and
+        # manifest entries of the exported records
+        self.key_index: dict[str, str] | None = None
+        if options.layout != "flat":
+            self.key_index = {}
+        self.manifest = None
+        if options.manifest and not options.plan:
+            self.manifest = ManifestWriter(merge=merge)
+
+        # Unchanged records of a snapshot are copied from the previous snapshot,
+        # loaded by start()
+        self.snapshot_base = None
+
+        # Records are written in the current thread if there is only one worker and
+        # one destination, else in a pool so that destinations are written
+        # concurrently
+        self.executor = None
+        if self.workers > 1 or labelled:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending: deque[tuple[PreparedRecord, Future]] = deque()
+
+    def start(self, check: bool = True) -> None:
+        """
+        Prepare the export before the harvest starts: check that records can be
+        written to the destination and load the previous snapshot.
+
+        Args:
+            check: If True the sink preflight check runs first.
+        """
+        options = self.options
+        if check:
+            self.sink.preflight(options.key_prefix, write=not options.plan)
+        if options.snapshot:
+            self.snapshot_base = load_snapshot_base(
+                self.sink, options.snapshot, options.key_prefix, self.file_logs
+            )
+
+    @property
+    def aborted(self) -> bool:
+        """True if the export to the destination was stopped."""
+        return self.error is not None
+
+    def submit(self, prepared: PreparedRecord) -> None:
+        """Write a record, blocks while the queue of pending records is full."""
+        if self.aborted:
+            return
+        if not self.executor:
+            self._collect(prepared, *self._write(prepared))
+            return
+
+        future = self.executor.submit(self._write, prepared)
+        self.pending.append((prepared, future))
+        while len(self.pending) >= self.workers * 2 and not self.aborted:
+            # Writes paused by the circuit breaker do not hold back the harvest
+            # shared with the other destinations
+            if self.breaker and self.breaker.paused:
+                break
+            record, future = self.pending.popleft()
+            self._collect(record, *future.result())
+
+    def drain(self) -> None:
+        """Collect the results of all pending records."""
+        while self.pending and not self.aborted:
+            record, future = self.pending.popleft()
+            self._collect(record, *future.result())
+
+    def shutdown(self) -> None:
+        """Stop the worker threads, pending records that did not start are dropped."""
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.pending.clear()
+
+    def finish(self, prepare_record, retry_attempts: int) -> None:
+        """
+        Retry the records that failed, then write the DOI index and the manifest
+        and flush the sink.
+
+        Args:
+            prepare_record: Function that prepares a record for export again.
+            retry_attempts: Number of retry passes.
+        """
+
+        def export_record(doi: str, xml_str: str, updated: str | None) -> None:
+            prepared = prepare_record((DataCiteRecord(doi, xml_str, updated), None))
+            if error := _write_record(prepared, self.sink, self._compress):
+                raise self._labelled(error)
+            self._record_exported(prepared)
+
+        stats = self.stats
+        if self.result.failed_records:
+            self.result.failed_records = retry_failed_records(
+                self.result.failed_records,
+                export_record=export_record,
+                attempts=retry_attempts,
+                file_logs=self.file_logs,
+            )
+            stats.retried = stats.failed - len(self.result.failed_records)
+            stats.exported += stats.retried
+            stats.failed = len(self.result.failed_records)
+
+        # The index and manifest are read, merged and written, concurrent exports
+        # to the same sink take turns
+        with self.sink.finish_lock:
+            if self.key_index:
+                write_key_index(
+                    self.key_index, self.sink, self.key_prefix, self.file_logs
+                )
+            if self.manifest:
+                write_manifest(
+                    self.manifest, self.sink, self.key_prefix, self.file_logs
+                )
+
+        self.sink.flush()
+        if self.options.snapshot:
+            self._finish_snapshot()
+
+    def _finish_snapshot(self) -> None:
+        """
+        Point the latest snapshot pointer to the snapshot and prune old snapshots,
+        an incomplete snapshot is kept but does not become the latest snapshot.
+        """
+        options = self.options
+        if self.result.failed_records:
+            CustomWarning(
+                self._labelled_message(
+                    f"Latest snapshot pointer was not updated, snapshot "
+                    f"{options.snapshot} is incomplete: "
+                    f"{len(self.result.failed_records)} record(s) failed"
+                ),
+                self.file_logs,
+            )
+            return
+
+        write_latest_snapshot(
+            self.sink,
+            options.snapshot,
+            self.stats.exported,
+            options.key_prefix,
+            self.file_logs,
+        )
+        if options.snapshot_retention:
+            prune_snapshots(
+                self.sink,
+                options.snapshot_retention,
+                options.key_prefix,
+                keep=options.snapshot,
+                file_logs=self.file_logs,
+            )
+
+    @property
+    def _compress(self) -> Compression | None:
+        return self.options.compress
+
+    def _labelled_message(self, message: str) -> str:
+        """Return the message with the destination name if there are several."""
+        return f"[{self.result.name}] {message}" if self.labelled else message
+
+    def _labelled(self, error: CustomClickException) -> CustomClickException:
+        """Return the error with the destination name if there are several."""
+        if not self.labelled:
+            return error
+        labelled = type(error)(self._labelled_message(error.message))
+        labelled.file_logs = error.file_logs
+        return labelled
+
+    def _record_exported(self, prepared: PreparedRecord) -> None:
+        stored_key = self.sink.stored_key(prepared.filename, self._compress)
+        self.stats.xml_bytes += prepared.size
+        self.stats.stored_bytes += len(prepared.body)
+        if self.key_index is not None:
+            self.key_index[prepared.doi] = stored_key
+        if self.manifest:
+            self.manifest.add(
+                prepared.doi,
+                stored_key,
+                prepared.body,
+                prepared.md5,
+                prepared.record.updated if prepared.record else None,
+            )
+        if self.state:
+            self.state.exported(
+                self.result.name,
+                prepared.doi,
+                stored_key,
+                prepared.md5,
+                len(prepared.body),
+                prepared.record.updated if prepared.record else None,
+            )
+
+    def _write(
+        self, prepared: PreparedRecord
+    ) -> tuple[CustomClickException | None, bool]:
+        """
+        Write a record once the adaptive concurrency allows another write in
+        flight, and report its latency and transport errors to it. Waits while
+        the circuit breaker of the destination is tripped.
+        """
+        if self.breaker and not prepared.error and not self.breaker.wait():
+            return _DestinationUnreachable(
+                f"Failed to export DOI '{prepared.doi}', destination is unreachable",
+                self.file_logs,
+            ), False
+        if not self.concurrency or prepared.error:
+            return self._write_or_copy(prepared)
+
+        ticket = self.concurrency.acquire()
+        start = time.monotonic()
+        error, copied = self._write_or_copy(prepared)
+        self.concurrency.release(
+            ticket,
+            time.monotonic() - start,
+            congested=isinstance(error, CustomTransportException),
+        )
+        return error, copied
+
+    def _write_or_copy(
+        self, prepared: PreparedRecord
+    ) -> tuple[CustomClickException | None, bool]:
+        """
+        Write a record, or copy it from the previous snapshot if it did not change.
+        Return the error of the record (if it failed) and whether it was copied.
+        """
+        source_key = None
+        if self.snapshot_base and not prepared.error:
+            stored_key = self.sink.stored_key(prepared.filename, self._compress)
+            source_key = self.snapshot_base.source_key(
+                stored_key, prepared.body, prepared.md5
+            )
+        if source_key is None:
+            return _write_record(prepared, self.sink, self._compress), False
+
+        # Records of a snapshot that is exported again on the same day are already
+        # in place
+        try:
+            if source_key == stored_key or self.sink.copy(source_key, stored_key):
+                return None, True
+        except CustomClickException as err:
+            return err, False
+        except Exception as err:
+            return CustomClickException(
+                f"Failed to copy key {source_key} to {stored_key} in "
+                f"{self.sink.name} destination: {err}"
+            ), False
+        return _write_record(prepared, self.sink, self._compress), False
+
+    def _collect(
+        self,
+        prepared: PreparedRecord,
+        error: CustomClickException | None,
+        copied: bool = False,
+    ) -> None:
+        """Count a written record or handle the error of a failed record."""
+        if error is None:
+            self.stats.exported += 1
+            self.stats.copied += copied
+            self._record_exported(prepared)
+            if self.breaker:
+                self.breaker.record_success()
+            return
+        if isinstance(error, _DestinationUnreachable):
+            # Not attempted, the circuit breaker opened while the record waited
+            self._abort_unreachable()
+            return
+
+        self.stats.failed += 1
+        if self.state:
+            self.state.failed(
+                self.result.name,
+                prepared.doi,
+                error.message,
+                prepared.record.updated if prepared.record else None,
+            )
+        error = self._labelled(error)
+        if self.early_exit:
+            self._abort(error.message)
+            return
+
+        CustomWarning(error.message, self.file_logs)
+        self.result.failed_records.append(
+            FailedRecord(
+                prepared.doi,
+                prepared.stage,
+                error.message,
+                prepared.record.xml if prepared.record else None,
+                prepared.record.updated if prepared.record else None,
+            )
+        )
+
+        if (
+            self.breaker
+            and isinstance(error, CustomTransportException)
+            and not self.breaker.record_failure()
+        ):
+            self._abort_unreachable()
+
+    def _abort_unreachable(self) -> None:
+        """Stop exporting to the destination after its circuit breaker opened."""
+        if self.aborted:
+            return
+        self._abort(
+            f"Aborted export because {self.result.name} destination is "
+            f"unreachable: {self.breaker.consecutive_failures} consecutive "
+            f"transport errors and {self.breaker.max_probes} failed endpoint "
+            f"probes. Export summary: {self.stats.summary()}"
+        )
+
+    def _abort(self, message: str) -> None:
+        """Stop exporting to the destination, other destinations continue."""
+        self.error = CustomClickException(message, self.file_logs)
+        self.result.error = message
+        if self.labelled:
+            CustomWarning(f"Stopped export to destination: {message}", self.file_logs)
+        self.sink.flush()
@@ -0,0 +1,132 @@
+"""
+Circuit breaker that pauses an export when the export destination is failing.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from .config import (
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN,
+    CIRCUIT_BREAKER_PROBES,
+)
+from .logger import CustomEcho, CustomWarning
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker that tracks consecutive transport errors.
+
+    After "threshold" consecutive transport errors the breaker trips and writes
+    are paused: the first writer that calls wait() pauses for "cooldown" seconds
+    and probes the endpoint while the other writers wait for the result. If a probe
+    succeeds the breaker resets and the writes resume, otherwise the endpoint is
+    probed again with exponential backoff up to "max_probes" times before the
+    breaker stays open and the export should be aborted.
+
+    Recording errors never blocks, so that only the writers of the failing
+    destination are paused and not the harvest shared by all destinations.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], bool],
+        threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+        cooldown: float = CIRCUIT_BREAKER_COOLDOWN,
+        max_probes: int = CIRCUIT_BREAKER_PROBES,
+        file_logs: bool = False,
+    ):
+        """
+        Args:
+            probe: Callable that returns True if the endpoint is reachable.
+            threshold: Number of consecutive transport errors that trip the breaker.
+            cooldown: Seconds to pause before the first probe, doubled for each
+                      subsequent probe.
+            max_probes: Number of probes attempted before the breaker stays open.
+            file_logs: If True enables logging info messages and errors to a file log.
+        """
+        self.probe = probe
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_probes = max_probes
+        self.file_logs = file_logs
+
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.is_open = False
+        self._lock = threading.Lock()
+        self._probing = False
+        # Set while writes are allowed, cleared while the breaker is tripped
+        self._closed = threading.Event()
+        self._closed.set()
+
+    @property
+    def paused(self) -> bool:
+        """True while the breaker is tripped and writes wait for the probes."""
+        return not self._closed.is_set()
+
+    def record_success(self) -> None:
+        """Reset the count of consecutive transport errors."""
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> bool:
+        """
+        Record a transport error, trips the breaker once the threshold is reached.
+
+        Returns False if the breaker is open and the export should be aborted,
+        else True.
+        """
+        with self._lock:
+            if self.is_open:
+                return False
+
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.threshold and not self.paused:
+                self.trips += 1
+                self._closed.clear()
+            return True
+
+    def wait(self) -> bool:
+        """
+        Called before each write, blocks while the breaker is tripped. The first
+        caller pauses and probes the endpoint, the lock is not held meanwhile.
+
+        Returns True if the write can go ahead, False if the breaker is open.
+        """
+        with self._lock:
+            if self.is_open or not self.paused:
+                return not self.is_open
+            probing, self._probing = self._probing, True
+
+        if probing:
+            self._closed.wait()
+            return not self.is_open
+
+        recovered = self._probe()
+        with self._lock:
+            self._probing = False
+            if recovered:
+                self.consecutive_failures = 0
+            else:
+                self.is_open = True
+            self._closed.set()
+        return recovered
+
+    def _probe(self) -> bool:
+        """Pause and probe the endpoint with exponential backoff."""
+        for attempt in range(self.max_probes):
+            pause = self.cooldown * 2**attempt
+            CustomWarning(
+                f"{self.consecutive_failures} consecutive transport errors, "
+                f"pausing export for {pause} seconds before probing endpoint "
+                f"(probe {attempt + 1}/{self.max_probes})",
+                self.file_logs,
+            )
+            time.sleep(pause)
+
+            if self.probe():
+                CustomEcho("Endpoint probe succeeded, resuming export", self.file_logs)
+                return True
+        return False
@@ -12,35 +12,101 @@ To access general CLI help in terminal execute:
 To access more detailed export command help in terminal execute:
     datacite-websnap export --help
 
+To keep exporting the records updated since the last run every hour execute:
+    datacite-websnap watch --client-id ethz.wsl --bucket opendataswiss --interval 3600
+
 Example command:
     datacite-websnap export --client-id ethz.wsl --bucket opendataswiss --key-prefix ethz.wsl --file-logs
 """
 
 import os
+import signal
+import threading
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Literal
+
 import click
-from typing import Literal
 from dotenv import load_dotenv
 
-from .logger import setup_logging, CustomEcho, CustomClickException, CustomWarning
-from .config import DATACITE_API_URL, DATACITE_PAGE_SIZE
+from .logger import (
+    setup_logging,
+    echo_to_stderr,
+    CustomBadParameter,
+    CustomEcho,
+    CustomClickException,
+    CustomWarning,
+)
+from .config import (
+    DATACITE_API_URL,
+    DATACITE_PAGE_SIZE,
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN,
+    RETRY_ATTEMPTS,
+    DEAD_LETTER_NAME,
+    DOI_LOOKUP_BATCH_SIZE,
+    DOI_LOOKUP_WORKERS,
+    XML_VALIDATION_BATCH_SIZE,
+    XML_VALIDATION_WORKERS,
+    EXPORT_WORKERS,
+    SNAPSHOT_DATE_FORMAT,
+    SNAPSHOT_LATEST_NAME,
+    PREFLIGHT_KEY_NAME,
+    ADAPTIVE_CONCURRENCY_MAX,
+    WATCH_INTERVAL,
+    WATCH_OVERLAP_SECONDS,
+    WATCH_HEALTH_HOST,
+    WATCH_HEALTH_PORT,
+    SERVE_HOST,
+    SERVE_PORT,
+    SERVE_JOB_WORKERS,
+    SERVE_MAX_QUEUED_JOBS,
+    STATE_STATUS_LIMIT,
+)
 from .validators import (
     validate_url,
     validate_at_least_one_query_param,
     validate_positive_int,
-    validate_single_string_key_value,
     validate_s3_config,
+    validate_s3_transport,
     validate_bucket,
     validate_key_prefix,
     validate_directory_path,
+    validate_doi_list,
+    validate_dois,
+    validate_doi_file,
+    validate_replay_pages,
+    validate_years,
+    validate_xml_schema,
+    validate_layout,
+    validate_destinations,
+    validate_stdout_destination,
+    validate_snapshot_options,
+    validate_byte_rate,
+    validate_positive_rate,
+    validate_timestamp,
+    DestinationSpec,
 )
-from .datacite_handler import get_datacite_client, get_datacite_list_dois_xml
-from .exporter import (
-    decode_base64_xml,
-    format_xml_file_name,
-    write_local_file,
-    create_s3_client,
-    s3_client_put_object,
+from .datacite_handler import format_datacite_filters
+from .exporter import Layout, create_s3_client
+from .compression import Compression, validate_compression
+from .api import (
+    Destination,
+    ExportError,
+    ExportOptions,
+    ExportQuery,
+    ExportResult,
+    Exporter,
 )
+from .sinks import LocalSink, S3Sink, StdoutSink
+from .ratelimit import RateLimits
+from .plan import write_plan_file
+from .failed_records import write_dead_letter_file, read_dead_letter_file
+from .watch import HealthServer, Watcher
+from .server import ExportServer, JobQueue
+from .preflight import PreflightCheck, run_preflight
+from .tracing import tracing
+from .state import StateStore
 
 
 @click.group()
@@ -54,86 +120,975 @@ def cli():
     To learn more about the 'export' command run:
 
     datacite-websnap export --help
+
+    To learn more about the 'watch' command, that exports the records updated since
+    its last run on an interval, run:
+
+    datacite-websnap watch --help
+
+    To learn more about the 'serve' command, a local HTTP job API that runs exports
+    on demand, run:
+
+    datacite-websnap serve --help
     """
     pass
 
 
-@cli.command(name="export")
-@click.option(
-    "--doi-prefix",
-    multiple=True,
-    help="DataCite DOI prefix used to filter results. "
-    "Accepts single or multiple prefix arguments.",
-)
-@click.option(
-    "--client-id",
-    help="DataCite repository account id used to filter results, "
-    "referred to as the 'client-id' in the DataCite documentation.",
+# Options of the export command that the watch command shares, specific DOIs,
+# recorded pages, plans and snapshots are not supported by incremental runs
+WATCH_EXPORT_OPTIONS = (
+    "doi_prefix",
+    "client_id",
+    "state",
+    "resource_type_id",
+    "created",
+    "registered",
+    "query",
+    "destination",
+    "bucket",
+    "key_prefix",
+    "directory_path",
+    "file_logs",
+    "log_level",
+    "early_exit",
+    "api_url",
+    "page_size",
+    "circuit_breaker_threshold",
+    "circuit_breaker_cooldown",
+    "retry_attempts",
+    "dead_letter_file",
+    "validate_xml",
+    "xml_schema",
+    "validation_workers",
+    "compress",
+    "layout",
+    "fsync",
+    "workers",
+    "adaptive_concurrency",
+    "max_upload_rate",
+    "max_put_rate",
+    "max_fetch_rate",
+    "manifest",
+    "preflight",
+    "state_db",
+    "s3_transport",
 )
-@click.option(
-    "--destination",
-    type=click.Choice(["S3", "local"]),
-    default="S3",
-    help="Choose where to export the DataCite XML records: "
-    "'S3' (default) for an S3 bucket or 'local' for local file system.",
+
+
+# Options of the export command that the serve command shares, the records of
+# each job are part of the job request
+SERVE_EXPORT_OPTIONS = (
+    "state",
+    "resource_type_id",
+    "created",
+    "registered",
+    "query",
+    "destination",
+    "bucket",
+    "key_prefix",
+    "directory_path",
+    "file_logs",
+    "log_level",
+    "early_exit",
+    "api_url",
+    "page_size",
+    "lookup_workers",
+    "circuit_breaker_threshold",
+    "circuit_breaker_cooldown",
+    "retry_attempts",
+    "validate_xml",
+    "xml_schema",
+    "validation_workers",
+    "compress",
+    "layout",
+    "fsync",
+    "workers",
+    "adaptive_concurrency",
+    "max_upload_rate",
+    "max_put_rate",
+    "max_fetch_rate",
+    "manifest",
+    "preflight",
+    "state_db",
+    "s3_transport",
 )
+
+
+def _export_options(command: Literal["export", "watch", "serve"]) -> Callable:
+    """
+    Return a decorator that adds the options of the export command that a command
+    shares to the command. Each command gets its own option instances, with help
+    that fits the command.
+
+    Args:
+        command: name of the command the options are added to
+    """
+    # Records are only streamed to stdout by the export command
+    local_help = (
+        ", 'local' for local file system or 'stdout' to stream the records to stdout "
+        "as NDJSON lines or, with 'stdout,format=tar', as a tar stream, messages are "
+        "then written to stderr"
+        if command == "export"
+        else " or 'local' for local file system"
+    )
+    destination_checks = (
+        "each destination can be written to: S3 buckets with a HeadBucket request "
+        f"and an empty test object '{PREFLIGHT_KEY_NAME}' that is written and "
+        "deleted under the key prefix, local directories with a temporary file"
+    )
+    preflight_help = {
+        "export": "Check concurrently before the harvest that the DataCite query "
+        f"returns records (and '--client-id' exists) and that {destination_checks}. "
+        "The export fails within seconds if a check fails",
+        "watch": "Check concurrently before the first run that the DataCite query "
+        f"returns records (and '--client-id' exists) and that {destination_checks}. "
+        "A run fails within seconds if a check fails, the checks are repeated "
+        "before each run until they pass",
+        "serve": f"Check concurrently at startup that {destination_checks}. The job "
+        "API does not start if a check fails",
+    }[command] + " (default: enabled)"
+
+    options = {
+        "doi_prefix": click.option(
+            "--doi-prefix",
+            multiple=True,
+            help="DataCite DOI prefix used to filter results. Accepts single or "
+            "multiple prefix arguments.",
+        ),
+        "client_id": click.option(
+            "--client-id",
+            help="DataCite repository account id used to filter results, referred to "
+            "as the 'client-id' in the DataCite documentation.",
+        ),
+        "doi": click.option(
+            "--doi",
+            multiple=True,
+            help="DataCite DOI of a record to export. Accepts single or multiple DOI "
+            "arguments. Only the listed DOIs are retrieved from DataCite and exported. "
+            "Cannot be combined with '--doi-prefix' or '--client-id'.",
+            callback=validate_dois,
+        ),
+        "doi_file": click.option(
+            "--doi-file",
+            type=click.Path(exists=True, file_okay=True, dir_okay=False),
+            help="Path of a text file with DataCite DOIs of records to export, one DOI "
+            "per line. Blank lines and lines starting with '#' are ignored. Cannot be "
+            "combined with '--doi-prefix' or '--client-id'.",
+            callback=validate_doi_file,
+        ),
+        "state": click.option(
+            "--state",
+            multiple=True,
+            type=click.Choice(["findable", "registered", "draft"]),
+            help="DataCite DOI state used to filter results server-side. Accepts "
+            "single or multiple state arguments.",
+        ),
+        "resource_type_id": click.option(
+            "--resource-type-id",
+            multiple=True,
+            help="DataCite resource type id used to filter results server-side, for "
+            "example 'dataset'. Accepts single or multiple resource type arguments.",
+        ),
+        "created": click.option(
+            "--created",
+            multiple=True,
+            help="Year DOIs were created used to filter results server-side, for "
+            "example '2024'. Accepts single or multiple year arguments.",
+            callback=validate_years,
+        ),
+        "registered": click.option(
+            "--registered",
+            multiple=True,
+            help="Year DOIs were registered used to filter results server-side, for "
+            "example '2024'. Accepts single or multiple year arguments.",
+            callback=validate_years,
+        ),
+        "query": click.option(
+            "--query",
+            help="Free-form DataCite query used to filter results server-side, for "
+            "example 'titles.title:snow'.",
+        ),
+        "destination": click.option(
+            "--destination",
+            multiple=True,
+            default=("S3",),
+            help="Choose where to export the DataCite XML records: 'S3' (default) for "
+            f"an S3 bucket{local_help}. Accepts multiple destinations, records are "
+            "harvested once and written to all destinations concurrently. Use "
+            "'S3:<name>' for additional S3 destinations configured with environment "
+            "variables prefixed with the upper case name, for example "
+            "'MIRROR_ENDPOINT_URL' and 'MIRROR_BUCKET' for 'S3:mirror'. Append "
+            "',workers=<n>' and ',early-exit[=true|false]' to override '--workers' and "
+            "'--early-exit' for a destination, for example 'S3:mirror,workers=8'.",
+        ),
+        "bucket": click.option(
+            "--bucket",
+            help="Name of S3 bucket that DataCite XML records (as S3 objects) will be "
+            "written in.",
+        ),
+        "key_prefix": click.option(
+            "--key-prefix",
+            help="Optional key prefix for objects in S3 bucket. If omitted then "
+            "objects are written in S3 bucket without a prefix.",
+        ),
+        "directory_path": click.option(
+            "--directory-path",
+            type=click.Path(exists=True, file_okay=False, dir_okay=True),
+            help="Only used if exporting to local destination. Path of the local "
+            "directory that DataCite XML metadata records will be written in",
+        ),
+        "file_logs": click.option(
+            "--file-logs",
+            is_flag=True,
+            default=False,
+            help="Flag that enables logging info messages and errors to a file log.",
+        ),
+        "log_level": click.option(
+            "--log-level",
+            default="INFO",
+            type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]),
+            help="Set the logging level.",
+        ),
+        "early_exit": click.option(
+            "--early-exit",
+            is_flag=True,
+            default=False,
+            help="If flag enabled then terminates program immediately after export "
+            "error occurs. Default value is False (not enabled). If False then only "
+            "logs export error and continues to try to export other DataCite XML "
+            "records returned by search query to an S3 bucket or local destination.",
+        ),
+        "api_url": click.option(
+            "--api-url",
+            default=DATACITE_API_URL,
+            help="DataCite API base URL used for queries (default: "
+            f"{DATACITE_API_URL})",
+            callback=validate_url,
+        ),
+        "page_size": click.option(
+            "--page-size",
+            type=int,
+            default=DATACITE_PAGE_SIZE,
+            help="Number of records returned per page of DataCite API response using "
+            f"pagination (default: {DATACITE_PAGE_SIZE})",
+            callback=validate_positive_int,
+        ),
+        "lookup_workers": click.option(
+            "--lookup-workers",
+            type=int,
+            default=DOI_LOOKUP_WORKERS,
+            help="Only used if exporting specific DOIs. Maximum number of concurrent "
+            "DataCite API requests used to retrieve the DOIs, each request retrieves a "
+            f"batch of up to {DOI_LOOKUP_BATCH_SIZE} DOIs (default: "
+            f"{DOI_LOOKUP_WORKERS})",
+            callback=validate_positive_int,
+        ),
+        "circuit_breaker_threshold": click.option(
+            "--circuit-breaker-threshold",
+            type=int,
+            default=CIRCUIT_BREAKER_THRESHOLD,
+            help="Only used if exporting to S3 destination. Number of consecutive S3 "
+            "transport errors (connection errors, timeouts, server errors) after which "
+            "the export is paused and the endpoint is probed. The export resumes if "
+            "the endpoint recovers, otherwise it is aborted. Set to 0 to disable "
+            f"(default: {CIRCUIT_BREAKER_THRESHOLD})",
+            callback=validate_positive_int,
+        ),
+        "circuit_breaker_cooldown": click.option(
+            "--circuit-breaker-cooldown",
+            type=int,
+            default=CIRCUIT_BREAKER_COOLDOWN,
+            help="Seconds the export is paused before the S3 endpoint is probed after "
+            "the circuit breaker trips, doubled for each subsequent probe (default: "
+            f"{CIRCUIT_BREAKER_COOLDOWN})",
+            callback=validate_positive_int,
+        ),
+        "retry_attempts": click.option(
+            "--retry-attempts",
+            type=int,
+            default=RETRY_ATTEMPTS,
+            help="Number of times records that failed to export are retried at the end "
+            "of the export, with exponential backoff between attempts. Set to 0 to "
+            f"disable (default: {RETRY_ATTEMPTS})",
+            callback=validate_positive_int,
+        ),
+        "dead_letter_file": click.option(
+            "--dead-letter-file",
+            type=click.Path(file_okay=True, dir_okay=False, writable=True),
+            default=DEAD_LETTER_NAME,
+            help="Path of the JSON Lines file that records which still fail to export "
+            "after retrying are written to, with their DOI, failed stage and error. "
+            f"Only written if records failed (default: {DEAD_LETTER_NAME})",
+        ),
+        "retry_failed": click.option(
+            "--retry-failed",
+            type=click.Path(exists=True, file_okay=True, dir_okay=False),
+            help="Path of a dead-letter file written by a previous export. Only the "
+            "DOIs listed in the file are retrieved from DataCite and exported, can be "
+            "combined with '--doi' and '--doi-file'. Cannot be combined with "
+            "'--doi-prefix' or '--client-id'.",
+        ),
+        "record_pages": click.option(
+            "--record-pages",
+            type=click.Path(file_okay=False, dir_okay=True, writable=True),
+            help="Optional path of a local directory that the raw DataCite API page "
+            "responses are recorded in (as a gzip compressed JSON Lines file) while "
+            "harvesting, so that the harvest can be replayed with '--replay-pages'.",
+        ),
+        "replay_pages": click.option(
+            "--replay-pages",
+            type=click.Path(exists=True, file_okay=False, dir_okay=True),
+            help="Path of a local directory with DataCite API page responses recorded "
+            "with '--record-pages'. The recorded records are exported without calling "
+            "the DataCite API. Cannot be combined with '--doi-prefix', '--client-id', "
+            "'--retry-failed' or '--record-pages'.",
+        ),
+        "validate_xml": click.option(
+            "--validate-xml",
+            type=click.Choice(["well-formed", "schema"]),
+            help="Optional validation of each decoded XML record before it is "
+            "exported: 'well-formed' checks that the record is well-formed XML, "
+            "'schema' also validates the record against the DataCite kernel 4.5 "
+            "XML schema bundled with the package, or the local XML schema passed "
+            "with '--xml-schema'. By default records are not validated. Invalid "
+            "records are reported and not exported.",
+        ),
+        "xml_schema": click.option(
+            "--xml-schema",
+            type=click.Path(exists=True, file_okay=True, dir_okay=False),
+            help="Optional path of a local DataCite kernel XML schema file (for "
+            "example 'kernel-4.6/metadata.xsd') used by '--validate-xml schema' "
+            "instead of the bundled DataCite kernel 4.5 schema. Included schema files "
+            "must also be available locally, the network is never used. Requires the "
+            "'lxml' package: pip install 'datacite-websnap[schema]'",
+        ),
+        "validation_workers": click.option(
+            "--validation-workers",
+            type=int,
+            default=XML_VALIDATION_WORKERS,
+            help="Number of worker processes that validate XML records in batches of "
+            f"{XML_VALIDATION_BATCH_SIZE} records. Set to 0 to validate in the main "
+            f"process (default: {XML_VALIDATION_WORKERS})",
+            callback=validate_positive_int,
+        ),
+        "compress": click.option(
+            "--compress",
+            type=click.Choice(["gzip", "zstd"]),
+            help="Optional compression of exported records. S3 objects keep their "
+            "'.xml' key and are uploaded with the matching 'Content-Encoding' header, "
+            "local files are written with a '.gz' or '.zst' extension. 'zstd' requires "
+            "the 'zstandard' package: pip install 'datacite-websnap[zstd]'",
+        ),
+        "layout": click.option(
+            "--layout",
+            type=click.Choice(["flat", "hash", "doi-suffix"]),
+            default="flat",
+            help="Layout of exported records: 'flat' (default) writes all records "
+            "directly in '--directory-path' (or under '--key-prefix'), 'hash' and "
+            "'doi-suffix' nest records in two levels of shard directories named after "
+            "a hash of the DOI or the start of the DOI suffix, for example "
+            "'en/vi/10.16904_envidat.31.xml'. Use 'hash' to spread S3 keys across "
+            "prefixes. Nested layouts also write an index that maps each DOI to the "
+            "key of its record. 'doi-suffix' is only supported for local exports.",
+        ),
+        "fsync": click.option(
+            "--fsync",
+            is_flag=True,
+            default=False,
+            help="Sync each file written to a local destination to disk before it is "
+            "renamed into place, so that exported files survive a power loss. Slows "
+            "down local exports, by default only the directories are synced (in "
+            "batches).",
+        ),
+        "workers": click.option(
+            "--workers",
+            type=int,
+            default=EXPORT_WORKERS,
+            help="Number of records exported (written or uploaded) concurrently "
+            f"(default: {EXPORT_WORKERS})",
+            callback=validate_positive_int,
+        ),
+        "adaptive_concurrency": click.option(
+            "--adaptive-concurrency",
+            is_flag=True,
+            default=False,
+            help="Adapt the number of records exported concurrently to each "
+            "destination (AIMD): increase it by one while latency and errors stay "
+            "healthy, halve it on throttling ('503 SlowDown'), timeouts or latency "
+            "spikes. '--workers' sets the maximum (default: "
+            f"{ADAPTIVE_CONCURRENCY_MAX} if '--workers' is not set above 1). The "
+            "concurrency over time is reported in the export summary.",
+        ),
+        "max_upload_rate": click.option(
+            "--max-upload-rate",
+            help="Optional limit of the bytes per second uploaded to S3 destinations, "
+            "for example '10M' or '1.5MiB'. The limit is shared by all workers and "
+            "destinations.",
+            callback=validate_byte_rate,
+        ),
+        "max_put_rate": click.option(
+            "--max-put-rate",
+            type=float,
+            help="Optional limit of the PUT (and copy) requests per second sent to S3 "
+            "destinations. The limit is shared by all workers and destinations.",
+            callback=validate_positive_rate,
+        ),
+        "max_fetch_rate": click.option(
+            "--max-fetch-rate",
+            help="Optional limit of the bytes per second downloaded from the DataCite "
+            "API, for example '2M'. Observed rates are reported with the progress of "
+            "each page.",
+            callback=validate_byte_rate,
+        ),
+        "trace_file": click.option(
+            "--trace-file",
+            type=click.Path(file_okay=True, dir_okay=False, writable=True),
+            help="Optional path of a JSON file in the Chrome Trace Event format that "
+            "spans of each DataCite API request, record decode and sink write (with "
+            "DOI, bytes, status code and retries) are written to, for example to load "
+            "the export in Perfetto (https://ui.perfetto.dev). Tracing is disabled by "
+            "default.",
+        ),
+        "state_db": click.option(
+            "--state-db",
+            type=click.Path(file_okay=True, dir_okay=False, writable=True),
+            help="Optional path of a local SQLite database (created if it does not "
+            "exist) that records the key, MD5 hash, DataCite 'updated' timestamp, last "
+            "export time and last error of each record and destination, and each run. "
+            "Query it with 'datacite-websnap status'.",
+        ),
+        "s3_transport": click.option(
+            "--s3-transport",
+            help="Optional S3 transport profile of the S3 clients as comma-separated "
+            "settings: 'pool-size=<n>' (by default the connection pool is sized to the "
+            "number of concurrent writes), 'retry-mode=standard|adaptive', "
+            "'max-attempts=<n>', 'connect-timeout=<seconds>', "
+            "'read-timeout=<seconds>', 'tcp-keepalive' and 'path-style' (path-style "
+            "addressing, for example for on-premises endpoints). Overrides the "
+            "settings of the 'S3_TRANSPORT' environment variable (prefixed with the "
+            "name of named S3 destinations), for example "
+            "'retry-mode=adaptive,tcp-keepalive'.",
+        ),
+        "plan": click.option(
+            "--plan",
+            is_flag=True,
+            default=False,
+            help="Dry run that harvests the records, lists the export destination once "
+            "and compares records by content hash, then prints how many records would "
+            "be created, updated, unchanged or deleted. Nothing is written.",
+        ),
+        "plan_file": click.option(
+            "--plan-file",
+            type=click.Path(file_okay=True, dir_okay=False, writable=True),
+            help="Optional path of a JSON file the plan is written to, implies "
+            "'--plan'.",
+        ),
+        "manifest": click.option(
+            "--manifest",
+            is_flag=True,
+            default=False,
+            help="Write a gzip compressed JSON manifest 'manifest.json.gz' (under the "
+            "key prefix for S3) at the end of the export that lists the DOI, key, MD5 "
+            "hash, size and DataCite 'updated' timestamp of each exported record. "
+            "Exports of specific DOIs update the entries of an existing manifest.",
+        ),
+        "snapshot": click.option(
+            "--snapshot",
+            is_flag=True,
+            default=False,
+            help="Export a dated snapshot under '<key-prefix>/YYYY-MM-DD/' (today, "
+            "UTC). Records that did not change since the latest snapshot are copied "
+            "from it (server-side for S3, hard links for local exports) instead of "
+            "uploaded again. A complete snapshot updates the pointer object "
+            f"'{SNAPSHOT_LATEST_NAME}'.",
+        ),
+        "snapshot_retention": click.option(
+            "--snapshot-retention",
+            type=int,
+            default=0,
+            help="Number of snapshots to keep with '--snapshot', older snapshots are "
+            "deleted with batched deletes after a complete snapshot. Set to 0 to keep "
+            "all snapshots (default: 0)",
+            callback=validate_positive_int,
+        ),
+        "preflight": click.option(
+            "--preflight/--no-preflight",
+            default=True,
+            help=preflight_help,
+        ),
+    }
+    names = {
+        "export": options.keys(),
+        "watch": WATCH_EXPORT_OPTIONS,
+        "serve": SERVE_EXPORT_OPTIONS,
+    }[command]
+
+    def decorator(f: Callable) -> Callable:
+        # Applied in reverse so that the options are listed in the order above
+        for name in reversed([name for name in options if name in names]):
+            f = options[name](f)
+        return f
+
+    return decorator
+
+
+@cli.command(name="export")
+@_export_options("export")
+def datacite_bulk_export(
+    doi_prefix: tuple[str, ...] = (),
+    client_id: str | None = None,
+    doi: tuple[str, ...] = (),
+    doi_file: tuple[str, ...] = (),
+    state: tuple[str, ...] = (),
+    resource_type_id: tuple[str, ...] = (),
+    created: tuple[str, ...] = (),
+    registered: tuple[str, ...] = (),
+    query: str | None = None,
+    destination: tuple[str, ...] = ("S3",),
+    bucket: str | None = None,
+    key_prefix: str | None = None,
+    directory_path: str | None = None,
+    file_logs: bool = False,
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO",
+    early_exit: bool = False,
+    api_url: str = DATACITE_API_URL,
+    page_size: int = DATACITE_PAGE_SIZE,
+    lookup_workers: int = DOI_LOOKUP_WORKERS,
+    circuit_breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+    circuit_breaker_cooldown: int = CIRCUIT_BREAKER_COOLDOWN,
+    retry_attempts: int = RETRY_ATTEMPTS,
+    dead_letter_file: str = DEAD_LETTER_NAME,
+    retry_failed: str | None = None,
+    record_pages: str | None = None,
+    replay_pages: str | None = None,
+    validate_xml: Literal["well-formed", "schema"] | None = None,
+    xml_schema: str | None = None,
+    validation_workers: int = XML_VALIDATION_WORKERS,
+    compress: Compression | None = None,
+    layout: Layout = "flat",
+    fsync: bool = False,
+    workers: int = EXPORT_WORKERS,
+    plan: bool = False,
+    plan_file: str | None = None,
+    manifest: bool = False,
+    snapshot: bool = False,
+    snapshot_retention: int = 0,
+    preflight: bool = True,
+    adaptive_concurrency: bool = False,
+    max_upload_rate: float | None = None,
+    max_put_rate: float | None = None,
+    max_fetch_rate: float | None = None,
+    trace_file: str | None = None,
+    state_db: str | None = None,
+    s3_transport: str | None = None,
+) -> None:
+    """
+    Bulk export DataCite XML metadata records that correspond to the records for a
+    particular DataCite repository or DOI prefix.
+
+    The default behavior is to export DataCite XML records to an S3 bucket but
+    command also supports downloading the records to a local machine.
+    """
+    # Load variables in .env from current working directory
+    cwd = os.getcwd()
+    dotenv_path = os.path.join(cwd, ".env")
+    load_dotenv(dotenv_path)
+
+    # Messages must not interleave with records exported to stdout
+    echo_to_stderr(
+        any(spec.kind == "stdout" for spec in validate_destinations(destination))
+    )
+
+    # Set up logging
+    if file_logs:
+        setup_logging(log_level)
+
+    CustomEcho("**** Starting DataCite bulk export... ****", file_logs)
+
+    # Combine DOIs passed as arguments, listed in DOI file and in dead-letter file
+    dois = doi + doi_file
+    if retry_failed:
+        dois += read_dead_letter_file(retry_failed, file_logs)
+    dois = tuple(dict.fromkeys(dois))
+
+    # DataCite search query params used to filter results server-side
+    filters = format_datacite_filters(
+        state, resource_type_id, created, registered, query
+    )
+
+    # Validate arguments
+    validate_replay_pages(
+        replay_pages, doi_prefix, client_id, dois, record_pages, filters, file_logs
+    )
+    validate_doi_list(dois, doi_prefix, client_id, record_pages, file_logs)
+    if not dois and not replay_pages:
+        validate_at_least_one_query_param(doi_prefix, client_id, file_logs)
+    destinations = _validate_destination_options(
+        destination,
+        key_prefix,
+        bucket,
+        directory_path,
+        layout,
+        file_logs,
+        allow_stdout=True,
+    )
+    for spec in destinations:
+        if spec.kind == "stdout":
+            validate_stdout_destination(spec, layout, compress, manifest, file_logs)
+    validate_xml_schema(xml_schema, validate_xml, file_logs)
+    validate_compression(compress, file_logs)
+    validate_snapshot_options(
+        snapshot, snapshot_retention, dois, plan or bool(plan_file), file_logs
+    )
+
+    plan = plan or bool(plan_file)
+    if plan:
+        CustomEcho("Planning export, no records are written", file_logs)
+
+    if len(destinations) == 1:
+        CustomEcho(f"Export destination: {destinations[0].label}", file_logs)
+    else:
+        CustomEcho(
+            f"Export destinations: {', '.join(spec.label for spec in destinations)}",
+            file_logs,
+        )
+    if replay_pages:
+        CustomEcho(
+            f"Replaying DataCite API pages recorded in: '{replay_pages}'", file_logs
+        )
+    elif dois:
+        CustomEcho(f"Querying DataCite API for {len(dois)} specific DOI(s)", file_logs)
+    else:
+        CustomEcho(
+            f"Querying DataCite API for DOIs with repository account ID: "
+            f"'{client_id}' and/or prefix(es): {doi_prefix}",
+            file_logs,
+        )
+    if filters:
+        CustomEcho(f"Filtering DataCite API results with: {filters}", file_logs)
+    if validate_xml:
+        CustomEcho(f"Validating XML records: {validate_xml}", file_logs)
+    if compress:
+        CustomEcho(f"Compressing exported records: {compress}", file_logs)
+    snapshot_date = None
+    if snapshot:
+        snapshot_date = datetime.now(timezone.utc).strftime(SNAPSHOT_DATE_FORMAT)
+        CustomEcho(f"Exporting snapshot: {snapshot_date}", file_logs)
+
+    # Rate limits are shared by all workers and destinations
+    rate_limits = RateLimits.from_rates(max_upload_rate, max_put_rate, max_fetch_rate)
+
+    # Validate S3 config and create the sinks of the export destinations
+    sinks = _create_destinations(
+        destinations,
+        bucket,
+        directory_path,
+        rate_limits,
+        file_logs,
+        s3_transport,
+        workers,
+        adaptive_concurrency,
+        fsync=fsync,
+    )
+
+    query = ExportQuery(
+        client_id=client_id,
+        doi_prefix=doi_prefix,
+        dois=dois,
+        filters=filters,
+        record_pages=record_pages,
+        replay_pages=replay_pages,
+    )
+    options = ExportOptions(
+        key_prefix=key_prefix,
+        layout=layout,
+        compress=compress,
+        workers=workers,
+        validate_xml=validate_xml,
+        xml_schema=xml_schema,
+        validation_workers=validation_workers,
+        early_exit=early_exit,
+        retry_attempts=retry_attempts,
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        circuit_breaker_cooldown=circuit_breaker_cooldown,
+        page_size=page_size,
+        lookup_workers=lookup_workers,
+        plan=plan,
+        manifest=manifest,
+        snapshot=snapshot_date,
+        snapshot_retention=snapshot_retention,
+        preflight=preflight,
+        adaptive_concurrency=adaptive_concurrency,
+        state_db=state_db,
+    )
+
+    # Errors were already logged when they were raised
+    failed = True
+    try:
+        with (
+            tracing(trace_file, file_logs),
+            Exporter(api_url, file_logs, rate_limits) as exporter,
+        ):
+            result = exporter.export(query, sinks, options)
+        failed = False
+    except ExportError as err:
+        raise CustomClickException(err.message) from err
+    finally:
+        # Ends the tar stream of a stdout destination
+        _close_destinations(sinks, failed, file_logs)
+
+    if result.plan:
+        for dest in result.destinations:
+            label = f" ({dest.name})" if len(result.destinations) > 1 else ""
+            CustomEcho(f"Export plan{label}: {dest.plan.summary()}", file_logs)
+        if plan_file:
+            plans = {dest.name: dest.plan for dest in result.destinations}
+            write_plan_file(
+                result.plan if len(plans) == 1 else plans, plan_file, file_logs
+            )
+        CustomEcho("**** Finished DataCite bulk export plan ****", file_logs)
+        return
+
+    _echo_export_result(result, rate_limits, dead_letter_file, file_logs)
+
+    # Destinations with early exit stop at their first failing record while the
+    # other destinations continue, fail the command after the export completed
+    if result.errors:
+        raise CustomClickException(
+            "Export aborted for destination(s): " + "; ".join(result.errors.values())
+        )
+
+    CustomEcho("**** Finished DataCite bulk export ****", file_logs)
+
+    return
+
+
+@cli.command(name="watch")
 @click.option(
-    "--bucket",
-    help="Name of S3 bucket that DataCite XML records (as S3 objects) "
-    "will be written in.",
+    "--interval",
+    type=int,
+    default=WATCH_INTERVAL,
+    help=f"Seconds between the start of two runs, the next run starts immediately "
+    f"if a run took longer (default: {WATCH_INTERVAL})",
+    callback=validate_positive_int,
 )
 @click.option(
-    "--key-prefix",
-    help="Optional key prefix for objects in S3 bucket. If omitted then objects are "
-    "written in S3 bucket without a prefix.",
+    "--since",
+    help="Optional ISO 8601 date or UTC timestamp, the first run only exports the "
+    "records updated since, for example '2025-01-01' or '2025-01-01T12:00:00Z'. "
+    "By default the first run exports all records.",
+    callback=validate_timestamp,
 )
 @click.option(
-    "--directory-path",
-    type=click.Path(exists=True, file_okay=False, dir_okay=True),
-    help="Only used if exporting to local destination. Path of the local directory "
-    "that DataCite XML metadata records will be written in",
+    "--health-host",
+    default=WATCH_HEALTH_HOST,
+    help=f"Host of the local health ('/health', JSON) and metrics ('/metrics', "
+    f"Prometheus text format) endpoint (default: {WATCH_HEALTH_HOST})",
 )
 @click.option(
-    "--file-logs",
-    is_flag=True,
-    default=False,
-    help="Flag that enables logging info messages and errors to a file log.",
+    "--health-port",
+    type=int,
+    default=WATCH_HEALTH_PORT,
+    help=f"Port of the local health and metrics endpoint, 0 for a free port "
+    f"(default: {WATCH_HEALTH_PORT})",
+    callback=validate_positive_int,
 )
+@_export_options("watch")
+def datacite_watch(
+    interval: int = WATCH_INTERVAL,
+    since: str | None = None,
+    health_host: str = WATCH_HEALTH_HOST,
+    health_port: int = WATCH_HEALTH_PORT,
+    doi_prefix: tuple[str, ...] = (),
+    client_id: str | None = None,
+    state: tuple[str, ...] = (),
+    resource_type_id: tuple[str, ...] = (),
+    created: tuple[str, ...] = (),
+    registered: tuple[str, ...] = (),
+    query: str | None = None,
+    destination: tuple[str, ...] = ("S3",),
+    bucket: str | None = None,
+    key_prefix: str | None = None,
+    directory_path: str | None = None,
+    file_logs: bool = False,
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO",
+    early_exit: bool = False,
+    api_url: str = DATACITE_API_URL,
+    page_size: int = DATACITE_PAGE_SIZE,
+    circuit_breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+    circuit_breaker_cooldown: int = CIRCUIT_BREAKER_COOLDOWN,
+    retry_attempts: int = RETRY_ATTEMPTS,
+    dead_letter_file: str = DEAD_LETTER_NAME,
+    validate_xml: Literal["well-formed", "schema"] | None = None,
+    xml_schema: str | None = None,
+    validation_workers: int = XML_VALIDATION_WORKERS,
+    compress: Compression | None = None,
+    layout: Layout = "flat",
+    fsync: bool = False,
+    workers: int = EXPORT_WORKERS,
+    adaptive_concurrency: bool = False,
+    max_upload_rate: float | None = None,
+    max_put_rate: float | None = None,
+    max_fetch_rate: float | None = None,
+    manifest: bool = False,
+    preflight: bool = True,
+    state_db: str | None = None,
+    s3_transport: str | None = None,
+) -> None:
+    """
+    Stay resident and export the DataCite XML records of a repository or DOI prefix
+    on an interval. Each run only exports the records updated since the last
+    successful run.
+
+    The DataCite API session and S3 clients are kept warm between runs. Stops
+    gracefully on SIGTERM or Ctrl+C after the current run completes.
+    """
+    # Load variables in .env from current working directory
+    cwd = os.getcwd()
+    dotenv_path = os.path.join(cwd, ".env")
+    load_dotenv(dotenv_path)
+
+    # Set up logging
+    if file_logs:
+        setup_logging(log_level)
+
+    CustomEcho("**** Starting DataCite watch... ****", file_logs)
+
+    # DataCite search query params used to filter results server-side
+    filters = format_datacite_filters(
+        state, resource_type_id, created, registered, query
+    )
+
+    # Validate arguments
+    validate_at_least_one_query_param(doi_prefix, client_id, file_logs)
+    destinations = _validate_destination_options(
+        destination, key_prefix, bucket, directory_path, layout, file_logs
+    )
+    validate_xml_schema(xml_schema, validate_xml, file_logs)
+    validate_compression(compress, file_logs)
+
+    CustomEcho(
+        f"Export destination(s): {', '.join(spec.label for spec in destinations)}",
+        file_logs,
+    )
+    CustomEcho(
+        f"Querying DataCite API for DOIs with repository account ID: "
+        f"'{client_id}' and/or prefix(es): {doi_prefix}",
+        file_logs,
+    )
+    if filters:
+        CustomEcho(f"Filtering DataCite API results with: {filters}", file_logs)
+    CustomEcho(
+        f"Exporting records updated since the last run every {interval} seconds "
+        f"(with an overlap of {WATCH_OVERLAP_SECONDS} seconds)",
+        file_logs,
+    )
+
+    # Rate limits are shared by all workers, destinations and runs
+    rate_limits = RateLimits.from_rates(max_upload_rate, max_put_rate, max_fetch_rate)
+
+    # Validate S3 config and create the sinks once, their clients stay warm
+    sinks = _create_destinations(
+        destinations,
+        bucket,
+        directory_path,
+        rate_limits,
+        file_logs,
+        s3_transport,
+        workers,
+        adaptive_concurrency,
+        fsync=fsync,
+    )
+
+    export_query = ExportQuery(
+        client_id=client_id, doi_prefix=doi_prefix, filters=filters
+    )
+    options = ExportOptions(
+        key_prefix=key_prefix,
+        layout=layout,
+        compress=compress,
+        workers=workers,
+        validate_xml=validate_xml,
+        xml_schema=xml_schema,
+        validation_workers=validation_workers,
+        early_exit=early_exit,
+        retry_attempts=retry_attempts,
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        circuit_breaker_cooldown=circuit_breaker_cooldown,
+        page_size=page_size,
+        manifest=manifest,
+        preflight=preflight,
+        adaptive_concurrency=adaptive_concurrency,
+        state_db=state_db,
+    )
+
+    with Exporter(api_url, file_logs, rate_limits) as exporter:
+        watcher = Watcher(
+            exporter,
+            sinks,
+            export_query,
+            options,
+            interval,
+            updated_since=since,
+            on_result=partial(
+                _echo_export_result,
+                rate_limits=rate_limits,
+                dead_letter_file=dead_letter_file,
+                file_logs=file_logs,
+            ),
+            file_logs=file_logs,
+        )
+        watcher.install_signal_handlers()
+        with HealthServer(watcher.metrics, health_host, health_port) as server:
+            CustomEcho(
+                f"Health and metrics endpoint: {server.url}/health, "
+                f"{server.url}/metrics",
+                file_logs,
+            )
+            watcher.run()
+
+
+@cli.command(name="serve")
 @click.option(
-    "--log-level",
-    default="INFO",
-    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]),
-    help="Set the logging level.",
+    "--host",
+    default=SERVE_HOST,
+    help=f"Host the job API listens on (default: {SERVE_HOST})",
 )
 @click.option(
-    "--early-exit",
-    is_flag=True,
-    default=False,
-    help="If flag enabled then terminates program immediately after "
-    "export error occurs. "
-    "Default value is False (not enabled). "
-    "If False then only logs export error and continues to try to export other "
-    "DataCite XML records returned by search query "
-    "to an S3 bucket or local destination.",
+    "--port",
+    type=int,
+    default=SERVE_PORT,
+    help=f"Port the job API listens on, 0 for a free port (default: {SERVE_PORT})",
+    callback=validate_positive_int,
 )
 @click.option(
-    "--api-url",
-    default=DATACITE_API_URL,
-    help=f"DataCite API base URL used for queries (default: {DATACITE_API_URL})",
-    callback=validate_url,
+    "--job-workers",
+    type=int,
+    default=SERVE_JOB_WORKERS,
+    help=f"Number of export jobs that run concurrently (default: {SERVE_JOB_WORKERS})",
+    callback=validate_positive_int,
 )
 @click.option(
-    "--page-size",
+    "--max-queued-jobs",
     type=int,
-    default=DATACITE_PAGE_SIZE,
-    help=f"Number of records returned per page of DataCite API response using "
-    f"pagination (default: {DATACITE_PAGE_SIZE})",
+    default=SERVE_MAX_QUEUED_JOBS,
+    help=f"Maximum number of export jobs waiting in the queue, requests for new "
+    f"jobs are rejected with '429 Too Many Requests' while the queue is full "
+    f"(default: {SERVE_MAX_QUEUED_JOBS})",
     callback=validate_positive_int,
 )
-def datacite_bulk_export(
-    doi_prefix: tuple[str, ...] = (),
-    client_id: str | None = None,
-    destination: Literal["S3", "local"] = "S3",
+@_export_options("serve")
+def datacite_serve(
+    host: str = SERVE_HOST,
+    port: int = SERVE_PORT,
+    job_workers: int = SERVE_JOB_WORKERS,
+    max_queued_jobs: int = SERVE_MAX_QUEUED_JOBS,
+    state: tuple[str, ...] = (),
+    resource_type_id: tuple[str, ...] = (),
+    created: tuple[str, ...] = (),
+    registered: tuple[str, ...] = (),
+    query: str | None = None,
+    destination: tuple[str, ...] = ("S3",),
     bucket: str | None = None,
     key_prefix: str | None = None,
     directory_path: str | None = None,
@@ -142,13 +1097,33 @@ def datacite_bulk_export(
     early_exit: bool = False,
     api_url: str = DATACITE_API_URL,
     page_size: int = DATACITE_PAGE_SIZE,
+    lookup_workers: int = DOI_LOOKUP_WORKERS,
+    circuit_breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+    circuit_breaker_cooldown: int = CIRCUIT_BREAKER_COOLDOWN,
+    retry_attempts: int = RETRY_ATTEMPTS,
+    validate_xml: Literal["well-formed", "schema"] | None = None,
+    xml_schema: str | None = None,
+    validation_workers: int = XML_VALIDATION_WORKERS,
+    compress: Compression | None = None,
+    layout: Layout = "flat",
+    fsync: bool = False,
+    workers: int = EXPORT_WORKERS,
+    adaptive_concurrency: bool = False,
+    max_upload_rate: float | None = None,
+    max_put_rate: float | None = None,
+    max_fetch_rate: float | None = None,
+    manifest: bool = False,
+    preflight: bool = True,
+    state_db: str | None = None,
+    s3_transport: str | None = None,
 ) -> None:
     """
-    Bulk export DataCite XML metadata records that correspond to the records for a
-    particular DataCite repository or DOI prefix.
+    Serve a local HTTP job API that exports the DataCite XML records of a
+    repository, DOI prefixes or specific DOIs on demand.
 
-    The default behavior is to export DataCite XML records to an S3 bucket but
-    command also supports downloading the records to a local machine.
+    Jobs are queued in a bounded queue and share the DataCite API session and S3
+    clients. Requests for records that are already queued are coalesced. Stops
+    gracefully on SIGTERM or Ctrl+C after the running jobs complete.
     """
     # Load variables in .env from current working directory
     cwd = os.getcwd()
@@ -159,73 +1134,354 @@ def datacite_bulk_export(
     if file_logs:
         setup_logging(log_level)
 
-    CustomEcho("**** Starting DataCite bulk export... ****", file_logs)
+    CustomEcho("**** Starting DataCite export job API... ****", file_logs)
 
-    # Validate arguments
-    validate_at_least_one_query_param(doi_prefix, client_id, file_logs)
-    validate_key_prefix(key_prefix, destination, file_logs)
+    # DataCite search query params used to filter the results of all jobs
+    filters = format_datacite_filters(
+        state, resource_type_id, created, registered, query
+    )
 
-    if destination == "S3":
-        validate_bucket(bucket, destination, file_logs)
-    else:
-        validate_directory_path(directory_path, destination, file_logs)
+    # Validate arguments
+    destinations = _validate_destination_options(
+        destination, key_prefix, bucket, directory_path, layout, file_logs
+    )
+    validate_xml_schema(xml_schema, validate_xml, file_logs)
+    validate_compression(compress, file_logs)
 
-    CustomEcho(f"Export destination: {destination}", file_logs)
     CustomEcho(
-        f"Querying DataCite API for DOIs with repository account ID: '{client_id}' "
-        f"and/or prefix(es): {doi_prefix}",
+        f"Export destination(s): {', '.join(spec.label for spec in destinations)}",
         file_logs,
     )
+    if filters:
+        CustomEcho(f"Filtering DataCite API results with: {filters}", file_logs)
 
-    # Validate S3 config and return S3 client
-    s3_client = None
-    if destination == "S3":
-        conf_s3 = validate_s3_config(file_logs)
-        s3_client = create_s3_client(conf_s3, file_logs)
+    # Rate limits are shared by all workers, destinations and jobs
+    rate_limits = RateLimits.from_rates(max_upload_rate, max_put_rate, max_fetch_rate)
 
-    # Validate client_id argument, raise error if client_id does not return successful
-    # response when used to return a client from the DataCite API
-    if client_id:
-        get_datacite_client(api_url, client_id, file_logs)
+    # Validate S3 config and create the sinks once, their clients are shared by
+    # all jobs
+    sinks = _create_destinations(
+        destinations,
+        bucket,
+        directory_path,
+        rate_limits,
+        file_logs,
+        s3_transport,
+        workers,
+        adaptive_concurrency,
+        fsync=fsync,
+        jobs=job_workers,
+    )
 
-    # Create a list of dictionaries with DOIs and Base64 encoded XML strings that
-    # correspond to the record results for the queried DataCite repository or DOI prefix
-    xml_list = get_datacite_list_dois_xml(
-        api_url, client_id, doi_prefix, page_size, file_logs
+    # Check the destinations once instead of before each job
+    if preflight:
+        run_preflight(
+            [
+                PreflightCheck(
+                    f"{dest.label} destination",
+                    partial(dest.sink.preflight, key_prefix),
+                )
+                for dest in sinks
+            ],
+            file_logs=file_logs,
+        )
+
+    options = ExportOptions(
+        key_prefix=key_prefix,
+        layout=layout,
+        compress=compress,
+        workers=workers,
+        validate_xml=validate_xml,
+        xml_schema=xml_schema,
+        validation_workers=validation_workers,
+        early_exit=early_exit,
+        retry_attempts=retry_attempts,
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        circuit_breaker_cooldown=circuit_breaker_cooldown,
+        page_size=page_size,
+        lookup_workers=lookup_workers,
+        manifest=manifest,
+        preflight=False,
+        adaptive_concurrency=adaptive_concurrency,
+        state_db=state_db,
     )
 
-    # Export XML files for each record
-    for doi_xml_dict in xml_list:
+    stop = threading.Event()
+
+    def handler(signum, frame):
+        CustomEcho(
+            f"Received {signal.Signals(signum).name}, stopping after the running "
+            f"jobs complete",
+            file_logs,
+        )
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+    with Exporter(api_url, file_logs, rate_limits) as exporter:
+        job_queue = JobQueue(
+            exporter,
+            sinks,
+            options,
+            filters=filters,
+            workers=job_workers,
+            max_queued=max_queued_jobs,
+            file_logs=file_logs,
+        )
         try:
-            validate_single_string_key_value(doi_xml_dict, file_logs)
-            doi, xml_str = next(iter(doi_xml_dict.items()))
-            xml_filename = format_xml_file_name(doi, key_prefix)
-            xml_decoded = decode_base64_xml(xml_str, file_logs)
-
-            match destination:
-                case "S3":
-                    s3_client_put_object(
-                        client=s3_client,
-                        body=xml_decoded,
-                        bucket=bucket,
-                        key=xml_filename,
-                        file_logs=file_logs,
-                    )
-                case "local":
-                    write_local_file(
-                        content_bytes=xml_decoded,
-                        filename=xml_filename,
-                        directory_path=directory_path,
-                        file_logs=file_logs,
-                    )
-
-        except CustomClickException as err:
-            if early_exit:
-                raise CustomClickException(err.message, file_logs)
-            else:
-                CustomWarning(err.message, file_logs)
-                continue
+            with ExportServer(job_queue, host, port) as server:
+                CustomEcho(f"Export job API: {server.url}/jobs", file_logs)
+                stop.wait()
+        finally:
+            job_queue.close()
 
-    CustomEcho("**** Finished DataCite bulk export ****", file_logs)
+    CustomEcho("**** Stopped DataCite export job API ****", file_logs)
 
-    return
+
+@cli.command(name="status")
+@click.option(
+    "--state-db",
+    required=True,
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    help="Path of the SQLite state database written by exports with '--state-db'.",
+)
+@click.option(
+    "--destination",
+    help="Optional name of the destination to show, for example 'S3', 'local' or "
+    "'S3:mirror'. By default all destinations are shown.",
+)
+@click.option(
+    "--failed",
+    is_flag=True,
+    default=False,
+    help="List the records that failed in the last run.",
+)
+@click.option(
+    "--not-updated-days",
+    type=int,
+    help="List the records whose DataCite 'updated' timestamp is older than the "
+    "number of days.",
+    callback=validate_positive_int,
+)
+@click.option(
+    "--not-exported-days",
+    type=int,
+    help="List the records that were not exported successfully in the number of days.",
+    callback=validate_positive_int,
+)
+@click.option(
+    "--limit",
+    type=int,
+    default=STATE_STATUS_LIMIT,
+    help=f"Maximum number of records listed (default: {STATE_STATUS_LIMIT})",
+    callback=validate_positive_int,
+)
+def datacite_status(
+    state_db: str,
+    destination: str | None = None,
+    failed: bool = False,
+    not_updated_days: int | None = None,
+    not_exported_days: int | None = None,
+    limit: int = STATE_STATUS_LIMIT,
+) -> None:
+    """
+    Show the export state recorded in a state database: the last run, the number
+    of records and failed records of each destination and, with '--failed',
+    '--not-updated-days' or '--not-exported-days', the records that match all the
+    given conditions.
+    """
+    listed = failed or not_updated_days is not None or not_exported_days is not None
+
+    with StateStore(state_db) as state:
+        run = state.last_run()
+        summary = state.summary()
+        records = (
+            state.records(
+                destination,
+                failed_last_run=failed,
+                not_updated_days=not_updated_days,
+                not_exported_days=not_exported_days,
+                limit=limit,
+            )
+            if listed
+            else []
+        )
+
+    if run is None:
+        click.echo("No runs recorded")
+    else:
+        click.echo(
+            f"Last run {run['id']}: {run['status']}, started {run['started_at']}, "
+            f"finished {run['finished_at'] or '-'}, {run['exported']} exported, "
+            f"{run['failed']} failed"
+            + (f", error: {run['error']}" if run["error"] else "")
+        )
+    for row in summary:
+        if destination and row["destination"] != destination:
+            continue
+        click.echo(
+            f"Destination {row['destination']}: {row['records']} records, "
+            f"{row['failed']} failed, last exported "
+            f"{row['last_exported_at'] or '-'}"
+        )
+
+    if not listed:
+        return
+    click.echo(f"{len(records)} matching record(s)")
+    for record in records:
+        click.echo(
+            "\t".join(
+                str(record[column] or "-")
+                for column in (
+                    "doi",
+                    "destination",
+                    "key",
+                    "updated",
+                    "exported_at",
+                    "error",
+                )
+            )
+        )
+    if len(records) == limit:
+        click.echo(f"Listed the first {limit} records, use '--limit' to list more")
+
+
+def _validate_destination_options(
+    destination: tuple[str, ...],
+    key_prefix: str | None,
+    bucket: str | None,
+    directory_path: str | None,
+    layout: Layout,
+    file_logs: bool = False,
+    allow_stdout: bool = False,
+) -> list[DestinationSpec]:
+    """
+    Validate the export destinations and their options and return the parsed
+    destinations. A 'stdout' destination is only valid if allow_stdout is True.
+    """
+    destinations = validate_destinations(destination, file_logs)
+    kinds = {spec.kind for spec in destinations}
+    if "stdout" in kinds and not allow_stdout:
+        raise CustomBadParameter(
+            "'--destination stdout' can only be used with the export command",
+            file_logs,
+        )
+    validate_key_prefix(key_prefix, "local" if kinds == {"local"} else "S3", file_logs)
+    for spec in destinations:
+        validate_layout(layout, spec.kind, file_logs)
+        if spec.kind == "S3":
+            spec_bucket = os.getenv(f"{spec.env_prefix}BUCKET") if spec.name else None
+            validate_bucket(spec_bucket or bucket, spec.kind, file_logs)
+        elif spec.kind == "local":
+            validate_directory_path(directory_path, spec.kind, file_logs)
+
+    return destinations
+
+
+def _create_destinations(
+    destinations: list[DestinationSpec],
+    bucket: str | None,
+    directory_path: str | None,
+    rate_limits: RateLimits,
+    file_logs: bool = False,
+    s3_transport: str | None = None,
+    workers: int = EXPORT_WORKERS,
+    adaptive_concurrency: bool = False,
+    jobs: int = 1,
+    fsync: bool = False,
+) -> list[Destination]:
+    """
+    Validate the S3 config of each S3 destination and return the destinations with
+    their sinks, the S3 clients are created once and reused by every export.
+
+    The connection pool of each S3 client is sized to the maximum number of records
+    written concurrently to the destination by all jobs, the resolved transport
+    profile is echoed.
+    """
+    sinks = []
+    for spec in destinations:
+        if spec.kind == "S3":
+            conf_s3 = validate_s3_config(file_logs, spec.env_prefix)
+            transport = validate_s3_transport(s3_transport, file_logs, spec.env_prefix)
+            concurrency = spec.workers or workers
+            if adaptive_concurrency and concurrency == 1:
+                concurrency = ADAPTIVE_CONCURRENCY_MAX
+            concurrency *= max(jobs, 1)
+            CustomEcho(
+                f"S3 transport ({spec.label}): {transport.summary(concurrency)}",
+                file_logs,
+            )
+            sink = S3Sink(
+                create_s3_client(conf_s3, file_logs, transport, concurrency),
+                (spec.name and os.getenv(f"{spec.env_prefix}BUCKET")) or bucket,
+                file_logs,
+                rate_limits,
+            )
+        elif spec.kind == "stdout":
+            sink = StdoutSink(spec.stdout_format or "ndjson", file_logs=file_logs)
+        else:
+            sink = LocalSink(directory_path, file_logs, fsync)
+        # A closed pipe fails all further records, stdout stops at the first failing
+        # record unless the destination sets 'early-exit=false'
+        early_exit = spec.early_exit
+        if spec.kind == "stdout" and early_exit is None:
+            early_exit = True
+        sinks.append(Destination(sink, spec.label, spec.workers, early_exit))
+
+    return sinks
+
+
+def _close_destinations(
+    destinations: list[Destination], failed: bool = False, file_logs: bool = False
+) -> None:
+    """
+    Close the sinks of the destinations. Every sink is closed even if closing
+    another sink fails.
+
+    Args:
+        destinations: Destinations whose sinks are closed.
+        failed: If True the export failed, errors of closing a sink are only warned
+                about so that they do not mask the error of the export. Otherwise
+                the first error is raised once all sinks are closed.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    close_error = None
+    for dest in destinations:
+        try:
+            dest.sink.close()
+        except Exception as err:
+            if failed:
+                CustomWarning(
+                    f"Failed to close {dest.label} destination: {err}", file_logs
+                )
+            elif close_error is None:
+                close_error = err
+    if close_error:
+        raise close_error
+
+
+def _echo_export_result(
+    result: ExportResult,
+    rate_limits: RateLimits,
+    dead_letter_file: str,
+    file_logs: bool = False,
+) -> None:
+    """
+    Write the records that failed to the dead-letter file and echo the summary of
+    each destination.
+    """
+    if result.failed_records:
+        write_dead_letter_file(result.failed_records, dead_letter_file, file_logs)
+        CustomEcho(
+            f"{len(result.failed_records)} record(s) failed to export and were "
+            f"written to dead-letter file '{dead_letter_file}', export them again "
+            f"with '--retry-failed {dead_letter_file}'",
+            file_logs,
+        )
+
+    for dest in result.destinations:
+        label = f" ({dest.name})" if len(result.destinations) > 1 else ""
+        CustomEcho(f"Export summary{label}: {dest.stats.summary()}", file_logs)
+    if rate_limits:
+        CustomEcho(f"Rate limits: {rate_limits.summary()}", file_logs)
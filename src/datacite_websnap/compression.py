@@ -0,0 +1,76 @@
+"""
+Compress exported DataCite XML records.
+
+"zstd" compression requires the optional "zstandard" dependency:
+    pip install 'datacite-websnap[zstd]'
+"""
+
+import gzip
+from typing import Literal
+
+from .config import GZIP_COMPRESSION_LEVEL, ZSTD_COMPRESSION_LEVEL
+from .logger import CustomClickException
+
+# Compression formats supported for exported records
+Compression = Literal["gzip", "zstd"]
+
+# File extension appended to local files and HTTP Content-Encoding of S3 objects
+COMPRESSION_EXTENSIONS: dict[str, str] = {"gzip": ".gz", "zstd": ".zst"}
+CONTENT_ENCODINGS: dict[str, str] = {"gzip": "gzip", "zstd": "zstd"}
+
+# HTTP Content-Type of exported S3 objects
+XML_CONTENT_TYPE = "application/xml"
+
+
+def validate_compression(
+    compression: Compression | None, file_logs: bool = False
+) -> Compression | None:
+    """
+    Validate and return compression.
+    Raises ClickException if the package required for the compression format is not
+    installed.
+    """
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise CustomClickException(
+                "'zstd' compression requires the 'zstandard' package, "
+                "install it with: pip install 'datacite-websnap[zstd]'",
+                file_logs,
+            )
+
+    return compression
+
+
+def compress_bytes(
+    content_bytes: bytes, compression: Compression, file_logs: bool = False
+) -> bytes:
+    """
+    Return compressed bytes object.
+
+    gzip output does not include a modification time so that compressing the same
+    record always returns the same bytes.
+
+    Args:
+        content_bytes: bytes object that will be compressed
+        compression: compression format, "gzip" or "zstd"
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        match compression:
+            case "gzip":
+                return gzip.compress(
+                    content_bytes, compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0
+                )
+            case "zstd":
+                import zstandard
+
+                # Compressor objects are not thread-safe, create one per record
+                return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).compress(
+                    content_bytes
+                )
+            case _:
+                raise ValueError(f"unsupported compression '{compression}'")
+    except Exception as err:
+        raise CustomClickException(f"Failed to compress record: {err}", file_logs)
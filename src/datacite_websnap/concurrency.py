@@ -0,0 +1,131 @@
+"""
+Adaptive concurrency of export writes with AIMD (additive increase, multiplicative
+decrease), the congestion control algorithm of TCP.
+
+The number of writes in flight grows by one after each window of healthy writes
+(as many writes as the current limit) and is cut multiplicatively when a write
+signals congestion: a transport error (for example "503 SlowDown" or a timeout
+after boto3 retries) or a latency spike (boto3 retries of throttled requests
+surface as slow writes). The export therefore settles close to the concurrency the
+destination sustains instead of using a fixed number of workers.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from .config import (
+    ADAPTIVE_CONCURRENCY_BACKOFF,
+    ADAPTIVE_CONCURRENCY_INITIAL,
+    ADAPTIVE_LATENCY_ALPHA,
+    ADAPTIVE_LATENCY_FACTOR,
+    ADAPTIVE_LATENCY_FLOOR,
+)
+
+
+class AdaptiveConcurrency:
+    """
+    Thread-safe AIMD limit of concurrent writes.
+
+    Each write calls acquire() before it starts, which blocks while the limit is
+    reached, and release() with its latency when it completes. Congestion signals
+    of writes that started before the last decrease are ignored, so that one burst
+    of throttled writes only cuts the limit once.
+
+    Attributes:
+        limit: Current number of writes allowed in flight.
+        max_limit: Maximum number of writes in flight.
+        min_limit: Minimum number of writes in flight.
+        decreases: Number of times the limit was cut.
+        timeline: Seconds since the start and limit of each limit change, starting
+                  with the initial limit.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial: int = ADAPTIVE_CONCURRENCY_INITIAL,
+        min_limit: int = 1,
+        backoff: float = ADAPTIVE_CONCURRENCY_BACKOFF,
+        latency_factor: float = ADAPTIVE_LATENCY_FACTOR,
+        latency_floor: float = ADAPTIVE_LATENCY_FLOOR,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_limit: Maximum number of writes in flight.
+            initial: Initial number of writes in flight.
+            min_limit: Minimum number of writes in flight.
+            backoff: Factor the limit is multiplied with on congestion.
+            latency_factor: Writes slower than latency_factor times the average
+                            latency are latency spikes.
+            latency_floor: Writes faster than latency_floor seconds are never
+                           latency spikes.
+            clock: Function that returns the current time in seconds.
+        """
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = min(max(initial, min_limit), self.max_limit)
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.clock = clock
+
+        self.in_flight = 0
+        self.decreases = 0
+        self.timeline: list[tuple[float, int]] = [(0.0, self.limit)]
+        self._start = clock()
+        self._latency: float | None = None
+        self._healthy = 0
+        self._ticket = 0
+        self._decrease_ticket = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """Block until a write may start and return the ticket of the write."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+            self._ticket += 1
+            return self._ticket
+
+    def release(self, ticket: int, latency: float, congested: bool = False) -> None:
+        """
+        Record a completed write and adjust the limit.
+
+        Args:
+            ticket: Ticket returned by acquire() when the write started.
+            latency: Duration of the write in seconds.
+            congested: True if the write failed with a transport error.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            spike = self._latency is not None and latency > max(
+                self._latency * self.latency_factor, self.latency_floor
+            )
+            if not congested:
+                self._latency = (
+                    latency
+                    if self._latency is None
+                    else (1 - ADAPTIVE_LATENCY_ALPHA) * self._latency
+                    + ADAPTIVE_LATENCY_ALPHA * latency
+                )
+
+            if congested or spike:
+                if ticket > self._decrease_ticket:
+                    self._decrease_ticket = self._ticket
+                    self.decreases += 1
+                    self._set_limit(max(int(self.limit * self.backoff), 1))
+            else:
+                self._healthy += 1
+                if self._healthy >= self.limit:
+                    self._set_limit(self.limit + 1)
+            self._condition.notify_all()
+
+    def _set_limit(self, limit: int) -> None:
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        self._healthy = 0
+        if limit != self.limit:
+            self.limit = limit
+            self.timeline.append((round(self.clock() - self._start, 3), limit))
@@ -15,3 +15,127 @@ LOG_FORMAT: str = (
     "%(asctime)s | %(levelname)s | %(module)s.%(funcName)s:%(lineno)d | %(message)s"
 )
 LOG_DATE_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+
+# Circuit breaker used for S3 exports: number of consecutive transport errors that
+# pause the export, seconds to pause before probing the endpoint and number of probes
+# attempted (with exponential backoff) before the export is aborted
+CIRCUIT_BREAKER_THRESHOLD: int = 5
+CIRCUIT_BREAKER_COOLDOWN: int = 30
+CIRCUIT_BREAKER_PROBES: int = 3
+
+# Failed records: number of retry passes at the end of an export, seconds to wait
+# before the first retry pass (doubled for each subsequent pass) and default name of
+# the dead-letter file that records which still fail are written to
+RETRY_ATTEMPTS: int = 2
+RETRY_BACKOFF: int = 5
+DEAD_LETTER_NAME: str = "datacite-websnap-dead-letter.jsonl"
+
+# Name of the gzip compressed JSON Lines file that raw DataCite API page responses are
+# recorded to and replayed from
+RECORDED_PAGES_NAME: str = "datacite-pages.jsonl.gz"
+
+# Lookups of explicit DOIs: maximum number of DOIs per DataCite API request (combined
+# in one "doi:" query) and number of requests sent concurrently
+DOI_LOOKUP_BATCH_SIZE: int = 100
+DOI_LOOKUP_WORKERS: int = 4
+
+# Validation of decoded XML records: number of records sent per batch to the process
+# pool and number of worker processes
+XML_VALIDATION_BATCH_SIZE: int = 100
+XML_VALIDATION_WORKERS: int = 4
+
+# Compression of exported records: compression levels used for "gzip" and "zstd" and
+# number of threads that compress records ahead of the export
+GZIP_COMPRESSION_LEVEL: int = 6
+ZSTD_COMPRESSION_LEVEL: int = 3
+COMPRESSION_WORKERS: int = 2
+
+# Export concurrency: number of records exported (written or uploaded) concurrently
+EXPORT_WORKERS: int = 1
+
+# Local exports: number of shard directory levels and characters per level used by
+# the "hash" and "doi-suffix" layouts, and number of files renamed into a directory
+# before the directory is synced
+SHARD_DEPTH: int = 2
+SHARD_WIDTH: int = 2
+LOCAL_FSYNC_BATCH_SIZE: int = 100
+
+# Name of the JSON object (or local file) written next to the exported records when
+# records are nested in shard directories, maps each DOI to the key of its record
+KEY_INDEX_NAME: str = "doi-index.json"
+
+# Name of the gzip compressed JSON manifest written next to the exported records at
+# the end of each export
+MANIFEST_NAME: str = "manifest.json.gz"
+
+# Maximum number of keys deleted per S3 DeleteObjects request (the S3 limit is 1000)
+S3_DELETE_BATCH_SIZE: int = 1000
+
+# Snapshots: name of the pointer object (next to the dated snapshot prefixes) with
+# the date of the latest complete snapshot, and format of the snapshot dates
+SNAPSHOT_LATEST_NAME: str = "latest.json"
+SNAPSHOT_DATE_FORMAT: str = "%Y-%m-%d"
+
+# Preflight checks before the harvest: seconds until checks that did not complete
+# fail the export, and name of the test object written to (and deleted from) each
+# destination under the key prefix
+PREFLIGHT_TIMEOUT: int = 60
+PREFLIGHT_KEY_NAME: str = ".datacite-websnap-preflight"
+
+# Adaptive (AIMD) export concurrency: initial number of concurrent writes, maximum
+# if '--workers' is not set above 1, factor the limit is multiplied with after
+# throttling, timeouts or latency spikes, and weight of each request in the average
+# latency. A request is a latency spike if it is slower than ADAPTIVE_LATENCY_FACTOR
+# times the average latency and at least ADAPTIVE_LATENCY_FLOOR seconds
+ADAPTIVE_CONCURRENCY_INITIAL: int = 2
+ADAPTIVE_CONCURRENCY_MAX: int = 32
+ADAPTIVE_CONCURRENCY_BACKOFF: float = 0.5
+ADAPTIVE_LATENCY_ALPHA: float = 0.1
+ADAPTIVE_LATENCY_FACTOR: float = 3.0
+ADAPTIVE_LATENCY_FLOOR: float = 0.25
+
+# Rate limits: seconds of the rate a token bucket can accumulate while idle (small
+# so that rates are paced smoothly instead of in bursts) and size in bytes of the
+# chunks DataCite API responses are read in when the fetch rate is limited
+RATE_LIMIT_BURST_SECONDS: float = 0.1
+RATE_LIMIT_CHUNK_SIZE: int = 64 * 1024
+
+# Watch daemon: default seconds between the start of two runs, seconds subtracted
+# from the start of the last successful run for records that DataCite indexed late,
+# and default host and port of the local health and metrics endpoint
+WATCH_INTERVAL: int = 3600
+WATCH_OVERLAP_SECONDS: int = 300
+WATCH_HEALTH_HOST: str = "127.0.0.1"
+WATCH_HEALTH_PORT: int = 8765
+
+# Job API server: default host and port, number of jobs that run concurrently,
+# maximum number of jobs waiting in the queue and number of finished jobs whose
+# status is kept
+SERVE_HOST: str = "127.0.0.1"
+SERVE_PORT: int = 8766
+SERVE_JOB_WORKERS: int = 2
+SERVE_MAX_QUEUED_JOBS: int = 100
+SERVE_JOB_HISTORY: int = 100
+
+# Export state database: number of record updates written in one SQLite transaction,
+# seconds to wait for a lock held by another export and default number of records
+# listed by the status command
+STATE_DB_BATCH_SIZE: int = 500
+STATE_DB_TIMEOUT: int = 30
+STATE_STATUS_LIMIT: int = 50
+
+# S3 transport profile (see '--s3-transport'): seconds to wait for a connection and
+# for a response, retry mode and maximum number of attempts of each request (including
+# the first attempt) and minimum size of the connection pool of each S3 client (the
+# botocore default). The pool is sized to the number of concurrent writes plus
+# S3_POOL_HEADROOM connections for listings, probes, copies and the manifest
+S3_CONNECT_TIMEOUT: float = 5
+S3_READ_TIMEOUT: float = TIMEOUT
+S3_RETRY_MODE: str = "standard"
+S3_MAX_ATTEMPTS: int = 4
+S3_POOL_SIZE_MIN: int = 10
+S3_POOL_HEADROOM: int = 4
+
+# Exports to stdout: size in bytes of the buffer records are collected in before they
+# are written to stdout, stdout is only flushed at the end of each export
+STDOUT_BUFFER_SIZE: int = 1024 * 1024
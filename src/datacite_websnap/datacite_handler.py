@@ -2,7 +2,9 @@
 Handles interactions with DataCite API.
 """
 
-from typing import Any
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
 
 import requests
 
@@ -11,8 +13,13 @@ from .config import (
     TIMEOUT,
     DATACITE_API_DOIS_ENDPOINT,
     DATACITE_PAGE_SIZE,
+    DOI_LOOKUP_BATCH_SIZE,
+    DOI_LOOKUP_WORKERS,
 )
-from .logger import CustomClickException, CustomEcho
+from .logger import CustomClickException, CustomEcho, CustomWarning
+from .page_archive import record_datacite_pages, iter_recorded_pages
+from .record import DataCiteRecord
+from .tracing import span
 
 
 def get_url_json(
@@ -20,6 +27,7 @@ def get_url_json(
     params: dict | None = None,
     timeout: int = TIMEOUT,
     file_logs: bool = False,
+    session: requests.Session | None = None,
 ) -> Any:
     """
     Return the JSON encoded part of a response if it exists as a Python object.
@@ -30,11 +38,17 @@ def get_url_json(
         params: An optional dictionary of query parameters to send to the URL.
         timeout: Timeout of request in seconds.
         file_logs: If True enables logging info messages and errors to a file log.
+        session: Optional requests.Session whose connections are reused across
+                 requests, by default each request opens a new connection.
     """
     try:
-        response = requests.get(url, timeout=timeout, params=params or {})
-        response.raise_for_status()
-        return response.json()
+        with span("get_url_json", "datacite", url=url, params=params) as trace:
+            response = (session or requests).get(
+                url, timeout=timeout, params=params or {}
+            )
+            trace.set(status_code=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
+            return response.json()
 
     except requests.exceptions.HTTPError as http_err:
         raise CustomClickException(f"HTTP error: {http_err}", file_logs)
@@ -59,7 +73,10 @@ def get_url_json(
 
 
 def get_datacite_client(
-    api_url: str, client_id: str, file_logs: bool = False
+    api_url: str,
+    client_id: str,
+    file_logs: bool = False,
+    session: requests.Session | None = None,
 ) -> dict[str, Any]:
     """
     Return client response from DataCite API.
@@ -73,18 +90,80 @@ def get_datacite_client(
         api_url: The DataCite base URL to call the API with.
         client_id: The DataCite API client id that will be used to query DataCite DOIs.
         file_logs: If True enables logging info messages and errors to a file log.
+        session: Optional requests.Session used for the request.
     """
     return get_url_json(
-        url=f"{api_url}{DATACITE_API_CLIENTS_ENDPOINT}/{client_id}", file_logs=file_logs
+        url=f"{api_url}{DATACITE_API_CLIENTS_ENDPOINT}/{client_id}",
+        file_logs=file_logs,
+        session=session,
     )
 
 
+def format_datacite_filters(
+    state: tuple[str, ...] = (),
+    resource_type_id: tuple[str, ...] = (),
+    created: tuple[str, ...] = (),
+    registered: tuple[str, ...] = (),
+    query: str | None = None,
+) -> dict[str, str]:
+    """
+    Return a dictionary of DataCite API list DOIs search query params used to
+    filter results server-side. Only includes filters that are truthy.
+
+    Multiple values for the same filter are joined with "," which DataCite
+    interprets as "OR".
+
+    Example input: state=("findable",), created=("2023", "2024")
+    Example output: {"state": "findable", "created": "2023,2024"}
+
+    Args:
+        state: DOI states, for example ("findable",)
+        resource_type_id: Resource type ids, for example ("dataset", "software")
+        created: Years the DOIs were created, for example ("2024",)
+        registered: Years the DOIs were registered, for example ("2024",)
+        query: Free-form DataCite query, for example "titles.title:snow"
+    """
+    filters = {
+        "state": ",".join(state),
+        "resource-type-id": ",".join(resource_type_id),
+        "created": ",".join(created),
+        "registered": ",".join(registered),
+        "query": query,
+    }
+    return {key: value for key, value in filters.items() if value}
+
+
+def format_updated_since_filters(
+    filters: dict[str, str] | None, updated_since: str
+) -> dict[str, str]:
+    """
+    Return a copy of DataCite search query params that also only match records
+    updated at or after a timestamp, combined with the free-form "query" filter.
+
+    Example input: {"query": "titles.title:snow"}, "2025-01-01T00:00:00Z"
+    Example output:
+        {"query": "(titles.title:snow) AND updated:[2025-01-01T00:00:00Z TO *]"}
+
+    Args:
+        filters: Optional search query params, for example returned by
+                 format_datacite_filters().
+        updated_since: ISO 8601 UTC timestamp, for example "2025-01-01T00:00:00Z"
+    """
+    filters = dict(filters or {})
+    updated = f"updated:[{updated_since} TO *]"
+    query = filters.get("query")
+    filters["query"] = f"({query}) AND {updated}" if query else updated
+    return filters
+
+
 def get_datacite_dois(
     api_url: str,
     client_id: str,
     doi_prefix: tuple[str, ...] = (),
     page_size: int = DATACITE_PAGE_SIZE,
     file_logs: bool = False,
+    filters: dict[str, str] | None = None,
+    session: requests.Session | None = None,
 ) -> dict[str, Any]:
     """
     Returns a list of DOIs as a response from DataCite API.
@@ -102,9 +181,12 @@ def get_datacite_dois(
         page_size: DataCite page size is the number of records
                    returned per page using pagination.
         file_logs: If True enables logging info messages and errors to a file log.
+        filters: Optional additional search query params used to filter results,
+                 for example returned by format_datacite_filters().
+        session: Optional requests.Session used for the request.
     """
     url = f"{api_url}{DATACITE_API_DOIS_ENDPOINT}"
-    params = {}
+    params = dict(filters or {})
 
     # Query search params
     if doi_prefix:
@@ -117,21 +199,24 @@ def get_datacite_dois(
 
     # Params needed for cursor-based pagination
     params["page[cursor]"] = 1
-    params["page[size"] = page_size
+    params["page[size]"] = page_size
 
     # Get response for first page
-    return get_url_json(url, params=params, timeout=TIMEOUT, file_logs=file_logs)
+    return get_url_json(
+        url, params=params, timeout=TIMEOUT, file_logs=file_logs, session=session
+    )
 
 
-def extract_doi_xml(datacite_response: dict) -> list[dict]:
+def extract_doi_xml(datacite_response: dict) -> list[DataCiteRecord]:
     """
-    Returns a list of dictionaries with DOIs and extracted XML strings from a
-    DataCite API data response object.
+    Returns a list of DataCiteRecord objects with the DOIs and Base64 encoded XML
+    strings extracted from a DataCite API data response object.
 
-    The format of the dictionary is the values for the response keys:
-      {"doi": "xml"}
+    The record attributes are the values for the response keys:
       "doi" is the DataCite DOI "doi" value, for example "10.16904/envidat.27"
       "xml" is the DataCite DOI as a Base64 encoded XML string
+      "updated" is the DataCite "updated" timestamp, if it was returned
+    Objects without a "doi" or "xml" string are skipped.
 
     For more information about the expected DataCite data response object see
     DataCite API documentation: https://support.datacite.org/reference/get_dois
@@ -139,16 +224,171 @@ def extract_doi_xml(datacite_response: dict) -> list[dict]:
     Args:
         datacite_response: DataCite API data response object.
     """
-    data = datacite_response.get("data", [])
-    doi_xml = []
+    records = []
+
+    for obj in datacite_response.get("data", []):
+        attributes = obj.get("attributes", {})
+        xml, doi = attributes.get("xml"), attributes.get("doi")
+        if xml and doi and isinstance(xml, str) and isinstance(doi, str):
+            records.append(DataCiteRecord(doi, xml, attributes.get("updated")))
+
+    return records
+
+
+def iter_datacite_dois_pages(
+    api_url: str,
+    client_id: str | None = None,
+    doi_prefix: tuple[str, ...] = (),
+    page_size: int = DATACITE_PAGE_SIZE,
+    file_logs: bool = False,
+    filters: dict[str, str] | None = None,
+    session: requests.Session | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield each page response from the DataCite API list DOIs endpoint, following
+    the "next" links of cursor-based pagination.
+
+    Raises error if an unsuccessful response from DataCite API is returned.
+
+    Args:
+        api_url: The DataCite base URL to call the API with.
+        client_id: The DataCite API client id used to query DataCite DOIs.
+        doi_prefix: The DOI prefixes used to query DataCite DOIs.
+        page_size: DataCite page size is the number of records
+                   returned per page using pagination.
+        file_logs: If True enables logging info messages and errors to a file log.
+        filters: Optional additional search query params used to filter results.
+        session: Optional requests.Session whose connections are reused for all
+                 pages.
+    """
+    # Get response for first page
+    resp_obj = get_datacite_dois(
+        api_url, client_id, doi_prefix, page_size, file_logs, filters, session
+    )
+    yield resp_obj
+
+    # Get next link using cursor-based pagination
+    while next_link := resp_obj.get("links", {}).get("next"):
+        resp_obj = get_url_json(
+            next_link, params={"detail": "true"}, timeout=TIMEOUT, session=session
+        )
+        yield resp_obj
+
+
+class DataCiteRecords:
+    """
+    Iterable of DataCiteRecord objects with the attributes:
+      "doi" is the DataCite DOI "doi" value, for example "10.16904/envidat.27"
+      "xml" is the DataCite DOI as a Base64 encoded XML string
+
+    Records are extracted lazily from the page responses of the DataCite API list
+    DOIs endpoint, one page at a time, so that memory use does not grow with the
+    number of records. Can only be iterated once.
 
-    for obj in data:
-        if (xml := obj.get("attributes", {}).get("xml")) and (
-            doi := obj.get("attributes", {}).get("doi")
-        ):
-            doi_xml.append({doi: xml})
+    The first page response is retrieved when the object is created so that the
+    total number of records is known before iterating. Raises error if no records
+    are returned, or at the end of iteration if the number of extracted records does
+    not match the total number of records in the "meta" object of the first page.
+    """
 
-    return doi_xml
+    def __init__(
+        self,
+        pages: Iterable[dict[str, Any]],
+        file_logs: bool = False,
+        on_page: Callable[[dict[str, Any]], None] | None = None,
+        allow_empty: bool = False,
+    ):
+        """
+        Args:
+            pages: Iterable of DataCite API page responses, for example returned by
+                   iter_datacite_dois_pages().
+            file_logs: If True enables logging info messages and errors to a file log.
+            on_page: Optional function called with each page response before its
+                     records are extracted.
+            allow_empty: If True 0 returned records are not an error, for example
+                         for incremental queries of records updated since the
+                         last export.
+        """
+        self.file_logs = file_logs
+        self.on_page = on_page
+        self._pages = iter(pages)
+        self._first_page = next(self._pages, {})
+
+        # Echo total number of returned DOIs
+        meta = self._first_page.get("meta", {})
+        self.total = meta.get("total")
+        self.total_pages = meta.get("totalPages")
+        CustomEcho(
+            f"Total number of DataCite DOIs returned for search query: {self.total}",
+            file_logs,
+        )
+
+        # Handle 0 records returned
+        if self.total == 0 and not allow_empty:
+            raise CustomClickException(
+                "0 records returned for search query, review '--client-id', "
+                "'--doi-prefix' and/or filter arguments",
+                file_logs,
+            )
+
+    def __len__(self) -> int:
+        return self.total or 0
+
+    def __iter__(self) -> Iterator[DataCiteRecord]:
+        if self._first_page is None:
+            raise CustomClickException(
+                "DataCite records can only be iterated once", self.file_logs
+            )
+        first_page, self._first_page = self._first_page, None
+
+        records = 0
+        pages = itertools.chain([first_page], self._pages)
+        for page_number, resp_obj in enumerate(pages, start=1):
+            # Echo page being currently processed
+            CustomEcho(
+                f"Currently processing page {page_number}/{self.total_pages}...",
+                self.file_logs,
+            )
+
+            if self.on_page:
+                self.on_page(resp_obj)
+
+            # Extract DOIs and XML strings for page
+            for record in extract_doi_xml(resp_obj):
+                records += 1
+                yield record
+
+        # Validate processed output matches number of records in response "meta"
+        if self.total != records:
+            raise CustomClickException(
+                f"Total number of XML records retrieved ({records}) does not match "
+                f"the total number of records expected in 'meta' object: "
+                f"{self.total}",
+                self.file_logs,
+            )
+
+
+def extract_pages_doi_xml(
+    pages: Iterable[dict[str, Any]], file_logs: bool = False
+) -> list[DataCiteRecord]:
+    """
+    Return a list of DataCiteRecord objects with the attributes:
+      "doi" is the DataCite DOI "doi" value, for example "10.16904/envidat.27"
+      "xml" is the DataCite DOI as a Base64 encoded XML string
+
+    The returned values are extracted from the page responses of the DataCite API
+    list DOIs endpoint.
+
+    Raises error if no records are returned or if the number of extracted records
+    does not match the total number of records in the "meta" object of the first
+    page response.
+
+    Args:
+        pages: Iterable of DataCite API page responses, for example returned by
+               iter_datacite_dois_pages().
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    return list(DataCiteRecords(pages, file_logs))
 
 
 def get_datacite_list_dois_xml(
@@ -157,10 +397,15 @@ def get_datacite_list_dois_xml(
     doi_prefix: tuple[str, ...] = (),
     page_size: int = DATACITE_PAGE_SIZE,
     file_logs: bool = False,
-) -> list[dict]:
+    record_pages: str | None = None,
+    filters: dict[str, str] | None = None,
+    stream: bool = False,
+    on_page: Callable[[dict[str, Any]], None] | None = None,
+    session: requests.Session | None = None,
+    allow_empty: bool = False,
+) -> list[DataCiteRecord] | DataCiteRecords:
     """
-    Return a list of dictionaries in the following format:
-    {"doi": "xml"}
+    Return a list of DataCiteRecord objects with the attributes:
       "doi" is the DataCite DOI "doi" value, for example "10.16904/envidat.27"
       "xml" is the DataCite DOI as a Base64 encoded XML string
 
@@ -171,6 +416,7 @@ def get_datacite_list_dois_xml(
      or validation fails.
 
     Supports the following search query params from DataCite: "prefix", "client-id"
+    and the filters returned by format_datacite_filters().
 
     Args:
         api_url: The DataCite base URL to call the API with.
@@ -179,64 +425,166 @@ def get_datacite_list_dois_xml(
         page_size: DataCite page size is the number of records
                    returned per page using pagination.
         file_logs: If True enables logging info messages and errors to a file log.
+        record_pages: Optional path of a directory that the raw page responses are
+                      recorded in, so that they can be replayed with
+                      get_recorded_list_dois_xml().
+        filters: Optional additional search query params used to filter results.
+        stream: If True return a DataCiteRecords iterable that retrieves pages
+                while it is iterated instead of a list, so that memory use does not
+                grow with the number of records.
+        on_page: Optional function called with each page response, for example to
+                 collect record attributes other than the XML.
+        session: Optional requests.Session whose connections are reused for all
+                 pages.
+        allow_empty: If True 0 returned records are not an error.
     """
-    # Get response for first page
-    resp_obj = get_datacite_dois(api_url, client_id, doi_prefix, page_size, file_logs)
+    # Echo DOIs per page
+    CustomEcho(f"Number of DOIs per page: {page_size}", file_logs)
 
-    # Echo total number of returned DOIs
-    total_records = resp_obj.get("meta", {}).get("total")
-    CustomEcho(
-        f"Total number of DataCite DOIs returned for search query: {total_records}",
-        file_logs,
+    pages = iter_datacite_dois_pages(
+        api_url, client_id, doi_prefix, page_size, file_logs, filters, session
     )
+    if record_pages:
+        pages = record_datacite_pages(pages, record_pages, file_logs)
 
-    # Handle 0 records returned
-    if total_records == 0:
-        raise CustomClickException(
-            "0 records returned for search query, review '--client-id' and/or "
-            "'--doi-prefix' arguments",
-            file_logs,
-        )
+    records = DataCiteRecords(pages, file_logs, on_page, allow_empty)
+    return records if stream else list(records)
 
-    # Echo DOIs per page
-    CustomEcho(f"Number of DOIs per page: {page_size}", file_logs)
 
-    # Echo page being currently processed
-    pages = 1
-    total_pages = resp_obj.get("meta", {}).get("totalPages")
-    CustomEcho(f"Currently processing page {pages}/{total_pages}...", file_logs)
+def get_recorded_list_dois_xml(
+    replay_pages: str,
+    file_logs: bool = False,
+    stream: bool = False,
+    on_page: Callable[[dict[str, Any]], None] | None = None,
+) -> list[DataCiteRecord] | DataCiteRecords:
+    """
+    Return a list of DataCiteRecord objects in the same format as get_datacite_list_dois_xml()
+    from page responses previously recorded in a local directory, without calling
+    the DataCite API.
 
-    # Extract DOIs and XML strings for first page
-    xml_lst = []
-    if resp_xml_lst := extract_doi_xml(resp_obj):
-        xml_lst.extend(resp_xml_lst)
+    Args:
+        replay_pages: Path of the directory the page responses were recorded in.
+        file_logs: If True enables logging info messages and errors to a file log.
+        stream: If True return a DataCiteRecords iterable that reads pages while it
+                is iterated instead of a list.
+        on_page: Optional function called with each page response.
+    """
+    records = DataCiteRecords(
+        iter_recorded_pages(replay_pages, file_logs), file_logs, on_page
+    )
+    return records if stream else list(records)
 
-    # Extract DOIs and XML strings for subsequent pages
-    while True:
-        if pages < total_pages:
-            CustomEcho(
-                f"Currently processing page {pages + 1}/{total_pages}...", file_logs
-            )
 
-        # Get next link using cursor-based pagination
-        next_link = resp_obj.get("links", {}).get("next")
-        if not next_link:
-            break
+def format_doi_query(dois: tuple[str, ...]) -> str:
+    """
+    Format DOIs into a DataCite API "query" param value that matches any of the DOIs.
+
+    Example input: ("10.16904/envidat.31", "10.16904/envidat.32")
+    Example output: 'doi:("10.16904/envidat.31" OR "10.16904/envidat.32")'
 
-        resp_obj = get_url_json(next_link, params={"detail": "true"}, timeout=TIMEOUT)
-        if resp_xml_lst := extract_doi_xml(resp_obj):
-            xml_lst.extend(resp_xml_lst)
+    Args:
+        dois: The DOIs to match, for example ("10.16904/envidat.31",)
+    """
+    return "doi:(" + " OR ".join(f'"{doi}"' for doi in dois) + ")"
 
-        pages += 1
 
-    # Validate processed output matches number of records in response "meta" object
-    xml_lst_length = len(xml_lst)
-    if total_records != xml_lst_length:
-        raise CustomClickException(
-            f"Total number of XML records retrieved ({xml_lst_length}) does not match "
-            f"the total number of records expected in 'meta' object: {total_records}, "
-            f"for DataCite API call see {next_link}",
+def get_datacite_dois_xml_by_id(
+    api_url: str,
+    dois: tuple[str, ...],
+    batch_size: int = DOI_LOOKUP_BATCH_SIZE,
+    workers: int = DOI_LOOKUP_WORKERS,
+    file_logs: bool = False,
+    filters: dict[str, str] | None = None,
+    on_page: Callable[[dict[str, Any]], None] | None = None,
+    session: requests.Session | None = None,
+    on_failed: Callable[[str, str], None] | None = None,
+) -> list[DataCiteRecord]:
+    """
+    Return a list of DataCiteRecord objects for specific DOIs with the attributes:
+      "doi" is the DataCite DOI "doi" value, for example "10.16904/envidat.27"
+      "xml" is the DataCite DOI as a Base64 encoded XML string
+
+    DOIs are looked up in batches, each batch is retrieved with a single request to
+    the DataCite API list DOIs endpoint using a query that matches any DOI in the
+    batch. Batches are requested concurrently.
+
+    DOIs that cannot be retrieved from the DataCite API are skipped with a warning
+    and passed to on_failed.
+
+    For DataCite API documentation used in this call see
+    https://support.datacite.org/reference/get_dois
+
+    Args:
+        api_url: The DataCite base URL to call the API with.
+        dois: The DOIs to retrieve, for example ("10.16904/envidat.27",)
+        batch_size: Maximum number of DOIs retrieved per request.
+        workers: Maximum number of concurrent requests.
+        file_logs: If True enables logging info messages and errors to a file log.
+        filters: Optional additional search query params used to filter results,
+                 a "query" filter is combined with the DOI query using "AND".
+        on_page: Optional function called with the response of each batch.
+        session: Optional requests.Session whose connections are reused for all
+                 batches.
+        on_failed: Optional function called with each DOI that could not be
+                   retrieved and the error message.
+    """
+    dois = tuple(dict.fromkeys(dois))
+    batches = [dois[i : i + batch_size] for i in range(0, len(dois), batch_size)]
+    CustomEcho(
+        f"Number of DOIs requested: {len(dois)} in {len(batches)} batch(es)",
+        file_logs,
+    )
+
+    filters = dict(filters or {})
+    query = filters.pop("query", None)
+
+    def get_batch(batch: tuple[str, ...]) -> dict[str, Any]:
+        doi_query = format_doi_query(batch)
+        return get_url_json(
+            f"{api_url}{DATACITE_API_DOIS_ENDPOINT}",
+            params={
+                **filters,
+                "query": f"{doi_query} AND ({query})" if query else doi_query,
+                "detail": "true",
+                "page[size]": len(batch),
+            },
+            file_logs=file_logs,
+            session=session,
+        )
+
+    xml_lst = []
+    batch_errors = {}
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(batches)), 1)) as pool:
+        futures = [pool.submit(get_batch, batch) for batch in batches]
+        for batch, future in zip(batches, futures):
+            try:
+                resp_obj = future.result()
+            except CustomClickException as err:
+                CustomWarning(
+                    f"Failed to retrieve batch of {len(batch)} DOI(s): {err.message}",
+                    file_logs,
+                )
+                batch_errors.update((doi.lower(), err.message) for doi in batch)
+                continue
+
+            if on_page:
+                on_page(resp_obj)
+
+            if resp_xml_lst := extract_doi_xml(resp_obj):
+                xml_lst.extend(resp_xml_lst)
+
+    # DataCite returns DOIs in lower case, compare case-insensitively
+    found = {record.doi.lower() for record in xml_lst}
+    if missing := [doi for doi in dois if doi.lower() not in found]:
+        CustomWarning(
+            f"{len(missing)} DOI(s) not returned by DataCite API: {', '.join(missing)}",
             file_logs,
         )
+    if on_failed:
+        for doi in missing:
+            if error := batch_errors.get(doi.lower()):
+                on_failed(doi, f"Failed to retrieve DOI '{doi}': {error}")
+            else:
+                on_failed(doi, f"DOI '{doi}' not returned by DataCite API")
 
     return xml_lst
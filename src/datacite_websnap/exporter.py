@@ -3,8 +3,16 @@ Process and export DataCite XML metadata records.
 """
 
 import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
 from pathlib import Path
 import binascii
+from collections.abc import Sequence
+from typing import Literal
 
 from botocore.config import Config
 from botocore.exceptions import (
@@ -12,12 +20,26 @@ from botocore.exceptions import (
     BotoCoreError,
     NoCredentialsError,
     EndpointConnectionError,
+    ConnectionError as BotoConnectionError,
+    HTTPClientError,
 )
 import boto3
 
-from .logger import CustomClickException, CustomEcho
-from .validators import S3ConfigModel
-from .config import TIMEOUT
+from .logger import CustomClickException, CustomEcho, CustomTransportException
+from .tracing import span
+from .validators import S3ConfigModel, S3TransportModel
+from .config import (
+    SHARD_DEPTH,
+    SHARD_WIDTH,
+    LOCAL_FSYNC_BATCH_SIZE,
+    S3_DELETE_BATCH_SIZE,
+)
+from .compression import (
+    Compression,
+    COMPRESSION_EXTENSIONS,
+    CONTENT_ENCODINGS,
+    XML_CONTENT_TYPE,
+)
 
 
 def decode_base64_xml(encoded_xml: str, file_logs: bool = False) -> bytes:
@@ -36,12 +58,53 @@ def decode_base64_xml(encoded_xml: str, file_logs: bool = False) -> bytes:
         raise CustomClickException(f"Unexpected error: {err}", file_logs)
 
 
-def format_xml_file_name(doi: str, key_prefix: str | None = None) -> str:
+# Layout of exported records: all records in one directory ("flat") or nested in
+# shard directories derived from a hash of the DOI or from the DOI suffix
+Layout = Literal["flat", "hash", "doi-suffix"]
+
+
+def format_shard_prefix(doi: str, layout: Layout = "flat") -> str:
+    """
+    Return the shard directories that a record is nested in, with a trailing "/",
+    or an empty string for the "flat" layout.
+
+    "hash" uses the first characters of the SHA-1 hex digest of the lowercase DOI
+    (DOIs are case-insensitive) and spreads records evenly across directories.
+    "doi-suffix" uses the first alphanumeric characters of the lowercase DOI suffix,
+    padded with "_", and keeps records with similar suffixes together.
+
+    Example input: "10.16904/envidat.31", "doi-suffix"
+    Example output: "en/vi/"
+
+    Args:
+        doi: "doi" string, example "10.16904/envidat.31"
+        layout: "flat", "hash" or "doi-suffix"
+    """
+    match layout:
+        case "hash":
+            shard_key = hashlib.sha1(doi.lower().encode("utf-8")).hexdigest()
+        case "doi-suffix":
+            suffix = doi.split("/", 1)[-1].lower()
+            shard_key = re.sub(r"[^0-9a-z]", "", suffix)
+            shard_key = shard_key.ljust(SHARD_DEPTH * SHARD_WIDTH, "_")
+        case _:
+            return ""
+
+    return "".join(
+        f"{shard_key[i * SHARD_WIDTH : (i + 1) * SHARD_WIDTH]}/"
+        for i in range(SHARD_DEPTH)
+    )
+
+
+def format_xml_file_name(
+    doi: str, key_prefix: str | None = None, layout: Layout = "flat"
+) -> str:
     """
     Format "doi" value into an XML filename.
     "/" replaced with "_" and ".xml" appended to the filename.
 
-    Also supports formatting a "doi" value with an S3 key prefix.
+    Also supports formatting a "doi" value with an S3 key prefix and nesting the
+    filename in shard directories (see format_shard_prefix()).
 
     Example input: "10.16904/envidat.31"
     Example output: "10.16904_envidat.31.xml"
@@ -49,20 +112,25 @@ def format_xml_file_name(doi: str, key_prefix: str | None = None) -> str:
     Args:
         doi: "doi" string, example "10.16904/envidat.31"
         key_prefix: Optional key prefix for objects in S3 bucket.
+        layout: "flat" (default), "hash" or "doi-suffix"
     """
     doi_format = doi.replace("/", "_")
+    file_name = f"{format_shard_prefix(doi, layout)}{doi_format}.xml"
 
     if not key_prefix:
-        return f"{doi_format}.xml"
+        return file_name
 
     if key_prefix.endswith("/"):
-        return f"{key_prefix}{doi_format}.xml"
+        return f"{key_prefix}{file_name}"
     else:
-        return f"{key_prefix}/{doi_format}.xml"
+        return f"{key_prefix}/{file_name}"
 
 
 def create_s3_client(
-    conf_s3: S3ConfigModel, file_logs: bool = False
+    conf_s3: S3ConfigModel,
+    file_logs: bool = False,
+    transport: S3TransportModel | None = None,
+    concurrency: int = 1,
 ) -> boto3.Session.client:
     """
     Return a Boto3 S3 client.
@@ -70,6 +138,9 @@ def create_s3_client(
     Args:
         conf_s3: S3ConfigModel
         file_logs: If True enables logging info messages and errors to a file log.
+        transport: Optional S3TransportModel, by default the default profile.
+        concurrency: Maximum number of requests the client sends concurrently, the
+                     connection pool is sized to it unless the profile sets a size.
 
     Raises:
         CustomClickException: If the client could not be created.
@@ -77,6 +148,7 @@ def create_s3_client(
     Returns:
         boto3.client: Configured S3 client
     """
+    transport = transport or S3TransportModel()
     try:
         session = boto3.Session(
             aws_access_key_id=conf_s3.aws_access_key_id,
@@ -88,9 +160,15 @@ def create_s3_client(
             config=Config(
                 request_checksum_calculation="when_required",
                 response_checksum_validation="when_required",
-                connect_timeout=5,
-                read_timeout=TIMEOUT,
-                retries={"max_attempts": 3},
+                connect_timeout=transport.connect_timeout,
+                read_timeout=transport.read_timeout,
+                retries={
+                    "mode": transport.retry_mode,
+                    "total_max_attempts": transport.max_attempts,
+                },
+                max_pool_connections=transport.pool_connections(concurrency),
+                tcp_keepalive=transport.tcp_keepalive,
+                s3={"addressing_style": "path"} if transport.path_style else None,
             ),
         )
 
@@ -104,23 +182,59 @@ def s3_client_put_object(
     bucket: str,
     key: str,
     file_logs: bool = False,
+    compression: Compression | None = None,
+    content_type: str | None = None,
 ) -> None:
     """
     Copy string as an S3 object to a S3 bucket.
 
     NOTE: This function will overwrite objects with the same key names!
 
+    If compression is set the body must already be compressed, the object is
+    uploaded with the matching Content-Encoding and an XML Content-Type so that
+    HTTP clients decompress it transparently.
+
+    Raises CustomTransportException for connection errors, timeouts and server
+    (5xx) errors so that callers can distinguish a failing endpoint from a
+    failing record.
+
     Args:
         client: boto3.Session.client
         body: bytes object that will be written as an S3 object's data
         bucket: name of bucket that object should be written in
         key: name (or path) of the object in the S3 bucket
         file_logs: If True enables logging info messages and errors to a file log.
+        compression: Optional compression format of the body, "gzip" or "zstd"
+        content_type: Optional Content-Type of the object, default for compressed
+                      objects is "application/xml"
     """
     err_msg = f"Failed to export key {key}: "
+    headers = {}
+    if compression:
+        headers["ContentEncoding"] = CONTENT_ENCODINGS[compression]
+        headers["ContentType"] = XML_CONTENT_TYPE
+    if content_type:
+        headers["ContentType"] = content_type
     try:
-        response_s3 = client.put_object(Body=body, Bucket=bucket, Key=key)
+        with span(
+            "s3_client_put_object", "sink", bucket=bucket, key=key, bytes=len(body)
+        ) as trace:
+            response_s3 = client.put_object(
+                Body=body, Bucket=bucket, Key=key, **headers
+            )
+            metadata = response_s3.get("ResponseMetadata", {})
+            trace.set(
+                status_code=metadata.get("HTTPStatusCode"),
+                retries=metadata.get("RetryAttempts", 0),
+            )
+    except (BotoConnectionError, HTTPClientError) as err:
+        raise CustomTransportException(f"{err_msg}S3 transport error: {err}", file_logs)
     except ClientError as err:
+        status_code = err.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status_code and status_code >= 500:
+            raise CustomTransportException(
+                f"{err_msg}boto3 ClientError: {err}", file_logs
+            )
         raise CustomClickException(f"{err_msg}boto3 ClientError: {err}", file_logs)
     except Exception as err:
         raise CustomClickException(f"{err_msg}Unexpected error: {err}", file_logs)
@@ -132,6 +246,12 @@ def s3_client_put_object(
             f"Successfully exported to bucket '{bucket}' DataCite DOI record: {key}",
             file_logs,
         )
+    elif status_code and status_code >= 500:
+        raise CustomTransportException(
+            f"{err_msg}S3 client returned server error HTTP response "
+            f"status code {status_code} for key '{key}'",
+            file_logs,
+        )
     else:
         raise CustomClickException(
             f"{err_msg}S3 client returned unexpected HTTP response "
@@ -142,29 +262,294 @@ def s3_client_put_object(
     return
 
 
+def s3_client_head_bucket(client: boto3.Session.client, bucket: str) -> bool:
+    """
+    Return True if the S3 bucket can be reached with a HeadBucket request,
+    else return False.
+
+    Used to probe whether an S3 endpoint has recovered after transport errors.
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket to probe
+    """
+    try:
+        response_s3 = client.head_bucket(Bucket=bucket)
+    except Exception:
+        return False
+
+    return response_s3.get("ResponseMetadata", {}).get("HTTPStatusCode") == 200
+
+
+def s3_client_copy_object(
+    client: boto3.Session.client,
+    bucket: str,
+    source_key: str,
+    key: str,
+    file_logs: bool = False,
+) -> None:
+    """
+    Copy an S3 object to another key of the same bucket with a server-side
+    CopyObject request, the object data does not pass through the client. The
+    metadata of the source object (for example Content-Encoding) is copied as well.
+
+    Raises CustomTransportException for connection errors and server (5xx) errors
+    like s3_client_put_object().
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket the object is copied in
+        source_key: name (or path) of the object that is copied
+        key: name (or path) of the copy in the S3 bucket
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    err_msg = f"Failed to copy key {source_key} to {key}: "
+    try:
+        client.copy_object(
+            Bucket=bucket, Key=key, CopySource={"Bucket": bucket, "Key": source_key}
+        )
+    except (BotoConnectionError, HTTPClientError) as err:
+        raise CustomTransportException(f"{err_msg}S3 transport error: {err}", file_logs)
+    except ClientError as err:
+        status_code = err.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status_code and status_code >= 500:
+            raise CustomTransportException(
+                f"{err_msg}boto3 ClientError: {err}", file_logs
+            )
+        raise CustomClickException(f"{err_msg}boto3 ClientError: {err}", file_logs)
+    except Exception as err:
+        raise CustomClickException(f"{err_msg}Unexpected error: {err}", file_logs)
+
+    CustomEcho(
+        f"Copied unchanged DataCite DOI record in bucket '{bucket}': {key}", file_logs
+    )
+
+
+def s3_client_delete_objects(
+    client: boto3.Session.client,
+    bucket: str,
+    keys: Sequence[str],
+    file_logs: bool = False,
+    batch_size: int = S3_DELETE_BATCH_SIZE,
+) -> None:
+    """
+    Delete S3 objects with DeleteObjects requests of up to batch_size keys each
+    (S3 accepts at most 1000 keys per request).
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket the objects are deleted from
+        keys: names (or paths) of the objects to delete
+        file_logs: If True enables logging info messages and errors to a file log.
+        batch_size: Maximum number of keys per DeleteObjects request.
+    """
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start : start + batch_size]
+        try:
+            response_s3 = client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as err:
+            raise CustomClickException(
+                f"Failed to delete objects in bucket '{bucket}': {err}", file_logs
+            )
+        if errors := response_s3.get("Errors"):
+            raise CustomClickException(
+                f"Failed to delete {len(errors)} object(s) in bucket '{bucket}', "
+                f"first error: {errors[0].get('Key')}: {errors[0].get('Message')}",
+                file_logs,
+            )
+
+
+def s3_client_check_bucket(
+    client: boto3.Session.client,
+    bucket: str,
+    key: str | None = None,
+    file_logs: bool = False,
+) -> None:
+    """
+    Check that an S3 bucket can be reached with a HeadBucket request and, if key
+    is set, that objects can be written to it by writing and deleting an empty test
+    object. Raises CustomClickException with the step that failed, for example if
+    the bucket does not exist or the credentials are not allowed to write.
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket to check
+        key: Optional name (or path) of the test object.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    step = "access"
+    try:
+        client.head_bucket(Bucket=bucket)
+        if key:
+            step = f"write test object '{key}' to"
+            client.put_object(Bucket=bucket, Key=key, Body=b"")
+            step = f"delete test object '{key}' from"
+            client.delete_object(Bucket=bucket, Key=key)
+    except ClientError as err:
+        raise CustomClickException(
+            f"Failed to {step} bucket '{bucket}': boto3 ClientError: {err}", file_logs
+        )
+    except Exception as err:
+        raise CustomClickException(
+            f"Failed to {step} bucket '{bucket}': {err}", file_logs
+        )
+
+
+class DirectorySyncer:
+    """
+    Thread-safe batcher of directory fsyncs.
+
+    Renaming a file into a directory is only durable after the directory itself is
+    synced. Instead of syncing the directory after every file, each directory is
+    synced once "batch_size" files were renamed into it and when flush() is called.
+    """
+
+    def __init__(self, batch_size: int = LOCAL_FSYNC_BATCH_SIZE):
+        """
+        Args:
+            batch_size: Number of files renamed into a directory before the
+                        directory is synced.
+        """
+        self.batch_size = batch_size
+        self.synced = 0
+        self._pending: dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, directory: Path) -> None:
+        """Record a file renamed into directory, sync directory if batch is full."""
+        with self._lock:
+            self._pending[directory] = self._pending.get(directory, 0) + 1
+            if self._pending[directory] < self.batch_size:
+                return
+            del self._pending[directory]
+        self._sync(directory)
+
+    def flush(self) -> None:
+        """Sync all directories that files were renamed into since their last sync."""
+        with self._lock:
+            directories, self._pending = list(self._pending), {}
+        for directory in directories:
+            self._sync(directory)
+
+    def _sync(self, directory: Path) -> None:
+        # Directories cannot be opened for syncing on Windows
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self.synced += 1
+
+
+def s3_client_get_object(
+    client: boto3.Session.client, bucket: str, key: str, file_logs: bool = False
+) -> bytes | None:
+    """
+    Return the data of an S3 object, or None if the object does not exist.
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket the object is read from
+        key: name (or path) of the object in the S3 bucket
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        return client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as err:
+        if err.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise CustomClickException(
+            f"Failed to read key {key}: boto3 ClientError: {err}", file_logs
+        )
+    except Exception as err:
+        raise CustomClickException(
+            f"Failed to read key {key}: Unexpected error: {err}", file_logs
+        )
+
+
+def _read_umask() -> int:
+    """Return the umask of the process, read once when the module is imported."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Files are written to temporary files created with mode 0600, they are given the
+# mode of files created with open() before they are renamed
+LOCAL_FILE_MODE = 0o666 & ~_read_umask()
+
+
 def write_local_file(
     content_bytes: bytes,
     filename: str,
     directory_path: str | None = None,
     file_logs: bool = False,
+    compression: Compression | None = None,
+    syncer: DirectorySyncer | None = None,
+    fsync: bool = False,
 ) -> None:
     """
-    Write a bytes object to a local file.
+    Atomically write a bytes object to a local file.
+
+    The bytes are written to a temporary file in the same directory that is then
+    renamed to the filename, so that an interrupted export never leaves a truncated
+    file behind. Parent directories of the filename (for example shard directories)
+    are created if they do not exist.
+
+    If compression is set the bytes object must already be compressed and the
+    extension of the compression format is appended to the filename,
+    for example "10.16904_envidat.31.xml.gz".
 
     Args:
         content_bytes: bytes object that will be written to a local file
         filename: name of file to write, be sure to include desired extension
         directory_path: path to directory to write the file in
         file_logs: If True enables logging info messages and errors to a file log.
+        compression: Optional compression format of the bytes, "gzip" or "zstd"
+        syncer: Optional DirectorySyncer that batches syncs of the directory the
+                file is renamed into.
+        fsync: If True the temporary file is synced before it is renamed, so that
+               the file is durable once the directory is synced.
     """
-    try:
-        if directory_path:
-            file_path = Path(directory_path) / filename
-        else:
-            file_path = Path(filename)
+    if compression:
+        filename += COMPRESSION_EXTENSIONS[compression]
 
-        with open(file_path, "wb") as f:
-            f.write(content_bytes)
+    try:
+        directory = Path(directory_path) if directory_path else Path()
+        file_path = directory / filename
+
+        # Create shard directories, directory_path itself must already exist
+        if file_path.parent != directory:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+        with span(
+            "write_local_file",
+            "sink",
+            filename=file_path.as_posix(),
+            bytes=len(content_bytes),
+        ):
+            fd, tmp_path = tempfile.mkstemp(
+                dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+            )
+            try:
+                with open(fd, "wb") as f:
+                    os.fchmod(f.fileno(), LOCAL_FILE_MODE)
+                    f.write(content_bytes)
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+        if syncer:
+            syncer.add(file_path.parent)
 
         posix_file_path = file_path.as_posix()
         CustomEcho(f"Wrote file: {posix_file_path}", file_logs)
@@ -174,3 +559,53 @@ def write_local_file(
 
     except Exception as err:
         raise CustomClickException(f"Unexpected error: {err}", file_logs)
+
+
+def link_local_file(
+    source_filename: str,
+    filename: str,
+    directory_path: str | None = None,
+    file_logs: bool = False,
+    syncer: DirectorySyncer | None = None,
+) -> None:
+    """
+    Atomically hard link an existing local file to another filename, so that an
+    unchanged file is not written again. The file is copied instead if the file
+    system does not support hard links.
+
+    Args:
+        source_filename: name of the existing file, relative to directory_path
+        filename: name of the link, relative to directory_path
+        directory_path: path to directory of the files
+        file_logs: If True enables logging info messages and errors to a file log.
+        syncer: Optional DirectorySyncer that batches syncs of the directory the
+                link is renamed into.
+    """
+    try:
+        directory = Path(directory_path) if directory_path else Path()
+        source_path, file_path = directory / source_filename, directory / filename
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        try:
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                if not source_path.exists():
+                    raise
+                shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        if syncer:
+            syncer.add(file_path.parent)
+
+        CustomEcho(f"Linked unchanged file: {file_path.as_posix()}", file_logs)
+
+    except IOError as io_err:
+        raise CustomClickException(f"IOError: {io_err}", file_logs)
+
+    except Exception as err:
+        raise CustomClickException(f"Unexpected error: {err}", file_logs)
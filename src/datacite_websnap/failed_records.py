@@ -0,0 +1,142 @@
+"""
+Collect, retry and persist DataCite XML records that failed to export.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Literal
+
+from .config import RETRY_ATTEMPTS, RETRY_BACKOFF
+from .logger import CustomClickException, CustomEcho, CustomWarning
+from .tracing import span
+
+# Stage of the export pipeline that a record failed in
+Stage = Literal["lookup", "validate", "decode", "xml", "export"]
+
+
+@dataclass
+class FailedRecord:
+    """
+    DataCite XML record that failed to export.
+
+    Attributes:
+        doi: DataCite DOI of the record, for example "10.16904/envidat.31"
+        stage: Stage of the export pipeline that the record failed in.
+        error: Error message of the most recent failure.
+        xml: Base64 encoded XML string of the record, kept so that the record can be
+             retried without querying DataCite again. Not written to dead-letter file.
+        updated: DataCite "updated" timestamp of the record, kept so that a retried
+                 record is recorded with it. Not written to dead-letter file.
+    """
+
+    doi: str
+    stage: Stage
+    error: str
+    xml: str | None = None
+    updated: str | None = None
+
+
+def retry_failed_records(
+    failed_records: list[FailedRecord],
+    export_record: Callable[[str, str, str | None], None],
+    attempts: int = RETRY_ATTEMPTS,
+    backoff: float = RETRY_BACKOFF,
+    file_logs: bool = False,
+) -> list[FailedRecord]:
+    """
+    Retry exporting failed records sequentially with exponential backoff and return
+    the records that still fail.
+
+    Only records that failed in the "export" stage are retried, records that failed
+    validation or decoding fail deterministically and are returned unchanged.
+
+    Args:
+        failed_records: Records that failed to export.
+        export_record: Callable that exports a record given its DOI, Base64 encoded
+                       XML string and DataCite "updated" timestamp, raises
+                       CustomClickException if export fails.
+        attempts: Number of retry passes.
+        backoff: Seconds to wait before the first retry pass, doubled for each
+                 subsequent pass.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    retryable, permanent = [], []
+    for rec in failed_records:
+        if rec.stage == "export" and rec.xml:
+            retryable.append(rec)
+        else:
+            permanent.append(rec)
+
+    for attempt in range(attempts):
+        if not retryable:
+            break
+
+        delay = backoff * 2**attempt
+        CustomEcho(
+            f"Retrying {len(retryable)} failed record(s) in {delay} seconds "
+            f"(attempt {attempt + 1}/{attempts})...",
+            file_logs,
+        )
+        time.sleep(delay)
+
+        still_failing = []
+        for rec in retryable:
+            try:
+                with span("retry_record", "record", doi=rec.doi, retry=attempt + 1):
+                    export_record(rec.doi, rec.xml, rec.updated)
+            except CustomClickException as err:
+                CustomWarning(err.message, file_logs)
+                rec.error = err.message
+                still_failing.append(rec)
+
+        retryable = still_failing
+
+    return permanent + retryable
+
+
+def write_dead_letter_file(
+    failed_records: list[FailedRecord], file_path: str, file_logs: bool = False
+) -> None:
+    """
+    Write failed records to a dead-letter file in JSON Lines format.
+
+    Each line is a JSON object with the keys "doi", "stage" and "error".
+
+    Args:
+        failed_records: Records that failed to export.
+        file_path: Path of the dead-letter file, overwritten if it already exists.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        with open(file_path, "w", encoding="utf-8") as f:
+            for rec in failed_records:
+                line = {"doi": rec.doi, "stage": rec.stage, "error": rec.error}
+                f.write(json.dumps(line) + "\n")
+    except OSError as io_err:
+        raise CustomClickException(
+            f"IOError: Failed to write dead-letter file: {io_err}", file_logs
+        )
+
+
+def read_dead_letter_file(file_path: str, file_logs: bool = False) -> tuple[str, ...]:
+    """
+    Return the unique DOIs listed in a dead-letter file, in the order they appear.
+
+    Args:
+        file_path: Path of the dead-letter file written by write_dead_letter_file().
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        lines = Path(file_path).read_text(encoding="utf-8").splitlines()
+        dois = (json.loads(line)["doi"] for line in lines if line.strip())
+        return tuple(dict.fromkeys(dois))
+    except OSError as io_err:
+        raise CustomClickException(
+            f"IOError: Failed to read dead-letter file: {io_err}", file_logs
+        )
+    except (json.JSONDecodeError, KeyError, TypeError) as err:
+        raise CustomClickException(
+            f"Invalid dead-letter file '{file_path}': {err}", file_logs
+        )
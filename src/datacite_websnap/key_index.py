@@ -0,0 +1,79 @@
+"""
+Index that maps DOIs to the keys (or local file paths) of their exported records.
+
+The index is written next to the exported records when records are nested in shard
+directories, so that consumers can find the record of a DOI without listing the
+bucket or directory.
+"""
+
+import json
+
+from .config import KEY_INDEX_NAME
+from .logger import CustomClickException, CustomEcho
+from .sinks import Sink
+
+
+def format_index_key(key_prefix: str | None = None) -> str:
+    """
+    Return the key (or local file name) of the index.
+
+    Example input: "ethz.wsl"
+    Example output: "ethz.wsl/doi-index.json"
+
+    Args:
+        key_prefix: Optional key prefix for objects in S3 bucket.
+    """
+    if not key_prefix:
+        return KEY_INDEX_NAME
+    return f"{key_prefix.rstrip('/')}/{KEY_INDEX_NAME}"
+
+
+def merge_key_index(
+    existing: bytes | None, entries: dict[str, str], file_logs: bool = False
+) -> bytes:
+    """
+    Return the index JSON object with entries merged into the existing index.
+
+    Entries of DOIs that were not exported again are kept so that exports of a
+    subset of DOIs (for example with '--doi') do not drop entries from the index.
+
+    Args:
+        existing: Existing index JSON object, or None if there is no index yet.
+        entries: Dictionary with DOIs as keys and keys of their records as values.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        index = json.loads(existing) if existing else {}
+    except json.JSONDecodeError as err:
+        raise CustomClickException(f"Invalid existing DOI index: {err}", file_logs)
+
+    index.update(entries)
+    return json.dumps(dict(sorted(index.items())), indent=0).encode("utf-8")
+
+
+def write_key_index(
+    entries: dict[str, str],
+    sink: Sink,
+    key_prefix: str | None = None,
+    file_logs: bool = False,
+) -> None:
+    """
+    Merge entries into the index at the export destination and write it.
+
+    Args:
+        entries: Dictionary with DOIs as keys and keys of their records as values.
+        sink: Sink of the export destination the index is written to.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    index_key = format_index_key(key_prefix)
+    existing = sink.read(index_key)
+    sink.write(
+        merge_key_index(existing, entries, file_logs),
+        index_key,
+        content_type="application/json",
+    )
+
+    CustomEcho(
+        f"Updated DOI index with {len(entries)} record(s): {index_key}", file_logs
+    )
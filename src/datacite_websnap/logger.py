@@ -5,6 +5,10 @@ import logging
 
 from .config import LOG_FORMAT, LOG_DATE_FORMAT, LOG_NAME
 
+# If True CustomEcho writes messages to stderr, set while records are exported to
+# stdout so that messages do not interleave with the records
+_echo_err = False
+
 
 def setup_logging(log_level: str = "INFO"):
     """Set up the logging configuration."""
@@ -16,6 +20,12 @@ def setup_logging(log_level: str = "INFO"):
     )
 
 
+def echo_to_stderr(enabled: bool = True) -> None:
+    """Write the messages of CustomEcho to stderr if enabled, else to stdout."""
+    global _echo_err
+    _echo_err = enabled
+
+
 def _log_error(message):
     """Log the error message."""
     logging.error(message, stacklevel=3)
@@ -44,6 +54,14 @@ class CustomClickException(click.ClickException):
         return click.style(super().format_message(), fg="red")
 
 
+class CustomTransportException(CustomClickException):
+    """
+    CustomClickException raised for transport errors (connection errors, timeouts
+    and server errors) that indicate the remote endpoint itself is failing rather
+    than the record that was being exported.
+    """
+
+
 class CustomBadParameter(click.BadParameter):
     """Custom BadParameter exception that conditionally logs BadParameter exceptions."""
 
@@ -80,7 +98,7 @@ class CustomEcho:
             file_logs: Flag to that enables logging echo statements to a file log.
                        Default is False (logs are not enabled.)
         """
-        click.echo(message)
+        click.echo(message, err=_echo_err)
         self.file_logs = file_logs
 
         if self.file_logs:
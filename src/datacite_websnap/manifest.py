@@ -0,0 +1,179 @@
+"""
+Manifest of an export: a gzip compressed JSON document that lists the DOI, key,
+content hash, size and DataCite "updated" timestamp of every exported record.
+
+Downstream consumers can fetch the manifest with a single request and then only
+retrieve the records that changed since they last synced.
+
+Example manifest (before compression):
+    {"generated": "2025-01-01T00:00:00+00:00", "records": [
+    {"doi": "10.16904/envidat.1", "key": "10.16904_envidat.1.xml",
+     "md5": "...", "size": 1234, "updated": "2024-12-31T12:00:00Z"}
+    ], "total": 1}
+"""
+
+import gzip
+import hashlib
+import json
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from .config import MANIFEST_NAME
+from .logger import CustomClickException, CustomEcho
+from .sinks import Sink
+
+# Content type of the manifest object in S3, the manifest is stored compressed
+# without a Content-Encoding header so that clients receive the gzip file as is
+MANIFEST_CONTENT_TYPE = "application/gzip"
+
+
+class ManifestWriter:
+    """
+    Collect the manifest entries of exported records.
+
+    Entries are written to a compressed temporary file as records are exported, so
+    that memory use does not grow with the number of records.
+
+    Attributes:
+        generated: ISO 8601 UTC timestamp of the export run.
+        merge: If True finish() carries over entries of an existing manifest.
+        records: Number of entries written to the manifest.
+    """
+
+    def __init__(self, generated: str | None = None, merge: bool = False):
+        """
+        Args:
+            generated: ISO 8601 timestamp of the export run, defaults to now (UTC).
+            merge: If True the DOIs of added records are kept, so that entries of
+                   other records in an existing manifest can be carried over by
+                   finish(). Should be True if only a subset of the records is
+                   exported (for example with '--doi').
+        """
+        self.generated = generated or datetime.now(timezone.utc).isoformat(
+            timespec="seconds"
+        )
+        self.records = 0
+        self.merge = merge
+        self._dois: set[str] | None = set() if merge else None
+        self._lock = threading.Lock()
+        self._file = tempfile.TemporaryFile()
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb", mtime=0)
+        self._gzip.write(
+            f'{{"generated": {json.dumps(self.generated)}, "records": ['.encode()
+        )
+
+    def add(
+        self,
+        doi: str,
+        key: str,
+        body: bytes,
+        md5: str | None = None,
+        updated: str | None = None,
+    ) -> None:
+        """
+        Add the entry of an exported record.
+
+        Args:
+            doi: DOI of the record.
+            key: S3 key or local path (relative to the export directory) the record
+                 was written to.
+            body: Content written to the export destination.
+            md5: Optional MD5 hex digest of body, computed if not given.
+            updated: Optional DataCite "updated" timestamp of the record.
+        """
+        md5 = md5 or hashlib.md5(body, usedforsecurity=False).hexdigest()
+        with self._lock:
+            entry = {
+                "doi": doi,
+                "key": key,
+                "md5": md5,
+                "size": len(body),
+                "updated": updated,
+            }
+            self._write_entry(entry)
+            if self._dois is not None:
+                self._dois.add(doi)
+
+    def finish(self, existing: bytes | None = None) -> bytes:
+        """
+        Return the gzip compressed manifest and close the writer.
+
+        Args:
+            existing: Optional existing (compressed) manifest, its entries of records
+                      that were not exported in this run are carried over if the
+                      writer was created with merge=True.
+        """
+        with self._lock:
+            if existing and self.merge:
+                for entry in iter_manifest_entries(existing):
+                    if entry.get("doi") not in self._dois:
+                        self._write_entry(entry)
+            self._gzip.write(f'\n], "total": {self.records}}}\n'.encode())
+            self._gzip.close()
+            self._file.seek(0)
+            manifest = self._file.read()
+            self._file.close()
+            return manifest
+
+    def _write_entry(self, entry: dict) -> None:
+        separator = "\n" if not self.records else ",\n"
+        self._gzip.write((separator + json.dumps(entry)).encode())
+        self.records += 1
+
+
+def iter_manifest_entries(
+    manifest: bytes, file_logs: bool = False
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield the record entries of a gzip compressed manifest.
+
+    Args:
+        manifest: Compressed manifest, for example returned by ManifestWriter.finish()
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    try:
+        records = json.loads(gzip.decompress(manifest))["records"]
+    except (OSError, EOFError, ValueError, KeyError, TypeError) as err:
+        raise CustomClickException(
+            f"Failed to read existing manifest: {err}", file_logs
+        )
+    yield from records
+
+
+def format_manifest_key(key_prefix: str | None = None) -> str:
+    """
+    Return the key (or local file name) of the manifest.
+
+    Args:
+        key_prefix: Optional key prefix for objects in S3 bucket.
+    """
+    return f"{key_prefix.rstrip('/')}/{MANIFEST_NAME}" if key_prefix else MANIFEST_NAME
+
+
+def write_manifest(
+    manifest: ManifestWriter,
+    sink: Sink,
+    key_prefix: str | None = None,
+    file_logs: bool = False,
+) -> None:
+    """
+    Finish the manifest and write it to the export destination, entries of an
+    existing manifest are carried over if the writer merges manifests.
+
+    Args:
+        manifest: ManifestWriter with the entries of the exported records.
+        sink: Sink of the export destination the manifest is written to.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    manifest_key = format_manifest_key(key_prefix)
+    existing = sink.read(manifest_key) if manifest.merge else None
+    sink.write(
+        manifest.finish(existing), manifest_key, content_type=MANIFEST_CONTENT_TYPE
+    )
+
+    CustomEcho(
+        f"Wrote manifest with {manifest.records} record(s): {manifest_key}", file_logs
+    )
@@ -0,0 +1,76 @@
+"""
+Record raw DataCite API page responses to a local directory and replay them.
+"""
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .config import RECORDED_PAGES_NAME
+from .logger import CustomClickException, CustomEcho
+
+
+def record_datacite_pages(
+    pages: Iterable[dict[str, Any]], directory_path: str, file_logs: bool = False
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield each DataCite API page response unchanged after recording it to a gzip
+    compressed JSON Lines file, one page response per line.
+
+    The file is opened when the first page is retrieved and closed when the pages
+    are exhausted, so that pages are recorded while they are being exported.
+
+    Args:
+        pages: Iterable of DataCite API page responses.
+        directory_path: Path of the directory the pages file is written in,
+                        created if it does not exist.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    file_path = Path(directory_path) / RECORDED_PAGES_NAME
+    try:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        f = gzip.open(file_path, "wt", encoding="utf-8")
+    except OSError as io_err:
+        raise CustomClickException(
+            f"IOError: Failed to open recorded pages file: {io_err}", file_logs
+        )
+
+    recorded = 0
+    with f:
+        for page in pages:
+            f.write(json.dumps(page, separators=(",", ":")) + "\n")
+            recorded += 1
+            yield page
+
+    CustomEcho(
+        f"Recorded {recorded} DataCite API page(s) to: {file_path.as_posix()}",
+        file_logs,
+    )
+
+
+def iter_recorded_pages(
+    directory_path: str, file_logs: bool = False
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield the DataCite API page responses recorded by record_datacite_pages(), in the
+    order they were recorded.
+
+    Args:
+        directory_path: Path of the directory the pages file was written in.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    file_path = Path(directory_path) / RECORDED_PAGES_NAME
+    try:
+        with gzip.open(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (OSError, EOFError) as io_err:
+        raise CustomClickException(
+            f"IOError: Failed to read recorded pages file: {io_err}", file_logs
+        )
+    except json.JSONDecodeError as err:
+        raise CustomClickException(
+            f"Invalid recorded pages file '{file_path.as_posix()}': {err}", file_logs
+        )
@@ -0,0 +1,88 @@
+"""
+Helpers that run stages of the export pipeline ahead of the export loop.
+"""
+
+import hashlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from .failed_records import Stage
+from .logger import CustomClickException
+from .record import DataCiteRecord
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def prefetch_map(
+    fn: Callable[[T], R], items: Iterable[T], workers: int, max_pending: int = 0
+) -> Iterator[R]:
+    """
+    Yield fn(item) for each item in the order of the items, while up to
+    "max_pending" following items are already processed in a pool of worker
+    threads.
+
+    Used to move work that releases the GIL (for example compression) off the
+    thread that exports the records.
+
+    Args:
+        fn: Function applied to each item, exceptions are raised when the result of
+            the item is yielded.
+        items: Iterable of items, consumed lazily.
+        workers: Number of worker threads, if 0 fn is applied in the current thread.
+        max_pending: Maximum number of items processed ahead, default is two items
+                     per worker.
+    """
+    if not workers:
+        yield from map(fn, items)
+        return
+
+    max_pending = max_pending or workers * 2
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending: deque[Future] = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclass
+class PreparedRecord:
+    """
+    DataCite XML record prepared for export.
+
+    Attributes:
+        doi: DataCite DOI of the record, for example "10.16904/envidat.31"
+        record: DataCite record that is prepared.
+        filename: XML filename (or S3 key) of the record.
+        body: Decoded and optionally compressed XML that is exported.
+        size: Size of the decoded XML in bytes.
+        stage: Stage of the export pipeline the record reached.
+        error: Error raised while preparing the record, if the record failed.
+    """
+
+    doi: str
+    record: DataCiteRecord | None = None
+    filename: str | None = None
+    body: bytes | None = None
+    size: int = 0
+    stage: Stage = "validate"
+    error: CustomClickException | None = None
+
+    @cached_property
+    def md5(self) -> str:
+        """
+        MD5 hex digest of the body, the hash of the record is reused if the body is
+        not compressed.
+        """
+        if self.record is not None and self.body is self.record.decode():
+            return self.record.md5
+        return hashlib.md5(self.body, usedforsecurity=False).hexdigest()
@@ -0,0 +1,304 @@
+"""
+Plan an export without writing: compare harvested records with the records that
+already exist at the export destination.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Literal
+
+from .logger import CustomClickException, CustomEcho, CustomWarning
+from .pipeline import PreparedRecord
+
+# Action planned for a record
+Action = Literal["create", "update", "unchanged", "delete"]
+
+# Extensions of exported records, used to tell records apart from other objects
+# (for example the DOI index) at the export destination
+RECORD_EXTENSIONS = (".xml", ".xml.gz", ".xml.zst")
+
+
+@dataclass
+class ListedObject:
+    """
+    Object (or local file) listed at the export destination.
+
+    Attributes:
+        size: Size of the object in bytes.
+        etag: S3 ETag of the object (the MD5 hex digest of the data for objects
+              uploaded with a single PUT), None for local files.
+        path: Path of the local file, None for S3 objects.
+    """
+
+    size: int
+    etag: str | None = None
+    path: Path | None = None
+
+    def matches(self, body: bytes, md5: str | None = None) -> bool:
+        """
+        Return True if the content of the object is identical to body.
+
+        Args:
+            body: Content of the record.
+            md5: Optional MD5 hex digest of body, computed if not given.
+        """
+        if self.size != len(body):
+            return False
+        digest = md5 or hashlib.md5(body, usedforsecurity=False).hexdigest()
+        if self.path is not None:
+            with open(self.path, "rb") as f:
+                return hashlib.file_digest(f, "md5").hexdigest() == digest
+        return (self.etag or "").strip('"') == digest
+
+
+@dataclass
+class PlanEntry:
+    """Record (or object) that an export would create, update or delete."""
+
+    action: Action
+    key: str
+    doi: str | None = None
+    size: int = 0
+
+
+@dataclass
+class ExportPlan:
+    """
+    Changes that an export would make at the export destination.
+
+    Attributes:
+        entries: Records that would be created, updated or deleted.
+        counts: Number of records per action.
+        sizes: Size in bytes of the records per action, for "delete" the size of
+               the existing objects.
+        failed: Number of records that would fail to export.
+    """
+
+    entries: list[PlanEntry] = field(default_factory=list)
+    counts: Counter = field(default_factory=Counter)
+    sizes: Counter = field(default_factory=Counter)
+    failed: int = 0
+
+    def add(self, action: Action, key: str, doi: str | None, size: int) -> None:
+        """Add a planned action, unchanged records are only counted."""
+        self.counts[action] += 1
+        self.sizes[action] += size
+        if action != "unchanged":
+            self.entries.append(PlanEntry(action, key, doi, size))
+
+    def summary(self) -> str:
+        """Return a one line human-readable summary of the plan."""
+        summary = ", ".join(
+            f"{self.counts[action]} {label} ({self.sizes[action]} bytes)"
+            for action, label in (
+                ("create", "to create"),
+                ("update", "to update"),
+                ("unchanged", "unchanged"),
+                ("delete", "to delete"),
+            )
+        )
+        if self.failed:
+            summary += f", {self.failed} failed"
+        return summary
+
+    def to_dict(self) -> dict:
+        """Return the plan as a JSON serializable dictionary."""
+        return {
+            "summary": {
+                action: {"count": self.counts[action], "bytes": self.sizes[action]}
+                for action in ("create", "update", "unchanged", "delete")
+            }
+            | {"failed": self.failed},
+            "changes": [asdict(entry) for entry in self.entries],
+        }
+
+
+def list_s3_objects(
+    client, bucket: str, key_prefix: str | None = None, file_logs: bool = False
+) -> dict[str, ListedObject]:
+    """
+    Return the objects under the key prefix of an S3 bucket, listed with paginated
+    ListObjectsV2 requests (up to 1000 objects per request).
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket to list
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    prefix = f"{key_prefix.rstrip('/')}/" if key_prefix else ""
+    listing = {}
+    try:
+        paginator = client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                listing[obj["Key"]] = ListedObject(obj["Size"], etag=obj["ETag"])
+    except Exception as err:
+        raise CustomClickException(
+            f"Failed to list objects in bucket '{bucket}': {err}", file_logs
+        )
+    return listing
+
+
+def list_s3_prefixes(
+    client, bucket: str, key_prefix: str | None = None, file_logs: bool = False
+) -> list[str]:
+    """
+    Return the names of the "directories" directly under the key prefix of an S3
+    bucket, listed with ListObjectsV2 requests that group keys by "/".
+
+    Example output: ["2025-01-01", "2025-01-02"]
+
+    Args:
+        client: boto3.Session.client
+        bucket: name of bucket to list
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    prefix = f"{key_prefix.rstrip('/')}/" if key_prefix else ""
+    names = []
+    try:
+        paginator = client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            for common_prefix in page.get("CommonPrefixes", []):
+                names.append(common_prefix["Prefix"][len(prefix) :].rstrip("/"))
+    except Exception as err:
+        raise CustomClickException(
+            f"Failed to list prefixes in bucket '{bucket}': {err}", file_logs
+        )
+    return sorted(names)
+
+
+def list_local_files(
+    directory_path: str, file_logs: bool = False, key_prefix: str | None = None
+) -> dict[str, ListedObject]:
+    """
+    Return the files in a local directory and its subdirectories, keyed by their
+    POSIX path relative to the directory.
+
+    Args:
+        directory_path: path to directory to list
+        file_logs: If True enables logging info messages and errors to a file log.
+        key_prefix: Optional subdirectory of the directory, only its files are
+                    listed.
+    """
+    root = Path(directory_path)
+    listing = {}
+    try:
+        for dir_path, _, file_names in os.walk(root / (key_prefix or "")):
+            for file_name in file_names:
+                path = Path(dir_path) / file_name
+                key = path.relative_to(root).as_posix()
+                listing[key] = ListedObject(path.stat().st_size, path=path)
+    except OSError as io_err:
+        raise CustomClickException(f"IOError: {io_err}", file_logs)
+    return listing
+
+
+def build_export_plan(
+    prepared_records: Iterable[PreparedRecord],
+    listing: dict[str, ListedObject],
+    key_extension: str = "",
+    include_deletions: bool = True,
+    file_logs: bool = False,
+) -> ExportPlan:
+    """
+    Return the plan of an export by comparing the content hash of each prepared
+    record with the object listed under the same key.
+
+    Args:
+        prepared_records: Iterable of prepared (decoded and optionally compressed)
+                          records.
+        listing: Objects listed at the export destination, by key.
+        key_extension: Extension appended to the key of a record at the
+                       destination, for example ".gz" for compressed local files.
+        include_deletions: If True, listed records that were not harvested are
+                           planned to be deleted. Should be False if only a subset
+                           of the records was harvested (for example with '--doi').
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    return build_export_plans(
+        prepared_records, [(listing, key_extension)], include_deletions, file_logs
+    )[0]
+
+
+def build_export_plans(
+    prepared_records: Iterable[PreparedRecord],
+    listings: list[tuple[dict[str, ListedObject], str]],
+    include_deletions: bool = True,
+    file_logs: bool = False,
+) -> list[ExportPlan]:
+    """
+    Return the plans of an export to several destinations, records are iterated
+    once and compared with the listing of each destination (see
+    build_export_plan()).
+
+    Args:
+        prepared_records: Iterable of prepared (decoded and optionally compressed)
+                          records.
+        listings: Objects listed at each export destination (by key) paired with
+                  the key extension of the destination.
+        include_deletions: If True, listed records that were not harvested are
+                           planned to be deleted.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    plans = [ExportPlan() for _ in listings]
+    planned_keys = [set() for _ in listings]
+
+    for prepared in prepared_records:
+        if prepared.error:
+            for plan in plans:
+                plan.failed += 1
+            CustomWarning(prepared.error.message, file_logs)
+            continue
+
+        for plan, keys, (listing, key_extension) in zip(plans, planned_keys, listings):
+            key = prepared.filename + key_extension
+            keys.add(key)
+            listed = listing.get(key)
+            if listed is None:
+                action = "create"
+            elif listed.matches(prepared.body, prepared.md5):
+                action = "unchanged"
+            else:
+                action = "update"
+            plan.add(action, key, prepared.doi, len(prepared.body))
+
+    if include_deletions:
+        for plan, keys, (listing, _) in zip(plans, planned_keys, listings):
+            for key, listed in sorted(listing.items()):
+                if key not in keys and key.endswith(RECORD_EXTENSIONS):
+                    plan.add("delete", key, None, listed.size)
+
+    return plans
+
+
+def write_plan_file(
+    plan: ExportPlan | dict[str, ExportPlan], path: str, file_logs: bool = False
+) -> None:
+    """
+    Write the plan to a JSON file.
+
+    Args:
+        plan: ExportPlan, or dictionary with the names of several destinations as
+              keys and their plans as values, written as {"destinations": {...}}
+        path: Path of the plan file, overwritten if it exists.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    if isinstance(plan, ExportPlan):
+        plan_dict = plan.to_dict()
+    else:
+        plan_dict = {"destinations": {name: p.to_dict() for name, p in plan.items()}}
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(plan_dict, f, indent=2)
+    except OSError as io_err:
+        raise CustomClickException(
+            f"IOError: Failed to write plan file: {io_err}", file_logs
+        )
+
+    CustomEcho(f"Wrote export plan to: {path}", file_logs)
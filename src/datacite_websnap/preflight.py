@@ -0,0 +1,89 @@
+"""
+Preflight checks that run concurrently before records are harvested, so that an
+invalid DataCite query or a misconfigured export destination (for example a typo in
+the bucket name or missing write permissions) fails the export within seconds
+instead of after the harvest.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import click
+
+from .config import PREFLIGHT_TIMEOUT
+from .logger import CustomClickException, CustomEcho
+
+
+@dataclass(frozen=True)
+class PreflightCheck:
+    """
+    Check that runs before the harvest.
+
+    Attributes:
+        name: Name of the check shown in messages, for example "S3 destination".
+        run: Function that raises an exception if the check fails, its return
+             value is returned by run_preflight() so that results (for example the
+             first page of records) can be reused.
+    """
+
+    name: str
+    run: Callable[[], Any]
+
+
+def run_preflight(
+    checks: list[PreflightCheck],
+    timeout: float = PREFLIGHT_TIMEOUT,
+    file_logs: bool = False,
+) -> dict[str, Any]:
+    """
+    Run checks concurrently and return their results by check name.
+
+    Raises CustomClickException as soon as one check fails, without waiting for
+    the other checks, or if the checks did not complete within the timeout.
+
+    Args:
+        checks: Checks to run.
+        timeout: Seconds until checks that did not complete fail.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    if not checks:
+        return {}
+
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=len(checks), thread_name_prefix="preflight"
+    )
+    futures = {executor.submit(check.run): check for check in checks}
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            name = futures[future].name
+            try:
+                results[name] = future.result()
+            except click.ClickException as err:
+                raise CustomClickException(
+                    f"Preflight check '{name}' failed: {err.message}", file_logs
+                )
+            except Exception as err:
+                raise CustomClickException(
+                    f"Preflight check '{name}' failed: {err}", file_logs
+                )
+    except TimeoutError:
+        pending = [check.name for future, check in futures.items() if not future.done()]
+        raise CustomClickException(
+            f"Preflight check(s) did not complete within {timeout} seconds: "
+            f"{', '.join(pending)}",
+            file_logs,
+        )
+    finally:
+        # Do not wait for checks that are still running if one check failed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    CustomEcho(
+        f"Preflight checks passed in {time.monotonic() - start:.1f}s: "
+        f"{', '.join(check.name for check in checks)}",
+        file_logs,
+    )
+    return results
@@ -0,0 +1,194 @@
+"""
+Token bucket rate limits of the bandwidth and request rate of an export.
+
+One RateLimits object is shared by all workers and destinations of an export, so
+that the limits apply to the export as a whole:
+    - upload: bytes per second uploaded to S3 destinations
+    - put: PUT (and CopyObject) requests per second sent to S3 destinations
+    - fetch: bytes per second downloaded from the DataCite API
+
+Buckets only hold RATE_LIMIT_BURST_SECONDS of their rate, and requests larger
+than the bucket go into debt that later requests wait for, so that the rates are
+paced smoothly instead of in bursts while the average rate stays exact.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import requests
+
+from .config import RATE_LIMIT_BURST_SECONDS, RATE_LIMIT_CHUNK_SIZE
+from .stats import format_bytes
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that paces consumers to a rate of tokens per second.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens the bucket holds.
+        consumed: Total number of tokens consumed.
+        waited: Total seconds consumers waited for tokens.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            rate: Tokens added per second, for example bytes or requests per second.
+            burst_seconds: Seconds of the rate the bucket holds.
+            clock: Function that returns the current time in seconds.
+            sleep: Function that sleeps for a number of seconds.
+        """
+        self.rate = rate
+        self.capacity = max(rate * burst_seconds, 1)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.consumed = 0.0
+        self.waited = 0.0
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._start: float | None = None
+        self._lock = threading.Lock()
+
+    def consume(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, wait until they are available and return the
+        seconds waited.
+
+        Args:
+            tokens: Number of tokens to take, for example the size of a request
+                    body in bytes.
+        """
+        with self._lock:
+            now = self.clock()
+            if self._start is None:
+                self._start = now
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            self.consumed += tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+
+        # Tokens are already taken, consumers that come later wait for the debt
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    @property
+    def observed_rate(self) -> float:
+        """
+        Average tokens consumed per second since the first consume(), at most the
+        rate of the bucket (the burst of the first tokens is not counted as a rate).
+        """
+        if self._start is None:
+            return 0.0
+        return self.consumed / max(
+            self.clock() - self._start, self.consumed / self.rate
+        )
+
+
+@dataclass
+class RateLimits:
+    """
+    Rate limits shared by all workers and destinations of an export.
+
+    Attributes:
+        upload: Optional limit of bytes per second uploaded to S3 destinations.
+        put: Optional limit of PUT requests per second sent to S3 destinations.
+        fetch: Optional limit of bytes per second downloaded from DataCite.
+    """
+
+    upload: TokenBucket | None = None
+    put: TokenBucket | None = None
+    fetch: TokenBucket | None = None
+
+    @classmethod
+    def from_rates(
+        cls,
+        max_upload_rate: float | None = None,
+        max_put_rate: float | None = None,
+        max_fetch_rate: float | None = None,
+    ) -> "RateLimits":
+        """
+        Return rate limits with a token bucket for each rate that is set.
+
+        Args:
+            max_upload_rate: Optional bytes per second uploaded to S3.
+            max_put_rate: Optional PUT requests per second sent to S3.
+            max_fetch_rate: Optional bytes per second downloaded from DataCite.
+        """
+        return cls(
+            upload=TokenBucket(max_upload_rate) if max_upload_rate else None,
+            put=TokenBucket(max_put_rate) if max_put_rate else None,
+            fetch=TokenBucket(max_fetch_rate) if max_fetch_rate else None,
+        )
+
+    def __bool__(self) -> bool:
+        return any((self.upload, self.put, self.fetch))
+
+    def summary(self) -> str:
+        """
+        Return the observed rates and caps, for example
+        "fetch 0.9 MiB/s of 1.0 MiB/s, PUT 49.8/s of 50.0/s, waited 12.3s".
+        """
+        parts = []
+        for name, bucket in (("fetch", self.fetch), ("upload", self.upload)):
+            if bucket:
+                parts.append(
+                    f"{name} {format_bytes(round(bucket.observed_rate))}/s of "
+                    f"{format_bytes(round(bucket.rate))}/s"
+                )
+        if self.put:
+            parts.append(f"PUT {self.put.observed_rate:.1f}/s of {self.put.rate:.1f}/s")
+        waited = sum(
+            bucket.waited for bucket in (self.fetch, self.upload, self.put) if bucket
+        )
+        parts.append(f"waited {waited:.1f}s")
+        return ", ".join(parts)
+
+
+class ThrottledSession(requests.Session):
+    """
+    requests.Session that paces the download of response bodies with a token
+    bucket of bytes per second shared by all requests of the session.
+
+    Bodies are read in chunks of RATE_LIMIT_CHUNK_SIZE bytes and the bytes received
+    from the network (compressed if the response is compressed) are taken from the
+    bucket after each chunk.
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        """
+        Args:
+            bucket: Token bucket of bytes per second.
+        """
+        super().__init__()
+        self.bucket = bucket
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        stream = kwargs.pop("stream", False)
+        response = super().request(method, url, stream=True, **kwargs)
+        if stream:
+            return response
+
+        chunks, received = [], 0
+        for chunk in response.iter_content(RATE_LIMIT_CHUNK_SIZE):
+            chunks.append(chunk)
+            self.bucket.consume(response.raw.tell() - received)
+            received = response.raw.tell()
+        response._content = b"".join(chunks)
+        response.close()
+        return response
@@ -0,0 +1,78 @@
+"""
+Compact representation of the DataCite XML records that are exported.
+"""
+
+import hashlib
+
+from .exporter import decode_base64_xml
+
+
+class DataCiteRecord:
+    """
+    DataCite XML record extracted from a DataCite API response.
+
+    Records are slotted and their attributes are read-only, so that a record is
+    cheap to create for each record of a page and needs no validation after it was
+    extracted. The XML is decoded and hashed lazily, at most once per record.
+
+    Attributes:
+        doi: DataCite DOI of the record, for example "10.16904/envidat.31"
+        xml: Base64 encoded XML string of the record.
+        updated: DataCite "updated" timestamp of the record, if it was returned.
+    """
+
+    __slots__ = ("_doi", "_xml", "_updated", "_body", "_md5")
+
+    def __init__(self, doi: str, xml: str, updated: str | None = None):
+        """
+        Args:
+            doi: DataCite DOI of the record.
+            xml: Base64 encoded XML string of the record.
+            updated: Optional DataCite "updated" timestamp of the record.
+        """
+        self._doi = doi
+        self._xml = xml
+        self._updated = updated
+        self._body: bytes | None = None
+        self._md5: str | None = None
+
+    @property
+    def doi(self) -> str:
+        return self._doi
+
+    @property
+    def xml(self) -> str:
+        return self._xml
+
+    @property
+    def updated(self) -> str | None:
+        return self._updated
+
+    def __repr__(self) -> str:
+        return f"DataCiteRecord(doi={self._doi!r}, xml={self._xml!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DataCiteRecord):
+            return NotImplemented
+        return self._doi == other._doi and self._xml == other._xml
+
+    def __hash__(self) -> int:
+        return hash((self._doi, self._xml))
+
+    def decode(self, file_logs: bool = False) -> bytes:
+        """
+        Return the decoded XML of the record, decoded on the first call.
+
+        Args:
+            file_logs: If True enables logging info messages and errors to a file log.
+        """
+        if self._body is None:
+            self._body = decode_base64_xml(self._xml, file_logs)
+        return self._body
+
+    @property
+    def md5(self) -> str:
+        """MD5 hex digest of the decoded XML, computed on the first access."""
+        if self._md5 is None:
+            self._md5 = hashlib.md5(self.decode(), usedforsecurity=False).hexdigest()
+        return self._md5
@@ -0,0 +1,407 @@
+"""
+Local HTTP job API that runs on-demand exports, for example to re-export the
+records of a repository or specific DOIs right after they were published.
+
+Jobs are queued in a bounded queue and run by a fixed number of worker threads
+that share one Exporter (with its DataCite API session) and the sinks (with their
+S3 clients), so that jobs do not pay process startup and TLS handshakes. Requests
+for records that are already waiting in the queue are coalesced into the queued
+job: a repository or DOI prefix job is reused, and DOIs are added to the queued
+job of specific DOIs so that they are retrieved with batched lookups.
+
+Endpoints:
+    POST /jobs       {"client_id": "ethz.wsl"}, {"doi_prefix": ["10.16904"]} or
+                     {"dois": ["10.16904/envidat.31"]}, returns the job (202), or
+                     429 if the queue is full
+    GET  /jobs       Recent jobs
+    GET  /jobs/<id>  Status and stats of a job
+    GET  /health     Number of queued and running jobs
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Literal, Sequence
+
+import click
+
+from .api import Destination, ExportError, Exporter, ExportOptions, ExportQuery
+from .config import SERVE_JOB_HISTORY, SERVE_JOB_WORKERS, SERVE_MAX_QUEUED_JOBS
+from .logger import CustomEcho, CustomWarning
+from .validators import validate_dois
+from .watch import format_timestamp
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class JobQueueFull(Exception):
+    """Error raised by JobQueue.submit() if the queue of waiting jobs is full."""
+
+
+@dataclass
+class ExportJob:
+    """
+    Export requested with the job API.
+
+    Attributes:
+        id: Unique ID of the job.
+        client_id: DataCite repository account ID of the records to export.
+        doi_prefix: DataCite DOI prefixes of the records to export.
+        dois: Specific DOIs to export, DOIs of coalesced requests are added while
+              the job is queued.
+        status: "queued", "running", "succeeded", "failed" or "cancelled"
+        requests: Number of requests coalesced into the job, including the first.
+        created: Unix timestamp of the first request.
+        started: Unix timestamp of the start of the export.
+        finished: Unix timestamp of the end of the export.
+        destinations: Stats of each destination after the export.
+        failed_dois: DOIs of records that still failed after retrying.
+        error: Error message if the job failed.
+    """
+
+    client_id: str | None = None
+    doi_prefix: tuple[str, ...] = ()
+    dois: list[str] = field(default_factory=list)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = "queued"
+    requests: int = 1
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    destinations: list[dict] = field(default_factory=list)
+    failed_dois: list[str] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def key(self) -> tuple:
+        """Key of the records of the job, requests with the same key are coalesced."""
+        if self.dois:
+            return ("dois",)
+        return ("query", self.client_id, tuple(sorted(self.doi_prefix)))
+
+    @property
+    def done(self) -> bool:
+        """True if the job finished or was cancelled."""
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        """Return the job as a dictionary reported by the job API."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "client_id": self.client_id,
+            "doi_prefix": list(self.doi_prefix),
+            "dois": list(self.dois),
+            "requests": self.requests,
+            "created": format_timestamp(self.created),
+            "started": format_timestamp(self.started) if self.started else None,
+            "finished": format_timestamp(self.finished) if self.finished else None,
+            "duration": (
+                round(self.finished - self.started, 3)
+                if self.started and self.finished
+                else None
+            ),
+            "destinations": self.destinations,
+            "failed_dois": self.failed_dois,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded queue of export jobs run by worker threads that share one Exporter and
+    the sinks of the destinations.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        destinations: Sequence[Destination],
+        options: ExportOptions,
+        filters: dict[str, str] | None = None,
+        workers: int = SERVE_JOB_WORKERS,
+        max_queued: int = SERVE_MAX_QUEUED_JOBS,
+        history: int = SERVE_JOB_HISTORY,
+        file_logs: bool = False,
+    ):
+        """
+        Args:
+            exporter: Exporter shared by all jobs.
+            destinations: Destinations the records of all jobs are written to.
+            options: Options of the exports.
+            filters: Optional DataCite search query params applied to all jobs, for
+                     example returned by format_datacite_filters().
+            workers: Number of jobs that run concurrently.
+            max_queued: Maximum number of jobs waiting in the queue, requests for
+                        new jobs are rejected while the queue is full.
+            history: Number of finished jobs whose status is kept.
+            file_logs: If True enables logging info messages and errors to a file log.
+        """
+        self.exporter = exporter
+        self.destinations = list(destinations)
+        self.options = options
+        self.filters = filters or {}
+        self.max_queued = max_queued
+        self.history = history
+        self.file_logs = file_logs
+
+        self._jobs: OrderedDict[str, ExportJob] = OrderedDict()
+        self._queued: deque[ExportJob] = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"export-job-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        client_id: str | None = None,
+        doi_prefix: Sequence[str] = (),
+        dois: Sequence[str] = (),
+    ) -> ExportJob:
+        """
+        Queue an export job and return it, or return the queued job the request was
+        coalesced into.
+
+        Raises JobQueueFull if the queue of waiting jobs is full, and
+        click.BadParameter if the request is invalid.
+
+        Args:
+            client_id: DataCite repository account ID of the records to export.
+            doi_prefix: DataCite DOI prefixes of the records to export.
+            dois: Specific DOIs to export, cannot be combined with client_id or
+                  doi_prefix.
+        """
+        dois = validate_dois(None, None, tuple(dois))
+        if dois and (client_id or doi_prefix):
+            raise click.BadParameter(
+                "'dois' cannot be combined with 'client_id' or 'doi_prefix'"
+            )
+        if not (dois or client_id or doi_prefix):
+            raise click.BadParameter(
+                "At least one of 'client_id', 'doi_prefix' or 'dois' is required"
+            )
+        job = ExportJob(client_id, tuple(doi_prefix), list(dict.fromkeys(dois)))
+
+        with self._condition:
+            if self._closed:
+                raise JobQueueFull("The job queue is shutting down")
+
+            # Coalesce with the queued job of the same records, the records are
+            # retrieved when the job starts so they include this request
+            for queued in self._queued:
+                if queued.key == job.key:
+                    queued.dois.extend(
+                        doi for doi in job.dois if doi not in queued.dois
+                    )
+                    queued.requests += 1
+                    return queued
+
+            if len(self._queued) >= self.max_queued:
+                raise JobQueueFull(
+                    f"The job queue is full ({self.max_queued} queued jobs)"
+                )
+            self._queued.append(job)
+            self._jobs[job.id] = job
+            self._prune()
+            self._condition.notify()
+
+        return job
+
+    def get(self, job_id: str) -> ExportJob | None:
+        """Return the job with the given ID, None if it is unknown."""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[ExportJob]:
+        """Return the known jobs, most recent first."""
+        with self._condition:
+            return list(reversed(self._jobs.values()))
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of known jobs per status."""
+        with self._condition:
+            counts = dict.fromkeys(
+                ("queued", "running", "succeeded", "failed", "cancelled"), 0
+            )
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def close(self) -> None:
+        """Cancel the queued jobs and wait for the running jobs to finish."""
+        with self._condition:
+            self._closed = True
+            while self._queued:
+                job = self._queued.popleft()
+                job.status = "cancelled"
+                job.finished = time.time()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queued and not self._closed:
+                    self._condition.wait()
+                if not self._queued:
+                    return
+                job = self._queued.popleft()
+                job.status = "running"
+                job.started = time.time()
+            self._run(job)
+
+    def _run(self, job: ExportJob) -> None:
+        records = (
+            f"{len(job.dois)} specific DOI(s)"
+            if job.dois
+            else f"repository account ID '{job.client_id}' and/or prefix(es): "
+            f"{job.doi_prefix}"
+        )
+        CustomEcho(f"Starting export job {job.id} for {records}", self.file_logs)
+        query = ExportQuery(
+            client_id=job.client_id,
+            doi_prefix=job.doi_prefix,
+            dois=tuple(job.dois),
+            filters=self.filters,
+        )
+
+        try:
+            result = self.exporter.export(query, self.destinations, self.options)
+        except ExportError as err:
+            error = err.message
+        except Exception as err:
+            # Keep the worker alive for the next jobs
+            error = f"Unexpected error: {err}"
+        else:
+            job.destinations = [
+                {
+                    "name": dest.name,
+                    "total": dest.stats.total,
+                    "exported": dest.stats.exported,
+                    "failed": dest.stats.failed,
+                    "copied": dest.stats.copied,
+                    "summary": dest.stats.summary(),
+                    "error": dest.error,
+                }
+                for dest in result.destinations
+            ]
+            job.failed_dois = [record.doi for record in result.failed_records]
+            error = "; ".join(result.errors.values()) or None
+            if job.failed_dois and not error:
+                error = f"{len(job.failed_dois)} record(s) failed to export"
+
+        with self._condition:
+            job.error = error
+            job.status = "failed" if error else "succeeded"
+            job.finished = time.time()
+        if error:
+            CustomWarning(f"Export job {job.id} failed: {error}", self.file_logs)
+        else:
+            CustomEcho(f"Finished export job {job.id}", self.file_logs)
+
+
+class ExportServer:
+    """
+    Context manager that serves the job API of a JobQueue on a local port in a
+    background thread.
+
+    Attributes:
+        url: URL of the running server, for example "http://127.0.0.1:8766"
+    """
+
+    def __init__(self, job_queue: JobQueue, host: str, port: int):
+        """
+        Args:
+            job_queue: Queue the requested jobs are submitted to.
+            host: Host the server listens on, for example "127.0.0.1"
+            port: Port the server listens on, 0 for a free port.
+        """
+        self.job_queue = job_queue
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "ExportServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        job_queue = self.job_queue
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send_json(200, {"status": "ok", **job_queue.counts()})
+                elif self.path == "/jobs":
+                    jobs = [job.to_dict() for job in job_queue.jobs()]
+                    self._send_json(200, {"jobs": jobs})
+                elif self.path.startswith("/jobs/"):
+                    job = job_queue.get(self.path.removeprefix("/jobs/"))
+                    if job:
+                        self._send_json(200, job.to_dict())
+                    else:
+                        self._send_json(404, {"error": "Unknown job"})
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path != "/jobs":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+
+                try:
+                    request = json.loads(body or b"{}")
+                    if not isinstance(request, dict):
+                        raise TypeError("the request body must be a JSON object")
+                    job = job_queue.submit(
+                        client_id=request.get("client_id"),
+                        doi_prefix=tuple(request.get("doi_prefix") or ()),
+                        dois=tuple(request.get("dois") or ()),
+                    )
+                except (ValueError, TypeError) as err:
+                    self._send_json(400, {"error": f"Invalid request: {err}"})
+                except click.BadParameter as err:
+                    self._send_json(400, {"error": err.message})
+                except JobQueueFull as err:
+                    self._send_json(429, {"error": str(err)}, {"Retry-After": "60"})
+                else:
+                    self._send_json(202, job.to_dict())
+
+            def _send_json(self, status: int, obj: dict, headers=None):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
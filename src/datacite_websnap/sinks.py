@@ -0,0 +1,512 @@
+"""
+Sinks are the destinations that exported records are written to.
+
+The Exporter (see api.py) writes each prepared record to a sink with
+Sink.write_record(), which calls Sink.write() unless the sink needs the DOI.
+S3Sink and LocalSink wrap the S3 and local file functions in exporter.py, StdoutSink
+streams records to stdout. Custom destinations subclass Sink and implement at least
+write().
+
+Example custom sink:
+    class MemorySink(Sink):
+        name = "memory"
+
+        def __init__(self):
+            self.objects = {}
+
+        def write(self, body, key, compression=None, content_type=None):
+            self.objects[key] = body
+"""
+
+import json
+import os
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from pathlib import Path
+from typing import BinaryIO, Literal
+
+import boto3
+
+from .compression import COMPRESSION_EXTENSIONS, Compression
+from .config import PREFLIGHT_KEY_NAME, STDOUT_BUFFER_SIZE
+from .exporter import (
+    DirectorySyncer,
+    link_local_file,
+    s3_client_check_bucket,
+    s3_client_copy_object,
+    s3_client_delete_objects,
+    s3_client_get_object,
+    s3_client_head_bucket,
+    s3_client_put_object,
+    write_local_file,
+)
+from .logger import CustomClickException
+from .ratelimit import RateLimits
+from .plan import ListedObject, list_local_files, list_s3_objects, list_s3_prefixes
+
+
+class Sink(ABC):
+    """
+    Destination that exported records (and the DOI index and manifest) are written
+    to.
+
+    Records may be written from several worker threads at once, so write() must be
+    thread-safe. Failures should be raised as CustomClickException, or as
+    CustomTransportException if the destination itself is failing (for example
+    connection errors), so that the circuit breaker can pause the export.
+
+    Attributes:
+        name: Name of the destination shown in messages, for example "S3".
+    """
+
+    name: str = "custom"
+
+    @abstractmethod
+    def write(
+        self,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        """
+        Write an object to the destination, overwriting an object with the same key.
+
+        Args:
+            body: Content of the object, already compressed if compression is set.
+            key: Key (or relative path) of the object.
+            compression: Optional compression format of the body.
+            content_type: Optional content type of the object.
+        """
+
+    def write_record(
+        self,
+        doi: str,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        """
+        Write an exported record, by default with write(). Sinks that need the DOI
+        of the record override this method.
+
+        Args:
+            doi: DOI of the record.
+            body: Content of the record, already compressed if compression is set.
+            key: Key (or relative path) of the record.
+            compression: Optional compression format of the body.
+            content_type: Optional content type of the record.
+        """
+        self.write(body, key, compression, content_type)
+
+    def stored_key(self, key: str, compression: Compression | None = None) -> str:
+        """Return the key an object written with write() is stored under."""
+        return key
+
+    @property
+    def finish_lock(self) -> threading.Lock:
+        """
+        Lock held while the DOI index and manifest of an export are read, merged
+        and written, so that concurrent exports to the sink (for example jobs of
+        the serve command) do not lose each other's entries.
+        """
+        # dict.setdefault() is atomic, concurrent callers get the same lock
+        return self.__dict__.setdefault("_finish_lock", threading.Lock())
+
+    def read(self, key: str) -> bytes | None:
+        """
+        Return the content of an object, or None if it does not exist. Sinks that
+        cannot be read return None, so that the DOI index and manifest are written
+        without merging existing entries.
+        """
+        return None
+
+    def list(self, prefix: str | None = None) -> dict[str, ListedObject]:
+        """Return the objects at the destination by key, used to plan exports."""
+        raise CustomClickException(
+            f"Export destination '{self.name}' does not support listing objects"
+        )
+
+    def list_prefixes(self, prefix: str | None = None) -> Sequence[str]:
+        """
+        Return the sorted names of the "directories" directly under the prefix,
+        used to find the snapshots of snapshot exports.
+        """
+        raise CustomClickException(
+            f"Export destination '{self.name}' does not support listing prefixes"
+        )
+
+    def copy(self, source_key: str, key: str) -> bool:
+        """
+        Copy a stored object to another stored key without sending its content
+        again, used to carry unchanged records over to a new snapshot. Return False
+        if the destination cannot copy objects, the record is then written instead.
+
+        Args:
+            source_key: Stored key of the existing object, see stored_key().
+            key: Stored key of the copy.
+        """
+        return False
+
+    def delete(self, keys: Sequence[str]) -> None:
+        """Delete stored objects, used to prune old snapshots."""
+        raise CustomClickException(
+            f"Export destination '{self.name}' does not support deleting objects"
+        )
+
+    def probe(self) -> bool:
+        """Return True if the destination is reachable, used by the circuit breaker."""
+        return True
+
+    def preflight(self, key_prefix: str | None = None, write: bool = True) -> None:
+        """
+        Check that records can be written to the destination before the harvest
+        starts, raise CustomClickException with the reason if they cannot.
+
+        Args:
+            key_prefix: Optional key prefix the records are written under.
+            write: If True a test object may be written and deleted, False for
+                   export plans that must not write anything.
+        """
+
+    def flush(self) -> None:
+        """Persist records that were written, called at the end of each export."""
+
+    def close(self) -> None:
+        """Release resources held by the sink."""
+
+
+class S3Sink(Sink):
+    """
+    Write records as objects to an S3 bucket.
+
+    The boto3 client is reused for every export the sink is used for.
+    """
+
+    name = "S3"
+
+    def __init__(
+        self,
+        client: boto3.Session.client,
+        bucket: str,
+        file_logs=False,
+        rate_limits: RateLimits | None = None,
+    ):
+        """
+        Args:
+            client: boto3.Session.client, for example returned by create_s3_client()
+            bucket: name of bucket that objects are written in
+            file_logs: If True enables logging info messages and errors to a file log.
+            rate_limits: Optional upload and PUT rate limits, shared with the other
+                         S3 sinks of an export.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.file_logs = file_logs
+        self.rate_limits = rate_limits or RateLimits()
+
+    def write(
+        self,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        if self.rate_limits.put:
+            self.rate_limits.put.consume()
+        if self.rate_limits.upload:
+            self.rate_limits.upload.consume(len(body))
+        s3_client_put_object(
+            client=self.client,
+            body=body,
+            bucket=self.bucket,
+            key=key,
+            file_logs=self.file_logs,
+            compression=compression,
+            content_type=content_type,
+        )
+
+    def read(self, key: str) -> bytes | None:
+        return s3_client_get_object(self.client, self.bucket, key, self.file_logs)
+
+    def list(self, prefix: str | None = None) -> dict[str, ListedObject]:
+        return list_s3_objects(self.client, self.bucket, prefix, self.file_logs)
+
+    def list_prefixes(self, prefix: str | None = None) -> Sequence[str]:
+        return list_s3_prefixes(self.client, self.bucket, prefix, self.file_logs)
+
+    def copy(self, source_key: str, key: str) -> bool:
+        # Server-side copy, the object data does not pass through this host but
+        # the request counts as a PUT request
+        if self.rate_limits.put:
+            self.rate_limits.put.consume()
+        s3_client_copy_object(self.client, self.bucket, source_key, key, self.file_logs)
+        return True
+
+    def delete(self, keys: Sequence[str]) -> None:
+        s3_client_delete_objects(self.client, self.bucket, keys, self.file_logs)
+
+    def probe(self) -> bool:
+        return s3_client_head_bucket(self.client, self.bucket)
+
+    def preflight(self, key_prefix: str | None = None, write: bool = True) -> None:
+        key = None
+        if write:
+            key = (
+                f"{key_prefix.rstrip('/')}/{PREFLIGHT_KEY_NAME}"
+                if key_prefix
+                else PREFLIGHT_KEY_NAME
+            )
+        s3_client_check_bucket(self.client, self.bucket, key, self.file_logs)
+
+
+class LocalSink(Sink):
+    """
+    Write records as files to a local directory.
+
+    Files are written atomically, directory syncs are batched and completed by
+    flush(). The data of each file is only synced if fsync is True.
+    """
+
+    name = "local"
+
+    def __init__(
+        self, directory_path: str, file_logs: bool = False, fsync: bool = False
+    ):
+        """
+        Args:
+            directory_path: path to directory that files are written in
+            file_logs: If True enables logging info messages and errors to a file log.
+            fsync: If True each file is synced before it is renamed into place.
+        """
+        self.directory_path = directory_path
+        self.file_logs = file_logs
+        self.fsync = fsync
+        self.syncer = DirectorySyncer()
+
+    def write(
+        self,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        write_local_file(
+            content_bytes=body,
+            filename=key,
+            directory_path=self.directory_path,
+            file_logs=self.file_logs,
+            compression=compression,
+            syncer=self.syncer,
+            fsync=self.fsync,
+        )
+
+    def stored_key(self, key: str, compression: Compression | None = None) -> str:
+        # Compressed files are written with the extension of the compression format
+        return key + COMPRESSION_EXTENSIONS[compression] if compression else key
+
+    def read(self, key: str) -> bytes | None:
+        file_path = Path(self.directory_path) / key
+        try:
+            return file_path.read_bytes() if file_path.exists() else None
+        except OSError as io_err:
+            raise CustomClickException(f"IOError: {io_err}", self.file_logs)
+
+    def list(self, prefix: str | None = None) -> dict[str, ListedObject]:
+        return list_local_files(self.directory_path, self.file_logs, prefix)
+
+    def list_prefixes(self, prefix: str | None = None) -> Sequence[str]:
+        directory = Path(self.directory_path) / (prefix or "")
+        if not directory.is_dir():
+            return []
+        return sorted(path.name for path in directory.iterdir() if path.is_dir())
+
+    def copy(self, source_key: str, key: str) -> bool:
+        # Unchanged files are hard linked instead of written again
+        link_local_file(
+            source_key, key, self.directory_path, self.file_logs, self.syncer
+        )
+        return True
+
+    def delete(self, keys: Sequence[str]) -> None:
+        root = Path(self.directory_path).resolve()
+        directories = set()
+        try:
+            for key in keys:
+                file_path = root / key
+                file_path.unlink(missing_ok=True)
+                directories.update(file_path.parents)
+            # Remove directories that are empty now, deepest first
+            for directory in sorted(directories, key=lambda d: -len(d.parts)):
+                if root in directory.parents and _is_empty_directory(directory):
+                    os.rmdir(directory)
+        except OSError as io_err:
+            raise CustomClickException(f"IOError: {io_err}", self.file_logs)
+
+    def preflight(self, key_prefix: str | None = None, write: bool = True) -> None:
+        directory = Path(self.directory_path)
+        if not directory.is_dir():
+            raise CustomClickException(
+                f"Directory '{self.directory_path}' does not exist", self.file_logs
+            )
+        if write:
+            try:
+                with tempfile.TemporaryFile(dir=directory, prefix=PREFLIGHT_KEY_NAME):
+                    pass
+            except OSError as io_err:
+                raise CustomClickException(
+                    f"Cannot write to directory '{self.directory_path}': {io_err}",
+                    self.file_logs,
+                )
+
+    def flush(self) -> None:
+        self.syncer.flush()
+
+
+StdoutFormat = Literal["ndjson", "tar"]
+
+
+class StdoutSink(Sink):
+    """
+    Write records to stdout, for example to pipe the export into another tool.
+
+    With the "ndjson" format each record is a JSON line with its DOI, key and XML,
+    with the "tar" format each record is a member of a tar stream named after its
+    key (the DOI index and manifest are members too), close() ends the stream.
+
+    Records are collected in a buffer that is written to stdout once it holds
+    buffer_size bytes, stdout is only flushed by flush() at the end of each export.
+    If stdout is closed (for example by "| head") the records that were buffered
+    are lost and all further records fail.
+    """
+
+    name = "stdout"
+
+    def __init__(
+        self,
+        stdout_format: StdoutFormat = "ndjson",
+        stream: BinaryIO | None = None,
+        file_logs: bool = False,
+        buffer_size: int = STDOUT_BUFFER_SIZE,
+    ):
+        """
+        Args:
+            stdout_format: "ndjson" or "tar"
+            stream: Binary stream the records are written to, defaults to stdout.
+            file_logs: If True enables logging info messages and errors to a file log.
+            buffer_size: Size in bytes of the buffer written to the stream at once.
+        """
+        self.stdout_format = stdout_format
+        self.stream = stream or sys.stdout.buffer
+        self.file_logs = file_logs
+        self.buffer_size = buffer_size
+        self.mtime = int(time.time())
+        self.written = 0
+        self.closed = False
+        self.error: str | None = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def write(
+        self,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        if self.stdout_format == "ndjson":
+            raise CustomClickException(
+                f"Export destination 'stdout' with 'ndjson' format only supports "
+                f"records, cannot write '{key}'",
+                self.file_logs,
+            )
+        self._append_tar_member(self.stored_key(key, compression), body)
+
+    def write_record(
+        self,
+        doi: str,
+        body: bytes,
+        key: str,
+        compression: Compression | None = None,
+        content_type: str | None = None,
+    ) -> None:
+        if self.stdout_format == "tar":
+            self._append_tar_member(self.stored_key(key, compression), body)
+            return
+        try:
+            line = json.dumps(
+                {"doi": doi, "key": key, "xml": body.decode()}, ensure_ascii=False
+            )
+        except UnicodeDecodeError as err:
+            raise CustomClickException(
+                f"Failed to write DOI '{doi}' as NDJSON, XML is not UTF-8: {err}",
+                self.file_logs,
+            )
+        self._append(line.encode() + b"\n")
+
+    def stored_key(self, key: str, compression: Compression | None = None) -> str:
+        # Compressed tar members are named with the extension of the compression
+        return key + COMPRESSION_EXTENSIONS[compression] if compression else key
+
+    def _append_tar_member(self, name: str, body: bytes) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(body)
+        info.mtime = self.mtime
+        info.mode = 0o644
+        padding = -len(body) % tarfile.BLOCKSIZE
+        self._append(info.tobuf(tarfile.PAX_FORMAT), body, tarfile.NUL * padding)
+
+    def _append(self, *chunks: bytes) -> None:
+        with self._lock:
+            if self.closed or self.error:
+                raise CustomClickException(
+                    self.error or "Export destination 'stdout' is closed",
+                    self.file_logs,
+                )
+            for chunk in chunks:
+                self._buffer += chunk
+            if len(self._buffer) >= self.buffer_size:
+                self._drain()
+
+    def _drain(self, flush: bool = False) -> None:
+        """
+        Write the buffer to the stream, called with the lock held. A failed write
+        (for example a closed pipe) fails all further writes.
+        """
+        try:
+            self.stream.write(self._buffer)
+            # Only bytes that were written count towards the tar record padding
+            self.written += len(self._buffer)
+            if flush:
+                self.stream.flush()
+        except OSError as io_err:
+            self.error = f"IOError: Failed to write to stdout: {io_err}"
+            raise CustomClickException(self.error, self.file_logs)
+        finally:
+            self._buffer.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self.error:
+                self._drain(flush=True)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.stdout_format == "tar" and not self.error:
+            # End-of-archive marker, two zero blocks padded to a full tar record
+            size = self.written + len(self._buffer) + 2 * tarfile.BLOCKSIZE
+            padding = -size % tarfile.RECORDSIZE
+            self._append(tarfile.NUL * (2 * tarfile.BLOCKSIZE + padding))
+        self.flush()
+        self.closed = True
+
+
+def _is_empty_directory(directory: Path) -> bool:
+    return directory.is_dir() and not any(directory.iterdir())
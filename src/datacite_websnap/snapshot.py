@@ -0,0 +1,241 @@
+"""
+Dated snapshots of an export: each snapshot export writes the records under a
+prefix with the date of the export, for example "ethz.wsl/2025-01-02/".
+
+Records that did not change since the previous snapshot are copied from it with
+Sink.copy() (a server-side CopyObject request for S3) instead of being uploaded
+again. A pointer object ("latest.json") next to the snapshots names the latest
+complete snapshot, and snapshots beyond the retention are pruned with batched
+deletes.
+
+Example pointer object:
+    {"snapshot": "2025-01-02", "prefix": "ethz.wsl/2025-01-02/",
+     "generated": "2025-01-02T03:00:00+00:00", "records": 1234}
+"""
+
+import json
+from datetime import datetime, timezone
+
+from .config import SNAPSHOT_DATE_FORMAT, SNAPSHOT_LATEST_NAME
+from .logger import CustomClickException, CustomEcho
+from .plan import ListedObject
+from .sinks import Sink
+
+
+def validate_snapshot(snapshot: str, file_logs: bool = False) -> str:
+    """
+    Return the snapshot date if it has the snapshot date format, else raise
+    CustomClickException.
+
+    Args:
+        snapshot: Date of the snapshot, for example "2025-01-02"
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    if not _is_snapshot(snapshot):
+        raise CustomClickException(
+            f"Invalid snapshot date '{snapshot}', expected format "
+            f"'{SNAPSHOT_DATE_FORMAT}'",
+            file_logs,
+        )
+    return snapshot
+
+
+def format_snapshot_prefix(key_prefix: str | None, snapshot: str) -> str:
+    """
+    Return the key prefix of the records of a snapshot.
+
+    Example input: "ethz.wsl", "2025-01-02"
+    Example output: "ethz.wsl/2025-01-02"
+
+    Args:
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        snapshot: Date of the snapshot.
+    """
+    return f"{key_prefix.rstrip('/')}/{snapshot}" if key_prefix else snapshot
+
+
+def format_latest_key(key_prefix: str | None = None) -> str:
+    """
+    Return the key (or local file name) of the pointer to the latest snapshot.
+
+    Args:
+        key_prefix: Optional key prefix for objects in S3 bucket.
+    """
+    if not key_prefix:
+        return SNAPSHOT_LATEST_NAME
+    return f"{key_prefix.rstrip('/')}/{SNAPSHOT_LATEST_NAME}"
+
+
+def read_latest_snapshot(
+    sink: Sink, key_prefix: str | None = None, file_logs: bool = False
+) -> str | None:
+    """
+    Return the date of the latest complete snapshot, or None if there is no
+    pointer to a snapshot yet.
+
+    Args:
+        sink: Sink of the export destination.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    latest = sink.read(format_latest_key(key_prefix))
+    if latest is None:
+        return None
+    try:
+        snapshot = json.loads(latest)["snapshot"]
+    except (ValueError, KeyError, TypeError) as err:
+        raise CustomClickException(
+            f"Invalid latest snapshot pointer: {err!r}", file_logs
+        )
+    return validate_snapshot(snapshot, file_logs)
+
+
+def write_latest_snapshot(
+    sink: Sink,
+    snapshot: str,
+    records: int,
+    key_prefix: str | None = None,
+    file_logs: bool = False,
+) -> None:
+    """
+    Point the latest snapshot pointer to a complete snapshot.
+
+    Args:
+        sink: Sink of the export destination.
+        snapshot: Date of the snapshot.
+        records: Number of records in the snapshot.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    pointer = {
+        "snapshot": snapshot,
+        "prefix": f"{format_snapshot_prefix(key_prefix, snapshot)}/",
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "records": records,
+    }
+    latest_key = format_latest_key(key_prefix)
+    sink.write(
+        json.dumps(pointer).encode("utf-8"),
+        latest_key,
+        content_type="application/json",
+    )
+    CustomEcho(
+        f"Updated latest snapshot pointer to {snapshot}: {latest_key}", file_logs
+    )
+
+
+def prune_snapshots(
+    sink: Sink,
+    retention: int,
+    key_prefix: str | None = None,
+    keep: str | None = None,
+    file_logs: bool = False,
+) -> list[str]:
+    """
+    Delete the objects of all but the newest "retention" snapshots and return the
+    dates of the deleted snapshots. Prefixes that are not snapshot dates are never
+    deleted.
+
+    Args:
+        sink: Sink of the export destination.
+        retention: Number of snapshots to keep.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        keep: Optional date of a snapshot that is kept in any case, for example
+              the snapshot that was just exported.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    snapshots = [name for name in sink.list_prefixes(key_prefix) if _is_snapshot(name)]
+    pruned = [name for name in snapshots[:-retention] if name != keep]
+
+    for snapshot in pruned:
+        keys = sorted(sink.list(format_snapshot_prefix(key_prefix, snapshot)))
+        sink.delete(keys)
+        CustomEcho(f"Pruned snapshot {snapshot} with {len(keys)} object(s)", file_logs)
+    return pruned
+
+
+class SnapshotBase:
+    """
+    Previous snapshot that the unchanged records of a new snapshot are copied from.
+
+    Objects are matched by their key relative to the snapshot prefix and by
+    content: the MD5 of the record must equal the ETag (S3) or the file content
+    (local) of the object in the previous snapshot.
+    """
+
+    def __init__(
+        self, snapshot_prefix: str, base_prefix: str, listing: dict[str, ListedObject]
+    ):
+        """
+        Args:
+            snapshot_prefix: Key prefix of the new snapshot.
+            base_prefix: Key prefix of the previous snapshot.
+            listing: Objects of the previous snapshot by stored key.
+        """
+        self.snapshot_prefix = f"{snapshot_prefix}/"
+        self.base_prefix = f"{base_prefix}/"
+        self.listing = listing
+
+    def source_key(
+        self, stored_key: str, body: bytes, md5: str | None = None
+    ) -> str | None:
+        """
+        Return the stored key of the unchanged object in the previous snapshot, or
+        None if the record is new or changed.
+
+        Args:
+            stored_key: Stored key of the record in the new snapshot.
+            body: Content of the record.
+            md5: Optional MD5 hex digest of body, computed if not given.
+        """
+        if not stored_key.startswith(self.snapshot_prefix):
+            return None
+        source_key = self.base_prefix + stored_key[len(self.snapshot_prefix) :]
+        listed = self.listing.get(source_key)
+        if listed is None or not listed.matches(body, md5):
+            return None
+        return source_key
+
+
+def load_snapshot_base(
+    sink: Sink,
+    snapshot: str,
+    key_prefix: str | None = None,
+    file_logs: bool = False,
+) -> SnapshotBase | None:
+    """
+    Return the latest complete snapshot as base of a new snapshot, or None if
+    there is no previous snapshot.
+
+    The previous snapshot is listed once (up to 1000 objects per S3 request) so
+    that unchanged records are found without requests per record.
+
+    Args:
+        sink: Sink of the export destination.
+        snapshot: Date of the new snapshot.
+        key_prefix: Optional key prefix for objects in S3 bucket.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    previous = read_latest_snapshot(sink, key_prefix, file_logs)
+    if previous is None:
+        return None
+
+    base_prefix = format_snapshot_prefix(key_prefix, previous)
+    listing = sink.list(base_prefix)
+    CustomEcho(
+        f"Snapshot {snapshot} is based on snapshot {previous} with "
+        f"{len(listing)} object(s)",
+        file_logs,
+    )
+    return SnapshotBase(
+        format_snapshot_prefix(key_prefix, snapshot), base_prefix, listing
+    )
+
+
+def _is_snapshot(name: str) -> bool:
+    """Return True if the name is a snapshot date."""
+    try:
+        datetime.strptime(name, SNAPSHOT_DATE_FORMAT)
+    except (ValueError, TypeError):
+        return False
+    return True
@@ -0,0 +1,329 @@
+"""
+Local SQLite database with the export state of each record.
+
+For each destination and DOI the database records the key, MD5 hash, size and
+DataCite "updated" timestamp of the last export, when the record was last exported
+and the error of the last failure. Each export is a run with its start, end and
+counts, so that questions such as "which records failed in the last run" or "which
+records were not updated in 30 days" are answered from the database instead of
+listing the destination or parsing logs.
+
+Updates are buffered and written in batches, one transaction per batch, so that
+the database does not slow down the export. The database uses write-ahead logging,
+so that it can be queried (for example by the status command) while an export
+writes to it.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Callable
+
+from .config import STATE_DB_BATCH_SIZE, STATE_DB_TIMEOUT, STATE_STATUS_LIMIT
+from .logger import CustomClickException
+
+# Format of the timestamps written to the database, the same format as the DataCite
+# "updated" timestamps so that they compare as strings
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    exported INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    destination TEXT NOT NULL,
+    doi TEXT NOT NULL,
+    key TEXT,
+    md5 TEXT,
+    size INTEGER,
+    updated TEXT,
+    exported_at TEXT,
+    failed_at TEXT,
+    error TEXT,
+    run_id INTEGER,
+    PRIMARY KEY (destination, doi)
+);
+CREATE INDEX IF NOT EXISTS records_run_id ON records (run_id);
+CREATE INDEX IF NOT EXISTS records_updated ON records (updated);
+CREATE INDEX IF NOT EXISTS records_exported_at ON records (exported_at);
+"""
+
+# Upserts of an exported record (clears the error of a previous failure) and of a
+# failed record (keeps the key, hash and time of the last successful export)
+_UPSERTS = {
+    "exported": """
+        INSERT INTO records
+            (destination, doi, key, md5, size, updated, exported_at, error, run_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)
+        ON CONFLICT (destination, doi) DO UPDATE SET
+            key = excluded.key,
+            md5 = excluded.md5,
+            size = excluded.size,
+            updated = COALESCE(excluded.updated, records.updated),
+            exported_at = excluded.exported_at,
+            error = NULL,
+            run_id = excluded.run_id
+    """,
+    "failed": """
+        INSERT INTO records (destination, doi, updated, failed_at, error, run_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (destination, doi) DO UPDATE SET
+            updated = COALESCE(excluded.updated, records.updated),
+            failed_at = excluded.failed_at,
+            error = excluded.error,
+            run_id = excluded.run_id
+    """,
+}
+
+
+def format_state_timestamp(seconds: float) -> str:
+    """Return a UTC timestamp in the format of the state database."""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+class StateStore:
+    """
+    Export state database, a context manager that closes the database.
+
+    Record updates of a run are not thread-safe, each export updates the records
+    from the thread that collects its results. Concurrent exports (for example the
+    jobs of the serve command) each open their own StateStore.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = STATE_DB_BATCH_SIZE,
+        file_logs: bool = False,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: Path of the SQLite database file, created if it does not exist.
+            batch_size: Number of record updates written in one transaction.
+            file_logs: If True enables logging info messages and errors to a file log.
+            clock: Clock in seconds since the epoch, used for the timestamps.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.file_logs = file_logs
+        self.clock = clock
+        self.run_id: int | None = None
+        self._pending: list[tuple[str, tuple]] = []
+        try:
+            self._conn = sqlite3.connect(
+                path, timeout=STATE_DB_TIMEOUT, check_same_thread=False
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as err:
+            raise CustomClickException(
+                f"SQLite error: Failed to open state database '{path}': {err}",
+                file_logs,
+            )
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Write pending updates and close the database."""
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def _now(self) -> str:
+        return format_state_timestamp(self.clock())
+
+    def _execute(self, message: str, fn: Callable[[], Any]) -> Any:
+        """Run fn in a transaction, raise CustomClickException for SQLite errors."""
+        try:
+            with self._conn:
+                return fn()
+        except sqlite3.Error as err:
+            raise CustomClickException(
+                f"SQLite error: Failed to {message} state database '{self.path}': "
+                f"{err}",
+                self.file_logs,
+            )
+
+    def start_run(self) -> int:
+        """Record the start of a run and return its ID."""
+        cursor = self._execute(
+            "write",
+            lambda: self._conn.execute(
+                "INSERT INTO runs (started_at, status) VALUES (?, 'running')",
+                (self._now(),),
+            ),
+        )
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def finish_run(self, exported: int, failed: int, error: str | None = None) -> None:
+        """
+        Write pending updates and record the end of the run.
+
+        Args:
+            exported: Number of records exported, summed over the destinations.
+            failed: Number of records that failed, summed over the destinations.
+            error: Error message if the run could not be completed.
+        """
+        self.flush()
+        if error:
+            status = "failed"
+        else:
+            status = "completed_with_errors" if failed else "completed"
+        self._execute(
+            "write",
+            lambda: self._conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, exported = ?, "
+                "failed = ?, error = ? WHERE id = ?",
+                (self._now(), status, exported, failed, error, self.run_id),
+            ),
+        )
+
+    def exported(
+        self,
+        destination: str,
+        doi: str,
+        key: str,
+        md5: str,
+        size: int,
+        updated: str | None = None,
+    ) -> None:
+        """
+        Record that a record was exported.
+
+        Args:
+            destination: Name of the destination.
+            doi: DOI of the record.
+            key: Stored key (or local path) of the record.
+            md5: MD5 hex digest of the exported content.
+            size: Size of the exported content in bytes.
+            updated: Optional DataCite "updated" timestamp of the record.
+        """
+        self._add(
+            "exported",
+            (destination, doi, key, md5, size, updated, self._now(), self.run_id),
+        )
+
+    def failed(
+        self, destination: str, doi: str, error: str, updated: str | None = None
+    ) -> None:
+        """
+        Record that a record failed to export.
+
+        Args:
+            destination: Name of the destination.
+            doi: DOI of the record.
+            error: Error message of the failure.
+            updated: Optional DataCite "updated" timestamp of the record.
+        """
+        self._add(
+            "failed", (destination, doi, updated, self._now(), error, self.run_id)
+        )
+
+    def _add(self, kind: str, params: tuple) -> None:
+        self._pending.append((kind, params))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending record updates in one transaction, in their order."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        def write() -> None:
+            for kind, updates in groupby(pending, key=lambda update: update[0]):
+                self._conn.executemany(
+                    _UPSERTS[kind], (params for _, params in updates)
+                )
+
+        self._execute("write", write)
+
+    def last_run(self) -> dict | None:
+        """Return the most recent run, or None if there is no run."""
+        row = self._execute(
+            "read",
+            lambda: self._conn.execute(
+                "SELECT * FROM runs ORDER BY id DESC LIMIT 1"
+            ).fetchone(),
+        )
+        return dict(row) if row else None
+
+    def summary(self) -> list[dict]:
+        """
+        Return the number of records, of failed records and the time of the last
+        export of each destination.
+        """
+        rows = self._execute(
+            "read",
+            lambda: self._conn.execute(
+                "SELECT destination, COUNT(*) AS records, "
+                "COUNT(error) AS failed, MAX(exported_at) AS last_exported_at "
+                "FROM records GROUP BY destination ORDER BY destination"
+            ).fetchall(),
+        )
+        return [dict(row) for row in rows]
+
+    def records(
+        self,
+        destination: str | None = None,
+        failed_last_run: bool = False,
+        not_updated_days: int | None = None,
+        not_exported_days: int | None = None,
+        limit: int = STATE_STATUS_LIMIT,
+    ) -> list[dict]:
+        """
+        Return the records matching all the given conditions, ordered by DOI.
+
+        Args:
+            destination: Optional name of the destination.
+            failed_last_run: If True only records that failed in the last run.
+            not_updated_days: Optional number of days, only records whose DataCite
+                              "updated" timestamp is older.
+            not_exported_days: Optional number of days, only records that were not
+                               exported successfully since.
+            limit: Maximum number of records returned.
+        """
+        conditions, params = [], []
+        if destination:
+            conditions.append("destination = ?")
+            params.append(destination)
+        if failed_last_run:
+            conditions.append(
+                "error IS NOT NULL AND run_id = (SELECT MAX(id) FROM runs)"
+            )
+        if not_updated_days is not None:
+            conditions.append("updated < ?")
+            params.append(self._days_ago(not_updated_days))
+        if not_exported_days is not None:
+            conditions.append("(exported_at IS NULL OR exported_at < ?)")
+            params.append(self._days_ago(not_exported_days))
+
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._execute(
+            "read",
+            lambda: self._conn.execute(
+                f"SELECT * FROM records {where}ORDER BY doi, destination LIMIT ?",
+                (*params, limit),
+            ).fetchall(),
+        )
+        return [dict(row) for row in rows]
+
+    def _days_ago(self, days: int) -> str:
+        return format_state_timestamp(self.clock() - days * 86400)
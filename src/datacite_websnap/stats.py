@@ -0,0 +1,97 @@
+"""
+Statistics collected while exporting DataCite XML metadata records.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ExportStats:
+    """
+    Counts of DataCite XML records processed during an export.
+
+    Attributes:
+        total: Number of records returned by the DataCite search query.
+        exported: Number of records successfully exported.
+        failed: Number of records that failed to export.
+        retried: Number of exported records that only succeeded after retrying.
+        copied: Number of exported records that were unchanged and copied from
+                the previous snapshot instead of written.
+        xml_bytes: Size in bytes of the decoded XML of the exported records.
+        stored_bytes: Size in bytes of the exported (optionally compressed) records.
+        compression: Compression format of the exported records, if compressed.
+        concurrency_timeline: Seconds since the start and concurrency limit of each
+                              change of the adaptive concurrency, if enabled.
+    """
+
+    total: int = 0
+    exported: int = 0
+    failed: int = 0
+    retried: int = 0
+    copied: int = 0
+    xml_bytes: int = 0
+    stored_bytes: int = 0
+    compression: str | None = None
+    concurrency_timeline: list[tuple[float, int]] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> int:
+        """Number of records that have not been processed yet."""
+        return max(self.total - self.exported - self.failed, 0)
+
+    @property
+    def compression_ratio(self) -> float | None:
+        """Ratio of decoded XML size to exported size, None if not compressed."""
+        if not self.compression or not self.stored_bytes:
+            return None
+        return self.xml_bytes / self.stored_bytes
+
+    def summary(self) -> str:
+        """Return a one line human-readable summary of the export."""
+        summary = (
+            f"{self.exported}/{self.total} records exported, "
+            f"{self.failed} failed, {self.remaining} not attempted"
+        )
+        if self.retried:
+            summary += f", {self.retried} exported after retrying"
+        if self.copied:
+            summary += f", {self.copied} unchanged copied from previous snapshot"
+        if (ratio := self.compression_ratio) is not None:
+            summary += (
+                f", {self.compression} compression ratio {ratio:.1f}x "
+                f"({format_bytes(self.xml_bytes)} to "
+                f"{format_bytes(self.stored_bytes)})"
+            )
+        if self.concurrency_timeline:
+            summary += f", {_format_timeline(self.concurrency_timeline)}"
+        return summary
+
+
+def _format_timeline(timeline: list[tuple[float, int]], max_points: int = 8) -> str:
+    """
+    Return the adaptive concurrency timeline formatted as "limit@seconds" points,
+    evenly sampled down to max_points, for example
+    "adaptive concurrency 2@0.0s 4@1.2s 2@3.5s 5@9.8s (peak 5, 1 decrease)".
+    """
+    indices = range(len(timeline))
+    if len(timeline) > max_points:
+        step = (len(timeline) - 1) / (max_points - 1)
+        indices = sorted({round(i * step) for i in range(max_points)})
+    points = " ".join(f"{timeline[i][1]}@{timeline[i][0]:.1f}s" for i in indices)
+    decreases = sum(
+        1 for (_, before), (_, after) in zip(timeline, timeline[1:]) if after < before
+    )
+    peak = max(limit for _, limit in timeline)
+    return (
+        f"adaptive concurrency {points} (peak {peak}, {decreases} "
+        f"decrease{'' if decreases == 1 else 's'})"
+    )
+
+
+def format_bytes(size: int) -> str:
+    """Return size in bytes formatted with a binary unit, for example "1.5 MiB"."""
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
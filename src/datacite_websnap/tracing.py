@@ -0,0 +1,189 @@
+"""
+Optional tracing of the export stages in the Chrome Trace Event format.
+
+Spans of DataCite API requests, record decodes and sink writes are collected in
+memory while tracing is enabled and written to a JSON file that can be loaded in
+trace viewers offline, for example Perfetto (https://ui.perfetto.dev) or
+chrome://tracing. While tracing is disabled span() returns a shared no-op span.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from .logger import CustomClickException, CustomEcho
+
+# Tracer that spans are recorded with, None while tracing is disabled
+_tracer: "Tracer | None" = None
+
+
+class Span:
+    """
+    Span of a traced operation, a context manager that records the span as a
+    complete event ("ph": "X") of the tracer when it exits.
+    """
+
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = self.tracer.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        end = self.tracer.clock()
+        if exc_type is not None:
+            self.args["error"] = str(getattr(exc_value, "message", exc_value))
+        self.tracer.record(self, end)
+
+    def set(self, **args: Any) -> None:
+        """Add attributes to the span, for example the status code of a response."""
+        self.args.update(args)
+
+
+class _NoopSpan:
+    """Span returned while tracing is disabled, it records nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collect the spans of all threads as Chrome Trace Event objects."""
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Args:
+            clock: Monotonic clock in seconds, the timestamps of the events are
+                   microseconds since the tracer was created.
+        """
+        self.clock = clock
+        self.origin = clock()
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        self.thread_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, category: str, **args: Any) -> Span:
+        """Return a span with the name, category and attributes."""
+        return Span(self, name, category, args)
+
+    def record(self, span: Span, end: float) -> None:
+        """Record a span that ended at the clock time end."""
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round((span.start - self.origin) * 1e6, 3),
+            "dur": round((end - span.start) * 1e6, 3),
+            "pid": self.pid,
+            "tid": thread.ident,
+            "args": span.args,
+        }
+        with self._lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def to_dict(self) -> dict:
+        """Return the trace as a Chrome Trace Event JSON object."""
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in thread_names.items()
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, file_path: str, file_logs: bool = False) -> None:
+        """
+        Write the trace to a JSON file.
+
+        Args:
+            file_path: Path of the trace file, overwritten if it already exists.
+            file_logs: If True enables logging info messages and errors to a file log.
+        """
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, default=str)
+        except OSError as io_err:
+            raise CustomClickException(
+                f"IOError: Failed to write trace file: {io_err}", file_logs
+            )
+
+
+def span(name: str, category: str = "export", **args: Any) -> Span | _NoopSpan:
+    """
+    Return a span of the enabled tracer, or the shared no-op span while tracing is
+    disabled.
+
+    Example:
+        with span("get_url_json", "datacite", url=url) as trace:
+            response = session.get(url)
+            trace.set(status_code=response.status_code)
+
+    Args:
+        name: Name of the span, for example the traced function.
+        category: Category of the span, for example "datacite" or "sink".
+        args: Attributes of the span, for example the DOI or the number of bytes.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.span(name, category, **args)
+
+
+@contextmanager
+def tracing(file_path: str | None, file_logs: bool = False) -> Iterator[None]:
+    """
+    Context manager that records spans while it is active and writes them to a
+    trace file when it exits, also if the traced code raised. Does nothing if
+    file_path is None.
+
+    Args:
+        file_path: Optional path of the Chrome Trace Event JSON file.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    global _tracer
+    if file_path is None:
+        yield
+        return
+
+    tracer = _tracer = Tracer()
+    try:
+        yield
+    finally:
+        _tracer = None
+        tracer.write(file_path, file_logs)
+        CustomEcho(
+            f"Wrote {len(tracer.events)} trace span(s) to file: '{file_path}'",
+            file_logs,
+        )
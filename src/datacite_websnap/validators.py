@@ -1,9 +1,27 @@
 """Validators for datacite-websnap."""
 
 import os
+import re
 import click
-from pydantic import BaseModel, AnyHttpUrl, ValidationError
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Literal
+from pydantic import (
+    BaseModel,
+    AnyHttpUrl,
+    PositiveFloat,
+    PositiveInt,
+    ValidationError,
+)
 
+from .config import (
+    S3_CONNECT_TIMEOUT,
+    S3_READ_TIMEOUT,
+    S3_RETRY_MODE,
+    S3_MAX_ATTEMPTS,
+    S3_POOL_SIZE_MIN,
+    S3_POOL_HEADROOM,
+)
 from .logger import CustomBadParameter, CustomClickException
 
 
@@ -22,15 +40,78 @@ def validate_url(ctx, param, url) -> str:
 
 def validate_positive_int(ctx, param, value) -> int:
     """
-    Validate and return integer.
+    Validate and return integer. Returns None if value is not set.
     Raises BadParameter exception if value is not positive.
     """
-    if value < 0:
+    if value is not None and value < 0:
         raise click.BadParameter(f"{value} must be positive integer")
 
     return value
 
 
+def validate_byte_rate(ctx, param, value) -> float | None:
+    """
+    Validate and return a rate of bytes per second, for example "500K", "10M" or
+    "1.5MiB" (decimal K/M/G or binary KiB/MiB/GiB units, a trailing "B" or "/s" is
+    allowed). Returns None if value is not set.
+    Raises BadParameter exception if value is not a positive size.
+    """
+    if value is None:
+        return None
+
+    match = re.fullmatch(
+        r"\s*(\d+(?:\.\d+)?)\s*(?:([KMG])(i)?)?B?(?:/s)?\s*", value, re.IGNORECASE
+    )
+    if not match:
+        raise click.BadParameter(
+            f"'{value}' is invalid because it must be a number of bytes per second, "
+            f"for example '500K', '10M' or '1.5MiB'"
+        )
+
+    number, unit, binary = match.groups()
+    rate = float(number)
+    if unit:
+        rate *= (1024 if binary else 1000) ** ("KMG".index(unit.upper()) + 1)
+    if rate <= 0:
+        raise click.BadParameter(f"'{value}' must be greater than 0")
+
+    return rate
+
+
+def validate_positive_rate(ctx, param, value) -> float | None:
+    """
+    Validate and return a rate per second. Returns None if value is not set.
+    Raises BadParameter exception if value is not greater than 0.
+    """
+    if value is not None and value <= 0:
+        raise click.BadParameter(f"{value} must be greater than 0")
+
+    return value
+
+
+def validate_timestamp(ctx, param, value) -> str | None:
+    """
+    Validate and return an ISO 8601 date or timestamp as a UTC timestamp, for example
+    "2025-01-01" returns "2025-01-01T00:00:00Z". Timestamps without a time zone are
+    UTC. Returns None if value is not set.
+    Raises BadParameter exception if value is not an ISO 8601 date or timestamp.
+    """
+    if value is None:
+        return None
+
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError as err:
+        raise click.BadParameter(
+            f"'{value}' is invalid because it must be an ISO 8601 date or timestamp, "
+            f"for example '2025-01-01' or '2025-01-01T12:00:00Z'"
+        ) from err
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
 def validate_at_least_one_query_param(
     doi_prefix: tuple[str, ...] | None, client_id: str | None, file_logs: bool = False
 ) -> None:
@@ -42,13 +123,174 @@ def validate_at_least_one_query_param(
     if not doi_prefix and not client_id:
         raise CustomBadParameter(
             "You must provide at least one of the following options: "
-            "'--doi-prefix' or '--client-id'",
+            "'--doi-prefix', '--client-id', '--doi' or '--doi-file'",
             file_logs,
         )
 
     return
 
 
+def validate_years(ctx, param, years) -> tuple[str, ...]:
+    """
+    Validate and return years.
+    Raises BadParameter exception if a year is not a four digit year.
+    """
+    for year in years:
+        if not (len(year) == 4 and year.isdigit()):
+            raise click.BadParameter(
+                f"'{year}' is invalid because it must be a four digit year, "
+                f"for example '2024'"
+            )
+
+    return years
+
+
+def validate_doi_list(
+    dois: tuple[str, ...],
+    doi_prefix: tuple[str, ...] | None,
+    client_id: str | None,
+    record_pages: str | None,
+    file_logs: bool = False,
+) -> tuple[str, ...]:
+    """
+    Validate and return dois.
+    Raises BadParameter exception if dois is truthy and any of the "doi_prefix",
+    "client_id" or "record_pages" (truthy) arguments are also provided.
+    """
+    if dois and (doi_prefix or client_id or record_pages):
+        raise CustomBadParameter(
+            "'--doi', '--doi-file' and '--retry-failed' cannot be combined with the "
+            "'--doi-prefix', '--client-id' or '--record-pages' options",
+            file_logs,
+        )
+
+    return dois
+
+
+def validate_dois(ctx, param, dois) -> tuple[str, ...]:
+    """
+    Validate and return DOIs stripped of surrounding whitespace.
+    Raises BadParameter exception if a DOI does not start with '10.' or does not
+    contain a '/' separating the DOI prefix and suffix.
+    """
+    dois = tuple(doi.strip() for doi in dois)
+    for doi in dois:
+        if not doi.startswith("10.") or "/" not in doi:
+            raise click.BadParameter(
+                f"'{doi}' is invalid because a DOI must start with '10.' and "
+                f"contain a '/', for example '10.16904/envidat.31'"
+            )
+
+    return dois
+
+
+def validate_doi_file(ctx, param, file_path) -> tuple[str, ...]:
+    """
+    Validate and return the DOIs listed in a text file, one DOI per line.
+    Blank lines and lines starting with '#' are ignored.
+    Raises BadParameter exception if the file cannot be read or a DOI is invalid.
+    """
+    if not file_path:
+        return ()
+
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except OSError as io_err:
+        raise click.BadParameter(f"Unable to read DOI file: {io_err}")
+
+    dois = tuple(line for line in lines if line and not line.startswith("#"))
+    return validate_dois(ctx, param, dois)
+
+
+def validate_replay_pages(
+    replay_pages: str | None,
+    doi_prefix: tuple[str, ...] | None,
+    client_id: str | None,
+    dois: tuple[str, ...] | None,
+    record_pages: str | None,
+    filters: dict[str, str] | None = None,
+    file_logs: bool = False,
+) -> str | None:
+    """
+    Validate and return replay_pages.
+    Raises BadParameter exception if replay_pages is truthy and any of the
+    "doi_prefix", "client_id", "dois", "record_pages" or "filters" (truthy)
+    arguments are also provided.
+    """
+    if replay_pages and (doi_prefix or client_id or dois or record_pages or filters):
+        raise CustomBadParameter(
+            "'--replay-pages' cannot be combined with the '--doi-prefix', "
+            "'--client-id', '--doi', '--doi-file', '--retry-failed', "
+            "'--record-pages' or filter options",
+            file_logs,
+        )
+
+    return replay_pages
+
+
+def validate_xml_schema(
+    xml_schema: str | None, validate_xml: str | None, file_logs: bool = False
+) -> str | None:
+    """
+    Validate and return xml_schema.
+    Raises BadParameter exception if xml_schema is truthy and option
+    '--validate-xml' is not 'schema'. Without xml_schema records are validated
+    against the bundled DataCite kernel schema.
+    """
+    if xml_schema and validate_xml != "schema":
+        raise CustomBadParameter(
+            "'--xml-schema' can only be used when the "
+            "'--validate-xml' option is set to 'schema'",
+            file_logs,
+        )
+
+    return xml_schema
+
+
+def validate_snapshot_options(
+    snapshot: bool,
+    snapshot_retention: int,
+    dois: tuple[str, ...] = (),
+    plan: bool = False,
+    file_logs: bool = False,
+) -> None:
+    """
+    Validate the snapshot options.
+    Raises BadParameter exception if '--snapshot-retention' is set without
+    '--snapshot', or if '--snapshot' is combined with specific DOIs or a plan
+    (a snapshot always contains all records of the query).
+    """
+    if snapshot_retention and not snapshot:
+        raise CustomBadParameter(
+            "'--snapshot-retention' can only be used with '--snapshot'", file_logs
+        )
+    if snapshot and (dois or plan):
+        raise CustomBadParameter(
+            "'--snapshot' cannot be combined with specific DOIs ('--doi', "
+            "'--doi-file', '--retry-failed') or '--plan'",
+            file_logs,
+        )
+
+
+def validate_layout(layout, destination, file_logs: bool = False) -> str:
+    """
+    Validate and return layout.
+    Raises BadParameter exception if layout is 'doi-suffix' when option
+    '--destination' is not 'local', because keys that share the start of the DOI
+    suffix concentrate S3 requests on the same key prefix.
+    """
+    if layout == "doi-suffix" and destination != "local":
+        raise CustomBadParameter(
+            "'--layout doi-suffix' can only be used when the "
+            "'--destination' option is set to 'local', use '--layout hash' to "
+            "spread S3 keys across prefixes",
+            file_logs,
+        )
+
+    return layout
+
+
 def validate_bucket(bucket, destination, file_logs: bool = False) -> str | None:
     """
     Validate and return bucket.
@@ -99,26 +341,6 @@ def validate_key_prefix(key_prefix, destination, file_logs: bool = False) -> str
     return key_prefix
 
 
-def validate_single_string_key_value(d: dict, file_logs: bool = False) -> None:
-    """
-    Validate that dictionary has exactly one key-value pair and both are strings.
-    Raises ClickException if validation fails.
-    """
-    if len(d) == 1:
-        key, value = list(d.items())[0]
-        if not isinstance(key, str) or not isinstance(value, str):
-            raise CustomClickException(
-                f"Both key and value must be strings in dictionary: {d}", file_logs
-            )
-    else:
-        raise CustomClickException(
-            f"Dictionary must have only 1 key-value pair, currently has {len(d)} pairs",
-            file_logs,
-        )
-
-    return
-
-
 class S3ConfigModel(BaseModel):
     """
     Class with required S3 config values and their types.
@@ -129,15 +351,20 @@ class S3ConfigModel(BaseModel):
     aws_secret_access_key: str
 
 
-def validate_s3_config(file_logs: bool = False) -> S3ConfigModel:
+def validate_s3_config(file_logs: bool = False, env_prefix: str = "") -> S3ConfigModel:
     """
     Return S3ConfigModel object after validating required environment variables.
+
+    Args:
+        file_logs: If True enables logging info messages and errors to a file log.
+        env_prefix: Optional prefix of the environment variable names, used for named
+                    S3 destinations, for example "MIRROR_" for "MIRROR_ENDPOINT_URL"
     """
     try:
         s3_conf = {
-            "endpoint_url": os.getenv("ENDPOINT_URL"),
-            "aws_access_key_id": os.getenv("AWS_ACCESS_KEY_ID"),
-            "aws_secret_access_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+            "endpoint_url": os.getenv(f"{env_prefix}ENDPOINT_URL"),
+            "aws_access_key_id": os.getenv(f"{env_prefix}AWS_ACCESS_KEY_ID"),
+            "aws_secret_access_key": os.getenv(f"{env_prefix}AWS_SECRET_ACCESS_KEY"),
         }
         return S3ConfigModel(**s3_conf)
     except ValidationError as e:
@@ -147,3 +374,256 @@ def validate_s3_config(file_logs: bool = False) -> S3ConfigModel:
         )
     except Exception as e:
         raise CustomClickException(f"Unexpected error: {e}", file_logs)
+
+
+class S3TransportModel(BaseModel):
+    """
+    Class with the S3 transport profile of an S3 client, see '--s3-transport'.
+
+    Attributes:
+        pool_size: Optional size of the connection pool, by default the pool is
+                   sized to the number of concurrent writes.
+        retry_mode: botocore retry mode, "standard" or "adaptive" (which also rate
+                    limits requests client-side after throttling errors).
+        max_attempts: Maximum number of attempts of each request, including the
+                      first attempt.
+        connect_timeout: Seconds to wait for a connection.
+        read_timeout: Seconds to wait for a response.
+        tcp_keepalive: If True enables TCP keepalive on the connections.
+        path_style: If True uses path-style addressing ("<endpoint>/<bucket>/<key>"),
+                    for example for on-premises endpoints without virtual-hosted
+                    style bucket names.
+    """
+
+    pool_size: PositiveInt | None = None
+    retry_mode: Literal["standard", "adaptive"] = S3_RETRY_MODE
+    max_attempts: PositiveInt = S3_MAX_ATTEMPTS
+    connect_timeout: PositiveFloat = S3_CONNECT_TIMEOUT
+    read_timeout: PositiveFloat = S3_READ_TIMEOUT
+    tcp_keepalive: bool = False
+    path_style: bool = False
+
+    def pool_connections(self, concurrency: int) -> int:
+        """
+        Return the size of the connection pool: pool_size if it is set, else the
+        number of concurrent writes plus connections for listings, probes, copies
+        and the manifest, at least the botocore default of 10.
+
+        Args:
+            concurrency: Maximum number of requests the client sends concurrently.
+        """
+        if self.pool_size:
+            return self.pool_size
+        return max(concurrency + S3_POOL_HEADROOM, S3_POOL_SIZE_MIN)
+
+    def summary(self, concurrency: int) -> str:
+        """Return the resolved settings of the profile, logged at startup."""
+        pool = self.pool_connections(concurrency)
+        return (
+            f"{pool} pooled connection(s)"
+            f"{'' if self.pool_size else f' (sized to {concurrency} worker(s))'}, "
+            f"{self.retry_mode} retries ({self.max_attempts} attempt(s)), "
+            f"connect timeout {self.connect_timeout:g}s, "
+            f"read timeout {self.read_timeout:g}s, "
+            f"TCP keepalive {'on' if self.tcp_keepalive else 'off'}, "
+            f"{'path-style' if self.path_style else 'default'} addressing"
+        )
+
+
+# Settings of an S3 transport profile value and their S3TransportModel fields
+S3_TRANSPORT_SETTINGS = {
+    "pool-size": "pool_size",
+    "retry-mode": "retry_mode",
+    "max-attempts": "max_attempts",
+    "connect-timeout": "connect_timeout",
+    "read-timeout": "read_timeout",
+    "tcp-keepalive": "tcp_keepalive",
+    "path-style": "path_style",
+}
+
+
+def parse_s3_transport(
+    value: str | None, source: str, file_logs: bool = False
+) -> dict[str, str]:
+    """
+    Parse and return the settings of an S3 transport profile value by field name.
+
+    Format: SETTING=VALUE[,SETTING=VALUE...], the flags 'tcp-keepalive' and
+    'path-style' can be given without a value
+    Example value: "pool-size=64,retry-mode=adaptive,tcp-keepalive,path-style"
+
+    Args:
+        value: Profile value, returns an empty dictionary if it is not set.
+        source: Name of the option or environment variable shown in errors.
+        file_logs: If True enables logging info messages and errors to a file log.
+
+    Raises BadParameter exception if a setting is unknown.
+    """
+    settings = {}
+    for setting in (value or "").split(","):
+        if not setting.strip():
+            continue
+        key, separator, setting_value = setting.strip().partition("=")
+        field = S3_TRANSPORT_SETTINGS.get(key.strip())
+        if not field or (
+            not separator and field not in ("tcp_keepalive", "path_style")
+        ):
+            raise CustomBadParameter(
+                f"Invalid setting '{setting}' in {source} value '{value}', expected "
+                f"one of: {', '.join(S3_TRANSPORT_SETTINGS)}, for example "
+                f"'pool-size=64,retry-mode=adaptive,tcp-keepalive,path-style'",
+                file_logs,
+            )
+        settings[field] = setting_value.strip() if separator else "true"
+
+    return settings
+
+
+def validate_s3_transport(
+    s3_transport: str | None = None, file_logs: bool = False, env_prefix: str = ""
+) -> S3TransportModel:
+    """
+    Return the S3TransportModel of an S3 destination. Settings of the
+    '--s3-transport' option override the settings of the 'S3_TRANSPORT' environment
+    variable.
+
+    Args:
+        s3_transport: Optional '--s3-transport' value.
+        file_logs: If True enables logging info messages and errors to a file log.
+        env_prefix: Optional prefix of the environment variable name, used for named
+                    S3 destinations, for example "MIRROR_" for "MIRROR_S3_TRANSPORT"
+    """
+    env_name = f"{env_prefix}S3_TRANSPORT"
+    settings = {
+        **parse_s3_transport(os.getenv(env_name), f"'{env_name}'", file_logs),
+        **parse_s3_transport(s3_transport, "'--s3-transport'", file_logs),
+    }
+    try:
+        return S3TransportModel(**settings)
+    except ValidationError as e:
+        raise CustomBadParameter(
+            f"Failed to validate S3 transport profile, error(s): {e}", file_logs
+        )
+
+
+@dataclass(frozen=True)
+class DestinationSpec:
+    """
+    Export destination parsed from a '--destination' value.
+
+    Attributes:
+        kind: "S3", "local" or "stdout"
+        name: Optional name of an additional S3 destination, its S3 config is read
+              from environment variables prefixed with the upper case name.
+        workers: Optional number of records written concurrently to the destination.
+        early_exit: Optional early-exit policy of the destination.
+        stdout_format: Optional format of a "stdout" destination, "ndjson" (default)
+                       or "tar".
+    """
+
+    kind: Literal["S3", "local", "stdout"]
+    name: str | None = None
+    workers: int | None = None
+    early_exit: bool | None = None
+    stdout_format: Literal["ndjson", "tar"] | None = None
+
+    @property
+    def label(self) -> str:
+        """Name of the destination shown in messages, for example "S3:mirror"."""
+        return f"{self.kind}:{self.name}" if self.name else self.kind
+
+    @property
+    def env_prefix(self) -> str:
+        """Prefix of the S3 config environment variables, for example "MIRROR_"."""
+        return f"{self.name.upper().replace('-', '_')}_" if self.name else ""
+
+
+def validate_destinations(
+    destination: str | tuple[str, ...], file_logs: bool = False
+) -> list[DestinationSpec]:
+    """
+    Parse and return the '--destination' values.
+
+    Format: KIND[:NAME][,workers=N][,early-exit[=true|false]][,format=ndjson|tar]
+    Example values: "S3", "local,workers=1", "S3:mirror,workers=8,early-exit",
+    "stdout,format=tar"
+
+    Raises BadParameter exception if a value is invalid or if a destination is
+    given more than once.
+    """
+    values = (destination,) if isinstance(destination, str) else destination
+    specs = []
+    for value in values or ("S3",):
+        kind_name, *settings = value.split(",")
+        kind, separator, name = kind_name.partition(":")
+        kind = {"s3": "S3", "local": "local", "stdout": "stdout"}.get(
+            kind.strip().lower()
+        )
+        valid_name = not separator or (kind == "S3" and re.fullmatch(r"\w[\w-]*", name))
+        if not kind or not valid_name:
+            raise CustomBadParameter(
+                f"Invalid '--destination' value '{value}', expected 'S3', "
+                f"'S3:<name>', 'local' or 'stdout' optionally followed by "
+                f"',workers=<n>' and ',early-exit[=true|false]'",
+                file_logs,
+            )
+
+        options = {}
+        for setting in settings:
+            key, _, option_value = setting.strip().partition("=")
+            try:
+                if key == "workers" and int(option_value) > 0:
+                    options["workers"] = int(option_value)
+                elif key == "early-exit" and option_value in ("", "true", "false"):
+                    options["early_exit"] = option_value != "false"
+                elif key == "format" and kind == "stdout":
+                    if option_value not in ("ndjson", "tar"):
+                        raise ValueError
+                    options["stdout_format"] = option_value
+                else:
+                    raise ValueError
+            except ValueError:
+                raise CustomBadParameter(
+                    f"Invalid setting '{setting}' in '--destination' value "
+                    f"'{value}', expected 'workers=<n>', 'early-exit[=true|false]' "
+                    f"or 'format=ndjson|tar' (only for 'stdout')",
+                    file_logs,
+                )
+        specs.append(DestinationSpec(kind, name or None, **options))
+
+    labels = [spec.label for spec in specs]
+    if len(set(labels)) != len(labels):
+        raise CustomBadParameter(
+            f"Each '--destination' can only be given once: {', '.join(labels)}",
+            file_logs,
+        )
+
+    return specs
+
+
+def validate_stdout_destination(
+    spec: DestinationSpec,
+    layout: str,
+    compress: str | None,
+    manifest: bool,
+    file_logs: bool = False,
+) -> None:
+    """
+    Validate the options of a 'stdout' destination.
+    Raises BadParameter exception if the 'ndjson' format is combined with
+    '--compress', a nested '--layout' or '--manifest', because NDJSON lines only
+    hold the XML of records.
+    """
+    if spec.stdout_format == "tar":
+        return
+    for enabled, option in (
+        (compress, "--compress"),
+        (layout != "flat", f"--layout {layout}"),
+        (manifest, "--manifest"),
+    ):
+        if enabled:
+            raise CustomBadParameter(
+                f"'{option}' cannot be used with the 'stdout' destination in "
+                f"'ndjson' format, use 'stdout,format=tar' instead",
+                file_logs,
+            )
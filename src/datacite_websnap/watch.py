@@ -0,0 +1,345 @@
+"""
+Long-running sync daemon that exports the records updated since its last run on an
+interval, used instead of running the export command from cron.
+
+The Exporter (with its DataCite API session) and the sinks (with their S3 clients)
+are created once and reused by every run, so that runs do not pay interpreter
+startup, imports and TLS handshakes again. The first run exports all records of the
+query (or the records updated since a given timestamp), each following run only
+the records updated since the start of the last successful run, minus
+WATCH_OVERLAP_SECONDS for records that DataCite indexed late.
+
+A small HTTP server reports the health of the daemon at "/health" (JSON) and
+metrics of the runs at "/metrics" (Prometheus text format).
+"""
+
+import json
+import signal
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Sequence
+
+import click
+
+from .api import (
+    Destination,
+    ExportError,
+    Exporter,
+    ExportOptions,
+    ExportQuery,
+    ExportResult,
+)
+from .config import WATCH_OVERLAP_SECONDS
+from .logger import CustomEcho, CustomWarning
+
+
+def format_timestamp(seconds: float) -> str:
+    """
+    Return a Unix timestamp as an ISO 8601 UTC timestamp used in DataCite queries,
+    for example "2025-01-01T00:00:00Z".
+    """
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class WatchMetrics:
+    """
+    Metrics of the runs of a Watcher, reported by the health server.
+
+    Attributes:
+        runs: Number of completed runs, including failed runs.
+        failed_runs: Number of runs that raised an error or had failed records.
+        records_exported: Total number of records exported by all runs.
+        records_failed: Total number of records that failed in all runs.
+        last_run_started: Unix timestamp of the start of the last run.
+        last_success: Unix timestamp of the start of the last successful run.
+        last_duration: Seconds the last run took.
+        last_error: Error message of the last run, None if it succeeded.
+        updated_since: Timestamp the next run exports the updated records since,
+                       None if it exports all records.
+    """
+
+    runs: int = 0
+    failed_runs: int = 0
+    records_exported: int = 0
+    records_failed: int = 0
+    last_run_started: float | None = None
+    last_success: float | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+    updated_since: str | None = None
+
+    @property
+    def healthy(self) -> bool:
+        """True until a run failed, and again after the next successful run."""
+        return self.last_error is None
+
+    def health(self) -> dict:
+        """Return the health report served at "/health"."""
+        return {
+            "status": "ok" if self.healthy else "failing",
+            "runs": self.runs,
+            "last_run_started": self._format(self.last_run_started),
+            "last_success": self._format(self.last_success),
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "updated_since": self.updated_since,
+        }
+
+    def prometheus(self) -> str:
+        """Return the metrics served at "/metrics" in Prometheus text format."""
+        metrics = [
+            ("runs_total", "counter", "Completed runs", self.runs),
+            ("failed_runs_total", "counter", "Failed runs", self.failed_runs),
+            (
+                "records_exported_total",
+                "counter",
+                "Records exported",
+                self.records_exported,
+            ),
+            ("records_failed_total", "counter", "Records failed", self.records_failed),
+            ("up", "gauge", "1 if the last run succeeded", int(self.healthy)),
+            (
+                "last_success_timestamp_seconds",
+                "gauge",
+                "Start of the last successful run",
+                self.last_success or 0,
+            ),
+            (
+                "last_run_duration_seconds",
+                "gauge",
+                "Duration of the last run",
+                self.last_duration or 0,
+            ),
+        ]
+        lines = []
+        for name, kind, description, value in metrics:
+            lines.append(f"# HELP datacite_websnap_{name} {description}")
+            lines.append(f"# TYPE datacite_websnap_{name} {kind}")
+            lines.append(f"datacite_websnap_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format(seconds: float | None) -> str | None:
+        return format_timestamp(seconds) if seconds is not None else None
+
+
+class HealthServer:
+    """
+    Context manager that serves the health report and metrics of a Watcher on a
+    local port in a background thread.
+
+    Attributes:
+        url: URL of the running server, for example "http://127.0.0.1:8080"
+    """
+
+    def __init__(self, metrics: WatchMetrics, host: str, port: int):
+        """
+        Args:
+            metrics: Metrics of the Watcher.
+            host: Host the server listens on, for example "127.0.0.1"
+            port: Port the server listens on, 0 for a free port.
+        """
+        self.metrics = metrics
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "HealthServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    status = 200 if metrics.healthy else 503
+                    body = json.dumps(metrics.health()).encode("utf-8")
+                    self._send(status, body, "application/json")
+                elif self.path == "/metrics":
+                    body = metrics.prometheus().encode("utf-8")
+                    self._send(200, body, "text/plain; version=0.0.4")
+                else:
+                    self.send_error(404)
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class Watcher:
+    """
+    Export the records of a query on an interval with a warm Exporter and warm
+    sinks, each run only exports the records updated since the last successful run.
+
+    A run that fails or has failed records does not advance the timestamp, so that
+    the next run exports its records again.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        destinations: Sequence[Destination],
+        query: ExportQuery,
+        options: ExportOptions,
+        interval: float,
+        updated_since: str | None = None,
+        overlap: float = WATCH_OVERLAP_SECONDS,
+        on_result: Callable[[ExportResult], None] | None = None,
+        file_logs: bool = False,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            exporter: Exporter reused by all runs.
+            destinations: Destinations the records are written to.
+            query: Records to export, must not list specific DOIs or recorded pages.
+            options: Options of the export. Preflight checks only run before the
+                     first run.
+            interval: Seconds between the start of a run and the start of the next
+                      run, the next run starts immediately if a run took longer.
+            updated_since: Optional ISO 8601 UTC timestamp the first run exports the
+                           updated records since, None exports all records.
+            overlap: Seconds subtracted from the start of the last successful run,
+                     so that records indexed late by DataCite are not missed.
+            on_result: Optional function called with the result of each run.
+            file_logs: If True enables logging info messages and errors to a file log.
+            clock: Function that returns the current Unix timestamp.
+        """
+        self.exporter = exporter
+        self.destinations = list(destinations)
+        self.query = query
+        self.options = options
+        self.interval = interval
+        self.overlap = overlap
+        self.on_result = on_result
+        self.file_logs = file_logs
+        self.clock = clock
+        self.metrics = WatchMetrics(updated_since=updated_since)
+        self._stop = threading.Event()
+
+    @property
+    def stopped(self) -> bool:
+        """True after stop() was called."""
+        return self._stop.is_set()
+
+    def stop(self) -> None:
+        """Stop after the current run, or immediately if waiting for the next run."""
+        self._stop.set()
+
+    def install_signal_handlers(self) -> None:
+        """
+        Stop gracefully on SIGTERM and SIGINT, the current run completes first.
+        Must be called from the main thread.
+        """
+
+        def handler(signum, frame):
+            CustomEcho(
+                f"Received {signal.Signals(signum).name}, stopping after the "
+                f"current run",
+                self.file_logs,
+            )
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handler)
+        signal.signal(signal.SIGINT, handler)
+
+    def run(self, max_runs: int | None = None) -> None:
+        """
+        Run exports until stop() is called.
+
+        Args:
+            max_runs: Optional number of runs after which the Watcher stops.
+        """
+        runs = 0
+        while not self.stopped:
+            started = self.clock()
+            self.run_once()
+            runs += 1
+            if max_runs is not None and runs >= max_runs:
+                break
+
+            wait = max(self.interval - (self.clock() - started), 0)
+            CustomEcho(f"Next run in {wait:.0f} seconds", self.file_logs)
+            self._stop.wait(wait)
+
+        CustomEcho("**** Stopped DataCite watch ****", self.file_logs)
+
+    def run_once(self) -> ExportResult | None:
+        """
+        Export the records updated since the last successful run and return the
+        result, None if the run failed.
+        """
+        metrics = self.metrics
+        started = self.clock()
+        metrics.last_run_started = started
+        query = replace(self.query, updated_since=metrics.updated_since)
+        CustomEcho(
+            f"**** Starting run {metrics.runs + 1}, exporting "
+            + (
+                f"records updated since {query.updated_since}"
+                if query.updated_since
+                else "all records"
+            )
+            + " ****",
+            self.file_logs,
+        )
+
+        try:
+            result = self.exporter.export(query, self.destinations, self.options)
+        except (ExportError, click.ClickException) as err:
+            result = None
+            error = err.message
+        except Exception as err:
+            # Keep watching, the next run exports the same records again
+            result = None
+            error = f"Unexpected error: {err}"
+        else:
+            # Preflight checks already passed with the warm clients
+            self.options = replace(self.options, preflight=False)
+
+            error = "; ".join(result.errors.values()) or None
+            failed = len(result.failed_records)
+            if failed and not error:
+                error = f"{failed} record(s) failed to export"
+            metrics.records_exported += sum(
+                dest.stats.exported for dest in result.destinations
+            )
+            metrics.records_failed += failed
+
+        metrics.runs += 1
+        metrics.last_duration = round(self.clock() - started, 3)
+        metrics.last_error = error
+        if error:
+            metrics.failed_runs += 1
+            CustomWarning(
+                f"Run {metrics.runs} failed, the next run exports the same records "
+                f"again: {error}",
+                self.file_logs,
+            )
+        else:
+            metrics.last_success = started
+            metrics.updated_since = format_timestamp(started - self.overlap)
+
+        if result and self.on_result:
+            self.on_result(result)
+        return result
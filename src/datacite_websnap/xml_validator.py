@@ -0,0 +1,197 @@
+"""
+Validate decoded DataCite XML records in a process pool.
+
+Records are checked to be well-formed XML and can optionally be validated against a
+DataCite kernel XML schema (XSD) loaded from the local file system, by default the
+DataCite kernel 4.5 schema bundled with the package. Schemas are never retrieved
+over the network.
+
+Validating against a schema requires the optional "lxml" dependency:
+    pip install 'datacite-websnap[schema]'
+"""
+
+import base64
+import binascii
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.resources import files
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Iterable, Iterator, Literal
+from xml.etree import ElementTree
+
+from .config import XML_VALIDATION_BATCH_SIZE, XML_VALIDATION_WORKERS
+from .logger import CustomClickException
+from .record import DataCiteRecord
+
+# Validation performed on each decoded record
+ValidationMode = Literal["well-formed", "schema"]
+
+# DataCite kernel XML schema bundled with the package, used if no schema is given.
+# The files of the schema package (metadata.xsd and its include directory) are
+# copied unchanged from https://schema.datacite.org/meta/kernel-4.5/
+BUNDLED_XML_SCHEMA = str(
+    files(__package__).joinpath("schemas", "kernel-4.5", "metadata.xsd")
+)
+
+# XML schema used by the current (worker) process, set by _init_worker()
+_schema = None
+
+
+def load_xml_schema(schema_path: str | None = None, file_logs: bool = False) -> Any:
+    """
+    Return lxml XMLSchema parsed from a local XSD file.
+
+    Files included or imported by the schema are resolved relative to the schema
+    file, network access is disabled.
+
+    Args:
+        schema_path: Path of the XSD file, for example the "metadata.xsd" file of a
+                     DataCite kernel schema package. Defaults to the bundled
+                     DataCite kernel 4.5 schema.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    schema_path = schema_path or BUNDLED_XML_SCHEMA
+    try:
+        from lxml import etree
+    except ImportError:
+        raise CustomClickException(
+            "Validating XML against a schema requires the 'lxml' package, "
+            "install it with: pip install 'datacite-websnap[schema]'",
+            file_logs,
+        )
+
+    parser = etree.XMLParser(no_network=True, resolve_entities=False)
+    try:
+        return etree.XMLSchema(etree.parse(schema_path, parser))
+    except (OSError, etree.XMLSyntaxError, etree.XMLSchemaParseError) as err:
+        raise CustomClickException(
+            f"Failed to load XML schema '{schema_path}': {err}", file_logs
+        )
+
+
+def check_xml(xml_bytes: bytes, schema: Any = None) -> str | None:
+    """
+    Return an error message if XML is not well-formed or not valid against the
+    schema, else return None.
+
+    Args:
+        xml_bytes: Decoded XML.
+        schema: Optional lxml XMLSchema returned by load_xml_schema().
+    """
+    if schema is None:
+        try:
+            ElementTree.fromstring(xml_bytes)
+        except ElementTree.ParseError as err:
+            return f"XML is not well-formed: {err}"
+        return None
+
+    from lxml import etree
+
+    parser = etree.XMLParser(no_network=True, resolve_entities=False)
+    try:
+        doc = etree.fromstring(xml_bytes, parser)
+    except etree.XMLSyntaxError as err:
+        return f"XML is not well-formed: {err}"
+
+    if not schema.validate(doc):
+        error = schema.error_log[0]
+        return f"XML is not valid against schema: line {error.line}: {error.message}"
+    return None
+
+
+def _init_worker(mode: ValidationMode, schema_path: str | None) -> None:
+    """Load the XML schema once per worker process."""
+    global _schema
+    _schema = load_xml_schema(schema_path) if mode == "schema" else None
+
+
+def _check_batch(encoded_xmls: list[str | None]) -> list[str | None]:
+    """
+    Return the validation error message (or None) of each Base64 encoded XML in a
+    batch. Values that are missing or cannot be decoded are skipped because they are
+    reported when the record is decoded for export.
+    """
+    errors = []
+    for encoded_xml in encoded_xmls:
+        try:
+            xml_bytes = base64.b64decode(encoded_xml) if encoded_xml else None
+        except (binascii.Error, ValueError):
+            xml_bytes = None
+        errors.append(check_xml(xml_bytes, _schema) if xml_bytes else None)
+    return errors
+
+
+def validate_xml_records(
+    records: Iterable[DataCiteRecord],
+    mode: ValidationMode = "well-formed",
+    schema_path: str | None = None,
+    workers: int = XML_VALIDATION_WORKERS,
+    batch_size: int = XML_VALIDATION_BATCH_SIZE,
+    file_logs: bool = False,
+) -> Iterator[tuple[DataCiteRecord, str | None]]:
+    """
+    Yield each record with its validation error message (None if the record is
+    valid), in the order of the records.
+
+    Records are sent in batches to a pool of worker processes. At most two batches
+    per worker are in flight, so that the records are validated ahead of the export
+    while memory stays bounded.
+
+    Args:
+        records: Iterable of DataCiteRecord objects.
+        mode: "well-formed" checks that each record is well-formed XML, "schema"
+              additionally validates each record against the schema.
+        schema_path: Path of a local XSD file used if mode is "schema", defaults to
+                     the bundled DataCite kernel 4.5 schema.
+        workers: Number of worker processes, if 0 records are validated in the
+                 current process.
+        batch_size: Number of records sent to a worker process at once.
+        file_logs: If True enables logging info messages and errors to a file log.
+    """
+    # Load schema before starting worker processes so that errors are raised early
+    schema = load_xml_schema(schema_path, file_logs) if mode == "schema" else None
+
+    records = iter(records)
+    batches = iter(lambda: list(islice(records, batch_size)), [])
+
+    if not workers:
+        global _schema
+        _schema = schema
+        for batch in batches:
+            yield from zip(batch, _check_batch([record.xml for record in batch]))
+        return
+
+    # Worker processes are started by a fork server, forking the current process
+    # (with the threads of the export) could deadlock the workers
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("forkserver"),
+        initializer=_init_worker,
+        initargs=(mode, schema_path),
+    )
+    pending: deque[tuple[list, Future]] = deque()
+    try:
+        for batch in batches:
+            future = executor.submit(_check_batch, [record.xml for record in batch])
+            pending.append((batch, future))
+            if len(pending) >= workers * 2:
+                yield from _collect_batch(*pending.popleft(), file_logs)
+        while pending:
+            yield from _collect_batch(*pending.popleft(), file_logs)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect_batch(
+    batch: list[DataCiteRecord], future: Future, file_logs: bool = False
+) -> Iterator[tuple[DataCiteRecord, str | None]]:
+    """Yield each record of a batch with its validation result."""
+    try:
+        errors = future.result()
+    except BrokenProcessPool as err:
+        raise CustomClickException(
+            f"XML validation worker process failed: {err}", file_logs
+        )
+    yield from zip(batch, errors)
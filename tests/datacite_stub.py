@@ -0,0 +1,194 @@
+"""
+Synthetic local stand-in for the DataCite API used by tests and benchmarks.
+
+Serves a configurable number of synthetic DOI records from the list DOIs endpoint
+using cursor-based pagination, and a client from the clients endpoint. Records are
+generated on the fly so that the stand-in itself uses constant memory. Supports the
+'doi:("..." OR "...")' query of DOI lookups and the "updated:[<timestamp> TO *]"
+query of incremental exports, records can be touched to update their "updated"
+timestamp.
+
+Example usage:
+    with DataCiteStub(records=10_000) as stub:
+        get_datacite_list_dois_xml(stub.url, client_id="stub.client")
+"""
+
+import base64
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STUB_CLIENT_ID = "stub.client"
+STUB_DOI_PREFIX = "10.5072"
+
+XML_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<resource xmlns="http://datacite.org/schema/kernel-4">'
+    '<identifier identifierType="DOI">{doi}</identifier>'
+    "<creators><creator><creatorName>Synthetic, Creator</creatorName></creator>"
+    "</creators>"
+    "<titles><title>Synthetic record {index}</title></titles>"
+    "<publisher>datacite-websnap</publisher>"
+    "<publicationYear>2025</publicationYear>"
+    '<resourceType resourceTypeGeneral="Dataset"/>'
+    '<descriptions><description descriptionType="Abstract">{padding}'
+    "</description></descriptions>"
+    "</resource>"
+)
+
+
+def stub_doi(index: int) -> str:
+    """Return the synthetic DOI of the record with the given index."""
+    return f"{STUB_DOI_PREFIX}/synthetic.{index}"
+
+
+def stub_xml(index: int) -> bytes:
+    """Return the synthetic (decoded) XML of the record with the given index."""
+    xml = XML_TEMPLATE.format(doi=stub_doi(index), index=index, padding="x" * 512)
+    return xml.encode("utf-8")
+
+
+def stub_updated(index: int) -> str:
+    """Return the synthetic DataCite "updated" timestamp of the record."""
+    return f"2025-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}Z"
+
+
+class DataCiteStub:
+    """
+    Context manager that runs the DataCite API stand-in on a free local port in a
+    background thread.
+
+    Attributes:
+        url: Base URL of the running stand-in, for example "http://127.0.0.1:5000"
+        requests: Number of requests served.
+        queries: The "query" params of the list DOIs requests, in order.
+    """
+
+    def __init__(self, records: int):
+        """
+        Args:
+            records: Number of synthetic records served by the list DOIs endpoint.
+        """
+        self.records = records
+        self.requests = 0
+        self.queries: list[str | None] = []
+        self._touched: dict[int, str] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "DataCiteStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def touch(self, index: int, updated: str) -> None:
+        """Set the "updated" timestamp of a record, for example to a recent time."""
+        self._touched[index] = updated
+
+    def updated(self, index: int) -> str:
+        """Return the "updated" timestamp of the record with the given index."""
+        return self._touched.get(index, stub_updated(index))
+
+    def page(
+        self,
+        cursor: int,
+        page_size: int,
+        updated_since: str | None = None,
+        dois: set[str] | None = None,
+    ) -> dict:
+        """
+        Return the list DOIs page response that starts at position cursor of the
+        records updated since updated_since and with one of the DOIs (all records
+        if None).
+        """
+        if updated_since or dois:
+            indices = [
+                index
+                for index in range(self.records)
+                if (not updated_since or self.updated(index) >= updated_since)
+                and (not dois or stub_doi(index) in dois)
+            ]
+        else:
+            indices = range(self.records)
+        end = min(cursor + page_size, len(indices))
+        data = [
+            {
+                "id": stub_doi(index),
+                "type": "dois",
+                "attributes": {
+                    "doi": stub_doi(index),
+                    "xml": base64.b64encode(stub_xml(index)).decode("ascii"),
+                    "updated": self.updated(index),
+                },
+            }
+            for index in indices[cursor:end]
+        ]
+        links = {}
+        if end < len(indices):
+            links["next"] = (
+                f"{self.url}/dois?page%5Bcursor%5D=c{end}&page%5Bsize%5D={page_size}"
+            )
+            if updated_since:
+                links["next"] += f"&query=updated:%5B{updated_since}%20TO%20*%5D"
+        return {
+            "data": data,
+            "meta": {
+                "total": len(indices),
+                "totalPages": -(-len(indices) // page_size),
+            },
+            "links": links,
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                url = urlparse(self.path)
+                params = {
+                    key: values[-1] for key, values in parse_qs(url.query).items()
+                }
+
+                if url.path == f"/clients/{STUB_CLIENT_ID}":
+                    self._send_json({"data": {"id": STUB_CLIENT_ID}})
+                elif url.path == "/dois":
+                    # The first page is requested with cursor "1" as in DataCite,
+                    # subsequent cursors are opaque tokens with the record index
+                    cursor = params.get("page[cursor]", "1")
+                    cursor = int(cursor[1:]) if cursor.startswith("c") else 0
+                    page_size = int(params.get("page[size]", 25))
+                    query = params.get("query")
+                    stub.queries.append(query)
+                    match = re.search(r"updated:\[(\S+) TO \*\]", query or "")
+                    dois = re.search(r"doi:\((.*?)\)", query or "")
+                    self._send_json(
+                        stub.page(
+                            cursor,
+                            page_size,
+                            match and match.group(1),
+                            dois and set(re.findall(r'"([^"]+)"', dois.group(1))),
+                        )
+                    )
+                else:
+                    self.send_error(404)
+
+            def _send_json(self, obj: dict):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,297 @@
+"""
+Synthetic local stand-in for an S3-compatible object storage used by tests and
+benchmarks.
+
+Supports the requests sent by datacite-websnap with path-style addressing: HeadBucket,
+PutObject, CopyObject, GetObject, DeleteObject, DeleteObjects and ListObjectsV2
+(with an optional delimiter). Optionally throttles PUT requests per key
+partition like S3 does: each partition (the first "partition_length" characters of
+a key) sustains "partition_rate" PUT requests per second, requests above the rate are
+rejected with "503 SlowDown".
+
+Example usage:
+    with S3Stub(partition_rate=100, partition_length=12) as stub:
+        client = boto3.client("s3", endpoint_url=stub.url, ...)
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape, unescape
+
+STUB_BUCKET = "stub-bucket"
+
+SLOW_DOWN = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b"<Error><Code>SlowDown</Code><Message>Please reduce your request rate."
+    b"</Message></Error>"
+)
+NO_SUCH_KEY = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b"<Error><Code>NoSuchKey</Code><Message>The specified key does not exist."
+    b"</Message></Error>"
+)
+
+
+class S3Stub:
+    """
+    Context manager that runs the S3 stand-in on a free local port in a background
+    thread.
+
+    Attributes:
+        url: Endpoint URL of the running stand-in, for example "http://127.0.0.1:5000"
+        objects: Dictionary with keys and data of the stored objects.
+        etags: Dictionary with keys and MD5 hex digests of the stored objects.
+        headers: Dictionary with keys and request headers of the stored objects.
+        requests: Counter of requests served per HTTP method.
+        throttled: Number of PUT requests rejected with "503 SlowDown".
+    """
+
+    def __init__(
+        self,
+        partition_rate: float | None = None,
+        partition_length: int = 0,
+        keep_objects: bool = True,
+    ):
+        """
+        Args:
+            partition_rate: Sustained PUT requests per second per key partition,
+                            None disables throttling.
+            partition_length: Number of leading key characters that determine the
+                              partition of a key.
+            keep_objects: If False only the keys of stored objects are kept, so that
+                          the stand-in uses little memory in benchmarks.
+        """
+        self.partition_rate = partition_rate
+        self.partition_length = partition_length
+        self.keep_objects = keep_objects
+        self.objects: dict[str, bytes] = {}
+        self.etags: dict[str, str] = {}
+        self.headers: dict[str, dict[str, str]] = {}
+        self.requests: Counter = Counter()
+        self.throttled = 0
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "S3Stub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def put(self, key: str, body: bytes) -> None:
+        """Store an object, for example to prepare a bucket in tests."""
+        with self._lock:
+            self.objects[key] = body if self.keep_objects else b""
+            self.etags[key] = hashlib.md5(body).hexdigest()
+
+    def copy(self, source_key: str, key: str) -> bool:
+        """Copy a stored object and its headers, return False if it does not exist."""
+        with self._lock:
+            if source_key not in self.etags:
+                return False
+            self.objects[key] = self.objects[source_key]
+            self.etags[key] = self.etags[source_key]
+            if source_key in self.headers:
+                self.headers[key] = self.headers[source_key]
+            return True
+
+    def list_objects(
+        self, prefix: str, start_after: str, max_keys: int, delimiter: str = ""
+    ) -> bytes:
+        """
+        Return the ListObjectsV2 response XML for a page of keys. Keys that contain
+        the delimiter after the prefix are grouped as common prefixes, which are
+        returned with the first page.
+        """
+        with self._lock:
+            keys = sorted(
+                key
+                for key in self.objects
+                if key.startswith(prefix) and key > start_after
+            )
+        common_prefixes = []
+        if delimiter:
+            grouped = {key for key in keys if delimiter in key[len(prefix) :]}
+            keys = [key for key in keys if key not in grouped]
+            if not start_after:
+                common_prefixes = sorted(
+                    {
+                        prefix + key[len(prefix) :].split(delimiter)[0] + delimiter
+                        for key in grouped
+                    }
+                )
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<LastModified>2025-01-01T00:00:00.000Z</LastModified>"
+            f'<ETag>"{self.etags[key]}"</ETag>'
+            f"<Size>{len(self.objects[key])}</Size>"
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for key in page
+        ) + "".join(
+            f"<CommonPrefixes><Prefix>{escape(common_prefix)}</Prefix></CommonPrefixes>"
+            for common_prefix in common_prefixes
+        )
+        token = (
+            f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>"
+            if truncated
+            else ""
+        )
+        return (
+            f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{STUB_BUCKET}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+            f"<IsTruncated>{str(truncated).lower()}</IsTruncated>"
+            f"{token}{contents}</ListBucketResult>"
+        ).encode("utf-8")
+
+    def partitions(self) -> set[str]:
+        """Return the partitions of the stored object keys."""
+        return {key[: self.partition_length] for key in self.objects}
+
+    def _allow_put(self, key: str) -> bool:
+        """Token bucket per partition with a burst of one second of requests."""
+        if not self.partition_rate:
+            return True
+
+        partition = key[: self.partition_length]
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(partition, (self.partition_rate, now))
+            tokens = min(
+                self.partition_rate, tokens + (now - updated) * self.partition_rate
+            )
+            if tokens < 1:
+                self._buckets[partition] = (tokens, now)
+                self.throttled += 1
+                return False
+            self._buckets[partition] = (tokens - 1, now)
+            return True
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _bucket_key(self) -> tuple[str, str]:
+                path = unquote(urlparse(self.path).path).lstrip("/")
+                bucket, _, key = path.partition("/")
+                return bucket, key
+
+            def _send(self, status: int, body: bytes = b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                with stub._lock:
+                    stub.requests["HEAD"] += 1
+                bucket, key = self._bucket_key()
+                if bucket != STUB_BUCKET or (key and key not in stub.objects):
+                    self._send(404)
+                else:
+                    self._send(200)
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests["PUT"] += 1
+                bucket, key = self._bucket_key()
+                copy_source = self.headers.get("x-amz-copy-source")
+                if bucket != STUB_BUCKET:
+                    self._send(404)
+                elif copy_source:
+                    source_key = unquote(copy_source).lstrip("/").partition("/")[2]
+                    with stub._lock:
+                        stub.requests["COPY"] += 1
+                    if stub.copy(source_key, key):
+                        body = (
+                            f"<CopyObjectResult><ETag>&quot;{stub.etags[key]}&quot;"
+                            f"</ETag><LastModified>2025-01-01T00:00:00.000Z"
+                            f"</LastModified></CopyObjectResult>"
+                        ).encode("utf-8")
+                        self._send(200, body, {"Content-Type": "application/xml"})
+                    else:
+                        self._send(
+                            404, NO_SUCH_KEY, {"Content-Type": "application/xml"}
+                        )
+                elif not stub._allow_put(key):
+                    self._send(503, SLOW_DOWN, {"Content-Type": "application/xml"})
+                else:
+                    stub.put(key, body)
+                    if stub.keep_objects:
+                        with stub._lock:
+                            stub.headers[key] = dict(self.headers)
+                    self._send(200, headers={"ETag": f'"{stub.etags[key]}"'})
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests["GET"] += 1
+                bucket, key = self._bucket_key()
+                params = parse_qs(urlparse(self.path).query)
+                if bucket == STUB_BUCKET and not key and "list-type" in params:
+                    with stub._lock:
+                        stub.requests["LIST"] += 1
+                    body = stub.list_objects(
+                        prefix=params.get("prefix", [""])[0],
+                        start_after=params.get("continuation-token", [""])[0],
+                        max_keys=int(params.get("max-keys", [1000])[0]),
+                        delimiter=params.get("delimiter", [""])[0],
+                    )
+                    self._send(200, body, {"Content-Type": "application/xml"})
+                elif bucket != STUB_BUCKET or key not in stub.objects:
+                    self._send(404, NO_SUCH_KEY, {"Content-Type": "application/xml"})
+                else:
+                    self._send(200, stub.objects[key])
+
+            def do_DELETE(self):
+                with stub._lock:
+                    stub.requests["DELETE"] += 1
+                    stub.objects.pop(self._bucket_key()[1], None)
+                    stub.etags.pop(self._bucket_key()[1], None)
+                self._send(204)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                bucket, _ = self._bucket_key()
+                if bucket != STUB_BUCKET or "delete" not in urlparse(self.path).query:
+                    self._send(404)
+                    return
+                keys = [
+                    unescape(key)
+                    for key in re.findall(r"<Key>(.*?)</Key>", body.decode("utf-8"))
+                ]
+                with stub._lock:
+                    stub.requests["DELETE_OBJECTS"] += 1
+                    for key in keys:
+                        stub.objects.pop(key, None)
+                        stub.etags.pop(key, None)
+                        stub.headers.pop(key, None)
+                self._send(
+                    200,
+                    b"<DeleteResult></DeleteResult>",
+                    {"Content-Type": "application/xml"},
+                )
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,195 @@
+"""Tests for src/datacite-websnap/api.py"""
+
+import threading
+from unittest.mock import patch
+
+import click
+import pytest
+
+from datacite_websnap.api import (
+    Destination,
+    ExportError,
+    ExportOptions,
+    ExportQuery,
+    Exporter,
+)
+from datacite_websnap.exporter import format_xml_file_name
+from datacite_websnap.logger import CustomTransportException
+from datacite_websnap.sinks import Sink
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi, stub_xml
+
+
+class MemorySink(Sink):
+    name = "memory"
+
+    def __init__(self, fail_keys=(), fail_all=False):
+        self.objects = {}
+        self.fail_keys = set(fail_keys)
+        self.fail_all = fail_all
+        self.flushed = 0
+
+    def write(self, body, key, compression=None, content_type=None):
+        if self.fail_all or key in self.fail_keys:
+            raise RuntimeError("disk full")
+        self.objects[key] = body
+
+    def flush(self):
+        self.flushed += 1
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with (
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomWarning"),
+        patch("datacite_websnap.failed_records.time.sleep"),
+    ):
+        yield
+
+
+def test_exporter_custom_sink_reused_across_exports():
+    sink = MemorySink()
+
+    with DataCiteStub(12) as datacite, Exporter(datacite.url) as exporter:
+        first = exporter.export(ExportQuery(client_id=STUB_CLIENT_ID), sink)
+        second = exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            sink,
+            ExportOptions(key_prefix="p", workers=4),
+        )
+
+    assert first.stats.summary() == "12/12 records exported, 0 failed, 0 not attempted"
+    assert second.stats.exported == 12
+    assert sink.flushed == 2
+    assert sink.objects[format_xml_file_name(stub_doi(3), "p")] == stub_xml(3)
+    assert len(sink.objects) == 24
+
+
+def test_exporter_custom_sink_errors_fail_records():
+    sink = MemorySink(fail_keys={format_xml_file_name(stub_doi(1))})
+
+    with DataCiteStub(3) as datacite, Exporter(datacite.url) as exporter:
+        result = exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            sink,
+            ExportOptions(retry_attempts=1),
+        )
+
+    assert result.stats.exported == 2
+    assert [record.doi for record in result.failed_records] == [stub_doi(1)]
+    assert "disk full" in result.failed_records[0].error
+
+
+def test_exporter_raises_export_error():
+    with DataCiteStub(3) as datacite, Exporter(datacite.url) as exporter:
+        with pytest.raises(ExportError) as exc_info:
+            exporter.export(ExportQuery(client_id="unknown.client"), MemorySink())
+
+    assert not isinstance(exc_info.value, click.ClickException)
+    assert "HTTP error" in exc_info.value.message
+
+
+def test_exporter_plan_requires_listing():
+    with DataCiteStub(3) as datacite, Exporter(datacite.url) as exporter:
+        with pytest.raises(ExportError, match="does not support listing"):
+            exporter.export(
+                ExportQuery(client_id=STUB_CLIENT_ID),
+                MemorySink(),
+                ExportOptions(plan=True),
+            )
+
+
+def test_exporter_fans_out_one_harvest_to_destinations():
+    primary, mirror = MemorySink(), MemorySink()
+
+    with DataCiteStub(40) as datacite, Exporter(datacite.url) as exporter:
+        result = exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            [Destination(primary, "primary", workers=4), Destination(mirror, "mirror")],
+            ExportOptions(page_size=10, layout="hash"),
+        )
+        requests = datacite.requests
+
+    # One client lookup and four pages for both destinations
+    assert requests == 5
+    assert [dest.name for dest in result.destinations] == ["primary", "mirror"]
+    assert all(dest.stats.exported == 40 for dest in result.destinations)
+    assert set(primary.objects) == set(mirror.objects)
+    assert "doi-index.json" in mirror.objects
+    assert not result.errors
+
+
+def test_exporter_destination_early_exit_does_not_stop_others():
+    healthy, broken = MemorySink(), MemorySink(fail_all=True)
+
+    with DataCiteStub(5) as datacite, Exporter(datacite.url) as exporter:
+        result = exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            [Destination(healthy), Destination(broken, "broken", early_exit=True)],
+        )
+
+    assert len(healthy.objects) == 5
+    assert result.destinations[0].stats.exported == 5
+    assert result.destinations[1].stats.failed == 1
+    assert "[broken] Failed to export key" in result.errors["broken"]
+    assert broken.flushed == 1
+
+
+def test_exporter_circuit_breaker_pauses_only_failing_destination():
+    class HealthySink(MemorySink):
+        def __init__(self, records):
+            super().__init__()
+            self.records = records
+            self.done = threading.Event()
+
+        def write(self, body, key, compression=None, content_type=None):
+            super().write(body, key, compression, content_type)
+            if len(self.objects) == self.records:
+                self.done.set()
+
+    class UnreachableSink(MemorySink):
+        def __init__(self, healthy):
+            super().__init__()
+            self.healthy = healthy
+            self.probed = []
+
+        def write(self, body, key, compression=None, content_type=None):
+            raise CustomTransportException("Connection refused")
+
+        def probe(self):
+            # The harvest continues for the healthy destination meanwhile
+            self.healthy.done.wait(5)
+            self.probed.append(len(self.healthy.objects))
+            return False
+
+    healthy = HealthySink(20)
+    unreachable = UnreachableSink(healthy)
+
+    with (
+        DataCiteStub(20) as datacite,
+        Exporter(datacite.url) as exporter,
+        patch("datacite_websnap.circuit_breaker.CustomWarning"),
+        patch("datacite_websnap.circuit_breaker.time.sleep"),
+    ):
+        result = exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            [Destination(healthy, "healthy"), Destination(unreachable, "unreachable")],
+            ExportOptions(circuit_breaker_threshold=2),
+        )
+
+    assert unreachable.probed[0] == 20
+    assert result.destinations[0].stats.exported == 20
+    assert result.destinations[1].stats.failed == 2
+    assert "unreachable destination is unreachable" in result.errors["unreachable"]
+
+
+def test_exporter_all_destinations_aborted_raises():
+    with DataCiteStub(5) as datacite, Exporter(datacite.url) as exporter:
+        with pytest.raises(ExportError, match="disk full"):
+            exporter.export(
+                ExportQuery(client_id=STUB_CLIENT_ID),
+                MemorySink(fail_all=True),
+                ExportOptions(early_exit=True),
+            )
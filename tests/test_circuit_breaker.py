@@ -0,0 +1,100 @@
+"""Tests for src/datacite-websnap/circuit_breaker.py"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from datacite_websnap.circuit_breaker import CircuitBreaker
+
+
+def test_circuit_breaker_below_threshold():
+    probe = MagicMock(return_value=True)
+    breaker = CircuitBreaker(probe=probe, threshold=3, cooldown=0)
+
+    assert breaker.record_failure() is True
+    assert breaker.record_failure() is True
+    assert breaker.consecutive_failures == 2
+    probe.assert_not_called()
+
+
+def test_circuit_breaker_success_resets_failures():
+    breaker = CircuitBreaker(probe=MagicMock(), threshold=3, cooldown=0)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+
+    assert breaker.consecutive_failures == 0
+
+
+@patch("datacite_websnap.circuit_breaker.time.sleep")
+@patch("datacite_websnap.circuit_breaker.CustomEcho")
+@patch("datacite_websnap.circuit_breaker.CustomWarning")
+def test_circuit_breaker_resumes_after_successful_probe(
+    mock_warning, mock_echo, mock_sleep
+):
+    probe = MagicMock(side_effect=[False, True])
+    breaker = CircuitBreaker(probe=probe, threshold=2, cooldown=10, max_probes=3)
+
+    breaker.record_failure()
+    assert breaker.record_failure() is True
+    assert breaker.paused
+    probe.assert_not_called()
+
+    assert breaker.wait() is True
+    assert not breaker.paused
+    assert breaker.trips == 1
+    assert breaker.consecutive_failures == 0
+    assert breaker.is_open is False
+    assert probe.call_count == 2
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [10, 20]
+
+
+@patch("datacite_websnap.circuit_breaker.time.sleep")
+@patch("datacite_websnap.circuit_breaker.CustomWarning")
+def test_circuit_breaker_opens_after_failed_probes(mock_warning, mock_sleep):
+    probe = MagicMock(return_value=False)
+    breaker = CircuitBreaker(probe=probe, threshold=1, cooldown=1, max_probes=2)
+
+    assert breaker.record_failure() is True
+    assert breaker.wait() is False
+    assert breaker.is_open is True
+    assert probe.call_count == 2
+
+    # Breaker stays open without probing again
+    assert breaker.record_failure() is False
+    assert breaker.wait() is False
+    assert probe.call_count == 2
+
+
+@patch("datacite_websnap.circuit_breaker.CustomEcho")
+@patch("datacite_websnap.circuit_breaker.CustomWarning")
+def test_circuit_breaker_probes_without_holding_lock(mock_warning, mock_echo):
+    probing, resume = threading.Event(), threading.Event()
+
+    def probe():
+        probing.set()
+        return resume.wait(5)
+
+    breaker = CircuitBreaker(probe=probe, threshold=1, cooldown=0)
+    breaker.record_failure()
+
+    results = []
+    writers = [
+        threading.Thread(target=lambda: results.append(breaker.wait()))
+        for _ in range(3)
+    ]
+    for writer in writers:
+        writer.start()
+    assert probing.wait(5)
+
+    # Errors are recorded while the endpoint is probed, the writers wait
+    assert breaker.record_failure() is True
+    assert breaker.paused
+    assert results == []
+
+    resume.set()
+    for writer in writers:
+        writer.join(5)
+    assert results == [True, True, True]
+    assert breaker.trips == 1
+    assert breaker.consecutive_failures == 0
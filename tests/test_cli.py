@@ -1,10 +1,19 @@
 """Tests for src/datacite-websnap/cli.py"""
 
+import gzip
+import json
+
 import click.testing
+import pytest
 from unittest.mock import patch, MagicMock
 
-from datacite_websnap.cli import cli
-from datacite_websnap.logger import CustomClickException
+from datacite_websnap import logger
+from datacite_websnap.api import Destination
+from datacite_websnap.cli import _close_destinations, cli, datacite_bulk_export
+from datacite_websnap.record import DataCiteRecord
+from datacite_websnap.logger import CustomClickException, CustomTransportException
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi, stub_xml
+from tests.s3_stub import S3Stub, STUB_BUCKET
 
 
 def test_export_command_help():
@@ -15,27 +24,41 @@ def test_export_command_help():
     assert "--client-id" in result.output
 
 
+def test_watch_and_serve_command_help():
+    runner = click.testing.CliRunner()
+    export_params = {param.name: param for param in datacite_bulk_export.params}
+    for command in ("watch", "serve"):
+        result = runner.invoke(cli, [command, "--help"])
+        assert result.exit_code == 0
+        assert "--destination" in result.output
+        assert "stdout" not in result.output
+
+        # Each command has its own instances of the shared options
+        params = cli.commands[command].params
+        assert not any(param is export_params.get(param.name) for param in params)
+        assert "fsync" in {param.name for param in params}
+
+
 def test_export_command_s3_success():
     runner = click.testing.CliRunner()
 
     mock_xml_list = [
-        {"10.123/abc": "PGhlbGxvPjwvaGVsbG8+"}  # Base64 for <hello>
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")  # Base64 for <hello>
     ]
 
     with (
         patch(
-            "datacite_websnap.cli.get_datacite_list_dois_xml",
+            "datacite_websnap.api.get_datacite_list_dois_xml",
             return_value=mock_xml_list,
         ),
         patch("datacite_websnap.cli.validate_s3_config"),
         patch("datacite_websnap.cli.create_s3_client", return_value=MagicMock()),
-        patch("datacite_websnap.cli.get_datacite_client"),
-        patch("datacite_websnap.cli.s3_client_put_object"),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.sinks.s3_client_put_object"),
         patch("datacite_websnap.cli.CustomEcho"),
-        patch("datacite_websnap.cli.validate_single_string_key_value"),
-        patch("datacite_websnap.cli.decode_base64_xml", return_value=b"<hello>"),
+        patch("datacite_websnap.record.decode_base64_xml", return_value=b"<hello>"),
         patch(
-            "datacite_websnap.cli.format_xml_file_name", return_value="10.123_abc.xml"
+            "datacite_websnap.api.format_xml_file_name", return_value="10.123_abc.xml"
         ),
     ):
         result = runner.invoke(
@@ -57,21 +80,20 @@ def test_export_command_local_success(tmp_path):
     runner = click.testing.CliRunner()
 
     mock_xml_list = [
-        {"10.123/abc": "PGhlbGxvPjwvaGVsbG8+"}  # Base64 for <hello>
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")  # Base64 for <hello>
     ]
 
     with (
         patch(
-            "datacite_websnap.cli.get_datacite_list_dois_xml",
+            "datacite_websnap.api.get_datacite_list_dois_xml",
             return_value=mock_xml_list,
         ),
-        patch("datacite_websnap.cli.get_datacite_client"),
-        patch("datacite_websnap.cli.write_local_file") as mock_write_file,
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.sinks.write_local_file") as mock_write_file,
         patch("datacite_websnap.cli.CustomEcho"),
-        patch("datacite_websnap.cli.validate_single_string_key_value"),
-        patch("datacite_websnap.cli.decode_base64_xml", return_value=b"<hello>"),
+        patch("datacite_websnap.record.decode_base64_xml", return_value=b"<hello>"),
         patch(
-            "datacite_websnap.cli.format_xml_file_name", return_value="10.123_abc.xml"
+            "datacite_websnap.api.format_xml_file_name", return_value="10.123_abc.xml"
         ),
     ):
         result = runner.invoke(
@@ -96,21 +118,17 @@ def test_export_command_error_early_exit(tmp_path):
     runner = click.testing.CliRunner()
 
     mock_xml_list = [
-        {"10.123/abc": "invalid==="}  # Intentionally trigger decode error
+        DataCiteRecord("10.123/abc", "abc")  # Incorrect padding triggers decode error
     ]
 
     with (
         patch(
-            "datacite_websnap.cli.get_datacite_list_dois_xml",
+            "datacite_websnap.api.get_datacite_list_dois_xml",
             return_value=mock_xml_list,
         ),
-        patch("datacite_websnap.cli.get_datacite_client"),
-        patch("datacite_websnap.cli.CustomWarning") as mock_warning,
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.api.CustomWarning") as mock_warning,
         patch("datacite_websnap.cli.CustomEcho"),
-        patch(
-            "datacite_websnap.cli.validate_single_string_key_value",
-            side_effect=CustomClickException("Validation failed"),
-        ),
     ):
         result = runner.invoke(
             cli,
@@ -135,21 +153,17 @@ def test_export_command_error_continue(tmp_path):
     runner = click.testing.CliRunner()
 
     mock_xml_list = [
-        {"10.123/abc": "invalid==="}  # Intentionally trigger decode error
+        DataCiteRecord("10.123/abc", "abc")  # Incorrect padding triggers decode error
     ]
 
     with (
         patch(
-            "datacite_websnap.cli.get_datacite_list_dois_xml",
+            "datacite_websnap.api.get_datacite_list_dois_xml",
             return_value=mock_xml_list,
         ),
-        patch("datacite_websnap.cli.get_datacite_client"),
-        patch("datacite_websnap.cli.CustomWarning") as mock_warning,
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.api.CustomWarning") as mock_warning,
         patch("datacite_websnap.cli.CustomEcho"),
-        patch(
-            "datacite_websnap.cli.validate_single_string_key_value",
-            side_effect=CustomClickException("Validation failed"),
-        ),
     ):
         result = runner.invoke(
             cli,
@@ -162,8 +176,569 @@ def test_export_command_error_continue(tmp_path):
                 "--directory-path",
                 str(tmp_path),
                 "--file-logs",
+                "--dead-letter-file",
+                str(tmp_path / "dead-letter.jsonl"),
             ],
         )
 
     assert result.exit_code == 0
     mock_warning.assert_called_once()
+    assert (tmp_path / "dead-letter.jsonl").exists()
+
+
+def test_export_command_dois_not_found_are_dead_lettered(tmp_path):
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+    export_path = tmp_path / "export"
+    export_path.mkdir()
+
+    with (
+        DataCiteStub(2) as datacite,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomWarning"),
+        patch("datacite_websnap.failed_records.CustomEcho"),
+    ):
+        datacite_bulk_export.callback(
+            doi=(stub_doi(0), "10.5072/missing"),
+            destination=("local",),
+            directory_path=str(export_path),
+            api_url=datacite.url,
+            dead_letter_file=str(dead_letter_file),
+        )
+
+    assert len(list(export_path.glob("*.xml"))) == 1
+    lines = [json.loads(line) for line in dead_letter_file.read_text().splitlines()]
+    assert lines == [
+        {
+            "doi": "10.5072/missing",
+            "stage": "lookup",
+            "error": "DOI '10.5072/missing' not returned by DataCite API",
+        }
+    ]
+
+
+def test_export_command_circuit_breaker_aborts(tmp_path):
+    runner = click.testing.CliRunner()
+
+    mock_xml_list = [
+        DataCiteRecord(f"10.123/{i}", "PGhlbGxvPjwvaGVsbG8+") for i in range(5)
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.cli.validate_s3_config"),
+        patch("datacite_websnap.cli.create_s3_client", return_value=MagicMock()),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch(
+            "datacite_websnap.sinks.s3_client_put_object",
+            side_effect=CustomTransportException("Connection refused"),
+        ) as mock_put,
+        patch("datacite_websnap.sinks.s3_client_head_bucket", return_value=False),
+        patch("datacite_websnap.circuit_breaker.time.sleep"),
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.api.CustomWarning"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--bucket",
+                "test-bucket",
+                "--circuit-breaker-threshold",
+                "2",
+            ],
+        )
+
+    assert result.exit_code != 0
+    assert mock_put.call_count == 2
+    assert "0/5 records exported, 2 failed, 3 not attempted" in result.output
+
+
+def test_export_command_retries_failed_records(tmp_path):
+    runner = click.testing.CliRunner()
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+
+    mock_xml_list = [
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+"),
+        DataCiteRecord("10.123/def", "PGhlbGxvPjwvaGVsbG8+"),
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch(
+            "datacite_websnap.sinks.write_local_file",
+            side_effect=[CustomClickException("Disk busy"), None, None],
+        ) as mock_write_file,
+        patch("datacite_websnap.failed_records.time.sleep"),
+        patch("datacite_websnap.api.CustomWarning"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--dead-letter-file",
+                str(dead_letter_file),
+            ],
+        )
+
+    assert result.exit_code == 0
+    assert mock_write_file.call_count == 3
+    assert not dead_letter_file.exists()
+    assert "2/2 records exported, 0 failed" in result.output
+
+
+def test_export_command_writes_dead_letter_file(tmp_path):
+    runner = click.testing.CliRunner()
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+
+    mock_xml_list = [
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+"),
+        DataCiteRecord("10.123/def", "abc"),  # Incorrect padding triggers decode error
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch(
+            "datacite_websnap.sinks.write_local_file",
+            side_effect=CustomClickException("Disk full"),
+        ),
+        patch("datacite_websnap.failed_records.time.sleep"),
+        patch("datacite_websnap.api.CustomWarning"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--retry-attempts",
+                "1",
+                "--dead-letter-file",
+                str(dead_letter_file),
+            ],
+        )
+
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in dead_letter_file.read_text().splitlines()]
+    assert {(line["doi"], line["stage"]) for line in lines} == {
+        ("10.123/abc", "export"),
+        ("10.123/def", "decode"),
+    }
+
+
+def test_export_command_retry_failed_file(tmp_path):
+    runner = click.testing.CliRunner()
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+    dead_letter_file.write_text(
+        '{"doi": "10.123/abc", "stage": "export", "error": "timeout"}\n'
+    )
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_dois_xml_by_id",
+            return_value=[DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")],
+        ) as mock_get_by_id,
+        patch("datacite_websnap.api.get_datacite_list_dois_xml") as mock_get_list,
+        patch("datacite_websnap.sinks.write_local_file") as mock_write_file,
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--retry-failed",
+                str(dead_letter_file),
+            ],
+        )
+
+    assert result.exit_code == 0
+    assert mock_get_by_id.call_args.args[1] == ("10.123/abc",)
+    mock_get_list.assert_not_called()
+    mock_write_file.assert_called_once()
+
+
+def test_export_command_replay_pages(tmp_path):
+    runner = click.testing.CliRunner()
+
+    with (
+        patch(
+            "datacite_websnap.api.get_recorded_list_dois_xml",
+            return_value=[DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")],
+        ) as mock_replay,
+        patch("datacite_websnap.api.get_datacite_list_dois_xml") as mock_get_list,
+        patch("datacite_websnap.api.get_datacite_client") as mock_get_client,
+        patch("datacite_websnap.sinks.write_local_file") as mock_write_file,
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--replay-pages",
+                str(tmp_path),
+            ],
+        )
+
+    assert result.exit_code == 0
+    mock_replay.assert_called_once_with(str(tmp_path), False, stream=True, on_page=None)
+    mock_get_list.assert_not_called()
+    mock_get_client.assert_not_called()
+    mock_write_file.assert_called_once()
+
+
+def test_export_command_doi_and_doi_file(tmp_path):
+    runner = click.testing.CliRunner()
+    doi_file = tmp_path / "dois.txt"
+    doi_file.write_text("10.123/def\n10.123/abc\n")
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_dois_xml_by_id",
+            return_value=[DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")],
+        ) as mock_get_by_id,
+        patch("datacite_websnap.sinks.write_local_file"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--doi",
+                "10.123/abc",
+                "--doi-file",
+                str(doi_file),
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--lookup-workers",
+                "2",
+            ],
+        )
+
+    assert result.exit_code == 0
+    assert mock_get_by_id.call_args.args[1] == ("10.123/abc", "10.123/def")
+    assert mock_get_by_id.call_args.kwargs["workers"] == 2
+
+
+def test_export_command_doi_with_client_id_fails(tmp_path):
+    runner = click.testing.CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "export",
+            "--doi",
+            "10.123/abc",
+            "--client-id",
+            "test-client",
+            "--destination",
+            "local",
+            "--directory-path",
+            str(tmp_path),
+        ],
+    )
+
+    assert result.exit_code != 0
+
+
+def test_export_command_filters(tmp_path):
+    runner = click.testing.CliRunner()
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=[DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+")],
+        ) as mock_get_list,
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.sinks.write_local_file"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--state",
+                "findable",
+                "--resource-type-id",
+                "dataset",
+                "--created",
+                "2024",
+                "--query",
+                "titles.title:snow",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+            ],
+        )
+
+    assert result.exit_code == 0
+    assert mock_get_list.call_args.args[6] == {
+        "state": "findable",
+        "resource-type-id": "dataset",
+        "created": "2024",
+        "query": "titles.title:snow",
+    }
+
+
+def test_export_command_validate_xml(tmp_path):
+    runner = click.testing.CliRunner()
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+
+    mock_xml_list = [
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+"),  # <hello></hello>
+        DataCiteRecord("10.123/def", "PGhlbGxvPg=="),  # <hello>, not well-formed
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.sinks.write_local_file") as mock_write,
+        patch("datacite_websnap.api.CustomWarning") as mock_warning,
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--validate-xml",
+                "well-formed",
+                "--validation-workers",
+                "1",
+                "--dead-letter-file",
+                str(dead_letter_file),
+            ],
+        )
+
+    assert result.exit_code == 0
+    mock_write.assert_called_once()
+    assert mock_write.call_args.kwargs["filename"] == "10.123_abc.xml"
+    assert "Invalid XML for DOI '10.123/def'" in mock_warning.call_args.args[0]
+    line = json.loads(dead_letter_file.read_text())
+    assert (line["doi"], line["stage"]) == ("10.123/def", "xml")
+    assert "1/2 records exported, 1 failed" in result.output
+
+
+def test_export_command_compress_gzip(tmp_path):
+    runner = click.testing.CliRunner()
+
+    mock_xml_list = [
+        DataCiteRecord("10.123/abc", "PGhlbGxvPjwvaGVsbG8+"),  # <hello></hello>
+        DataCiteRecord("10.123/def", "PGhlbGxvPjwvaGVsbG8+"),
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--compress",
+                "gzip",
+            ],
+        )
+
+    assert result.exit_code == 0
+    for name in ("10.123_abc.xml.gz", "10.123_def.xml.gz"):
+        assert gzip.decompress((tmp_path / name).read_bytes()) == b"<hello></hello>"
+    assert "gzip compression ratio" in result.output
+
+
+def test_export_command_sharded_layout_workers(tmp_path):
+    runner = click.testing.CliRunner()
+
+    mock_xml_list = [
+        DataCiteRecord(f"10.123/abc.{i}", "PGhlbGxvPjwvaGVsbG8+") for i in range(20)
+    ]
+
+    with (
+        patch(
+            "datacite_websnap.api.get_datacite_list_dois_xml",
+            return_value=mock_xml_list,
+        ),
+        patch("datacite_websnap.api.get_datacite_client"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+    ):
+        result = runner.invoke(
+            cli,
+            [
+                "export",
+                "--client-id",
+                "test-client",
+                "--destination",
+                "local",
+                "--directory-path",
+                str(tmp_path),
+                "--layout",
+                "doi-suffix",
+                "--workers",
+                "4",
+            ],
+        )
+
+    assert result.exit_code == 0
+    files = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.xml"))
+    assert files == sorted(f"ab/c{str(i)[0]}/10.123_abc.{i}.xml" for i in range(20))
+    assert "20/20 records exported" in result.output
+
+
+def test_export_command_multiple_destinations(monkeypatch, tmp_path):
+    for prefix in ("", "MIRROR_"):
+        monkeypatch.setenv(f"{prefix}AWS_ACCESS_KEY_ID", "a")
+        monkeypatch.setenv(f"{prefix}AWS_SECRET_ACCESS_KEY", "b")
+
+    with (
+        DataCiteStub(20) as datacite,
+        S3Stub() as primary,
+        S3Stub() as mirror,
+        patch("datacite_websnap.cli.CustomEcho") as mock_echo,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+    ):
+        monkeypatch.setenv("ENDPOINT_URL", primary.url)
+        monkeypatch.setenv("MIRROR_ENDPOINT_URL", mirror.url)
+        monkeypatch.setenv("MIRROR_BUCKET", STUB_BUCKET)
+        monkeypatch.setenv("MIRROR_S3_TRANSPORT", "pool-size=6,tcp-keepalive")
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            destination=("S3", "S3:mirror,workers=4", "local"),
+            bucket=STUB_BUCKET,
+            directory_path=str(tmp_path),
+            api_url=datacite.url,
+            page_size=10,
+            workers=16,
+            s3_transport="path-style",
+        )
+        requests = datacite.requests
+
+    assert requests == 3
+    assert primary.objects == mirror.objects
+    assert len(primary.objects) == 20
+    assert len(list(tmp_path.glob("*.xml"))) == 20
+    summaries = [c.args[0] for c in mock_echo.call_args_list if "summary" in c.args[0]]
+    assert summaries == [
+        f"Export summary ({name}): 20/20 records exported, 0 failed, 0 not attempted"
+        for name in ("S3", "S3:mirror", "local")
+    ]
+
+    # The connection pool is sized to the workers of each S3 destination
+    transports = [
+        c.args[0] for c in mock_echo.call_args_list if "transport" in c.args[0]
+    ]
+    assert transports == [
+        "S3 transport (S3): 20 pooled connection(s) (sized to 16 worker(s)), standard "
+        "retries (4 attempt(s)), connect timeout 5s, read timeout 32s, TCP keepalive "
+        "off, path-style addressing",
+        "S3 transport (S3:mirror): 6 pooled connection(s), standard retries "
+        "(4 attempt(s)), connect timeout 5s, read timeout 32s, TCP keepalive on, "
+        "path-style addressing",
+    ]
+
+
+def test_export_command_stdout(monkeypatch, capsys):
+    monkeypatch.setattr(logger, "_echo_err", False)
+
+    with DataCiteStub(5) as datacite:
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            destination=("stdout",),
+            api_url=datacite.url,
+            workers=2,
+        )
+
+    # Records are written to stdout and messages to stderr
+    captured = capsys.readouterr()
+    lines = [json.loads(line) for line in captured.out.splitlines()]
+    assert [line["doi"] for line in lines] == [stub_doi(i) for i in range(5)]
+    assert lines[0]["xml"] == stub_xml(0).decode()
+    assert "Finished DataCite bulk export" in captured.err
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (["--compress", "gzip"], "'--compress' cannot be used"),
+        (["--layout", "hash"], "'--layout hash' cannot be used"),
+        (["--destination", "stdout,format=zip"], "Invalid setting 'format=zip'"),
+    ],
+)
+def test_export_command_stdout_invalid_options(monkeypatch, args, message):
+    monkeypatch.setattr(logger, "_echo_err", False)
+    runner = click.testing.CliRunner()
+    result = runner.invoke(
+        cli,
+        ["export", "--client-id", STUB_CLIENT_ID, "--destination", "stdout", *args],
+    )
+    assert result.exit_code == 2
+    assert message in result.stderr
+
+
+def test_close_destinations_closes_every_sink():
+    failing = MagicMock(name="failing")
+    failing.close.side_effect = OSError("Broken pipe")
+    healthy = MagicMock(name="healthy")
+    destinations = [Destination(failing, name="stdout"), Destination(healthy)]
+
+    # An export error is propagating, close errors are only warned about
+    with patch("datacite_websnap.cli.CustomWarning") as warning:
+        _close_destinations(destinations, failed=True)
+    healthy.close.assert_called_once()
+    assert (
+        "Failed to close stdout destination: Broken pipe" in (warning.call_args.args[0])
+    )
+
+    # Otherwise the close error is raised after every sink is closed
+    healthy.close.reset_mock()
+    with pytest.raises(OSError, match="Broken pipe"):
+        _close_destinations(destinations)
+    healthy.close.assert_called_once()
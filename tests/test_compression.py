@@ -0,0 +1,41 @@
+"""Tests for src/datacite-websnap/compression.py"""
+
+import gzip
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.compression import compress_bytes, validate_compression
+from datacite_websnap.logger import CustomClickException
+
+XML = b'<?xml version="1.0"?><resource>' + b"<title>snow</title>" * 100 + b"</resource>"
+
+
+def test_compress_bytes_gzip_is_deterministic():
+    compressed = compress_bytes(XML, "gzip")
+
+    assert gzip.decompress(compressed) == XML
+    assert compress_bytes(XML, "gzip") == compressed
+    assert len(compressed) < len(XML)
+
+
+def test_compress_bytes_zstd():
+    zstandard = pytest.importorskip("zstandard")
+
+    compressed = compress_bytes(XML, "zstd")
+
+    assert zstandard.ZstdDecompressor().decompress(compressed) == XML
+
+
+def test_compress_bytes_unsupported():
+    with pytest.raises(CustomClickException, match="Failed to compress record"):
+        compress_bytes(XML, "brotli")
+
+
+def test_validate_compression_zstd_not_installed():
+    assert validate_compression("gzip") == "gzip"
+
+    with patch.dict(sys.modules, {"zstandard": None}):
+        with pytest.raises(CustomClickException, match="zstandard"):
+            validate_compression("zstd")
@@ -0,0 +1,111 @@
+"""Tests for src/datacite-websnap/concurrency.py"""
+
+import threading
+from unittest.mock import patch
+
+from datacite_websnap.api import ExportOptions, ExportQuery, Exporter
+from datacite_websnap.concurrency import AdaptiveConcurrency
+from datacite_websnap.exporter import create_s3_client
+from datacite_websnap.sinks import S3Sink
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+def complete(concurrency, latency=0.01, congested=False, writes=1):
+    for _ in range(writes):
+        concurrency.release(concurrency.acquire(), latency, congested)
+
+
+def test_additive_increase_per_window():
+    concurrency = AdaptiveConcurrency(max_limit=4, initial=2)
+
+    complete(concurrency, writes=2)
+    assert concurrency.limit == 3
+    complete(concurrency, writes=3)
+    assert concurrency.limit == 4
+    complete(concurrency, writes=10)
+    assert concurrency.limit == 4
+
+
+def test_multiplicative_decrease_once_per_burst():
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8)
+    tickets = [concurrency.acquire() for _ in range(8)]
+
+    # All writes in flight were throttled, only the first signal cuts the limit
+    for ticket in tickets:
+        concurrency.release(ticket, 0.01, congested=True)
+    assert concurrency.limit == 4
+    assert concurrency.decreases == 1
+
+    # Writes that started after the decrease cut the limit again
+    complete(concurrency, congested=True)
+    assert concurrency.limit == 2
+    complete(concurrency, congested=True, writes=2)
+    assert concurrency.limit == 1
+
+
+def test_latency_spike_decreases_limit():
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=6, latency_floor=0.1)
+    complete(concurrency, latency=0.02, writes=5)
+
+    # Slower than the floor but not a spike relative to the average latency
+    complete(concurrency, latency=0.05)
+    assert concurrency.limit == 7
+
+    complete(concurrency, latency=0.5)
+    assert concurrency.limit == 3
+    assert [limit for _, limit in concurrency.timeline] == [6, 7, 3]
+
+
+def test_acquire_blocks_at_limit():
+    concurrency = AdaptiveConcurrency(max_limit=1, initial=1)
+    ticket = concurrency.acquire()
+    started = threading.Event()
+
+    def write():
+        concurrency.release(concurrency.acquire(), 0.01)
+        started.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    assert not started.wait(0.1)
+
+    concurrency.release(ticket, 0.01)
+    assert started.wait(1)
+    thread.join()
+
+
+def test_export_adapts_to_throttling_endpoint():
+    with (
+        DataCiteStub(300) as datacite,
+        S3Stub(partition_rate=100, partition_length=1) as s3,
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.preflight.CustomEcho"),
+    ):
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        with Exporter(datacite.url) as exporter:
+            result = exporter.export(
+                ExportQuery(client_id=STUB_CLIENT_ID),
+                S3Sink(client, STUB_BUCKET),
+                ExportOptions(
+                    adaptive_concurrency=True,
+                    workers=16,
+                    circuit_breaker_threshold=0,
+                ),
+            )
+
+    # Throttled requests are retried by boto3 and surface as latency spikes
+    timeline = result.stats.concurrency_timeline
+    assert s3.throttled
+    assert result.stats.exported == 300
+    assert any(
+        after < before for (_, before), (_, after) in zip(timeline, timeline[1:])
+    )
+    assert "adaptive concurrency 2@0.0s" in result.stats.summary()
@@ -4,11 +4,17 @@ import pytest
 from unittest.mock import patch, MagicMock
 import requests
 
+from datacite_websnap.record import DataCiteRecord
 from datacite_websnap.datacite_handler import (
     get_url_json,
     get_datacite_client,
     extract_doi_xml,
     get_datacite_list_dois_xml,
+    get_datacite_dois_xml_by_id,
+    get_recorded_list_dois_xml,
+    format_doi_query,
+    format_datacite_filters,
+    get_datacite_dois,
     CustomClickException,
 )
 
@@ -72,7 +78,10 @@ def test_extract_doi_xml_valid():
             {"attributes": {"doi": "10.123/def", "xml": "<xml2>"}},
         ]
     }
-    expected = [{"10.123/abc": "<xml1>"}, {"10.123/def": "<xml2>"}]
+    expected = [
+        DataCiteRecord("10.123/abc", "<xml1>"),
+        DataCiteRecord("10.123/def", "<xml2>"),
+    ]
     assert extract_doi_xml(data) == expected
 
 
@@ -102,7 +111,7 @@ def test_get_datacite_list_dois_xml_single_page():
                 file_logs=False,
             )
             assert len(results) == 2
-            assert {"10.123/abc": "<xml1>"} in results
+            assert DataCiteRecord("10.123/abc", "<xml1>") in results
 
 
 def test_get_datacite_list_dois_xml_zero_records():
@@ -156,10 +165,10 @@ def test_get_datacite_list_dois_xml_multiple_pages():
             )
 
     expected = [
-        {"10.123/abc": "<xml1>"},
-        {"10.123/def": "<xml2>"},
-        {"10.123/ghi": "<xml3>"},
-        {"10.123/jkl": "<xml4>"},
+        DataCiteRecord("10.123/abc", "<xml1>"),
+        DataCiteRecord("10.123/def", "<xml2>"),
+        DataCiteRecord("10.123/ghi", "<xml3>"),
+        DataCiteRecord("10.123/jkl", "<xml4>"),
     ]
 
     assert result == expected
@@ -184,3 +193,184 @@ def test_get_datacite_list_dois_xml_mismatched_total_records():
                 client_id="test-client",
                 file_logs=False,
             )
+
+
+def test_format_doi_query():
+    assert format_doi_query(("10.123/abc", "10.123/def")) == (
+        'doi:("10.123/abc" OR "10.123/def")'
+    )
+
+
+def test_get_datacite_dois_xml_by_id_batches_dois():
+    responses = {
+        'doi:("10.123/abc" OR "10.123/def")': {
+            "data": [
+                {"attributes": {"doi": "10.123/abc", "xml": "<xml1>"}},
+                {"attributes": {"doi": "10.123/def", "xml": "<xml2>"}},
+            ]
+        },
+        'doi:("10.123/GHI")': {
+            "data": [{"attributes": {"doi": "10.123/ghi", "xml": "<xml3>"}}]
+        },
+    }
+
+    def mock_get_url_json(url, params=None, **kwargs):
+        return responses[params["query"]]
+
+    with (
+        patch(
+            "datacite_websnap.datacite_handler.get_url_json",
+            side_effect=mock_get_url_json,
+        ) as mock_get,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomWarning") as mock_warning,
+    ):
+        result = get_datacite_dois_xml_by_id(
+            "https://api.example.org",
+            ("10.123/abc", "10.123/def", "10.123/GHI", "10.123/abc"),
+            batch_size=2,
+            workers=2,
+        )
+
+    assert result == [
+        DataCiteRecord("10.123/abc", "<xml1>"),
+        DataCiteRecord("10.123/def", "<xml2>"),
+        DataCiteRecord("10.123/ghi", "<xml3>"),
+    ]
+    assert mock_get.call_count == 2
+    assert mock_get.call_args.args[0] == "https://api.example.org/dois"
+    mock_warning.assert_not_called()
+
+
+def test_get_datacite_dois_xml_by_id_warns_missing_and_failed_batches():
+    def mock_get_url_json(url, params=None, **kwargs):
+        if "10.123/abc" in params["query"]:
+            return {"data": []}
+        raise CustomClickException("HTTP error: 500")
+
+    with (
+        patch(
+            "datacite_websnap.datacite_handler.get_url_json",
+            side_effect=mock_get_url_json,
+        ),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomWarning") as mock_warning,
+    ):
+        failed = []
+        result = get_datacite_dois_xml_by_id(
+            "https://api.example.org",
+            ("10.123/abc", "10.123/def"),
+            batch_size=1,
+            on_failed=lambda doi, error: failed.append((doi, error)),
+        )
+
+    assert result == []
+    # One warning for the failed batch, one listing both missing DOIs
+    assert mock_warning.call_count == 2
+    assert "10.123/abc, 10.123/def" in mock_warning.call_args.args[0]
+    assert failed == [
+        ("10.123/abc", "DOI '10.123/abc' not returned by DataCite API"),
+        ("10.123/def", "Failed to retrieve DOI '10.123/def': HTTP error: 500"),
+    ]
+
+
+def test_get_datacite_list_dois_xml_record_and_replay(tmp_path):
+    first_page = {
+        "meta": {"total": 2, "totalPages": 2},
+        "links": {"next": "https://next.page"},
+        "data": [{"attributes": {"doi": "10.123/abc", "xml": "<xml1>"}}],
+    }
+    second_page = {
+        "meta": {"total": 2, "totalPages": 2},
+        "links": {},
+        "data": [{"attributes": {"doi": "10.123/def", "xml": "<xml2>"}}],
+    }
+
+    with (
+        patch(
+            "datacite_websnap.datacite_handler.get_datacite_dois",
+            return_value=first_page,
+        ),
+        patch(
+            "datacite_websnap.datacite_handler.get_url_json", return_value=second_page
+        ),
+    ):
+        recorded = get_datacite_list_dois_xml(
+            api_url="https://api.example.org",
+            client_id="test-client",
+            record_pages=str(tmp_path),
+        )
+
+    with (
+        patch("datacite_websnap.datacite_handler.get_datacite_dois") as mock_dois,
+        patch("datacite_websnap.datacite_handler.get_url_json") as mock_get,
+    ):
+        replayed = get_recorded_list_dois_xml(str(tmp_path))
+
+    mock_dois.assert_not_called()
+    mock_get.assert_not_called()
+    assert (
+        replayed
+        == recorded
+        == [
+            DataCiteRecord("10.123/abc", "<xml1>"),
+            DataCiteRecord("10.123/def", "<xml2>"),
+        ]
+    )
+
+
+def test_format_datacite_filters():
+    filters = format_datacite_filters(
+        state=("findable",),
+        resource_type_id=("dataset", "software"),
+        created=("2023", "2024"),
+        query="titles.title:snow",
+    )
+    assert filters == {
+        "state": "findable",
+        "resource-type-id": "dataset,software",
+        "created": "2023,2024",
+        "query": "titles.title:snow",
+    }
+    assert format_datacite_filters() == {}
+
+
+def test_get_datacite_dois_params():
+    with patch("datacite_websnap.datacite_handler.get_url_json") as mock_get:
+        get_datacite_dois(
+            "https://api.example.org",
+            "client123",
+            ("10.123",),
+            page_size=100,
+            filters={"state": "findable", "registered": "2024"},
+        )
+
+    assert mock_get.call_args.kwargs["params"] == {
+        "state": "findable",
+        "registered": "2024",
+        "prefix": "10.123",
+        "client-id": "client123",
+        "detail": "true",
+        "page[cursor]": 1,
+        "page[size]": 100,
+    }
+
+
+def test_get_datacite_dois_xml_by_id_with_filters():
+    with (
+        patch(
+            "datacite_websnap.datacite_handler.get_url_json",
+            return_value={"data": []},
+        ) as mock_get,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomWarning"),
+    ):
+        get_datacite_dois_xml_by_id(
+            "https://api.example.org",
+            ("10.123/abc",),
+            filters={"state": "findable", "query": "titles.title:snow"},
+        )
+
+    params = mock_get.call_args.kwargs["params"]
+    assert params["state"] == "findable"
+    assert params["query"] == 'doi:("10.123/abc") AND (titles.title:snow)'
@@ -2,7 +2,7 @@
 
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
-from botocore.exceptions import BotoCoreError, ClientError
+from botocore.exceptions import BotoCoreError, ClientError, EndpointConnectionError
 
 from datacite_websnap.exporter import (
     decode_base64_xml,
@@ -11,8 +11,13 @@ from datacite_websnap.exporter import (
     create_s3_client,
     write_local_file,
     s3_client_put_object,
+    s3_client_head_bucket,
+    s3_client_get_object,
+    format_shard_prefix,
+    DirectorySyncer,
 )
-from datacite_websnap.validators import S3ConfigModel
+from datacite_websnap.logger import CustomTransportException
+from datacite_websnap.validators import S3ConfigModel, S3TransportModel
 
 
 def test_decode_base64_xml_valid():
@@ -80,6 +85,28 @@ def test_create_s3_client_success(mock_boto3_session):
     assert result == mock_client
 
 
+def test_create_s3_client_transport():
+    conf_s3 = S3ConfigModel(
+        aws_access_key_id="fake_access_key",
+        aws_secret_access_key="fake_secret_key",
+        endpoint_url="http://fake-s3-endpoint.com",
+    )
+
+    client = create_s3_client(
+        conf_s3,
+        transport=S3TransportModel(
+            retry_mode="adaptive", tcp_keepalive=True, path_style=True
+        ),
+        concurrency=48,
+    )
+
+    config = client.meta.config
+    assert config.max_pool_connections == 52
+    assert config.retries == {"mode": "adaptive", "total_max_attempts": 4}
+    assert config.tcp_keepalive is True
+    assert config.s3 == {"addressing_style": "path"}
+
+
 @patch("boto3.Session")
 def test_create_s3_client_failure(mock_boto3_session):
     """Test that CustomClickException is raised if boto3 client creation fails."""
@@ -139,6 +166,75 @@ def test_s3_client_put_object_client_error():
         )
 
 
+def test_s3_client_put_object_connection_error():
+    mock_client = MagicMock()
+    mock_client.put_object.side_effect = EndpointConnectionError(
+        endpoint_url="https://fake-s3-endpoint.com"
+    )
+
+    with pytest.raises(CustomTransportException):
+        s3_client_put_object(
+            client=mock_client,
+            body=b"<xml>error</xml>",
+            bucket="test-bucket",
+            key="fail.xml",
+        )
+
+
+def test_s3_client_put_object_server_error_is_transport_error():
+    mock_client = MagicMock()
+    mock_client.put_object.side_effect = ClientError(
+        {
+            "Error": {"Code": "SlowDown", "Message": "Please reduce your request rate"},
+            "ResponseMetadata": {"HTTPStatusCode": 503},
+        },
+        "PutObject",
+    )
+
+    with pytest.raises(CustomTransportException):
+        s3_client_put_object(
+            client=mock_client,
+            body=b"<xml>error</xml>",
+            bucket="test-bucket",
+            key="fail.xml",
+        )
+
+
+def test_s3_client_put_object_client_error_is_not_transport_error():
+    mock_client = MagicMock()
+    mock_client.put_object.side_effect = ClientError(
+        {
+            "Error": {"Code": "AccessDenied", "Message": "Access Denied"},
+            "ResponseMetadata": {"HTTPStatusCode": 403},
+        },
+        "PutObject",
+    )
+
+    with pytest.raises(CustomClickException) as exc:
+        s3_client_put_object(
+            client=mock_client,
+            body=b"<xml>error</xml>",
+            bucket="test-bucket",
+            key="fail.xml",
+        )
+
+    assert not isinstance(exc.value, CustomTransportException)
+
+
+def test_s3_client_head_bucket_success():
+    mock_client = MagicMock()
+    mock_client.head_bucket.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+    assert s3_client_head_bucket(mock_client, "test-bucket") is True
+
+
+def test_s3_client_head_bucket_failure():
+    mock_client = MagicMock()
+    mock_client.head_bucket.side_effect = EndpointConnectionError(
+        endpoint_url="https://fake-s3-endpoint.com"
+    )
+    assert s3_client_head_bucket(mock_client, "test-bucket") is False
+
+
 def test_s3_client_put_object_exception():
     mock_client = MagicMock()
     mock_client.put_object.side_effect = Exception(
@@ -169,6 +265,62 @@ def test_s3_client_put_object_non_200_status():
         )
 
 
+def test_s3_client_put_object_compressed():
+    mock_client = MagicMock()
+    mock_client.put_object.return_value = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    s3_client_put_object(
+        client=mock_client,
+        body=b"compressed",
+        bucket="test-bucket",
+        key="test_key.xml",
+        compression="gzip",
+    )
+
+    mock_client.put_object.assert_called_once_with(
+        Body=b"compressed",
+        Bucket="test-bucket",
+        Key="test_key.xml",
+        ContentEncoding="gzip",
+        ContentType="application/xml",
+    )
+
+
+def test_format_shard_prefix():
+    doi = "10.16904/EnviDat.31"
+    assert format_shard_prefix(doi) == ""
+    assert format_shard_prefix(doi, "doi-suffix") == "en/vi/"
+    assert format_shard_prefix("10.16904/a.1", "doi-suffix") == "a1/__/"
+
+    prefix = format_shard_prefix(doi, "hash")
+    assert len(prefix) == 6 and prefix[2] == "/" and prefix[5] == "/"
+    assert format_shard_prefix(doi.lower(), "hash") == prefix
+
+
+def test_format_xml_file_name_with_layout():
+    result = format_xml_file_name("10.16904/envidat.31", "data", "doi-suffix")
+    assert result == "data/en/vi/10.16904_envidat.31.xml"
+
+
+def test_s3_client_get_object_missing_key():
+    mock_client = MagicMock()
+    mock_client.get_object.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+    )
+
+    assert s3_client_get_object(mock_client, "bucket", "missing.json") is None
+
+
+def test_s3_client_get_object_error():
+    mock_client = MagicMock()
+    mock_client.get_object.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "GetObject"
+    )
+
+    with pytest.raises(CustomClickException):
+        s3_client_get_object(mock_client, "bucket", "index.json")
+
+
 def test_write_local_file_success(tmp_path):
     content = b"<xml>test</xml>"
     filename = "test.xml"
@@ -180,6 +332,55 @@ def test_write_local_file_success(tmp_path):
     assert file_path.read_bytes() == content
 
 
+def test_write_local_file_compressed(tmp_path):
+    write_local_file(b"compressed", "test.xml", str(tmp_path), compression="zstd")
+
+    assert (tmp_path / "test.xml.zst").read_bytes() == b"compressed"
+    assert not (tmp_path / "test.xml").exists()
+
+
+def test_write_local_file_sharded_and_atomic(tmp_path):
+    syncer = DirectorySyncer(batch_size=2)
+
+    for name in ("a.xml", "b.xml", "c.xml"):
+        write_local_file(b"<xml/>", f"ab/cd/{name}", str(tmp_path), syncer=syncer)
+
+    assert sorted(p.name for p in (tmp_path / "ab" / "cd").iterdir()) == [
+        "a.xml",
+        "b.xml",
+        "c.xml",
+    ]
+    assert syncer.synced == 1
+    syncer.flush()
+    assert syncer.synced == 2
+
+
+def test_write_local_file_mode_and_fsync(tmp_path):
+    (tmp_path / "reference.xml").write_bytes(b"<xml/>")
+
+    with patch("datacite_websnap.exporter.os.fsync") as mock_fsync:
+        write_local_file(b"<xml/>", "test.xml", str(tmp_path))
+        assert not mock_fsync.called
+        write_local_file(b"<xml/>", "durable.xml", str(tmp_path), fsync=True)
+        assert mock_fsync.call_count == 1
+
+    # Files have the mode of files created with open(), not the 0600 of temp files
+    mode = (tmp_path / "reference.xml").stat().st_mode & 0o777
+    assert (tmp_path / "test.xml").stat().st_mode & 0o777 == mode
+    assert (tmp_path / "durable.xml").stat().st_mode & 0o777 == mode
+
+
+def test_write_local_file_removes_temp_file_on_error(tmp_path):
+    (tmp_path / "test.xml").write_bytes(b"<old/>")
+
+    with patch("datacite_websnap.exporter.os.replace", side_effect=OSError("boom")):
+        with pytest.raises(CustomClickException):
+            write_local_file(b"<new/>", "test.xml", str(tmp_path))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["test.xml"]
+    assert (tmp_path / "test.xml").read_bytes() == b"<old/>"
+
+
 @patch("builtins.open", new_callable=mock_open)
 def test_write_local_file_ioerror(mock_open_fn):
     # Simulate IOError when opening file
@@ -0,0 +1,93 @@
+"""Tests for src/datacite-websnap/failed_records.py"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from datacite_websnap.failed_records import (
+    FailedRecord,
+    retry_failed_records,
+    write_dead_letter_file,
+    read_dead_letter_file,
+)
+from datacite_websnap.logger import CustomClickException
+
+
+@patch("datacite_websnap.failed_records.time.sleep")
+@patch("datacite_websnap.failed_records.CustomEcho")
+@patch("datacite_websnap.failed_records.CustomWarning")
+def test_retry_failed_records_recovers(mock_warning, mock_echo, mock_sleep):
+    export_record = MagicMock(side_effect=[CustomClickException("timeout"), None])
+    failed = [
+        FailedRecord(
+            "10.123/abc", "export", "timeout", "PGE+PC9hPg==", "2025-01-01T00:00:00Z"
+        )
+    ]
+
+    still_failing = retry_failed_records(failed, export_record, attempts=3, backoff=2)
+
+    assert still_failing == []
+    assert export_record.call_count == 2
+    export_record.assert_called_with(
+        "10.123/abc", "PGE+PC9hPg==", "2025-01-01T00:00:00Z"
+    )
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [2, 4]
+
+
+@patch("datacite_websnap.failed_records.time.sleep")
+@patch("datacite_websnap.failed_records.CustomEcho")
+@patch("datacite_websnap.failed_records.CustomWarning")
+def test_retry_failed_records_still_failing(mock_warning, mock_echo, mock_sleep):
+    export_record = MagicMock(side_effect=CustomClickException("still down"))
+    failed = [FailedRecord("10.123/abc", "export", "timeout", "PGE+PC9hPg==")]
+
+    still_failing = retry_failed_records(failed, export_record, attempts=2)
+
+    assert len(still_failing) == 1
+    assert still_failing[0].error == "still down"
+    assert export_record.call_count == 2
+
+
+@patch("datacite_websnap.failed_records.time.sleep")
+def test_retry_failed_records_skips_decode_failures(mock_sleep):
+    export_record = MagicMock()
+    failed = [FailedRecord("10.123/abc", "decode", "binascii Error", "invalid===")]
+
+    still_failing = retry_failed_records(failed, export_record, attempts=2)
+
+    assert still_failing == failed
+    export_record.assert_not_called()
+    mock_sleep.assert_not_called()
+
+
+def test_write_and_read_dead_letter_file(tmp_path):
+    file_path = tmp_path / "dead-letter.jsonl"
+    failed = [
+        FailedRecord("10.123/abc", "export", "timeout", "PGE+PC9hPg=="),
+        FailedRecord("10.123/def", "decode", "binascii Error"),
+        FailedRecord("10.123/abc", "export", "timeout"),
+    ]
+
+    write_dead_letter_file(failed, str(file_path))
+
+    lines = file_path.read_text().splitlines()
+    assert json.loads(lines[0]) == {
+        "doi": "10.123/abc",
+        "stage": "export",
+        "error": "timeout",
+    }
+    assert read_dead_letter_file(str(file_path)) == ("10.123/abc", "10.123/def")
+
+
+def test_read_dead_letter_file_invalid(tmp_path):
+    file_path = tmp_path / "dead-letter.jsonl"
+    file_path.write_text('{"stage": "export"}\n')
+
+    with pytest.raises(CustomClickException):
+        read_dead_letter_file(str(file_path))
+
+
+def test_read_dead_letter_file_missing(tmp_path):
+    with pytest.raises(CustomClickException):
+        read_dead_letter_file(str(tmp_path / "missing.jsonl"))
@@ -0,0 +1,100 @@
+"""Tests for src/datacite-websnap/key_index.py"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.cli import datacite_bulk_export
+from datacite_websnap.exporter import create_s3_client, format_xml_file_name
+from datacite_websnap.key_index import (
+    format_index_key,
+    merge_key_index,
+    write_key_index,
+)
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.sinks import LocalSink, S3Sink
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+def test_format_index_key():
+    assert format_index_key() == "doi-index.json"
+    assert format_index_key("ethz.wsl/") == "ethz.wsl/doi-index.json"
+
+
+def test_merge_key_index_keeps_existing_entries():
+    existing = json.dumps({"10.123/b": "old/b.xml", "10.123/c": "c.xml"}).encode()
+
+    merged = json.loads(
+        merge_key_index(existing, {"10.123/b": "b.xml", "10.123/a": "a.xml"})
+    )
+
+    assert merged == {"10.123/a": "a.xml", "10.123/b": "b.xml", "10.123/c": "c.xml"}
+    assert list(merged) == sorted(merged)
+
+
+def test_merge_key_index_invalid_existing():
+    with pytest.raises(CustomClickException):
+        merge_key_index(b"{not json", {})
+
+
+@patch("datacite_websnap.key_index.CustomEcho")
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_write_key_index_local_merges(mock_exporter_echo, mock_echo, tmp_path):
+    sink = LocalSink(str(tmp_path))
+    write_key_index({"10.123/a": "aa/bb/a.xml"}, sink)
+    write_key_index({"10.123/b": "cc/dd/b.xml"}, sink)
+
+    index = json.loads((tmp_path / "doi-index.json").read_text())
+    assert index == {"10.123/a": "aa/bb/a.xml", "10.123/b": "cc/dd/b.xml"}
+
+
+@patch("datacite_websnap.key_index.CustomEcho")
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_write_key_index_s3(mock_exporter_echo, mock_echo):
+    with S3Stub() as s3:
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        sink = S3Sink(client, STUB_BUCKET)
+        write_key_index({"10.123/a": "p/aa/a.xml"}, sink, "p")
+        write_key_index({"10.123/b": "p/bb/b.xml"}, sink, "p")
+
+    assert json.loads(s3.objects["p/doi-index.json"]) == {
+        "10.123/a": "p/aa/a.xml",
+        "10.123/b": "p/bb/b.xml",
+    }
+    assert s3.headers["p/doi-index.json"]["Content-Type"] == "application/json"
+
+
+def test_export_hash_layout_spreads_s3_keys(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "a")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "b")
+
+    with (
+        DataCiteStub(200) as datacite,
+        S3Stub(partition_length=len("p/ab")) as s3,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.key_index.CustomEcho"),
+    ):
+        monkeypatch.setenv("ENDPOINT_URL", s3.url)
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            bucket=STUB_BUCKET,
+            key_prefix="p",
+            api_url=datacite.url,
+            layout="hash",
+            workers=4,
+        )
+
+    index = json.loads(s3.objects.pop("p/doi-index.json"))
+    assert len(index) == 200
+    assert index[stub_doi(7)] == format_xml_file_name(stub_doi(7), "p", "hash")
+    assert set(index.values()) == set(s3.objects)
+    assert len(s3.partitions()) > 100
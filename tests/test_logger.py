@@ -4,7 +4,9 @@ import logging
 import pytest
 from unittest.mock import patch
 
+from datacite_websnap import logger
 from datacite_websnap.logger import (
+    echo_to_stderr,
     CustomClickException,
     CustomBadParameter,
     CustomEcho,
@@ -50,6 +52,16 @@ def test_custom_echo_no_log(caplog):
         assert "Hello world" not in caplog.text
 
 
+def test_custom_echo_to_stderr(monkeypatch, capsys):
+    monkeypatch.setattr(logger, "_echo_err", False)
+    CustomEcho("To stdout")
+    echo_to_stderr()
+    CustomEcho("To stderr")
+    captured = capsys.readouterr()
+    assert captured.out == "To stdout\n"
+    assert captured.err == "To stderr\n"
+
+
 def test_custom_warning_stdout(capsys):
     CustomWarning("Something might be wrong", file_logs=False)
     captured = capsys.readouterr()
@@ -0,0 +1,135 @@
+"""Tests for src/datacite-websnap/manifest.py"""
+
+import gzip
+import hashlib
+import json
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.cli import datacite_bulk_export
+from datacite_websnap.exporter import format_xml_file_name
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.manifest import (
+    ManifestWriter,
+    format_manifest_key,
+    iter_manifest_entries,
+    write_manifest,
+)
+from datacite_websnap.sinks import LocalSink
+from tests.datacite_stub import (
+    DataCiteStub,
+    STUB_CLIENT_ID,
+    stub_doi,
+    stub_updated,
+    stub_xml,
+)
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+def test_format_manifest_key():
+    assert format_manifest_key() == "manifest.json.gz"
+    assert format_manifest_key("ethz.wsl/") == "ethz.wsl/manifest.json.gz"
+
+
+def test_manifest_writer_entries():
+    manifest = ManifestWriter(generated="2025-01-01T00:00:00+00:00")
+    manifest.add("10.123/a", "10.123_a.xml", b"<a/>", updated="2024-12-31")
+    manifest.add("10.123/b", "10.123_b.xml", b"<bb/>")
+
+    document = json.loads(gzip.decompress(manifest.finish()))
+
+    assert document == {
+        "generated": "2025-01-01T00:00:00+00:00",
+        "records": [
+            {
+                "doi": "10.123/a",
+                "key": "10.123_a.xml",
+                "md5": hashlib.md5(b"<a/>").hexdigest(),
+                "size": 4,
+                "updated": "2024-12-31",
+            },
+            {
+                "doi": "10.123/b",
+                "key": "10.123_b.xml",
+                "md5": hashlib.md5(b"<bb/>").hexdigest(),
+                "size": 5,
+                "updated": None,
+            },
+        ],
+        "total": 2,
+    }
+
+
+def test_manifest_writer_empty():
+    document = json.loads(gzip.decompress(ManifestWriter().finish()))
+    assert document["records"] == [] and document["total"] == 0
+
+
+def test_manifest_writer_merge_keeps_other_entries():
+    first = ManifestWriter()
+    first.add("10.123/a", "a.xml", b"old")
+    first.add("10.123/b", "b.xml", b"b")
+
+    second = ManifestWriter(merge=True)
+    second.add("10.123/a", "a.xml", b"new")
+    entries = list(iter_manifest_entries(second.finish(first.finish())))
+
+    assert [entry["doi"] for entry in entries] == ["10.123/a", "10.123/b"]
+    assert entries[0]["md5"] == hashlib.md5(b"new").hexdigest()
+
+
+def test_iter_manifest_entries_invalid():
+    with pytest.raises(CustomClickException):
+        list(iter_manifest_entries(b"not gzip"))
+
+
+def test_write_manifest_local(tmp_path):
+    manifest = ManifestWriter()
+    manifest.add("10.123/a", "a.xml", b"<a/>")
+
+    with patch("datacite_websnap.manifest.CustomEcho"):
+        write_manifest(manifest, LocalSink(str(tmp_path)))
+
+    entries = list(iter_manifest_entries((tmp_path / "manifest.json.gz").read_bytes()))
+    assert entries[0]["key"] == "a.xml"
+
+
+def test_export_writes_manifest_from_retrieved_pages(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "a")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "b")
+
+    with (
+        DataCiteStub(30) as datacite,
+        S3Stub() as s3,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.manifest.CustomEcho"),
+    ):
+        monkeypatch.setenv("ENDPOINT_URL", s3.url)
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            bucket=STUB_BUCKET,
+            key_prefix="p",
+            api_url=datacite.url,
+            page_size=10,
+            manifest=True,
+        )
+        requests = datacite.requests
+
+    manifest = s3.objects["p/manifest.json.gz"]
+    entries = list(iter_manifest_entries(manifest))
+
+    # One client lookup and three pages, the manifest needs no extra API calls
+    assert requests == 4
+    assert s3.headers["p/manifest.json.gz"]["Content-Type"] == "application/gzip"
+    assert len(entries) == 30
+    assert entries[7] == {
+        "doi": stub_doi(7),
+        "key": format_xml_file_name(stub_doi(7), "p"),
+        "md5": hashlib.md5(stub_xml(7)).hexdigest(),
+        "size": len(stub_xml(7)),
+        "updated": stub_updated(7),
+    }
+    assert all(s3.etags[entry["key"]] == entry["md5"] for entry in entries)
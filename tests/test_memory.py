@@ -0,0 +1,99 @@
+"""
+Peak-memory regression tests for exporting DataCite records.
+
+Exports run against the synthetic DataCite stand-in in tests/datacite_stub.py so
+that the peak memory of an export can be checked for growing record counts. Peak
+memory must stay below a fixed bound that does not depend on the number of records,
+which fails if records are accumulated in memory instead of being streamed.
+
+The 100k records case takes longer and is only run if the environment variable
+DATACITE_WEBSNAP_LARGE_TESTS is set.
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.cli import datacite_bulk_export
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi
+
+try:
+    import resource
+except ImportError:  # pragma: no cover, resource is not available on Windows
+    resource = None
+
+# Fixed bounds in MB for the peak memory of an export, independent of record count
+PEAK_TRACED_MB = 16
+PEAK_RSS_GROWTH_MB = 64
+
+LARGE = pytest.mark.skipif(
+    not os.getenv("DATACITE_WEBSNAP_LARGE_TESTS"),
+    reason="set DATACITE_WEBSNAP_LARGE_TESTS to run export tests with 100k records",
+)
+
+
+def max_rss_mb() -> float:
+    """Return the maximum resident set size of the process in MB."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def run_export(records: int, page_size: int = 250) -> tuple[list[str], float]:
+    """
+    Export records from the DataCite stand-in to a local destination that does not
+    retain the XML bodies.
+
+    Returns the exported filenames and the peak traced memory in MB.
+    """
+    exported = []
+
+    def write_local_file(content_bytes, filename, directory_path, file_logs, **kwargs):
+        exported.append(filename)
+
+    with (
+        DataCiteStub(records) as stub,
+        tempfile.TemporaryDirectory() as directory_path,
+        patch("datacite_websnap.sinks.write_local_file", new=write_local_file),
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+    ):
+        tracemalloc.start()
+        try:
+            datacite_bulk_export.callback(
+                client_id=STUB_CLIENT_ID,
+                destination="local",
+                directory_path=directory_path,
+                api_url=stub.url,
+                page_size=page_size,
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return exported, peak / 1024**2
+
+
+@pytest.mark.parametrize("records", [1_000, 10_000, pytest.param(100_000, marks=LARGE)])
+def test_export_peak_memory_is_bounded(records):
+    rss_before = max_rss_mb() if resource else 0
+
+    exported, peak_mb = run_export(records)
+
+    assert len(exported) == records
+    assert exported[0] == f"{stub_doi(0).replace('/', '_')}.xml"
+    assert peak_mb < PEAK_TRACED_MB
+    if resource:
+        assert max_rss_mb() - rss_before < PEAK_RSS_GROWTH_MB
+
+
+def test_export_peak_memory_does_not_grow_with_records():
+    _, small_peak_mb = run_export(1_000)
+    _, large_peak_mb = run_export(10_000)
+
+    # Ten times the records must not come close to ten times the memory
+    assert large_peak_mb < small_peak_mb * 2
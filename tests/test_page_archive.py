@@ -0,0 +1,36 @@
+"""Tests for src/datacite-websnap/page_archive.py"""
+
+import gzip
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.config import RECORDED_PAGES_NAME
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.page_archive import record_datacite_pages, iter_recorded_pages
+
+
+@patch("datacite_websnap.page_archive.CustomEcho")
+def test_record_datacite_pages_round_trip(mock_echo, tmp_path):
+    pages = [{"meta": {"total": 1}, "data": [{"id": "10.123/abc"}]}, {"data": []}]
+    directory = tmp_path / "pages"
+
+    yielded = list(record_datacite_pages(pages, str(directory)))
+
+    assert yielded == pages
+    assert (directory / RECORDED_PAGES_NAME).exists()
+    assert "Recorded 2" in mock_echo.call_args.args[0]
+    assert list(iter_recorded_pages(str(directory))) == pages
+
+
+def test_iter_recorded_pages_missing_file(tmp_path):
+    with pytest.raises(CustomClickException):
+        list(iter_recorded_pages(str(tmp_path)))
+
+
+def test_iter_recorded_pages_invalid_json(tmp_path):
+    with gzip.open(tmp_path / RECORDED_PAGES_NAME, "wt") as f:
+        f.write("{not json\n")
+
+    with pytest.raises(CustomClickException):
+        list(iter_recorded_pages(str(tmp_path)))
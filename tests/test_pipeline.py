@@ -0,0 +1,53 @@
+"""Tests for src/datacite-websnap/pipeline.py"""
+
+import threading
+import time
+
+import pytest
+
+from datacite_websnap.pipeline import prefetch_map
+
+
+@pytest.mark.parametrize("workers", [0, 1, 4])
+def test_prefetch_map_keeps_order(workers):
+    def slow_square(n):
+        time.sleep(0.001 * (n % 3))
+        return n * n
+
+    assert list(prefetch_map(slow_square, range(20), workers)) == [
+        n * n for n in range(20)
+    ]
+
+
+def test_prefetch_map_runs_off_current_thread():
+    threads = set(prefetch_map(lambda _: threading.get_ident(), range(5), workers=2))
+
+    assert threading.get_ident() not in threads
+
+
+def test_prefetch_map_raises_in_order():
+    def fail_on_three(n):
+        if n == 3:
+            raise ValueError("three")
+        return n
+
+    results = prefetch_map(fail_on_three, range(10), workers=2)
+
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(ValueError, match="three"):
+        next(results)
+
+
+def test_prefetch_map_bounds_items_in_flight():
+    consumed = []
+
+    def items():
+        for n in range(100):
+            consumed.append(n)
+            yield n
+
+    results = prefetch_map(lambda n: n, items(), workers=2, max_pending=3)
+    next(results)
+
+    assert len(consumed) <= 4
+    results.close()
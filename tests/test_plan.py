@@ -0,0 +1,176 @@
+"""Tests for src/datacite-websnap/plan.py"""
+
+import hashlib
+import json
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.cli import datacite_bulk_export
+from datacite_websnap.exporter import create_s3_client, format_xml_file_name
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.pipeline import PreparedRecord
+from datacite_websnap.plan import (
+    ListedObject,
+    build_export_plan,
+    list_local_files,
+    list_s3_objects,
+)
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi, stub_xml
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+def md5(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def prepared(doi: str, body: bytes) -> PreparedRecord:
+    return PreparedRecord(doi=doi, filename=f"{doi}.xml", body=body, stage="export")
+
+
+def test_listed_object_matches(tmp_path):
+    path = tmp_path / "a.xml"
+    path.write_bytes(b"<a/>")
+
+    assert ListedObject(4, etag=md5(b"<a/>")).matches(b"<a/>")
+    assert not ListedObject(4, etag=md5(b"<b/>")).matches(b"<a/>")
+    assert not ListedObject(5, etag=md5(b"<a/>")).matches(b"<a/>")
+    assert ListedObject(4, path=path).matches(b"<a/>")
+    assert not ListedObject(4, path=path).matches(b"<b/>")
+
+
+@patch("datacite_websnap.plan.CustomWarning")
+def test_build_export_plan(mock_warning):
+    listing = {
+        "same.xml": ListedObject(4, etag=md5(b"<a/>")),
+        "changed.xml": ListedObject(4, etag=md5(b"<b/>")),
+        "stale.xml": ListedObject(7, etag=md5(b"<stale/>")),
+        "doi-index.json": ListedObject(2, etag=md5(b"{}")),
+    }
+    failed = PreparedRecord(doi="broken", error=CustomClickException("bad"))
+    records = [
+        prepared("same", b"<a/>"),
+        prepared("changed", b"<a/>"),
+        prepared("new", b"<new/>"),
+        failed,
+    ]
+
+    plan = build_export_plan(records, listing)
+
+    assert dict(plan.counts) == {"create": 1, "update": 1, "unchanged": 1, "delete": 1}
+    assert plan.sizes["create"] == 6 and plan.sizes["delete"] == 7
+    assert plan.failed == 1
+    mock_warning.assert_called_once()
+    assert [(e.action, e.key) for e in plan.entries] == [
+        ("update", "changed.xml"),
+        ("create", "new.xml"),
+        ("delete", "stale.xml"),
+    ]
+    assert plan.to_dict()["summary"]["unchanged"] == {"count": 1, "bytes": 4}
+
+
+def test_build_export_plan_without_deletions():
+    listing = {"stale.xml": ListedObject(7, etag=md5(b"<stale/>"))}
+
+    plan = build_export_plan([], listing, include_deletions=False)
+
+    assert plan.counts["delete"] == 0
+
+
+def test_list_local_files(tmp_path):
+    (tmp_path / "ab" / "cd").mkdir(parents=True)
+    (tmp_path / "ab" / "cd" / "a.xml").write_bytes(b"<a/>")
+    (tmp_path / "b.xml").write_bytes(b"<bb/>")
+
+    listing = list_local_files(str(tmp_path))
+
+    assert {key: obj.size for key, obj in listing.items()} == {
+        "ab/cd/a.xml": 4,
+        "b.xml": 5,
+    }
+
+
+def test_list_s3_objects_paginates():
+    with S3Stub() as s3:
+        for i in range(2500):
+            s3.put(f"p/{i}.xml", b"<a/>")
+        s3.put("other/0.xml", b"<a/>")
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+
+        listing = list_s3_objects(client, STUB_BUCKET, "p")
+
+    assert len(listing) == 2500
+    assert listing["p/7.xml"].matches(b"<a/>")
+    assert s3.requests["LIST"] == 3
+
+
+def test_export_plan_s3_does_not_write(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "a")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "b")
+    plan_file = tmp_path / "plan.json"
+
+    with (
+        DataCiteStub(10) as datacite,
+        S3Stub() as s3,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.plan.CustomEcho"),
+    ):
+        monkeypatch.setenv("ENDPOINT_URL", s3.url)
+        for i in range(3):
+            s3.put(format_xml_file_name(stub_doi(i), "p"), stub_xml(i))
+        s3.put(format_xml_file_name(stub_doi(3), "p"), b"<changed/>")
+        s3.put("p/10.5072_deleted.xml", b"<deleted/>")
+
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            bucket=STUB_BUCKET,
+            key_prefix="p",
+            api_url=datacite.url,
+            plan_file=str(plan_file),
+        )
+
+    assert s3.requests["PUT"] == 0
+    summary = json.loads(plan_file.read_text())["summary"]
+    assert {
+        action: summary[action]["count"] for action in summary if action != "failed"
+    } == {
+        "create": 6,
+        "update": 1,
+        "unchanged": 3,
+        "delete": 1,
+    }
+
+
+@pytest.mark.parametrize("compress", [None, "gzip"])
+def test_export_plan_local_after_export(tmp_path, compress):
+    with (
+        DataCiteStub(5) as datacite,
+        patch("datacite_websnap.cli.CustomEcho") as mock_echo,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.key_index.CustomEcho"),
+    ):
+        export = dict(
+            client_id=STUB_CLIENT_ID,
+            destination="local",
+            directory_path=str(tmp_path),
+            api_url=datacite.url,
+            layout="hash",
+            compress=compress,
+        )
+        datacite_bulk_export.callback(**export)
+        files_before = sorted(tmp_path.rglob("*"))
+
+        datacite_bulk_export.callback(**export, plan=True)
+
+    assert sorted(tmp_path.rglob("*")) == files_before
+    assert (
+        "Export plan: 0 to create (0 bytes), 0 to update (0 bytes), 5 unchanged"
+        in mock_echo.call_args_list[-2].args[0]
+    )
@@ -0,0 +1,120 @@
+"""Tests for src/datacite-websnap/preflight.py"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.api import ExportError, ExportOptions, ExportQuery, Exporter
+from datacite_websnap.exporter import create_s3_client, s3_client_check_bucket
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.preflight import PreflightCheck, run_preflight
+from datacite_websnap.sinks import LocalSink, S3Sink
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with (
+        patch("datacite_websnap.preflight.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+    ):
+        yield
+
+
+def s3_sink(s3: S3Stub, bucket: str = STUB_BUCKET) -> S3Sink:
+    client = create_s3_client(
+        S3ConfigModel(
+            endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+        )
+    )
+    return S3Sink(client, bucket)
+
+
+def test_run_preflight_returns_results():
+    results = run_preflight(
+        [PreflightCheck("one", lambda: 1), PreflightCheck("two", lambda: 2)]
+    )
+    assert results == {"one": 1, "two": 2}
+    assert run_preflight([]) == {}
+
+
+def test_run_preflight_fails_fast():
+    def fail():
+        raise CustomClickException("bucket does not exist")
+
+    start = time.monotonic()
+    with pytest.raises(CustomClickException, match="'bucket' failed: bucket does"):
+        run_preflight(
+            [
+                PreflightCheck("slow", lambda: time.sleep(2)),
+                PreflightCheck("bucket", fail),
+            ]
+        )
+    assert time.monotonic() - start < 1
+
+
+def test_run_preflight_timeout():
+    with pytest.raises(CustomClickException, match="within 0.1 seconds: slow"):
+        run_preflight(
+            [
+                PreflightCheck("fast", lambda: None),
+                PreflightCheck("slow", lambda: time.sleep(1)),
+            ],
+            timeout=0.1,
+        )
+
+
+def test_s3_client_check_bucket():
+    with S3Stub() as s3:
+        sink = s3_sink(s3)
+        s3_client_check_bucket(sink.client, STUB_BUCKET, "p/.test")
+
+        with pytest.raises(
+            CustomClickException, match="Failed to access bucket 'typo'"
+        ):
+            s3_client_check_bucket(sink.client, "typo", "p/.test")
+
+    # The test object was written and deleted
+    assert s3.requests["PUT"] == 1 and s3.requests["DELETE"] == 1
+    assert not s3.objects
+
+
+def test_local_sink_preflight(tmp_path):
+    LocalSink(str(tmp_path)).preflight()
+    assert not list(tmp_path.iterdir())
+
+    with pytest.raises(CustomClickException, match="does not exist"):
+        LocalSink(str(tmp_path / "missing")).preflight()
+
+
+def test_export_fails_before_harvest_if_bucket_is_wrong():
+    with DataCiteStub(500) as datacite, S3Stub() as s3:
+        with Exporter(datacite.url) as exporter:
+            with pytest.raises(ExportError, match="'S3 destination' failed"):
+                exporter.export(
+                    ExportQuery(client_id=STUB_CLIENT_ID),
+                    s3_sink(s3, bucket="typo"),
+                    ExportOptions(page_size=10),
+                )
+        requests = datacite.requests
+
+    # At most the client lookup and the first page were requested
+    assert requests <= 2
+    assert not s3.objects
+
+
+def test_export_plan_preflight_does_not_write():
+    with DataCiteStub(3) as datacite, S3Stub() as s3:
+        with Exporter(datacite.url) as exporter:
+            exporter.export(
+                ExportQuery(client_id=STUB_CLIENT_ID),
+                s3_sink(s3),
+                ExportOptions(plan=True),
+            )
+
+    assert s3.requests["HEAD"] == 1
+    assert s3.requests["PUT"] == 0
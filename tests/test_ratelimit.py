@@ -0,0 +1,128 @@
+"""Tests for src/datacite-websnap/ratelimit.py"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.api import ExportOptions, ExportQuery, Exporter
+from datacite_websnap.exporter import create_s3_client
+from datacite_websnap.ratelimit import RateLimits, ThrottledSession, TokenBucket
+from datacite_websnap.sinks import S3Sink
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_paces_smoothly():
+    clock = FakeClock()
+    bucket = TokenBucket(10, burst_seconds=0.1, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.consume() for _ in range(11)]
+
+    # Only one token of burst, after that one token every 0.1 seconds
+    assert waits[0] == 0
+    assert waits[1:] == pytest.approx([0.1] * 10)
+    assert clock.now == pytest.approx(1.0)
+    assert bucket.observed_rate == pytest.approx(10)
+
+
+def test_token_bucket_large_consume_goes_into_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(1000, burst_seconds=0.1, clock=clock, sleep=clock.sleep)
+
+    # Larger than the bucket, the consumer waits for the missing tokens
+    assert bucket.consume(600) == pytest.approx(0.5)
+    assert bucket.consume(100) == pytest.approx(0.1)
+    assert bucket.waited == pytest.approx(0.6)
+
+
+def test_token_bucket_is_shared_by_threads():
+    bucket = TokenBucket(200, burst_seconds=0.01)
+
+    def consume():
+        for _ in range(20):
+            bucket.consume()
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=consume) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 80 requests at 200 per second, whatever the number of threads
+    assert time.monotonic() - start >= 0.35
+
+
+def test_rate_limits_summary():
+    assert not RateLimits.from_rates()
+
+    clock = FakeClock()
+    limits = RateLimits(
+        upload=TokenBucket(1024**2, clock=clock, sleep=clock.sleep),
+        put=TokenBucket(50, clock=clock, sleep=clock.sleep),
+    )
+    limits.upload.consume(1024**2)
+    limits.put.consume()
+
+    assert limits
+    assert limits.summary() == (
+        "upload 1.0 MiB/s of 1.0 MiB/s, PUT 50.0/s of 50.0/s, waited 0.9s"
+    )
+
+
+@patch("datacite_websnap.datacite_handler.CustomEcho")
+def test_throttled_session_paces_datacite_fetches(mock_echo):
+    bucket = TokenBucket(200_000)
+
+    with DataCiteStub(40) as datacite, ThrottledSession(bucket) as session:
+        body = session.get(f"{datacite.url}/dois?page[size]=40").content
+
+    # The body was received in chunks that were paced by the bucket
+    assert bucket.consumed >= len(body) > 50_000
+    assert bucket.waited >= (len(body) - bucket.capacity) / 200_000
+
+
+@patch("datacite_websnap.exporter.CustomEcho")
+@patch("datacite_websnap.datacite_handler.CustomEcho")
+@patch("datacite_websnap.api.CustomEcho")
+def test_export_respects_put_and_upload_rates(mock_echo, *mock_echos):
+    rate_limits = RateLimits.from_rates(max_upload_rate=200_000, max_put_rate=50)
+
+    with DataCiteStub(20) as datacite, S3Stub() as s3:
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        start = time.monotonic()
+        with Exporter(datacite.url, rate_limits=rate_limits) as exporter:
+            result = exporter.export(
+                ExportQuery(client_id=STUB_CLIENT_ID),
+                S3Sink(client, STUB_BUCKET, rate_limits=rate_limits),
+                ExportOptions(workers=8, preflight=False),
+            )
+        elapsed = time.monotonic() - start
+
+    assert result.stats.exported == 20
+    # 20 PUT requests at 50 per second despite 8 workers, after a burst of 5
+    assert elapsed >= (20 - rate_limits.put.capacity) / 50
+    assert rate_limits.put.consumed == 20
+    assert rate_limits.upload.consumed == sum(len(body) for body in s3.objects.values())
+    # Progress output reports the rates with each page
+    assert mock_echo.call_args.args[0].startswith("Rate limits: upload")
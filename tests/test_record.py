@@ -0,0 +1,55 @@
+"""Tests for src/datacite-websnap/record.py"""
+
+import gzip
+import hashlib
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.pipeline import PreparedRecord
+from datacite_websnap.record import DataCiteRecord
+
+HELLO = "PGhlbGxvPjwvaGVsbG8+"  # Base64 for <hello></hello>
+
+
+def test_record_is_slotted_and_read_only():
+    record = DataCiteRecord("10.123/abc", HELLO)
+
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.doi = "10.123/def"
+    with pytest.raises(AttributeError):
+        record.checksum = "abc"
+    assert record == DataCiteRecord("10.123/abc", HELLO)
+    assert hash(record) == hash(DataCiteRecord("10.123/abc", HELLO))
+
+
+def test_record_decodes_and_hashes_once():
+    record = DataCiteRecord("10.123/abc", HELLO)
+
+    with patch(
+        "datacite_websnap.record.decode_base64_xml", return_value=b"<hello></hello>"
+    ) as mock_decode:
+        body = record.decode()
+        assert record.decode() is body
+        assert record.md5 == hashlib.md5(body).hexdigest()
+    mock_decode.assert_called_once()
+
+    # Cached values are not part of the record's identity
+    assert record == DataCiteRecord("10.123/abc", HELLO)
+
+
+def test_record_decode_error():
+    with pytest.raises(CustomClickException, match="Unable to decode XML"):
+        DataCiteRecord("10.123/abc", "abc").decode()
+
+
+def test_prepared_record_reuses_record_md5():
+    record = DataCiteRecord("10.123/abc", HELLO)
+    prepared = PreparedRecord(record.doi, record, body=record.decode())
+    assert prepared.md5 == record.md5
+
+    compressed = PreparedRecord(record.doi, record, body=gzip.compress(b"<hello>"))
+    assert compressed.md5 == hashlib.md5(compressed.body).hexdigest()
+    assert compressed.md5 != record.md5
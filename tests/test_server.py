@@ -0,0 +1,170 @@
+"""Tests for src/datacite-websnap/server.py"""
+
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import click
+import pytest
+import requests
+
+from datacite_websnap.api import ExportOptions, Exporter
+from datacite_websnap.key_index import format_index_key
+from datacite_websnap.manifest import format_manifest_key, iter_manifest_entries
+from datacite_websnap.sinks import LocalSink
+from datacite_websnap.server import ExportServer, JobQueue, JobQueueFull
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with (
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomWarning"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.server.CustomEcho"),
+        patch("datacite_websnap.server.CustomWarning") as mock_warning,
+    ):
+        yield mock_warning
+
+
+class BlockingSink(LocalSink):
+    """Local sink whose writes wait until released."""
+
+    def __init__(self, directory_path):
+        super().__init__(directory_path)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, body, key, compression=None, content_type=None):
+        self.writing.set()
+        assert self.release.wait(10)
+        super().write(body, key, compression, content_type)
+
+
+def wait_until_done(job_queue, jobs, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not all(job_queue.get(job.id).done for job in jobs):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_job_queue_coalesces_queued_requests(tmp_path):
+    sink = BlockingSink(str(tmp_path))
+
+    with DataCiteStub(5) as datacite, Exporter(datacite.url) as exporter:
+        job_queue = JobQueue(
+            exporter, [sink], ExportOptions(preflight=False), workers=1, max_queued=2
+        )
+        running = job_queue.submit(client_id=STUB_CLIENT_ID)
+        assert sink.writing.wait(10)
+
+        # Requests for queued records join the queued job, the running job may
+        # have retrieved the records before they changed
+        dois = job_queue.submit(dois=(stub_doi(1), stub_doi(2)))
+        more_dois = job_queue.submit(dois=(stub_doi(2), stub_doi(3)))
+        client = job_queue.submit(client_id=STUB_CLIENT_ID)
+        same_client = job_queue.submit(client_id=STUB_CLIENT_ID)
+        with pytest.raises(JobQueueFull):
+            job_queue.submit(doi_prefix=("10.5072",))
+
+        sink.release.set()
+        wait_until_done(job_queue, [running, dois, client])
+        job_queue.close()
+
+    assert more_dois is dois
+    assert dois.dois == [stub_doi(1), stub_doi(2), stub_doi(3)]
+    assert dois.requests == 2
+    assert same_client is client and client is not running
+    assert client.requests == 2
+    assert [job.status for job in (running, dois, client)] == ["succeeded"] * 3
+    assert dois.destinations[0]["exported"] == 3
+    assert client.destinations[0]["exported"] == 5
+    assert job_queue.counts()["succeeded"] == 3
+
+
+def test_concurrent_jobs_keep_index_and_manifest_entries(tmp_path):
+    class SlowReadSink(LocalSink):
+        """Local sink whose reads are slow, so that finishing jobs overlap."""
+
+        def read(self, key):
+            time.sleep(0.3)
+            return super().read(key)
+
+    sink = SlowReadSink(str(tmp_path))
+
+    with DataCiteStub(4) as datacite, Exporter(datacite.url) as exporter:
+        job_queue = JobQueue(
+            exporter,
+            [sink],
+            ExportOptions(preflight=False, layout="hash", manifest=True),
+            workers=2,
+        )
+        jobs = [
+            job_queue.submit(dois=(stub_doi(0), stub_doi(1))),
+            job_queue.submit(dois=(stub_doi(2), stub_doi(3))),
+        ]
+        wait_until_done(job_queue, jobs)
+        job_queue.close()
+
+    assert [job.status for job in jobs] == ["succeeded"] * 2
+    index = json.loads(sink.read(format_index_key()))
+    manifest = list(iter_manifest_entries(sink.read(format_manifest_key())))
+    assert sorted(index) == [stub_doi(i) for i in range(4)]
+    assert sorted(entry["doi"] for entry in manifest) == sorted(index)
+
+
+def test_job_queue_rejects_invalid_requests(tmp_path):
+    job_queue = JobQueue(Exporter(), [LocalSink(str(tmp_path))], ExportOptions())
+    try:
+        with pytest.raises(click.BadParameter):
+            job_queue.submit()
+        with pytest.raises(click.BadParameter):
+            job_queue.submit(dois=("envidat.31",))
+        with pytest.raises(click.BadParameter):
+            job_queue.submit(client_id=STUB_CLIENT_ID, dois=(stub_doi(1),))
+    finally:
+        job_queue.close()
+
+
+def test_export_server_runs_jobs(tmp_path, quiet):
+    with DataCiteStub(3) as datacite, Exporter(datacite.url) as exporter:
+        job_queue = JobQueue(
+            exporter, [LocalSink(str(tmp_path))], ExportOptions(preflight=False)
+        )
+        with ExportServer(job_queue, "127.0.0.1", 0) as server:
+            created = requests.post(
+                f"{server.url}/jobs", json={"dois": [stub_doi(0)]}, timeout=5
+            )
+            unknown_client = requests.post(
+                f"{server.url}/jobs", json={"client_id": "unknown.client"}, timeout=5
+            )
+            invalid = requests.post(f"{server.url}/jobs", data=b"[", timeout=5)
+            wait_until_done(job_queue, job_queue.jobs())
+
+            job = requests.get(f"{server.url}/jobs/{created.json()['id']}", timeout=5)
+            jobs = requests.get(f"{server.url}/jobs", timeout=5).json()["jobs"]
+            health = requests.get(f"{server.url}/health", timeout=5).json()
+            unknown = requests.get(f"{server.url}/jobs/unknown", timeout=5)
+        job_queue.close()
+
+    assert created.status_code == 202
+    assert created.json()["status"] in ("queued", "running")
+    assert invalid.status_code == 400
+    assert unknown.status_code == 404
+
+    assert job.json()["status"] == "succeeded"
+    assert job.json()["destinations"][0]["exported"] == 1
+    assert (tmp_path / "10.5072_synthetic.0.xml").exists()
+    assert len(jobs) == 2
+    assert health["succeeded"] == 1
+
+    # The job of an unknown repository account failed and reports the error
+    assert unknown_client.status_code == 202
+    failed = next(job for job in jobs if job["id"] == unknown_client.json()["id"])
+    assert failed["status"] == "failed"
+    assert "unknown.client" in failed["error"]
+    assert health["failed"] == 1
+    assert "failed" in quiet.call_args.args[0]
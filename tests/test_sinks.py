@@ -0,0 +1,171 @@
+"""Tests for src/datacite-websnap/sinks.py"""
+
+import io
+import json
+import tarfile
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.exporter import create_s3_client
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.sinks import LocalSink, S3Sink, StdoutSink
+from datacite_websnap.validators import S3ConfigModel
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_local_sink_write_read_list(mock_echo, tmp_path):
+    sink = LocalSink(str(tmp_path))
+
+    sink.write(b"<a/>", "aa/a.xml")
+    sink.write(b"compressed", "b.xml", compression="gzip")
+    sink.flush()
+
+    assert sink.stored_key("b.xml", "gzip") == "b.xml.gz"
+    assert sink.read("aa/a.xml") == b"<a/>"
+    assert sink.read("missing.xml") is None
+    assert set(sink.list()) == {"aa/a.xml", "b.xml.gz"}
+    assert sink.probe()
+
+
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_s3_sink_write_read_list(mock_echo):
+    with S3Stub() as s3:
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        sink = S3Sink(client, STUB_BUCKET)
+        sink.write(b"<a/>", "p/a.xml", compression="gzip")
+
+        assert sink.stored_key("p/a.xml", "gzip") == "p/a.xml"
+        assert sink.read("p/a.xml") == b"<a/>"
+        assert sink.read("p/missing.xml") is None
+        assert list(sink.list("p")) == ["p/a.xml"]
+        assert sink.probe()
+
+    assert s3.headers["p/a.xml"]["Content-Encoding"] == "gzip"
+
+
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_local_sink_copy_delete_list_prefixes(mock_echo, tmp_path):
+    sink = LocalSink(str(tmp_path))
+    sink.write(b"<a/>", "2025-01-01/aa/a.xml")
+
+    assert sink.copy("2025-01-01/aa/a.xml", "2025-01-02/aa/a.xml")
+    assert sink.read("2025-01-02/aa/a.xml") == b"<a/>"
+    assert sink.list_prefixes() == ["2025-01-01", "2025-01-02"]
+    assert list(sink.list("2025-01-02")) == ["2025-01-02/aa/a.xml"]
+
+    # Hard link, the content is not written again
+    assert (tmp_path / "2025-01-01/aa/a.xml").stat().st_nlink == 2
+
+    sink.delete(["2025-01-01/aa/a.xml"])
+    assert sink.list_prefixes() == ["2025-01-02"]
+
+
+@patch("datacite_websnap.exporter.CustomEcho")
+def test_s3_sink_copy_delete_list_prefixes(mock_echo):
+    with S3Stub() as s3:
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        sink = S3Sink(client, STUB_BUCKET)
+        sink.write(b"<a/>", "p/2025-01-01/a.xml", compression="gzip")
+        sink.write(b"{}", "p/latest.json")
+
+        assert sink.copy("p/2025-01-01/a.xml", "p/2025-01-02/a.xml")
+        assert sink.list_prefixes("p") == ["2025-01-01", "2025-01-02"]
+
+        sink.delete([f"p/2025-01-01/{i}.xml" for i in range(1500)])
+        sink.delete(["p/2025-01-01/a.xml"])
+        assert sink.list_prefixes("p") == ["2025-01-02"]
+
+    # Copies keep the headers of the source object and send no body
+    assert s3.requests["COPY"] == 1
+    assert s3.headers["p/2025-01-02/a.xml"]["Content-Encoding"] == "gzip"
+    # Deletes are sent in batches of up to 1000 keys
+    assert s3.requests["DELETE_OBJECTS"] == 3
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_stdout_sink_ndjson_buffers_records():
+    stream = CountingStream()
+    sink = StdoutSink(stream=stream, buffer_size=200)
+
+    for i in range(10):
+        sink.write_record(f"10.123/{i}", "<a>ü</a>".encode(), f"10.123_{i}.xml")
+    assert stream.writes == 2
+    assert stream.flushes == 0
+    with pytest.raises(CustomClickException, match="only supports records"):
+        sink.write(b"{}", "doi-index.json")
+    with pytest.raises(CustomClickException, match="not UTF-8"):
+        sink.write_record("10.123/x", b"\xff", "10.123_x.xml")
+    sink.close()
+
+    lines = stream.getvalue().decode().splitlines()
+    assert stream.flushes == 1
+    assert len(lines) == 10
+    assert json.loads(lines[3]) == {
+        "doi": "10.123/3",
+        "key": "10.123_3.xml",
+        "xml": "<a>ü</a>",
+    }
+
+
+def test_stdout_sink_closed_pipe():
+    class ClosedStream(io.BytesIO):
+        def write(self, data):
+            raise BrokenPipeError("Broken pipe")
+
+    sink = StdoutSink(stream=ClosedStream(), buffer_size=10)
+
+    with pytest.raises(CustomClickException, match="Broken pipe"):
+        sink.write_record("10.123/a", b"<a/>", "10.123_a.xml")
+    with pytest.raises(CustomClickException, match="Broken pipe"):
+        sink.write_record("10.123/b", b"<b/>", "10.123_b.xml")
+    sink.close()
+
+    # The records that failed to write are not counted as written
+    assert sink.written == 0
+
+
+def test_stdout_sink_tar_stream():
+    stream = io.BytesIO()
+    sink = StdoutSink("tar", stream=stream)
+
+    sink.write_record("10.123/a", b"<a/>", "aa/10.123_a.xml")
+    sink.write_record("10.123/b", b"compressed", "10.123_b.xml", compression="gzip")
+    sink.write(b"{}", "doi-index.json")
+    sink.flush()
+    sink.close()
+    sink.close()
+
+    assert len(stream.getvalue()) % tarfile.RECORDSIZE == 0
+    stream.seek(0)
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        members = {m.name: tar.extractfile(m).read() for m in tar}
+    assert members == {
+        "aa/10.123_a.xml": b"<a/>",
+        "10.123_b.xml.gz": b"compressed",
+        "doi-index.json": b"{}",
+    }
+    with pytest.raises(CustomClickException, match="closed"):
+        sink.write(b"<c/>", "c.xml")
@@ -0,0 +1,165 @@
+"""Tests for src/datacite-websnap/snapshot.py"""
+
+import hashlib
+import json
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap.api import ExportError, ExportOptions, ExportQuery, Exporter
+from datacite_websnap.exporter import create_s3_client, format_xml_file_name
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.plan import ListedObject
+from datacite_websnap.sinks import LocalSink, S3Sink
+from datacite_websnap.snapshot import (
+    SnapshotBase,
+    format_latest_key,
+    format_snapshot_prefix,
+    read_latest_snapshot,
+    validate_snapshot,
+)
+from datacite_websnap.validators import S3ConfigModel
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi, stub_xml
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with (
+        patch("datacite_websnap.api.CustomWarning") as mock_warning,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.snapshot.CustomEcho"),
+    ):
+        yield mock_warning
+
+
+def export_snapshot(datacite, sink, snapshot, **kwargs):
+    with Exporter(datacite.url) as exporter:
+        return exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            sink,
+            ExportOptions(snapshot=snapshot, **kwargs),
+        )
+
+
+def test_format_snapshot_keys():
+    assert format_snapshot_prefix(None, "2025-01-02") == "2025-01-02"
+    assert format_snapshot_prefix("ethz.wsl/", "2025-01-02") == "ethz.wsl/2025-01-02"
+    assert format_latest_key() == "latest.json"
+    assert format_latest_key("ethz.wsl") == "ethz.wsl/latest.json"
+
+
+def test_validate_snapshot():
+    assert validate_snapshot("2025-01-02") == "2025-01-02"
+    with pytest.raises(CustomClickException):
+        validate_snapshot("latest")
+
+
+def test_snapshot_base_source_key():
+    etag = f'"{hashlib.md5(b"<a/>").hexdigest()}"'
+    base = SnapshotBase(
+        "p/2025-01-02", "p/2025-01-01", {"p/2025-01-01/a.xml": ListedObject(4, etag)}
+    )
+
+    assert base.source_key("p/2025-01-02/a.xml", b"<a/>") == "p/2025-01-01/a.xml"
+    assert base.source_key("p/2025-01-02/a.xml", b"<b/>") is None
+    assert base.source_key("p/2025-01-02/b.xml", b"<a/>") is None
+
+
+def test_snapshots_copy_unchanged_records_s3():
+    with DataCiteStub(25) as datacite, S3Stub() as s3:
+        client = create_s3_client(
+            S3ConfigModel(
+                endpoint_url=s3.url, aws_access_key_id="a", aws_secret_access_key="b"
+            )
+        )
+        sink = S3Sink(client, STUB_BUCKET)
+
+        first = export_snapshot(datacite, sink, "2025-01-01", key_prefix="p")
+        puts = s3.requests["PUT"]
+
+        # One record changed since the first snapshot
+        changed_key = format_xml_file_name(stub_doi(4), "p/2025-01-01")
+        s3.put(changed_key, b"<outdated/>")
+
+        second = export_snapshot(
+            datacite, sink, "2025-01-02", key_prefix="p", workers=4
+        )
+        third = export_snapshot(
+            datacite, sink, "2025-01-03", key_prefix="p", snapshot_retention=2
+        )
+
+    assert first.stats.copied == 0
+    assert puts == 27  # 25 records, the latest pointer and the preflight object
+    assert second.stats.exported == 25
+    assert second.stats.copied == 24
+    assert "24 unchanged copied from previous snapshot" in second.stats.summary()
+    assert third.stats.copied == 25
+    assert s3.requests["COPY"] == 49
+
+    # Only the changed record, the pointers and the preflight objects were
+    # uploaded again
+    assert s3.requests["PUT"] - s3.requests["COPY"] == puts + 1 + 2 * 2
+    assert s3.objects[format_xml_file_name(stub_doi(4), "p/2025-01-02")] == (
+        stub_xml(4)
+    )
+
+    # The oldest snapshot was pruned with one batched delete
+    assert s3.requests["DELETE_OBJECTS"] == 1
+    assert not any(key.startswith("p/2025-01-01/") for key in s3.objects)
+    assert len([key for key in s3.objects if key.startswith("p/2025-01-03/")]) == 25
+    latest = json.loads(s3.objects["p/latest.json"])
+    assert latest["snapshot"] == "2025-01-03"
+    assert latest["prefix"] == "p/2025-01-03/"
+    assert latest["records"] == 25
+
+
+def test_snapshots_link_unchanged_records_local(tmp_path):
+    sink = LocalSink(str(tmp_path))
+
+    with DataCiteStub(5) as datacite:
+        export_snapshot(datacite, sink, "2025-01-01", compress="gzip")
+        again = export_snapshot(datacite, sink, "2025-01-01", compress="gzip")
+        second = export_snapshot(datacite, sink, "2025-01-02", compress="gzip")
+
+    # Records of a snapshot that is exported again are already in place
+    assert again.stats.copied == 5
+    assert second.stats.copied == 5
+    key = format_xml_file_name(stub_doi(2), "2025-01-02") + ".gz"
+    assert (tmp_path / key).stat().st_nlink == 2
+    assert read_latest_snapshot(sink) == "2025-01-02"
+
+
+def test_incomplete_snapshot_keeps_latest_pointer(tmp_path, quiet):
+    class FailingSink(LocalSink):
+        def write(self, body, key, compression=None, content_type=None):
+            if key == format_xml_file_name(stub_doi(1), "2025-01-02"):
+                raise CustomClickException("disk full")
+            super().write(body, key, compression, content_type)
+
+    sink = FailingSink(str(tmp_path))
+
+    with (
+        DataCiteStub(3) as datacite,
+        patch("datacite_websnap.failed_records.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomWarning"),
+        patch("datacite_websnap.failed_records.time.sleep"),
+    ):
+        export_snapshot(datacite, sink, "2025-01-01")
+        (tmp_path / format_xml_file_name(stub_doi(1), "2025-01-01")).write_bytes(b"x")
+        result = export_snapshot(datacite, sink, "2025-01-02", retry_attempts=1)
+
+    assert result.stats.failed == 1
+    assert read_latest_snapshot(sink) == "2025-01-01"
+    assert "Latest snapshot pointer was not updated" in quiet.call_args.args[0]
+
+
+def test_snapshot_rejects_specific_dois():
+    with DataCiteStub(1) as datacite, Exporter(datacite.url) as exporter:
+        with pytest.raises(ExportError, match="Snapshots cannot be combined"):
+            exporter.export(
+                ExportQuery(dois=(stub_doi(0),)),
+                LocalSink("."),
+                ExportOptions(snapshot="2025-01-01"),
+            )
@@ -0,0 +1,190 @@
+"""Tests for src/datacite-websnap/state.py"""
+
+import sqlite3
+from unittest.mock import patch
+
+import click.testing
+import pytest
+
+from datacite_websnap.api import ExportError, ExportOptions, ExportQuery, Exporter
+from datacite_websnap.cli import cli
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.sinks import LocalSink
+from datacite_websnap.state import StateStore, format_state_timestamp
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi, stub_updated
+
+DAY = 86400
+NOW = 1893456000.0  # 2030-01-01T00:00:00Z
+
+
+def count_records(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+def test_format_state_timestamp():
+    assert format_state_timestamp(NOW) == "2030-01-01T00:00:00Z"
+
+
+def test_state_store_batches_updates(tmp_path):
+    path = tmp_path / "state.db"
+
+    with StateStore(str(path), batch_size=3, clock=lambda: NOW) as state:
+        state.start_run()
+        state.exported("S3", "10.123/a", "a.xml", "md5a", 10, "2029-12-01T00:00:00Z")
+        state.failed("S3", "10.123/b", "Timeout")
+        assert count_records(path) == 0
+
+        # A record that failed and was retried successfully has no error
+        state.exported("S3", "10.123/b", "b.xml", "md5b", 20)
+        assert count_records(path) == 2
+
+        state.failed("S3", "10.123/a", "Access denied")
+        state.finish_run(exported=2, failed=1)
+
+        run = state.last_run()
+        records = {row["doi"]: row for row in state.records()}
+
+    assert run["status"] == "completed_with_errors"
+    assert (run["exported"], run["failed"]) == (2, 1)
+    assert records["10.123/b"]["error"] is None
+    assert records["10.123/b"]["key"] == "b.xml"
+
+    # A failure keeps the key, hash and time of the last successful export
+    assert records["10.123/a"]["error"] == "Access denied"
+    assert records["10.123/a"]["md5"] == "md5a"
+    assert records["10.123/a"]["exported_at"] == "2030-01-01T00:00:00Z"
+    assert records["10.123/a"]["updated"] == "2029-12-01T00:00:00Z"
+
+
+def test_state_store_queries(tmp_path):
+    path = str(tmp_path / "state.db")
+    clock = [NOW - 40 * DAY]
+
+    with StateStore(path, clock=lambda: clock[0]) as state:
+        state.start_run()
+        state.exported("S3", "10.123/old", "old.xml", "1", 1, "2029-01-01T00:00:00Z")
+        state.exported("S3", "10.123/new", "new.xml", "2", 1, "2029-12-31T00:00:00Z")
+        state.failed("S3", "10.123/failed", "Timeout")
+        state.finish_run(exported=2, failed=1)
+
+        clock[0] = NOW
+        state.start_run()
+        state.exported("S3", "10.123/new", "new.xml", "2", 1)
+        state.exported("local", "10.123/new", "new.xml", "2", 1)
+        state.finish_run(exported=2, failed=0)
+
+        failed = state.records(failed_last_run=True)
+        not_updated = state.records(not_updated_days=30)
+        not_exported = state.records("S3", not_exported_days=30)
+        summary = state.summary()
+
+    # The failure happened in the previous run
+    assert failed == []
+    assert [row["doi"] for row in not_updated] == ["10.123/old"]
+    assert [row["doi"] for row in not_exported] == ["10.123/failed", "10.123/old"]
+    assert summary == [
+        {
+            "destination": "S3",
+            "records": 3,
+            "failed": 1,
+            "last_exported_at": "2030-01-01T00:00:00Z",
+        },
+        {
+            "destination": "local",
+            "records": 1,
+            "failed": 0,
+            "last_exported_at": "2030-01-01T00:00:00Z",
+        },
+    ]
+
+
+def test_state_store_invalid_path(tmp_path):
+    with pytest.raises(CustomClickException, match="Failed to open state database"):
+        StateStore(str(tmp_path / "missing" / "state.db"))
+
+
+def test_unexpected_export_error_fails_run(tmp_path):
+    class BrokenFlushSink(LocalSink):
+        def flush(self):
+            raise OSError("Input/output error")
+
+    path = str(tmp_path / "state.db")
+
+    with (
+        DataCiteStub(2) as datacite,
+        Exporter(datacite.url) as exporter,
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        pytest.raises(ExportError, match="Unexpected error: Input/output error") as err,
+    ):
+        exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            BrokenFlushSink(str(tmp_path)),
+            ExportOptions(state_db=path),
+        )
+
+    assert isinstance(err.value.__cause__, OSError)
+    with StateStore(path) as state:
+        run = state.last_run()
+    assert run["status"] == "failed"
+    assert run["error"] == "Unexpected error: Input/output error"
+
+
+def test_export_records_state_and_status_command(tmp_path):
+    path = str(tmp_path / "state.db")
+    directory = tmp_path / "records"
+    directory.mkdir()
+
+    class FailingSink(LocalSink):
+        retried = False
+
+        def write(self, body, key, compression=None, content_type=None):
+            if key.endswith("synthetic.2.xml"):
+                raise CustomClickException("disk full")
+            # Fails once, the retried record keeps its "updated" timestamp
+            if key.endswith("synthetic.1.xml") and not self.retried:
+                self.retried = True
+                raise CustomClickException("timeout")
+            super().write(body, key, compression, content_type)
+
+    with (
+        DataCiteStub(4) as datacite,
+        Exporter(datacite.url) as exporter,
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.preflight.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomWarning"),
+        patch("datacite_websnap.failed_records.time.sleep"),
+        patch.object(
+            StateStore, "exported", autospec=True, side_effect=StateStore.exported
+        ) as mock_exported,
+    ):
+        exporter.export(
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            FailingSink(str(directory)),
+            ExportOptions(state_db=path),
+        )
+
+    with StateStore(path) as state:
+        records = {row["doi"]: row for row in state.records()}
+    assert len(records) == 4
+    assert records[stub_doi(0)]["updated"] == stub_updated(0)
+    assert records[stub_doi(0)]["key"] == "10.5072_synthetic.0.xml"
+    assert records[stub_doi(2)]["error"] == "disk full"
+    assert records[stub_doi(1)]["error"] is None
+    retried = next(c for c in mock_exported.call_args_list if c.args[2] == stub_doi(1))
+    assert retried.args[-1] == stub_updated(1)
+
+    runner = click.testing.CliRunner()
+    status = runner.invoke(cli, ["status", "--state-db", path])
+    failed = runner.invoke(cli, ["status", "--state-db", path, "--failed"])
+
+    assert status.exit_code == 0
+    assert "completed_with_errors" in status.output
+    assert "3 exported, 1 failed" in status.output
+    assert "Destination local: 4 records, 1 failed" in status.output
+    assert failed.exit_code == 0
+    assert "1 matching record(s)" in failed.output
+    assert f"{stub_doi(2)}\tlocal\t-\t{stub_updated(2)}\t-\tdisk full" in failed.output
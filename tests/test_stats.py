@@ -0,0 +1,46 @@
+"""Tests for src/datacite-websnap/stats.py"""
+
+from datacite_websnap.stats import ExportStats
+
+
+def test_export_stats_remaining():
+    stats = ExportStats(total=10, exported=6, failed=1)
+    assert stats.remaining == 3
+
+
+def test_export_stats_summary():
+    stats = ExportStats(total=10, exported=6, failed=1)
+    assert stats.summary() == "6/10 records exported, 1 failed, 3 not attempted"
+
+
+def test_export_stats_summary_compression_ratio():
+    stats = ExportStats(
+        total=2, exported=2, xml_bytes=6144, stored_bytes=1024, compression="gzip"
+    )
+    assert stats.compression_ratio == 6
+    assert stats.summary() == (
+        "2/2 records exported, 0 failed, 0 not attempted, "
+        "gzip compression ratio 6.0x (6.0 KiB to 1.0 KiB)"
+    )
+
+
+def test_export_stats_compression_ratio_not_compressed():
+    stats = ExportStats(total=1, exported=1, xml_bytes=100, stored_bytes=100)
+    assert stats.compression_ratio is None
+
+
+def test_export_stats_summary_concurrency_timeline():
+    stats = ExportStats(
+        total=1,
+        exported=1,
+        concurrency_timeline=[(0.0, 2), (0.5, 3), (1.0, 4), (1.2, 2), (2.0, 3)],
+    )
+    assert stats.summary() == (
+        "1/1 records exported, 0 failed, 0 not attempted, adaptive concurrency "
+        "2@0.0s 3@0.5s 4@1.0s 2@1.2s 3@2.0s (peak 4, 1 decrease)"
+    )
+
+    stats.concurrency_timeline = [(float(i), i + 1) for i in range(20)]
+    assert "1@0.0s 4@3.0s" in stats.summary() and "20@19.0s (peak 20" in (
+        stats.summary()
+    )
@@ -0,0 +1,100 @@
+"""Tests for src/datacite-websnap/tracing.py"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from datacite_websnap import tracing
+from datacite_websnap.cli import datacite_bulk_export
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.tracing import Tracer, span
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi
+from tests.s3_stub import S3Stub, STUB_BUCKET
+
+
+def test_span_is_noop_while_disabled():
+    assert tracing._tracer is None
+    with span("get_url_json", url="https://example.org") as trace:
+        trace.set(status_code=200)
+    assert span("decode_base64_xml") is span("write_local_file")
+
+
+def test_tracer_records_complete_events():
+    clock = iter([10.0, 10.5, 10.75, 11.0, 11.25])
+    tracer = Tracer(clock=lambda: next(clock))
+
+    with tracer.span("get_url_json", "datacite", url="u") as trace:
+        trace.set(status_code=200)
+    with pytest.raises(CustomClickException):
+        with tracer.span("write_local_file", "sink"):
+            raise CustomClickException("IOError: disk full")
+
+    metadata, *events = tracer.to_dict()["traceEvents"]
+    assert metadata["ph"] == "M"
+    assert metadata["args"]["name"] == "MainThread"
+    assert events[0]["ph"] == "X"
+    assert (events[0]["ts"], events[0]["dur"]) == (500000.0, 250000.0)
+    assert events[0]["args"] == {"url": "u", "status_code": 200}
+    assert events[1]["args"] == {"error": "IOError: disk full"}
+
+
+def test_tracing_writes_file_if_export_fails(tmp_path):
+    trace_file = tmp_path / "trace.json"
+
+    with patch("datacite_websnap.tracing.CustomEcho"):
+        with pytest.raises(ValueError):
+            with tracing.tracing(str(trace_file)):
+                with span("get_url_json", "datacite"):
+                    raise ValueError("interrupted")
+
+    assert tracing._tracer is None
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert events[-1]["args"] == {"error": "interrupted"}
+
+
+def test_export_command_trace_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "a")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "b")
+    trace_file = tmp_path / "trace.json"
+    directory = tmp_path / "records"
+    directory.mkdir()
+
+    with (
+        DataCiteStub(3) as datacite,
+        S3Stub() as s3,
+        patch("datacite_websnap.cli.CustomEcho"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.tracing.CustomEcho") as mock_echo,
+    ):
+        monkeypatch.setenv("ENDPOINT_URL", s3.url)
+        datacite_bulk_export.callback(
+            client_id=STUB_CLIENT_ID,
+            destination=("S3", "local"),
+            bucket=STUB_BUCKET,
+            directory_path=str(directory),
+            api_url=datacite.url,
+            trace_file=str(trace_file),
+        )
+
+    trace = json.loads(trace_file.read_text())
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    names = [event["name"] for event in events]
+    assert names.count("decode_base64_xml") == 3
+    assert names.count("s3_client_put_object") == 3
+    assert names.count("write_local_file") == 3
+    assert "get_url_json" in names
+    assert "Wrote" in mock_echo.call_args.args[0]
+
+    decode = next(e for e in events if e["name"] == "decode_base64_xml")
+    assert decode["args"]["doi"] in {stub_doi(i) for i in range(3)}
+    assert decode["args"]["bytes"] > 0
+    put = next(e for e in events if e["name"] == "s3_client_put_object")
+    assert put["args"]["status_code"] == 200
+    assert put["args"]["retries"] == 0
+    page = next(e for e in events if "/dois" in e["args"]["url"])
+    assert page["args"]["status_code"] == 200
+
+    # Tracing is disabled again after the export
+    assert tracing._tracer is None
@@ -11,8 +11,21 @@ from datacite_websnap.validators import (
     validate_bucket,
     validate_directory_path,
     validate_key_prefix,
-    validate_single_string_key_value,
     validate_s3_config,
+    validate_s3_transport,
+    validate_doi_list,
+    validate_dois,
+    validate_doi_file,
+    validate_replay_pages,
+    validate_years,
+    validate_xml_schema,
+    validate_layout,
+    validate_destinations,
+    validate_snapshot_options,
+    validate_byte_rate,
+    validate_positive_rate,
+    validate_timestamp,
+    DestinationSpec,
     CustomBadParameter,
     CustomClickException,
 )
@@ -47,6 +60,67 @@ def test_validate_at_least_one_query_param_invalid():
         validate_at_least_one_query_param((), None)
 
 
+def test_validate_doi_list_valid():
+    assert validate_doi_list(("10.123/abc",), (), None, None) == ("10.123/abc",)
+    assert validate_doi_list((), ("10.1234",), "client-id", "pages") == ()
+
+
+def test_validate_doi_list_invalid():
+    with pytest.raises(CustomBadParameter):
+        validate_doi_list(("10.123/abc",), (), "client-id", None)
+    with pytest.raises(CustomBadParameter):
+        validate_doi_list(("10.123/abc",), (), None, "pages")
+
+
+def test_validate_dois_valid():
+    assert validate_dois(None, None, (" 10.123/abc ",)) == ("10.123/abc",)
+
+
+def test_validate_dois_invalid():
+    with pytest.raises(BadParameter):
+        validate_dois(None, None, ("envidat.31",))
+
+
+def test_validate_doi_file_valid(tmp_path):
+    file_path = tmp_path / "dois.txt"
+    file_path.write_text("# DOIs to export\n10.123/abc\n\n 10.123/def \n")
+    assert validate_doi_file(None, None, str(file_path)) == (
+        "10.123/abc",
+        "10.123/def",
+    )
+    assert validate_doi_file(None, None, None) == ()
+
+
+def test_validate_doi_file_invalid(tmp_path):
+    file_path = tmp_path / "dois.txt"
+    file_path.write_text("not-a-doi\n")
+    with pytest.raises(BadParameter):
+        validate_doi_file(None, None, str(file_path))
+
+
+def test_validate_replay_pages_valid():
+    assert validate_replay_pages("pages", (), None, None, None) == "pages"
+    assert validate_replay_pages(None, ("10.1234",), "client-id", None, "pages") is None
+
+
+def test_validate_replay_pages_invalid():
+    with pytest.raises(CustomBadParameter):
+        validate_replay_pages("pages", (), "client-id", None, None)
+    with pytest.raises(CustomBadParameter):
+        validate_replay_pages("pages", (), None, None, "pages")
+    with pytest.raises(CustomBadParameter):
+        validate_replay_pages("pages", (), None, None, None, {"state": "findable"})
+
+
+def test_validate_years_valid():
+    assert validate_years(None, None, ("2023", "2024")) == ("2023", "2024")
+
+
+def test_validate_years_invalid():
+    with pytest.raises(BadParameter):
+        validate_years(None, None, ("24",))
+
+
 def test_validate_bucket_valid():
     assert validate_bucket("my-bucket", "S3") == "my-bucket"
     assert validate_bucket(None, "local") is None
@@ -77,20 +151,6 @@ def test_validate_key_prefix_invalid():
         validate_key_prefix("not-allowed", "local")
 
 
-def test_validate_single_string_key_value_valid():
-    validate_single_string_key_value({"key": "value"})
-
-
-def test_validate_single_string_key_value_invalid_non_string():
-    with pytest.raises(CustomClickException):
-        validate_single_string_key_value({1: "value"})
-
-
-def test_validate_single_string_key_value_invalid_multiple_pairs():
-    with pytest.raises(CustomClickException):
-        validate_single_string_key_value({"a": "b", "c": "d"})
-
-
 def test_validate_s3_config_valid(monkeypatch):
     monkeypatch.setenv("ENDPOINT_URL", "https://s3.amazonaws.com")
     monkeypatch.setenv("AWS_ACCESS_KEY_ID", "abc")
@@ -117,3 +177,123 @@ def test_validate_s3_config_unexpected_error():
     ):
         with pytest.raises(CustomClickException):
             validate_s3_config(file_logs=True)
+
+
+def test_validate_s3_transport(monkeypatch):
+    default = validate_s3_transport()
+    assert default.retry_mode == "standard"
+    assert default.pool_connections(1) == 10
+    assert default.pool_connections(32) == 36
+
+    # Settings of the option override the settings of the environment variable of
+    # the destination
+    monkeypatch.setenv(
+        "MIRROR_S3_TRANSPORT", "retry-mode=adaptive,path-style,pool-size=8"
+    )
+    transport = validate_s3_transport(
+        "pool-size=64,read-timeout=2.5,tcp-keepalive", env_prefix="MIRROR_"
+    )
+    assert transport.retry_mode == "adaptive"
+    assert transport.path_style is True
+    assert transport.tcp_keepalive is True
+    assert transport.read_timeout == 2.5
+    assert transport.pool_connections(1) == 64
+    assert validate_s3_transport().path_style is False
+
+    with pytest.raises(CustomBadParameter, match="Invalid setting 'pool=8'"):
+        validate_s3_transport("pool=8")
+    with pytest.raises(CustomBadParameter, match="S3 transport profile"):
+        validate_s3_transport("retry-mode=legacy")
+    with pytest.raises(CustomBadParameter, match="S3 transport profile"):
+        validate_s3_transport("max-attempts=0")
+
+
+def test_validate_xml_schema():
+    assert validate_xml_schema("metadata.xsd", "schema") == "metadata.xsd"
+    assert validate_xml_schema(None, "well-formed") is None
+    # The bundled DataCite kernel schema is used by default
+    assert validate_xml_schema(None, "schema") is None
+
+    with pytest.raises(CustomBadParameter):
+        validate_xml_schema("metadata.xsd", "well-formed")
+
+
+def test_validate_layout():
+    assert validate_layout("hash", "local") == "hash"
+    assert validate_layout("hash", "S3") == "hash"
+    assert validate_layout("doi-suffix", "local") == "doi-suffix"
+
+    with pytest.raises(CustomBadParameter):
+        validate_layout("doi-suffix", "S3")
+
+
+def test_validate_snapshot_options():
+    validate_snapshot_options(True, 7)
+    validate_snapshot_options(False, 0, ("10.123/abc",), plan=True)
+
+    with pytest.raises(CustomBadParameter):
+        validate_snapshot_options(False, 7)
+    with pytest.raises(CustomBadParameter):
+        validate_snapshot_options(True, 0, ("10.123/abc",))
+    with pytest.raises(CustomBadParameter):
+        validate_snapshot_options(True, 0, plan=True)
+
+
+def test_validate_destinations():
+    assert validate_destinations("local") == [DestinationSpec("local")]
+    assert validate_destinations(("S3", "s3:mirror,workers=8", "local,early-exit")) == [
+        DestinationSpec("S3"),
+        DestinationSpec("S3", "mirror", workers=8),
+        DestinationSpec("local", early_exit=True),
+    ]
+    assert validate_destinations(("S3,early-exit=false",))[0].early_exit is False
+    assert validate_destinations(("S3:public-mirror",))[0].env_prefix == (
+        "PUBLIC_MIRROR_"
+    )
+
+
+@pytest.mark.parametrize(
+    "destination",
+    [
+        ("ftp",),
+        ("local:backup",),
+        ("S3:",),
+        ("S3,workers=0",),
+        ("S3,colour=blue",),
+        ("S3", "S3"),
+    ],
+)
+def test_validate_destinations_invalid(destination):
+    with pytest.raises(CustomBadParameter):
+        validate_destinations(destination)
+
+
+def test_validate_byte_rate():
+    assert validate_byte_rate(None, None, None) is None
+    assert validate_byte_rate(None, None, "500") == 500
+    assert validate_byte_rate(None, None, "10M") == 10_000_000
+    assert validate_byte_rate(None, None, "1.5MiB/s") == 1.5 * 1024**2
+
+    with pytest.raises(BadParameter):
+        validate_byte_rate(None, None, "fast")
+    with pytest.raises(BadParameter):
+        validate_byte_rate(None, None, "0K")
+
+
+def test_validate_positive_rate():
+    assert validate_positive_rate(None, None, 2.5) == 2.5
+    assert validate_positive_rate(None, None, None) is None
+
+    with pytest.raises(BadParameter):
+        validate_positive_rate(None, None, 0)
+
+
+def test_validate_timestamp():
+    assert validate_timestamp(None, None, None) is None
+    assert validate_timestamp(None, None, "2025-01-01") == "2025-01-01T00:00:00Z"
+    assert validate_timestamp(None, None, "2025-01-01T12:00:00+02:00") == (
+        "2025-01-01T10:00:00Z"
+    )
+
+    with pytest.raises(BadParameter):
+        validate_timestamp(None, None, "yesterday")
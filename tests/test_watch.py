@@ -0,0 +1,216 @@
+"""Tests for src/datacite-websnap/watch.py"""
+
+import os
+import signal
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from datacite_websnap.api import ExportOptions, ExportQuery, Exporter
+from datacite_websnap.cli import datacite_watch
+from datacite_websnap.datacite_handler import format_updated_since_filters
+from datacite_websnap.exporter import format_xml_file_name
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.sinks import LocalSink
+from datacite_websnap.watch import HealthServer, Watcher, format_timestamp
+from tests.datacite_stub import DataCiteStub, STUB_CLIENT_ID, stub_doi
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with (
+        patch("datacite_websnap.api.CustomWarning"),
+        patch("datacite_websnap.datacite_handler.CustomEcho"),
+        patch("datacite_websnap.exporter.CustomEcho"),
+        patch("datacite_websnap.preflight.CustomEcho"),
+        patch("datacite_websnap.watch.CustomEcho"),
+        patch("datacite_websnap.watch.CustomWarning") as mock_warning,
+    ):
+        yield mock_warning
+
+
+def test_format_updated_since_filters():
+    assert format_updated_since_filters(None, "2025-01-01T00:00:00Z") == {
+        "query": "updated:[2025-01-01T00:00:00Z TO *]"
+    }
+    assert format_updated_since_filters(
+        {"state": "findable", "query": "titles.title:snow"}, "2025-01-01T00:00:00Z"
+    ) == {
+        "state": "findable",
+        "query": "(titles.title:snow) AND updated:[2025-01-01T00:00:00Z TO *]",
+    }
+
+
+def test_format_timestamp():
+    assert format_timestamp(0) == "1970-01-01T00:00:00Z"
+
+
+def test_watcher_exports_records_updated_since_last_run(tmp_path):
+    sink = LocalSink(str(tmp_path))
+    clock = [1893456000.0]  # 2030-01-01T00:00:00Z
+
+    with DataCiteStub(5) as datacite, Exporter(datacite.url) as exporter:
+        watcher = Watcher(
+            exporter,
+            [sink],
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            ExportOptions(manifest=True),
+            interval=3600,
+            overlap=60,
+            clock=lambda: clock[0],
+        )
+        first = watcher.run_once()
+        datacite.touch(3, "2030-01-01T00:30:00Z")
+        clock[0] += 3600
+        second = watcher.run_once()
+        clock[0] += 3600
+        third = watcher.run_once()
+
+    assert first.stats.exported == 5
+    assert second.stats.exported == 1
+    assert third.stats.exported == 0
+    assert datacite.queries[1:] == [
+        "updated:[2029-12-31T23:59:00Z TO *]",
+        "updated:[2030-01-01T00:59:00Z TO *]",
+    ]
+
+    # The manifest keeps the entries of the records that were not updated
+    assert len(list(sink.list())) == 6
+    assert (tmp_path / format_xml_file_name(stub_doi(3))).exists()
+    assert watcher.metrics.runs == 3
+    assert watcher.metrics.records_exported == 6
+    assert watcher.metrics.healthy
+
+
+def test_failed_run_is_repeated_and_reported(tmp_path, quiet):
+    class FailingSink(LocalSink):
+        fail = True
+
+        def write(self, body, key, compression=None, content_type=None):
+            if self.fail:
+                raise CustomClickException("disk full")
+            super().write(body, key, compression, content_type)
+
+    sink = FailingSink(str(tmp_path))
+
+    with (
+        DataCiteStub(2) as datacite,
+        Exporter(datacite.url) as exporter,
+        patch("datacite_websnap.failed_records.CustomEcho"),
+        patch("datacite_websnap.failed_records.CustomWarning"),
+        patch("datacite_websnap.failed_records.time.sleep"),
+    ):
+        watcher = Watcher(
+            exporter,
+            [sink],
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            ExportOptions(retry_attempts=0),
+            interval=0,
+        )
+        with HealthServer(watcher.metrics, "127.0.0.1", 0) as server:
+            watcher.run_once()
+            health = requests.get(f"{server.url}/health", timeout=5)
+            metrics = requests.get(f"{server.url}/metrics", timeout=5).text
+
+            sink.fail = False
+            watcher.run_once()
+            healthy = requests.get(f"{server.url}/health", timeout=5)
+
+    assert health.status_code == 503
+    assert health.json()["status"] == "failing"
+    assert "datacite_websnap_failed_runs_total 1" in metrics
+    assert "datacite_websnap_up 0" in metrics
+    assert "failed, the next run exports the same records" in quiet.call_args.args[0]
+
+    # The timestamp did not advance, the second run exported all records again
+    assert datacite.queries[-1] is None
+    assert healthy.status_code == 200
+    assert healthy.json()["updated_since"] is not None
+    assert watcher.metrics.records_exported == 2
+
+
+def test_failed_preflight_and_unexpected_error_keep_watching(tmp_path):
+    class FlakySink(LocalSink):
+        preflights = 0
+
+        def preflight(self, key_prefix=None, write=True):
+            self.preflights += 1
+            if self.preflights == 1:
+                raise CustomClickException("directory not writable")
+            super().preflight(key_prefix, write)
+
+    sink = FlakySink(str(tmp_path))
+    export = Exporter.export
+    errors = []
+
+    def flaky_export(self, *args, **kwargs):
+        if len(errors) == 1:
+            raise RuntimeError("boom")
+        return export(self, *args, **kwargs)
+
+    with (
+        DataCiteStub(2) as datacite,
+        Exporter(datacite.url) as exporter,
+        patch.object(Exporter, "export", autospec=True, side_effect=flaky_export),
+    ):
+        watcher = Watcher(
+            exporter,
+            [sink],
+            ExportQuery(client_id=STUB_CLIENT_ID),
+            ExportOptions(),
+            interval=0,
+        )
+        for _ in range(3):
+            result = watcher.run_once()
+            errors.append(watcher.metrics.last_error)
+
+    assert "directory not writable" in errors[0]
+    assert errors[1] == "Unexpected error: boom"
+    assert errors[2] is None
+    assert result.stats.exported == 2
+
+    # The preflight checks ran again after the failed checks of the first run
+    assert sink.preflights == 2
+    assert not watcher.options.preflight
+    assert watcher.metrics.runs == 3
+    assert watcher.metrics.failed_runs == 2
+
+
+@patch("datacite_websnap.cli.CustomEcho")
+def test_watch_command_stops_on_sigterm(mock_echo, tmp_path):
+    previous = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    exported = tmp_path / format_xml_file_name(stub_doi(2))
+
+    def terminate():
+        deadline = time.monotonic() + 10
+        while not exported.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    try:
+        with DataCiteStub(3) as datacite:
+            thread = threading.Thread(target=terminate)
+            thread.start()
+            start = time.monotonic()
+            datacite_watch.callback(
+                interval=3600,
+                health_port=0,
+                client_id=STUB_CLIENT_ID,
+                destination=("local",),
+                directory_path=str(tmp_path),
+                api_url=datacite.url,
+            )
+            thread.join()
+    finally:
+        signal.signal(signal.SIGTERM, previous[0])
+        signal.signal(signal.SIGINT, previous[1])
+
+    # The daemon did not wait for the next run
+    assert time.monotonic() - start < 10
+    assert len(list(tmp_path.iterdir())) == 3
+    echoed = [call.args[0] for call in mock_echo.call_args_list]
+    assert any(message.startswith("Health and metrics endpoint") for message in echoed)
@@ -0,0 +1,124 @@
+"""Tests for src/datacite-websnap/xml_validator.py"""
+
+import base64
+
+import pytest
+
+from datacite_websnap.logger import CustomClickException
+from datacite_websnap.record import DataCiteRecord
+from datacite_websnap.xml_validator import (
+    check_xml,
+    load_xml_schema,
+    validate_xml_records,
+)
+
+SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           targetNamespace="http://datacite.org/schema/kernel-4"
+           elementFormDefault="qualified">
+  <xs:element name="resource">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="identifier" type="xs:string"/>
+      </xs:sequence>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+VALID = (
+    b'<resource xmlns="http://datacite.org/schema/kernel-4">'
+    b"<identifier>10.123/abc</identifier></resource>"
+)
+INVALID = b'<resource xmlns="http://datacite.org/schema/kernel-4"><title/></resource>'
+MALFORMED = b"<resource><identifier></resource>"
+
+# Record with the mandatory properties of the DataCite kernel 4 schema
+DATACITE_RECORD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<resource xmlns="http://datacite.org/schema/kernel-4">
+  <identifier identifierType="DOI">10.16904/envidat.31</identifier>
+  <creators><creator><creatorName>Doe, Jane</creatorName></creator></creators>
+  <titles><title>Snow depth</title></titles>
+  <publisher>EnviDat</publisher>
+  <publicationYear>2025</publicationYear>
+  <resourceType resourceTypeGeneral="Dataset">Dataset</resourceType>
+</resource>
+"""
+
+
+def encode(xml_bytes: bytes) -> str:
+    return base64.b64encode(xml_bytes).decode("ascii")
+
+
+@pytest.fixture
+def schema_path(tmp_path):
+    pytest.importorskip("lxml")
+    path = tmp_path / "metadata.xsd"
+    path.write_text(SCHEMA)
+    return str(path)
+
+
+def test_check_xml_well_formed():
+    assert check_xml(VALID) is None
+    assert check_xml(INVALID) is None
+    assert check_xml(MALFORMED).startswith("XML is not well-formed")
+
+
+def test_check_xml_schema(schema_path):
+    schema = load_xml_schema(schema_path)
+
+    assert check_xml(VALID, schema) is None
+    assert check_xml(INVALID, schema).startswith("XML is not valid against schema")
+    assert check_xml(MALFORMED, schema).startswith("XML is not well-formed")
+
+
+def test_load_xml_schema_invalid_file(tmp_path):
+    pytest.importorskip("lxml")
+    path = tmp_path / "metadata.xsd"
+    path.write_text("<not-a-schema/>")
+
+    with pytest.raises(CustomClickException, match="Failed to load XML schema"):
+        load_xml_schema(str(path))
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_validate_xml_records_keeps_order(workers):
+    records = [
+        DataCiteRecord(f"10.123/{i}", encode(MALFORMED if i % 3 == 0 else VALID))
+        for i in range(25)
+    ]
+    records.append(DataCiteRecord("10.123/undecodable", "abc"))
+
+    results = list(validate_xml_records(records, workers=workers, batch_size=4))
+
+    assert [record for record, _ in results] == records
+    assert [error is not None for _, error in results] == [
+        i % 3 == 0 for i in range(25)
+    ] + [False]
+
+
+def test_validate_xml_records_schema(schema_path):
+    records = [
+        DataCiteRecord("10.123/valid", encode(VALID)),
+        DataCiteRecord("10.123/invalid", encode(INVALID)),
+    ]
+
+    results = list(
+        validate_xml_records(records, "schema", schema_path, workers=1, batch_size=1)
+    )
+
+    assert results[0][1] is None
+    assert "not valid against schema" in results[1][1]
+
+
+def test_validate_xml_records_bundled_schema():
+    pytest.importorskip("lxml")
+    records = [
+        DataCiteRecord("10.16904/envidat.31", encode(DATACITE_RECORD)),
+        DataCiteRecord("10.123/invalid", encode(VALID)),
+    ]
+
+    results = list(validate_xml_records(records, "schema", workers=1))
+
+    assert results[0][1] is None
+    assert "not valid against schema" in results[1][1]